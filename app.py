@@ -23,6 +23,7 @@ import logging
 import csv
 import datetime
 import json
+import queue
 from pathlib import Path
 from typing import Optional
 
@@ -36,7 +37,7 @@ except ImportError:
     logger = logging.getLogger(__name__)
 
 # Flask e extensões
-from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify, stream_with_context, make_response, session, send_file
 
 # Módulos do sistema Onion Monitor
 try:
@@ -44,10 +45,23 @@ try:
         init_db, get_db_connection, obter_fontes, adicionar_fonte,
         registrar_coleta, registrar_validacao, obter_coletas,
         obter_estatisticas_validacao, exportar_coletas_csv,
-        registrar_auditoria, obter_registros_auditoria
+        registrar_auditoria, obter_registros_auditoria, obter_versao_dados, obter_versao_auditoria,
+        obter_execucoes_perfiladas, obter_execucao_perfilada,
+        iterar_coletas, iterar_auditoria, ler_cursor_coleta
     )
-    from coletor import buscar_termo, validar_vazamento, verificar_status_fonte
+    from coletor import validar_vazamento, verificar_status_fonte
     from integracao_auditoria import obter_relatorio_auditoria, exportar_relatorio_csv
+    from tarefas import (
+        submeter_busca, submeter_lote, obter_tarefa, obter_lote, listar_tarefas,
+        iterar_resultados_lote, FilaCheiaError
+    )
+    from eventos import assinar, cancelar_assinatura, formatar_sse
+    from cache_versionado import CacheVersionado, etag_versao
+    from compressao import configurar_compressao, etag_corresponde
+    from metricas import gerar_metricas
+    from perfilamento import resumir_spans
+    from exportacao_colunar import exportar_parquet, PYARROW_DISPONIVEL
+    from saida_eventos import obter_eventos, confirmar_eventos
     logger.info("Módulos do sistema importados com sucesso")
 except ImportError as e:
     logger.error(f"Erro ao importar módulos do sistema: {e}")
@@ -63,6 +77,7 @@ class OnionMonitorConfig:
         self.DATABASE_PATH = os.environ.get('DATABASE_PATH', 'onion_monitor.db')
         self.LOGS_DIR = os.environ.get('LOGS_DIR', 'logs')
         self.LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+        self.SSE_HEARTBEAT = int(os.environ.get('SSE_HEARTBEAT', 15))
 
 def configure_logging():
     """Configura sistema de logging estruturado"""
@@ -101,6 +116,12 @@ config = OnionMonitorConfig()
 app = Flask(__name__)
 app.secret_key = config.SECRET_KEY
 
+# Dados dos painéis, recalculados apenas quando a versão dos dados muda
+cache_paineis = CacheVersionado()
+
+# ETag e compressão gzip/brotli das respostas HTML e JSON
+configurar_compressao(app)
+
 # Inicializa o banco de dados
 try:
     init_db()
@@ -141,18 +162,16 @@ def internal_error(error):
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    """Página inicial com busca e resultados."""
+    """Página inicial com busca e resultados (a busca roda em segundo plano)."""
     termo = request.args.get('termo', '')
+    tarefa_id = request.args.get('tarefa', '')
     
     # Se o formulário for enviado via POST, redireciona para GET com o termo como parâmetro
     if request.method == 'POST':
         termo = request.form.get('termo', '')
         return redirect(url_for('index', termo=termo))
     
-    resultados = []
-    resultados_validados = 0
-    
-    if termo:
+    if termo and not tarefa_id:
         try:
             # Registra a ação de busca
             registrar_auditoria(
@@ -161,43 +180,36 @@ def index():
                 dados=f"Timestamp: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             )
             
-            # Realiza a busca
-            resultados = buscar_termo(termo)
-            
-            # Conta resultados validados
-            resultados_validados = 0
-            for r in resultados:
-                try:
-                    if r['validado'] == 1:
-                        resultados_validados += 1
-                except (KeyError, TypeError):
-                    pass
-            
-            # Registra a conclusão da busca
-            registrar_auditoria(
-                acao="concluir_busca",
-                descricao=f"Busca concluída para o termo: {termo}",
-                dados=f"Resultados: {len(resultados)}, Validados: {resultados_validados}"
-            )
+            # Envia a busca para o pool de trabalhadores; a página acompanha o progresso
+            tarefa_id = submeter_busca(termo)
+            return redirect(url_for('index', termo=termo, tarefa=tarefa_id))
+        except FilaCheiaError as e:
+            logger.warning(f"Busca recusada: {e}")
+            flash("Muitas buscas em andamento. Tente novamente em alguns instantes.", "warning")
         except Exception as e:
             logger.error(f"Erro durante busca: {e}")
             flash(f"Erro durante a busca: {str(e)}", "danger")
     
     return render_template('index.html', 
-                         resultados=resultados, 
+                         resultados=[], 
                          termo=termo, 
-                         resultados_validados=resultados_validados)
+                         resultados_validados=0,
+                         tarefa_id=tarefa_id)
 
-@app.route('/analise')
-def analise():
-    """Página de análise de dados coletados - VERSÃO COM LIMITAÇÃO VISUAL DEFINITIVA"""
+def _calcular_painel_analise():
+    """
+    Calcula os dados do painel de análise - VERSÃO COM LIMITAÇÃO VISUAL DEFINITIVA.
+    
+    Returns:
+        dict: Variáveis do template analise.html
+    """
+    # Obtém estatísticas de validação
+    estatisticas = obter_estatisticas_validacao()
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
     try:
-        # Obtém estatísticas de validação
-        estatisticas = obter_estatisticas_validacao()
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Estatísticas gerais
         cursor.execute('SELECT COUNT(*) FROM coletas')
         total_coletas = cursor.fetchone()[0]
@@ -346,31 +358,89 @@ def analise():
             logger.error(f"Erro ultimas validadas: {e}")
             ultimas_validadas = []
         
+    finally:
         conn.close()
+    
+    # Debug logs ESPECÍFICOS para verificação
+    logger.info(f"ANÁLISE DEBUG: Total coletas reais: {total_coletas}")
+    logger.info(f"ANÁLISE DEBUG: Gráfico fonte (limitado): {coletas_por_fonte}")
+    
+    return {
+        'estatisticas': estatisticas,
+        'total_coletas': total_coletas,
+        'total_validados': total_validados,
+        'total_termos': total_termos,
+        'total_fontes': total_fontes,
+        'distribuicao_validacao': distribuicao_validacao,
+        'coletas_por_fonte': coletas_por_fonte,
+        'coletas_por_termo': coletas_por_termo,
+        'coletas_por_dia': coletas_por_dia,
+        'ultimas_validadas': ultimas_validadas
+    }
+
+def _versao_painel_analise(versao):
+    """
+    Versão do painel de análise: a dos dados mais a data atual (UTC), pois a
+    janela dos últimos 7 dias (date('now')) muda na virada do dia mesmo sem
+    novas escritas.
+    
+    Args:
+        versao (int): Versão dos dados
+        
+    Returns:
+        str: Versão usada no cache e no ETag do painel
+    """
+    return f"{versao}-{datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%d')}"
+
+def _resposta_versionada(chave, versao, gerar):
+    """
+    Responde com ETag derivado da versão dos dados, ou 304 sem corpo quando o
+    cliente já tem essa versão (If-None-Match).
+    
+    Args:
+        chave (str): Identificador da resposta
+        versao (int): Versão dos dados usada para gerá-la
+        gerar (callable): Função sem argumentos que gera o corpo da resposta
+        
+    Returns:
+        Response: Resposta completa ou 304
+    """
+    # Mensagens flash pendentes são consumidas ao renderizar; não podem virar 304
+    if session.get('_flashes'):
+        return make_response(gerar())
+    
+    etag = etag_versao(chave, versao)
+    
+    if etag_corresponde(request.if_none_match, etag):
+        resposta = make_response('', 304)
+    else:
+        resposta = make_response(gerar())
+    
+    # ETag forte: a camada de compressão acrescenta o sufixo da codificação
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
+@app.route('/analise')
+def analise():
+    """Página de análise de dados coletados, servida do cache enquanto os dados não mudarem"""
+    try:
+        versao = obter_versao_dados()
         
         # Registra a ação de análise
         registrar_auditoria(
             acao="visualizar_analise",
             descricao="Visualização da página de análise (com limitação visual)",
-            dados=f"Estatísticas: {total_validados} validados, {total_coletas - total_validados} não validados"
+            dados=f"Versão dos dados: {versao}"
         )
         
-        # Debug logs ESPECÍFICOS para verificação
-        logger.info(f"ANÁLISE DEBUG: Total coletas reais: {total_coletas}")
-        logger.info(f"ANÁLISE DEBUG: Gráfico fonte (limitado): {coletas_por_fonte}")
-        
-        return render_template(
-            'analise.html',
-            estatisticas=estatisticas,
-            total_coletas=total_coletas,
-            total_validados=total_validados,
-            total_termos=total_termos,
-            total_fontes=total_fontes,
-            distribuicao_validacao=distribuicao_validacao,
-            coletas_por_fonte=coletas_por_fonte,
-            coletas_por_termo=coletas_por_termo,
-            coletas_por_dia=coletas_por_dia,
-            ultimas_validadas=ultimas_validadas
+        versao_painel = _versao_painel_analise(versao)
+        
+        # O template só é renderizado quando o cliente não tem esta versão
+        return _resposta_versionada(
+            'analise',
+            versao_painel,
+            lambda: render_template('analise.html', **cache_paineis.obter('analise', versao_painel, _calcular_painel_analise))
         )
         
     except Exception as e:
@@ -391,7 +461,28 @@ def analise():
 # ROTA DE DEBUG OPCIONAL
 @app.route('/debug-analise')
 def debug_analise():
-    """Rota de debug para diagnosticar problemas na página de análise"""
+    """Rota de debug para diagnosticar problemas na página de análise, com ETag/304 pela versão dos dados"""
+    try:
+        versao = obter_versao_dados()
+        
+        # Registra acesso ao debug
+        registrar_auditoria(
+            acao="debug_analise",
+            descricao="Acesso à página de debug da análise",
+            dados=f"Versão dos dados: {versao}"
+        )
+        
+        # As consultas só são executadas quando o cliente não tem esta versão
+        return _resposta_versionada('debug-analise', versao, _gerar_debug_analise)
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'ERROR',
+            'erro': str(e),
+            'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }), 500
+
+def _gerar_debug_analise():
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -430,13 +521,6 @@ def debug_analise():
         
         conn.close()
         
-        # Registra acesso ao debug
-        registrar_auditoria(
-            acao="debug_analise",
-            descricao="Acesso à página de debug da análise",
-            dados=f"Total coletas: {total_coletas}"
-        )
-        
         return jsonify(debug_info)
         
     except Exception as e:
@@ -601,6 +685,411 @@ def verificar_fonte(fonte_id):
         logger.error(f"Erro na verificação de fonte: {e}")
         return jsonify({'success': False, 'message': f'Erro: {str(e)}'})
 
+# ============================================================================
+# API DE TAREFAS EM SEGUNDO PLANO
+# ============================================================================
+
+@app.route('/api/tarefas/busca', methods=['POST'])
+def api_submeter_busca():
+    """Cria uma tarefa de busca e retorna o identificador para acompanhamento."""
+    dados = request.get_json(silent=True) or request.form
+    termo = (dados.get('termo') or '').strip()
+    
+    if not termo:
+        return jsonify({'success': False, 'error': 'Termo não informado'}), 400
+    
+    # "perfilar": captura um cProfile da busca (visível em /perfilamento)
+    perfilar = str(dados.get('perfilar', '')).lower() in ['1', 'true', 'sim', 'on']
+    
+    try:
+        registrar_auditoria(
+            acao="iniciar_busca",
+            descricao=f"Busca iniciada para o termo: {termo}",
+            dados=f"Timestamp: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        )
+        tarefa_id = submeter_busca(termo, opcoes={'perfilar': True} if perfilar else None)
+    except FilaCheiaError as e:
+        resposta = jsonify({'success': False, 'error': str(e)})
+        resposta.headers['Retry-After'] = '30'
+        return resposta, 503
+    except Exception as e:
+        logger.error(f"Erro ao criar tarefa de busca: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'tarefa_id': tarefa_id,
+        'status_url': url_for('api_tarefa', tarefa_id=tarefa_id)
+    }), 202
+
+@app.route('/api/tarefas/<tarefa_id>')
+def api_tarefa(tarefa_id):
+    """Estado de uma tarefa e resultados a partir da posição 'desde'."""
+    desde = request.args.get('desde', 0, type=int)
+    
+    try:
+        tarefa = obter_tarefa(tarefa_id, desde=desde)
+    except Exception as e:
+        logger.error(f"Erro ao consultar tarefa {tarefa_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    if not tarefa:
+        return jsonify({'success': False, 'error': 'Tarefa não encontrada'}), 404
+    
+    return jsonify(tarefa)
+
+@app.route('/api/tarefas/<tarefa_id>/eventos')
+def api_tarefa_eventos(tarefa_id):
+    """
+    Fluxo Server-Sent Events com o progresso e os resultados de uma tarefa.
+    
+    Envia primeiro o estado persistido (para quem conecta no meio da busca) e
+    depois os eventos publicados pelos coletores à medida que acontecem.
+    """
+    def gerar():
+        # Assina antes de ler o estado para não perder eventos entre as duas etapas
+        fila = assinar(tarefa_id)
+        
+        try:
+            tarefa = obter_tarefa(tarefa_id)
+            if not tarefa:
+                yield formatar_sse('erro', {'error': 'Tarefa não encontrada'})
+                return
+            
+            yield formatar_sse('estado', {k: v for k, v in tarefa.items() if k != 'resultados'})
+            
+            # Resultados já enviados, por ID da coleta: um resultado chega ao vivo (antes
+            # de ser gravado) e depois também pelo banco, na consulta do heartbeat
+            ids_enviados = set()
+            
+            def novo(resultado):
+                if resultado.get('id') is None:
+                    return True
+                if resultado['id'] in ids_enviados:
+                    return False
+                ids_enviados.add(resultado['id'])
+                return True
+            
+            for resultado in tarefa['resultados']:
+                if novo(resultado):
+                    yield formatar_sse('resultado', resultado)
+            # Posição no banco do próximo resultado ainda não lido
+            enviados = len(tarefa['resultados'])
+            
+            while not tarefa['concluida']:
+                try:
+                    tipo, dados = fila.get(timeout=config.SSE_HEARTBEAT)
+                except queue.Empty:
+                    # Sem eventos locais (a tarefa pode rodar em outro processo): consulta o banco
+                    tarefa = obter_tarefa(tarefa_id, desde=enviados)
+                    if not tarefa:
+                        yield formatar_sse('erro', {'error': 'Tarefa não encontrada'})
+                        return
+                    for resultado in tarefa['resultados']:
+                        if novo(resultado):
+                            yield formatar_sse('resultado', resultado)
+                    enviados += len(tarefa['resultados'])
+                    yield formatar_sse('estado', {k: v for k, v in tarefa.items() if k != 'resultados'})
+                    continue
+                
+                if tipo == 'resultado' and not novo(dados):
+                    continue
+                
+                yield formatar_sse(tipo, dados)
+                
+                if tipo == 'tarefa_concluida':
+                    break
+            
+            tarefa = obter_tarefa(tarefa_id, incluir_resultados=False)
+            if not tarefa:
+                yield formatar_sse('erro', {'error': 'Tarefa não encontrada'})
+                return
+            yield formatar_sse('fim', {k: v for k, v in tarefa.items() if k != 'resultados'})
+        
+        finally:
+            cancelar_assinatura(tarefa_id, fila)
+    
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/tarefas')
+def api_tarefas():
+    """Lista as tarefas mais recentes."""
+    limite = request.args.get('limite', 20, type=int)
+    return jsonify(listar_tarefas(limite=min(limite, 100)))
+
+@app.route('/api/buscar', methods=['POST'])
+def api_buscar():
+    """
+    Envia um lote de termos para busca em segundo plano.
+    
+    Aceita {"termos": [...]} ou {"termo": "..."} e responde 202 com o
+    identificador do lote; termos repetidos ou já em busca são agrupados.
+    """
+    dados = request.get_json(silent=True) or {}
+    termos = dados.get('termos')
+    
+    if termos is None and dados.get('termo'):
+        termos = [dados['termo']]
+    
+    if not isinstance(termos, list) or not termos:
+        return jsonify({'success': False, 'error': 'Parâmetro "termos" (lista) ou "termo" obrigatório'}), 400
+    
+    try:
+        lote = submeter_lote(termos)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FilaCheiaError as e:
+        resposta = jsonify({'success': False, 'error': str(e)})
+        resposta.headers['Retry-After'] = '60'
+        return resposta, 503
+    except Exception as e:
+        logger.error(f"Erro na API de busca: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    registrar_auditoria(
+        acao="api_buscar_lote",
+        descricao=f"Lote de busca enviado pela API: {lote['lote_id']}",
+        dados=f"Termos: {len(lote['termos'])}, Agrupados: {sum(1 for t in lote['termos'] if t['coalescida'])}"
+    )
+    
+    return jsonify({
+        'success': True,
+        'lote_id': lote['lote_id'],
+        'termos': lote['termos'],
+        'status_url': url_for('api_lote', lote_id=lote['lote_id']),
+        'resultados_url': url_for('api_lote_resultados', lote_id=lote['lote_id'])
+    }), 202
+
+@app.route('/api/buscar/<lote_id>')
+def api_lote(lote_id):
+    """Estado de um lote, com as tarefas paginadas (?pagina=N&por_pagina=M)."""
+    pagina = request.args.get('pagina', 1, type=int)
+    por_pagina = min(request.args.get('por_pagina', 100, type=int), 500)
+    
+    lote = obter_lote(lote_id, pagina=pagina, por_pagina=por_pagina)
+    if not lote:
+        return jsonify({'success': False, 'error': 'Lote não encontrado'}), 404
+    
+    return jsonify(lote)
+
+@app.route('/api/buscar/<lote_id>/resultados')
+def api_lote_resultados(lote_id):
+    """
+    Resultados do lote em NDJSON (um objeto JSON por linha).
+    
+    Com ?aguardar=1 a resposta permanece aberta e envia os resultados à medida
+    que são persistidos, terminando quando todas as buscas do lote acabarem.
+    """
+    if not obter_lote(lote_id, por_pagina=0):
+        return jsonify({'success': False, 'error': 'Lote não encontrado'}), 404
+    
+    aguardar = request.args.get('aguardar', '0').lower() in ['1', 'true', 'sim']
+    
+    def gerar():
+        for item in iterar_resultados_lote(lote_id, aguardar=aguardar):
+            yield json.dumps(item, default=str) + '\n'
+    
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# ============================================================================
+# API DE LEITURA EM LOTE (NDJSON)
+# ============================================================================
+
+def _ler_booleano(valor):
+    """Interpreta 1/0, true/false e sim/não de um parâmetro; None se ausente ou desconhecido."""
+    valor = (valor or '').lower()
+    if valor in ['1', 'true', 'sim']:
+        return True
+    if valor in ['0', 'false', 'nao', 'não']:
+        return False
+    return None
+
+def _resposta_ndjson(lotes):
+    """Resposta NDJSON em fluxo, uma parte por lote (comprimida parte a parte, ver compressao)."""
+    def gerar():
+        for lote in lotes:
+            yield ''.join(json.dumps(item, default=str, ensure_ascii=False) + '\n' for item in lote)
+    
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/coletas')
+def api_coletas():
+    """
+    Coletas em NDJSON (um objeto JSON por linha), em ordem de alteração.
+    
+    Filtros: termo, data_inicio e data_fim (YYYY-MM-DD), validado (1/0),
+    fonte (ID ou nome) e limite. Cada linha traz o campo "cursor"; com
+    ?desde=<cursor> vêm apenas as coletas incluídas ou validadas depois dela,
+    para consultas incrementais (ex.: ?validado=1&desde=<último cursor>).
+    """
+    limite = request.args.get('limite', type=int)
+    if limite is not None and limite <= 0:
+        return jsonify({'success': False, 'error': 'Parâmetro "limite" deve ser positivo'}), 400
+    
+    try:
+        desde = ler_cursor_coleta(request.args['desde']) if request.args.get('desde') else None
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    filtros = {
+        'termo': request.args.get('termo') or None,
+        'data_inicio': request.args.get('data_inicio') or None,
+        'data_fim': request.args.get('data_fim') or None,
+        'apenas_validados': _ler_booleano(request.args.get('validado')),
+        'fonte': request.args.get('fonte') or None,
+    }
+    
+    registrar_auditoria(
+        acao="api_coletas",
+        descricao="Consulta de coletas pela API",
+        dados=f"Filtros: {filtros}, Desde: {request.args.get('desde')}, Limite: {limite}"
+    )
+    
+    return _resposta_ndjson(iterar_coletas(desde=desde, limite=limite, **filtros))
+
+@app.route('/api/auditoria')
+def api_auditoria():
+    """
+    Eventos de auditoria em NDJSON, em ordem de id.
+    
+    Filtros: acao (pode repetir), data_inicio e data_fim (YYYY-MM-DD, UTC) e
+    limite. Com ?desde=<id> vêm apenas os eventos gravados depois desse id.
+    """
+    limite = request.args.get('limite', type=int)
+    desde = request.args.get('desde', type=int)
+    if (limite is not None and limite <= 0) or (request.args.get('desde') and desde is None):
+        return jsonify({'success': False, 'error': 'Parâmetros "limite" e "desde" devem ser inteiros positivos'}), 400
+    
+    # Sem registro de auditoria: cada consulta incremental voltaria na consulta seguinte
+    return _resposta_ndjson(iterar_auditoria(
+        acoes=request.args.getlist('acao') or None,
+        data_inicio=request.args.get('data_inicio') or None,
+        data_fim=request.args.get('data_fim') or None,
+        desde=desde,
+        limite=limite
+    ))
+
+@app.route('/api/saida/<consumidor>')
+def api_saida_eventos(consumidor):
+    """
+    Eventos de coletas validadas ainda não confirmados pelo consumidor (?limite=N).
+    
+    Os mesmos eventos são devolvidos até o consumidor confirmá-los em
+    /api/saida/<consumidor>/confirmar; cada consumidor tem a sua posição.
+    """
+    limite = request.args.get('limite', 100, type=int)
+    if limite <= 0:
+        return jsonify({'success': False, 'error': 'Parâmetro "limite" deve ser positivo'}), 400
+    limite = min(limite, 1000)
+    
+    try:
+        return jsonify({'success': True, **obter_eventos(consumidor, limite)})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erro ao obter eventos do consumidor {consumidor}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/saida/<consumidor>/confirmar', methods=['POST'])
+def api_saida_confirmar(consumidor):
+    """Confirma os eventos do consumidor até {"ate_id": N} (inclusive)."""
+    dados = request.get_json(silent=True) or request.form
+    
+    try:
+        confirmado_ate = confirmar_eventos(consumidor, int(dados.get('ate_id')))
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Parâmetro "ate_id" inteiro obrigatório ou consumidor inválido: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Erro ao confirmar eventos do consumidor {consumidor}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify({'success': True, 'consumidor': consumidor, 'confirmado_ate': confirmado_ate})
+
+@app.route('/metrics')
+def metrics():
+    """Métricas do processo no formato de exposição do Prometheus."""
+    corpo, tipo = gerar_metricas()
+    
+    if corpo is None:
+        return Response("prometheus_client não instalado\n", status=503, mimetype='text/plain')
+    
+    return Response(corpo, content_type=tipo)
+
+@app.route('/api/estatisticas')
+def api_estatisticas():
+    """Dados do painel de análise em JSON, com ETag/304 pela versão dos dados."""
+    try:
+        versao = obter_versao_dados()
+        versao_painel = _versao_painel_analise(versao)
+
+        def gerar():
+            painel = cache_paineis.obter('analise', versao_painel, _calcular_painel_analise)
+            return jsonify({'success': True, 'versao': versao, **painel})
+
+        return _resposta_versionada('estatisticas', versao_painel, gerar)
+
+    except Exception as e:
+        logger.error(f"Erro na API de estatísticas: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/exportar-parquet')
+def exportar_parquet_coletas():
+    """Exporta resultados para Parquet (mesmos filtros de /exportar-csv), lidos do banco em lotes."""
+    try:
+        if not PYARROW_DISPONIVEL:
+            flash("A exportação Parquet requer o pacote pyarrow.", "warning")
+            return redirect(url_for('index'))
+        
+        termo = request.args.get('termo', '')
+        data_inicio = request.args.get('data_inicio')
+        data_fim = request.args.get('data_fim')
+        apenas_validados = True if request.args.get('apenas_validados') == '1' else None
+        
+        import tempfile
+        descritor, caminho = tempfile.mkstemp(suffix='.parquet')
+        os.close(descritor)
+        
+        try:
+            resumo = exportar_parquet(
+                'coletas', caminho, data_inicio, data_fim, particao=None,
+                termo=termo, apenas_validados=apenas_validados
+            )
+            # O arquivo aberto continua legível depois de removido do diretório
+            arquivo = open(caminho, 'rb')
+        finally:
+            os.remove(caminho)
+        
+        registrar_auditoria(
+            acao="exportacao_parquet",
+            descricao="Exportação de resultados para Parquet",
+            dados=f"Termo: {termo}, Resultados: {resumo['linhas']}"
+        )
+        
+        data_atual = datetime.datetime.now().strftime('%Y-%m-%d')
+        return send_file(
+            arquivo,
+            mimetype="application/vnd.apache.parquet",
+            as_attachment=True,
+            download_name=f"onion_monitor_{data_atual}.parquet"
+        )
+        
+    except Exception as e:
+        logger.error(f"Erro na exportação Parquet: {e}")
+        flash(f"Erro ao exportar dados: {str(e)}", "danger")
+        return redirect(url_for('index'))
+
 # ============================================================================
 # ROTAS DE RELATÓRIOS DE AUDITORIA - MANTIDAS TODAS AS FUNCIONALIDADES ORIGINAIS
 # ============================================================================
@@ -609,8 +1098,9 @@ def verificar_fonte(fonte_id):
 def relatorio_auditoria(periodo):
     """Página de relatório de auditoria."""
     try:
-        # Obtém o relatório
-        relatorio = obter_relatorio_auditoria(periodo)
+        # Obtém o relatório (totais do período e uma página de eventos)
+        antes_de_id = request.args.get('antes_de', type=int)
+        relatorio = obter_relatorio_auditoria(periodo, antes_de_id=antes_de_id)
         
         # Registra a ação de visualização
         registrar_auditoria(
@@ -630,15 +1120,15 @@ def relatorio_auditoria(periodo):
 def exportar_auditoria(periodo):
     """Exporta relatório de auditoria para CSV."""
     try:
-        # Obtém o relatório
-        relatorio = obter_relatorio_auditoria(periodo)
+        # A exportação usa apenas os totais por tipo, sem a página de eventos
+        relatorio = obter_relatorio_auditoria(periodo, limite_eventos=0)
         
         # Cria um arquivo CSV em memória com BOM para UTF-8
         import io
-        output = io.BytesIO()
+        output = io.StringIO()
         
         # Adiciona BOM (Byte Order Mark) para UTF-8
-        output.write(b'\xef\xbb\xbf')
+        output.write('\ufeff')
         
         # Cria o escritor CSV com encoding UTF-8
         writer = csv.writer(output, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
@@ -668,7 +1158,7 @@ def exportar_auditoria(periodo):
         )
         
         return Response(
-            output.getvalue(),
+            output.getvalue().encode('utf-8'),
             mimetype="text/csv; charset=utf-8",
             headers={
                 "Content-Disposition": f"attachment;filename=relatorio_auditoria_{periodo}_{data_atual}.csv",
@@ -687,22 +1177,29 @@ def exportar_auditoria(periodo):
 
 @app.route('/registros')
 def registros():
-    """Página de registros de auditoria."""
+    """Página de registros de auditoria, com ETag/304 pela versão dos eventos."""
     try:
         data_inicio = request.args.get('data_inicio')
         data_fim = request.args.get('data_fim')
         
-        # Obtém os registros
-        registros = obter_registros_auditoria(data_inicio, data_fim, limite=500)
+        # A versão é lida antes do registro da visualização abaixo
+        versao = obter_versao_auditoria()
         
         # Registra a ação de visualização
         registrar_auditoria(
             acao="visualizar_registros",
             descricao="Visualização da página de registros de auditoria",
-            dados=f"Total de registros: {len(registros)}"
+            dados=f"Período: {data_inicio or '-'} a {data_fim or '-'}"
         )
         
-        return render_template('registros.html', registros=registros, request=request)
+        # Os registros só são lidos e renderizados quando o cliente não tem esta versão
+        return _resposta_versionada(
+            'registros',
+            versao,
+            lambda: render_template(
+                'registros.html', registros=obter_registros_auditoria(data_inicio, data_fim, limite=500), request=request
+            )
+        )
         
     except Exception as e:
         logger.error(f"Erro ao carregar registros: {e}")
@@ -728,6 +1225,45 @@ def ferramentas():
         logger.error(f"Erro ao carregar ferramentas: {e}")
         return render_template('ferramentas.html', fontes=[])
 
+@app.route('/perfilamento', methods=['GET', 'POST'])
+@app.route('/perfilamento/<execucao_id>')
+def perfilamento(execucao_id=None):
+    """Tempo gasto em cada etapa das buscas, com cProfile opcional por execução."""
+    if request.method == 'POST':
+        termo = request.form.get('termo', '').strip()
+        
+        if termo:
+            try:
+                tarefa_id = submeter_busca(termo, opcoes={'perfilar': True})
+                flash(f"Busca por '{termo}' iniciada com cProfile (tarefa {tarefa_id}).", "info")
+            except FilaCheiaError as e:
+                flash(str(e), "warning")
+        
+        return redirect(url_for('perfilamento'))
+    
+    try:
+        execucoes = obter_execucoes_perfiladas(limite=50)
+        execucao = obter_execucao_perfilada(execucao_id) if execucao_id else None
+        
+        if execucao_id and not execucao:
+            flash("Execução não encontrada.", "warning")
+        
+        resumo = resumir_spans(execucao['spans']) if execucao else []
+        
+        # Profundidade de cada span para exibir a árvore de etapas
+        if execucao:
+            profundidade = {}
+            for registro in execucao['spans']:
+                profundidade[registro['ordem']] = profundidade[registro['pai']] + 1 if registro['pai'] is not None else 0
+                registro['profundidade'] = profundidade[registro['ordem']]
+        
+        return render_template('perfilamento.html', execucoes=execucoes, execucao=execucao, resumo=resumo)
+        
+    except Exception as e:
+        logger.error(f"Erro ao carregar perfilamento: {e}")
+        flash(f"Erro ao carregar perfilamento: {str(e)}", "danger")
+        return render_template('perfilamento.html', execucoes=[], execucao=None, resumo=[])
+
 @app.route('/agendar-busca')
 def agendar_busca():
     """Página de instruções para agendamento de buscas."""
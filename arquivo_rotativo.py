@@ -0,0 +1,249 @@
+import os
+import gzip
+import json
+import atexit
+import shutil
+import logging
+import datetime
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+logger = logging.getLogger("arquivo_rotativo")
+
+# Tamanho (MB) que provoca a rotação do arquivo, além da virada do dia
+TAMANHO_MAXIMO_MB = float(os.environ.get('AUDITORIA_ARQUIVO_TAMANHO_MB', 50))
+
+# Intervalo (s) entre fsyncs: eventos escritos há menos tempo podem se perder numa queda do sistema
+INTERVALO_FSYNC = float(os.environ.get('AUDITORIA_ARQUIVO_FSYNC', 1))
+
+# Linhas acumuladas (bytes) que provocam uma escrita no arquivo
+TAMANHO_BUFFER = 64 * 1024
+
+class ArquivoJsonlRotativo:
+    """
+    Arquivo JSON Lines apenas de acréscimo, compartilhado entre processos, com
+    escrita em buffer, fsync periódico e rotação por tamanho ou por dia.
+
+    O buffer guarda apenas linhas completas, gravadas com um único os.write
+    num descritor O_APPEND, de modo que as linhas de processos diferentes
+    não se misturam. A rotação é feita por um processo de cada vez, sob uma
+    trava exclusiva (arquivo .lock ao lado); os demais percebem a troca do
+    inode e reabrem o arquivo novo antes da próxima escrita.
+
+    Os arquivos rotacionados recebem a data no nome
+    (ex.: busca-2025-01-31.jsonl.gz, busca-2025-01-31.1.jsonl.gz) e são
+    comprimidos com gzip numa thread separada.
+    """
+
+    def __init__(self, caminho, tamanho_maximo=None, intervalo_fsync=INTERVALO_FSYNC, comprimir=True):
+        """
+        Inicializa o arquivo.
+
+        Args:
+            caminho (str): Caminho do arquivo atual (ex.: logs/busca.jsonl)
+            tamanho_maximo (int, optional): Bytes que provocam a rotação. Defaults to TAMANHO_MAXIMO_MB.
+            intervalo_fsync (float, optional): Intervalo (s) entre fsyncs (0 para fsync a cada escrita)
+            comprimir (bool, optional): Comprime os arquivos rotacionados. Defaults to True.
+        """
+        self.caminho = caminho
+        self.tamanho_maximo = tamanho_maximo or int(TAMANHO_MAXIMO_MB * 1024 * 1024)
+        self.intervalo_fsync = intervalo_fsync
+        self.comprimir = comprimir
+        self._fd = None
+        self._inode = None
+        self._trava = None
+        self._linhas = []
+        self._tamanho_linhas = 0
+        self._pendente = False
+        self._lock = threading.Lock()
+        self._sinal = threading.Event()
+        self._thread = None
+
+    def _abrir(self):
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        if fcntl is not None and self._trava is None:
+            self._trava = os.open(self.caminho + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        self._fd = os.open(self.caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._inode = os.fstat(self._fd).st_ino
+
+    def _reabrir(self):
+        self._fechar_arquivo()
+        self._abrir()
+
+    @contextlib.contextmanager
+    def _travado(self, exclusivo=False):
+        # Escritas usam a trava compartilhada; a rotação, a exclusiva
+        if self._trava is None:
+            yield
+            return
+        fcntl.flock(self._trava, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._trava, fcntl.LOCK_UN)
+
+    def _substituido(self):
+        # O caminho aponta para outro inode (ou sumiu): outro processo rotacionou o arquivo
+        try:
+            return os.stat(self.caminho).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def _dia_rotacao(self):
+        # Dia do arquivo aberto se ele precisa ser rotacionado (tamanho ou virada do dia), senão None
+        estado = os.fstat(self._fd)
+        if not estado.st_size:
+            return None
+        dia = datetime.date.fromtimestamp(estado.st_mtime)
+        if estado.st_size >= self.tamanho_maximo or dia != datetime.date.today():
+            return dia
+        return None
+
+    def _destino_rotacao(self, dia):
+        base = self.caminho[:-len('.jsonl')] if self.caminho.endswith('.jsonl') else self.caminho
+        sufixo = 0
+        while True:
+            nome = f"{base}-{dia.isoformat()}{f'.{sufixo}' if sufixo else ''}.jsonl"
+            if not os.path.exists(nome) and not os.path.exists(nome + '.gz'):
+                return nome
+            sufixo += 1
+
+    def _rotacionar(self):
+        destino = None
+        with self._travado(exclusivo=True):
+            # Outro processo pode ter rotacionado enquanto esta trava era aguardada
+            if self._substituido():
+                self._reabrir()
+            dia = self._dia_rotacao()
+            if dia is not None:
+                destino = self._destino_rotacao(dia)
+                os.replace(self.caminho, destino)
+                self._reabrir()
+
+        # Nenhum processo escreve mais no arquivo rotacionado: todos conferem o inode sob a trava
+        if destino and self.comprimir:
+            threading.Thread(target=_comprimir, args=(destino,), name='auditoria-compressao', daemon=False).start()
+
+    def _gravar_linhas(self):
+        # Chamado com self._lock: grava as linhas acumuladas num único os.write
+        if not self._linhas:
+            return
+        dados = b''.join(self._linhas)
+        self._linhas = []
+        self._tamanho_linhas = 0
+
+        if self._fd is None or self._substituido():
+            self._reabrir()
+        if self._dia_rotacao() is not None:
+            self._rotacionar()
+
+        with self._travado():
+            if self._substituido():
+                self._reabrir()
+            while dados:
+                dados = dados[os.write(self._fd, dados):]
+        self._pendente = True
+
+    def _fechar_arquivo(self):
+        if self._fd is not None:
+            if self._pendente:
+                os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._pendente = False
+
+    def escrever(self, registro):
+        """
+        Acrescenta um registro como uma linha JSON.
+
+        Args:
+            registro (dict): Registro a gravar (valores não serializáveis viram texto)
+        """
+        linha = (json.dumps(registro, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+        with self._lock:
+            self._linhas.append(linha)
+            self._tamanho_linhas += len(linha)
+
+            if not self.intervalo_fsync:
+                self._gravar_linhas()
+                os.fsync(self._fd)
+                self._pendente = False
+                return
+
+            if self._tamanho_linhas >= TAMANHO_BUFFER:
+                self._gravar_linhas()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name='auditoria-fsync', daemon=True)
+                self._thread.start()
+
+    def descarregar(self):
+        """
+        Grava no disco (escrita e fsync) as linhas acumuladas.
+        """
+        with self._lock:
+            try:
+                self._gravar_linhas()
+                if self._fd is not None and self._pendente:
+                    os.fsync(self._fd)
+                    self._pendente = False
+            except OSError as e:
+                logger.error(f"Erro ao gravar {self.caminho}: {str(e)}")
+
+    def fechar(self):
+        """
+        Grava as linhas acumuladas e fecha o arquivo (é reaberto na próxima escrita).
+        """
+        with self._lock:
+            try:
+                self._gravar_linhas()
+                self._fechar_arquivo()
+                if self._trava is not None:
+                    os.close(self._trava)
+                    self._trava = None
+            except OSError as e:
+                logger.error(f"Erro ao fechar {self.caminho}: {str(e)}")
+
+    def _executar(self):
+        while True:
+            self._sinal.wait(self.intervalo_fsync)
+            self.descarregar()
+
+def _comprimir(caminho):
+    try:
+        with open(caminho, 'rb') as origem, gzip.open(caminho + '.gz', 'wb') as destino:
+            shutil.copyfileobj(origem, destino)
+        os.remove(caminho)
+    except OSError as e:
+        logger.error(f"Erro ao comprimir {caminho}: {str(e)}")
+
+_arquivos = {}
+_arquivos_lock = threading.Lock()
+
+def obter_arquivo(caminho):
+    """
+    Obtém o arquivo rotativo do processo para o caminho, criando-o na primeira chamada.
+
+    Args:
+        caminho (str): Caminho do arquivo atual
+
+    Returns:
+        ArquivoJsonlRotativo: Arquivo compartilhado
+    """
+    with _arquivos_lock:
+        arquivo = _arquivos.get(caminho)
+        if arquivo is None:
+            arquivo = _arquivos[caminho] = ArquivoJsonlRotativo(caminho)
+            # Garante que o buffer seja gravado quando o processo terminar
+            atexit.register(arquivo.fechar)
+        return arquivo
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Benchmark da coleta (buscar_termo) e da busca agendada contra fontes simuladas.
+
+Sobe o servidor_simulado.py num processo separado (Ahmia, listas .onion e
+páginas de vazamento, com latência e taxa de falhas configuráveis), aponta
+o coletor para ele com um banco temporário e mede:
+
+- termos por minuto;
+- latência p50/p99 por fonte (requisições e fonte inteira, a partir dos
+  spans do perfilamento gravados no banco);
+- linhas gravadas no banco por segundo;
+- pico de memória (RSS).
+
+O resultado é gravado em JSON (benchmarks/resultados/ por padrão) e
+comparado com o resultado anterior de mesma configuração, para que
+regressões fiquem visíveis.
+
+Uso:
+    python benchmarks/benchmark_coleta.py --termos acme,globex --latencia-onion 0.3 --taxa-falhas 0.05
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+import platform
+import resource
+import datetime
+import tempfile
+import subprocess
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import RAIZ, DIRETORIO_RESULTADOS, resumo_latencias, pico_rss_mb, versao_codigo, gravar_resultado
+from benchmarks.servidor_simulado import iniciar_servidor_processo, CONFIGURACAO_PADRAO
+
+logger = logging.getLogger("benchmark_coleta")
+
+# Tabelas do próprio perfilamento não entram na contagem de linhas gravadas
+TABELAS_IGNORADAS = ('execucoes', 'spans', 'sqlite_sequence')
+
+# Métricas comparadas com o resultado anterior: (caminho, maior é melhor)
+METRICAS_COMPARADAS = [
+    ('buscar_termo.termos_por_minuto', True),
+    ('buscar_termo.linhas_por_segundo', True),
+    ('buscar_termo.pico_rss_mb', False),
+    ('agendador.termos_por_minuto', True),
+    ('agendador.linhas_por_segundo', True),
+    ('agendador.pico_rss_mb', False),
+]
+
+def contar_linhas(caminho_db):
+    """
+    Conta as linhas de cada tabela do banco (exceto as do perfilamento).
+
+    Args:
+        caminho_db (str): Caminho do banco
+
+    Returns:
+        dict: {tabela: linhas}
+    """
+    conn = sqlite3.connect(caminho_db)
+    try:
+        tabelas = [
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            if row[0] not in TABELAS_IGNORADAS
+        ]
+        return {tabela: conn.execute(f'SELECT COUNT(*) FROM "{tabela}"').fetchone()[0] for tabela in tabelas}
+    finally:
+        conn.close()
+
+def latencias_por_fonte(caminho_db):
+    """
+    Extrai as latências por fonte dos spans gravados pelo perfilamento.
+
+    As requisições são os spans 'fetch'; a fonte vem do span ancestral com o
+    atributo 'fonte' (buscar_em_surface / buscar_em_lista).
+
+    Args:
+        caminho_db (str): Caminho do banco
+
+    Returns:
+        dict: {fonte: {'requisicoes': {...}, 'fonte': {...}}} com p50/p99 em ms
+    """
+    conn = sqlite3.connect(caminho_db)
+    try:
+        spans = {}
+        for execucao_id, ordem, pai, nome, duracao_ms, atributos in conn.execute(
+            'SELECT execucao_id, ordem, pai, nome, duracao_ms, atributos FROM spans'
+        ):
+            spans[(execucao_id, ordem)] = (pai, nome, duracao_ms, json.loads(atributos) if atributos else {})
+    finally:
+        conn.close()
+
+    requisicoes = {}
+    fontes = {}
+    for (execucao_id, _), (pai, nome, duracao_ms, atributos) in spans.items():
+        if duracao_ms is None:
+            continue
+        if nome in ('buscar_em_surface', 'buscar_em_lista') and 'fonte' in atributos:
+            fontes.setdefault(atributos['fonte'], []).append(duracao_ms)
+        elif nome == 'fetch':
+            # Sobe até o span que identifica a fonte
+            fonte = None
+            while pai is not None and fonte is None:
+                pai, _, _, atributos_pai = spans.get((execucao_id, pai), (None, None, None, {}))
+                fonte = atributos_pai.get('fonte')
+            requisicoes.setdefault(fonte or 'desconhecida', []).append(duracao_ms)
+
+    return {
+        fonte: {
+            'requisicoes': resumo_latencias(requisicoes.get(fonte, [])),
+            'fonte': resumo_latencias(fontes.get(fonte, [])),
+        }
+        for fonte in sorted(set(requisicoes) | set(fontes))
+    }
+
+def preparar_banco(db, caminho_db, url_base, fontes_lista):
+    """
+    Inicializa um banco vazio com as fontes simuladas no lugar das padrão.
+
+    Args:
+        db (module): Módulo db já importado
+        caminho_db (str): Caminho do banco a criar
+        url_base (str): URL do servidor simulado
+        fontes_lista (int): Quantidade de fontes do tipo 'lista'
+    """
+    caminho_anterior = db.DB_PATH
+    db.DB_PATH = caminho_db
+    try:
+        db.init_db()
+        conn = db.get_db_connection()
+        try:
+            conn.execute('DELETE FROM fontes')
+            fontes = [('Ahmia', f"{url_base}/ahmia/", 'surface')]
+            fontes += [(f"Lista {n}", f"{url_base}/lista/{n}/", 'lista') for n in range(1, fontes_lista + 1)]
+            conn.executemany(
+                "INSERT INTO fontes (nome, url, tipo, ativo, status) VALUES (?, ?, ?, 1, 'ativo')",
+                fontes
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    finally:
+        db.DB_PATH = caminho_anterior
+
+def _descarregar_auditoria():
+    # Grava os eventos de auditoria ainda no buffer antes de contar as linhas
+    from db import _gravar_lote_auditoria
+    from politica_auditoria import obter_buffer
+    obter_buffer(_gravar_lote_auditoria).descarregar()
+
+def _diferenca(antes, depois):
+    return {tabela: depois[tabela] - antes.get(tabela, 0) for tabela in depois if depois[tabela] != antes.get(tabela, 0)}
+
+def medir_buscar_termo(termos, rodadas, caminho_db):
+    """
+    Executa buscar_termo() para cada termo, no processo atual.
+
+    Args:
+        termos (list): Termos buscados
+        rodadas (int): Quantas vezes a lista de termos é buscada
+        caminho_db (str): Banco já preparado (também em DATABASE_PATH)
+
+    Returns:
+        dict: Métricas da execução
+    """
+    from coletor import buscar_termo
+
+    antes = contar_linhas(caminho_db)
+    duracoes = []
+    resultados = 0
+
+    inicio = time.perf_counter()
+    for _ in range(rodadas):
+        for termo in termos:
+            inicio_termo = time.perf_counter()
+            resultados += len(buscar_termo(termo))
+            duracoes.append((time.perf_counter() - inicio_termo) * 1000)
+    _descarregar_auditoria()
+    duracao = time.perf_counter() - inicio
+
+    linhas = _diferenca(antes, contar_linhas(caminho_db))
+    total_linhas = sum(linhas.values())
+
+    return {
+        'termos': len(termos) * rodadas,
+        'duracao_s': round(duracao, 2),
+        'termos_por_minuto': round(len(termos) * rodadas / duracao * 60, 2),
+        'duracao_termo': resumo_latencias(duracoes),
+        'resultados': resultados,
+        'linhas_gravadas': total_linhas,
+        'linhas_por_segundo': round(total_linhas / duracao, 1),
+        'linhas_por_tabela': linhas,
+        'latencias_por_fonte': latencias_por_fonte(caminho_db),
+        'pico_rss_mb': pico_rss_mb(resource.getrusage(resource.RUSAGE_SELF)),
+    }
+
+def medir_agendador(termos, caminho_db, ambiente, diretorio):
+    """
+    Executa busca_agendada.py num subprocesso, como o cron faria.
+
+    Args:
+        termos (list): Termos gravados em termos_busca.txt
+        caminho_db (str): Banco já preparado
+        ambiente (dict): Variáveis de ambiente do subprocesso
+        diretorio (str): Diretório de trabalho (termos_busca.txt e logs)
+
+    Returns:
+        dict: Métricas da execução
+    """
+    with open(os.path.join(diretorio, 'termos_busca.txt'), 'w') as f:
+        f.write('\n'.join(termos) + '\n')
+
+    antes = contar_linhas(caminho_db)
+
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, os.path.join(RAIZ, 'busca_agendada.py')],
+        cwd=diretorio,
+        env=dict(ambiente, DATABASE_PATH=caminho_db),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    duracao = time.perf_counter() - inicio
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    linhas = _diferenca(antes, contar_linhas(caminho_db))
+    total_linhas = sum(linhas.values())
+
+    return {
+        'codigo_saida': processo.returncode,
+        'termos': len(termos),
+        'duracao_s': round(duracao, 2),
+        'termos_por_minuto': round(len(termos) / duracao * 60, 2),
+        'linhas_gravadas': total_linhas,
+        'linhas_por_segundo': round(total_linhas / duracao, 1),
+        'linhas_por_tabela': linhas,
+        'latencias_por_fonte': latencias_por_fonte(caminho_db),
+        'pico_rss_mb': pico_rss_mb(uso),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da coleta contra fontes simuladas")
+    parser.add_argument('--termos', default='acme,globex,initech,umbrella,hooli', help="Termos separados por vírgula")
+    parser.add_argument('--rodadas', type=int, default=1, help="Repetições da lista de termos em buscar_termo")
+    parser.add_argument('--fontes-lista', type=int, default=2, help="Fontes do tipo 'lista' simuladas")
+    parser.add_argument('--latencia', type=float, default=CONFIGURACAO_PADRAO['latencia'], help="Latência (s) do Ahmia e das listas")
+    parser.add_argument('--latencia-onion', type=float, default=CONFIGURACAO_PADRAO['latencia_onion'], help="Latência (s) dos serviços .onion")
+    parser.add_argument('--taxa-falhas', type=float, default=CONFIGURACAO_PADRAO['taxa_falhas'], help="Fração de respostas 503")
+    parser.add_argument('--tamanho-vazamento', type=int, default=CONFIGURACAO_PADRAO['tamanho_vazamento'], help="KB por página de vazamento")
+    parser.add_argument('--max-paginas', type=int, default=20, help="FRONTEIRA_MAX_PAGINAS durante o benchmark")
+    parser.add_argument('--sem-agendador', action='store_true', help="Não executa o benchmark de busca_agendada.py")
+    parser.add_argument('--saida', default=DIRETORIO_RESULTADOS, help="Diretório dos resultados JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    termos = [termo.strip() for termo in args.termos.split(',') if termo.strip()]
+
+    configuracao_servidor = {
+        'latencia': args.latencia,
+        'latencia_onion': args.latencia_onion,
+        'taxa_falhas': args.taxa_falhas,
+        'tamanho_vazamento': args.tamanho_vazamento,
+        'termos': termos,
+    }
+    servidor, url_base = iniciar_servidor_processo(configuracao_servidor)
+    diretorio = tempfile.mkdtemp(prefix='onion_monitor_benchmark_')
+    logger.info(f"Servidor simulado em {url_base}; arquivos temporários em {diretorio}")
+
+    try:
+        # Configuração lida na importação dos módulos da coleta
+        ambiente = dict(
+            os.environ,
+            DATABASE_PATH=os.path.join(diretorio, 'buscar_termo.db'),
+            TOR_PROXY=url_base,
+            FRONTEIRA_ATRASO_HOST='0',
+            FRONTEIRA_MAX_PAGINAS=str(args.max_paginas),
+            COLETOR_PAUSA_FONTES='0',
+            PERFILAMENTO='1',
+            PERFILAMENTO_MAX_EXECUCOES='1000000',
+        )
+        os.environ.update(ambiente)
+        os.chdir(diretorio)
+
+        import db
+
+        # Os módulos da coleta configuram o logging em INFO; o benchmark só mostra avisos
+        logging.getLogger().setLevel(logging.WARNING)
+
+        resultado = {
+            'benchmark': 'coleta',
+            'data': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'versao_codigo': versao_codigo(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'configuracao': dict(configuracao_servidor, rodadas=args.rodadas, fontes_lista=args.fontes_lista, max_paginas=args.max_paginas),
+        }
+
+        preparar_banco(db, ambiente['DATABASE_PATH'], url_base, args.fontes_lista)
+        logger.warning(f"buscar_termo: {len(termos)} termos x {args.rodadas} rodada(s)")
+        resultado['buscar_termo'] = medir_buscar_termo(termos, args.rodadas, ambiente['DATABASE_PATH'])
+
+        if not args.sem_agendador:
+            caminho_agendador = os.path.join(diretorio, 'agendador.db')
+            preparar_banco(db, caminho_agendador, url_base, args.fontes_lista)
+            logger.warning(f"busca_agendada.py: {len(termos)} termos")
+            resultado['agendador'] = medir_agendador(termos, caminho_agendador, ambiente, diretorio)
+
+        with urllib.request.urlopen(f"{url_base}/_estatisticas", timeout=10) as resposta:
+            resultado['requisicoes_servidor'] = json.load(resposta)
+    finally:
+        os.chdir(RAIZ)
+        servidor.terminate()
+        servidor.join()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    print(json.dumps({chave: resultado[chave] for chave in ('buscar_termo', 'agendador') if chave in resultado}, indent=2, ensure_ascii=False))
+    gravar_resultado(resultado, 'coleta', METRICAS_COMPARADAS, args.saida)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Benchmark das consultas dos painéis e das exportações sobre um banco grande.
+
+Mede cada consulta usada por /analise, /registros, relatórios de auditoria e
+exportações, tanto chamando as funções do db/integracao_auditoria quanto
+pelas rotas do Flask (test_client, com renderização e compressão), sobre um
+banco gerado por gerar_dados_sinteticos.py.
+
+O resultado (p50/mín./máx. por caso e pico de RSS) é gravado em JSON e
+comparado com o resultado anterior de mesma configuração.
+
+Uso:
+    python benchmarks/gerar_dados_sinteticos.py --banco /tmp/onion_monitor_grande.db --coletas 10000000 --auditoria 30000000
+    python benchmarks/benchmark_painel.py --banco /tmp/onion_monitor_grande.db --ignorar 'obter_coletas$'
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+import platform
+import resource
+import datetime
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import RAIZ, DIRETORIO_RESULTADOS, percentil, pico_rss_mb, versao_codigo, gravar_resultado
+
+logger = logging.getLogger("benchmark_painel")
+
+PERIODOS_AUDITORIA = ('hoje', 'semana', 'mes', 'total')
+
+def _contar(caminho_db, tabela):
+    conn = sqlite3.connect(caminho_db)
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM "{tabela}"').fetchone()[0]
+    finally:
+        conn.close()
+
+def _termo_mais_frequente(caminho_db):
+    conn = sqlite3.connect(caminho_db)
+    try:
+        linha = conn.execute(
+            'SELECT termo_busca FROM coletas GROUP BY termo_busca ORDER BY COUNT(*) DESC LIMIT 1'
+        ).fetchone()
+        return linha[0] if linha else 'acme'
+    finally:
+        conn.close()
+
+def montar_casos(diretorio, termo):
+    """
+    Monta os casos medidos: funções de consulta e rotas do Flask.
+
+    Args:
+        diretorio (str): Diretório temporário (arquivos exportados)
+        termo (str): Termo usado nos filtros (o mais frequente do banco)
+
+    Returns:
+        list: Tuplas (nome, função sem argumentos que devolve o tamanho do resultado)
+    """
+    import app as aplicacao
+    from db import obter_coletas, obter_estatisticas_validacao, obter_registros_auditoria, exportar_coletas_csv
+    from integracao_auditoria import obter_relatorio_auditoria, exportar_relatorio_csv
+
+    cliente = aplicacao.app.test_client()
+    sete_dias = (datetime.date.today() - datetime.timedelta(days=7)).isoformat()
+
+    def rota(url, sem_cache=False):
+        def executar():
+            if sem_cache:
+                aplicacao.cache_paineis.limpar()
+            resposta = cliente.get(url, headers={'Accept-Encoding': 'gzip'})
+            corpo = resposta.get_data()
+            # As rotas redirecionam (com flash) quando falham
+            if resposta.status_code != 200:
+                raise RuntimeError(f"{url} respondeu {resposta.status_code}")
+            return len(corpo)
+        return executar
+
+    def exportar_coletas():
+        caminho = os.path.join(diretorio, 'coletas.csv')
+        exportar_coletas_csv(caminho)
+        return os.path.getsize(caminho)
+
+    def exportar_auditoria():
+        caminho = os.path.join(diretorio, 'auditoria.csv')
+        exportar_relatorio_csv('total', caminho)
+        return os.path.getsize(caminho)
+
+    casos = [
+        ('painel_analise', lambda: len(aplicacao._calcular_painel_analise())),
+        ('obter_estatisticas_validacao', lambda: len(obter_estatisticas_validacao())),
+        ('obter_coletas', lambda: len(obter_coletas())),
+        ('obter_coletas_termo', lambda: len(obter_coletas(termo=termo))),
+        ('obter_coletas_7_dias', lambda: len(obter_coletas(data_inicio=sete_dias))),
+        ('obter_coletas_validados', lambda: len(obter_coletas(apenas_validados=True))),
+        ('obter_registros_auditoria', lambda: len(obter_registros_auditoria(limite=500))),
+        ('obter_registros_auditoria_7_dias', lambda: len(obter_registros_auditoria(data_inicio=sete_dias, limite=500))),
+    ]
+    casos += [
+        (f'obter_relatorio_auditoria_{periodo}', lambda periodo=periodo: obter_relatorio_auditoria(periodo)['total_eventos'])
+        for periodo in PERIODOS_AUDITORIA
+    ]
+    casos += [
+        ('exportar_coletas_csv', exportar_coletas),
+        ('exportar_relatorio_csv', exportar_auditoria),
+        ('GET /analise', rota('/analise', sem_cache=True)),
+        ('GET /analise (cache)', rota('/analise')),
+        ('GET /api/estatisticas', rota('/api/estatisticas', sem_cache=True)),
+        ('GET /registros', rota('/registros')),
+        ('GET /exportar-csv', rota('/exportar-csv')),
+        ('GET /exportar-csv?apenas_validados=1', rota('/exportar-csv?apenas_validados=1')),
+        ('GET /exportar-csv?termo', rota(f'/exportar-csv?termo={termo}')),
+    ]
+    for periodo in PERIODOS_AUDITORIA:
+        casos += [
+            (f'GET /relatorio-auditoria/{periodo}', rota(f'/relatorio-auditoria/{periodo}')),
+            (f'GET /exportar-auditoria/{periodo}', rota(f'/exportar-auditoria/{periodo}')),
+        ]
+    return casos
+
+def medir(funcao, repeticoes):
+    """
+    Executa um caso várias vezes.
+
+    Args:
+        funcao (callable): Caso a medir
+        repeticoes (int): Execuções
+
+    Returns:
+        dict: Durações (mín., p50, máx.), tamanho do resultado e pico de RSS
+    """
+    duracoes = []
+    tamanho = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        tamanho = funcao()
+        duracoes.append((time.perf_counter() - inicio) * 1000)
+
+    return {
+        'execucoes': repeticoes,
+        'min_ms': round(min(duracoes), 1),
+        'p50_ms': round(percentil(duracoes, 50), 1),
+        'max_ms': round(max(duracoes), 1),
+        'tamanho_resultado': tamanho,
+        'pico_rss_mb': pico_rss_mb(resource.getrusage(resource.RUSAGE_SELF)),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das consultas dos painéis e exportações")
+    parser.add_argument('--banco', required=True, help="Banco gerado por gerar_dados_sinteticos.py")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--casos', default='', help="Expressão regular dos casos a executar")
+    parser.add_argument('--ignorar', default='', help="Expressão regular dos casos a ignorar (ex.: carregam tudo em memória)")
+    parser.add_argument('--saida', default=DIRETORIO_RESULTADOS, help="Diretório dos resultados JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    caminho_db = os.path.abspath(args.banco)
+    if not os.path.exists(caminho_db):
+        parser.error(f"banco não encontrado: {caminho_db}")
+
+    # Os módulos leem DATABASE_PATH na importação; logs e exportações vão para um diretório temporário.
+    # A auditoria das próprias consultas fica desligada para o banco não mudar entre execuções.
+    os.environ['DATABASE_PATH'] = caminho_db
+    os.environ['AUDITORIA_POLITICA'] = 'visualizacao=desligado,consulta=desligado,coleta=desligado,padrao=desligado'
+    diretorio = tempfile.mkdtemp(prefix='onion_monitor_painel_')
+    os.chdir(diretorio)
+
+    resultado = {
+        'benchmark': 'painel',
+        'data': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'versao_codigo': versao_codigo(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'configuracao': {
+            'banco': os.path.basename(caminho_db),
+            'coletas': _contar(caminho_db, 'coletas'),
+            'auditoria': _contar(caminho_db, 'auditoria'),
+            'status_fontes': _contar(caminho_db, 'status_fontes'),
+            'repeticoes': args.repeticoes,
+        },
+        'casos': {},
+    }
+
+    try:
+        casos = montar_casos(diretorio, _termo_mais_frequente(caminho_db))
+
+        # Os módulos configuram o logging em INFO; o benchmark só mostra avisos
+        logging.getLogger().setLevel(logging.WARNING)
+        logger.setLevel(logging.INFO)
+
+        for nome, funcao in casos:
+            if (args.casos and not re.search(args.casos, nome)) or (args.ignorar and re.search(args.ignorar, nome)):
+                continue
+            try:
+                resultado['casos'][nome] = medir(funcao, args.repeticoes)
+                logger.info(f"{nome}: p50 {resultado['casos'][nome]['p50_ms']} ms")
+            except Exception as e:
+                resultado['casos'][nome] = {'erro': str(e)}
+                logger.error(f"{nome}: {str(e)}")
+    finally:
+        os.chdir(RAIZ)
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    print(json.dumps(resultado['casos'], indent=2, ensure_ascii=False))
+    metricas = [(f"casos.{nome}.p50_ms", False) for nome in resultado['casos']]
+    gravar_resultado(resultado, 'painel', metricas, args.saida)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
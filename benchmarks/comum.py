@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import glob
+import datetime
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DIRETORIO_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+
+def percentil(valores, p):
+    """
+    Calcula o percentil pelo método do posto mais próximo.
+
+    Args:
+        valores (list): Amostras
+        p (float): Percentil (0-100)
+
+    Returns:
+        float: Valor do percentil (None sem amostras)
+    """
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posto = max(int(-(-p * len(ordenados) // 100)), 1)
+    return ordenados[min(posto, len(ordenados)) - 1]
+
+def resumo_latencias(valores):
+    """
+    Resume uma lista de durações em ms (amostras, p50 e p99).
+
+    Args:
+        valores (list): Durações em ms
+
+    Returns:
+        dict: {'amostras', 'p50_ms', 'p99_ms'}
+    """
+    return {
+        'amostras': len(valores),
+        'p50_ms': round(percentil(valores, 50), 1) if valores else None,
+        'p99_ms': round(percentil(valores, 99), 1) if valores else None,
+    }
+
+def pico_rss_mb(uso):
+    """
+    Converte o pico de memória de resource.getrusage() para MB.
+
+    Args:
+        uso: Resultado de resource.getrusage()
+
+    Returns:
+        float: Pico de RSS em MB
+    """
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(uso.ru_maxrss / divisor, 1)
+
+def versao_codigo():
+    """
+    Obtém o commit atual do repositório (para identificar os resultados).
+
+    Returns:
+        str: Hash curto do commit ou None fora de um repositório git
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def _obter(resultado, caminho):
+    for chave in caminho.split('.'):
+        if not isinstance(resultado, dict):
+            return None
+        resultado = resultado.get(chave)
+    return resultado
+
+def comparar(atual, anterior, metricas):
+    """
+    Compara métricas com um resultado anterior.
+
+    Args:
+        atual (dict): Resultado atual
+        anterior (dict): Resultado anterior
+        metricas (list): Tuplas (caminho com pontos, maior é melhor)
+
+    Returns:
+        list: Linhas de texto (as regressões acima de 10% são marcadas)
+    """
+    linhas = []
+    for caminho, maior_melhor in metricas:
+        valor, referencia = _obter(atual, caminho), _obter(anterior, caminho)
+        if valor is None or not referencia:
+            continue
+        variacao = (valor - referencia) / referencia * 100
+        regressao = variacao < -10 if maior_melhor else variacao > 10
+        linhas.append(f"{caminho}: {referencia} -> {valor} ({variacao:+.1f}%){'  REGRESSÃO' if regressao else ''}")
+    return linhas
+
+def gravar_resultado(resultado, prefixo, metricas, diretorio=DIRETORIO_RESULTADOS):
+    """
+    Grava o resultado em JSON e o compara com o resultado anterior de mesma configuração.
+
+    Args:
+        resultado (dict): Resultado do benchmark (com a chave 'configuracao')
+        prefixo (str): Prefixo do arquivo (ex.: 'coleta')
+        metricas (list): Métricas comparadas (ver comparar())
+        diretorio (str, optional): Diretório dos resultados
+
+    Returns:
+        str: Caminho do arquivo gravado
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    anteriores = sorted(glob.glob(os.path.join(diretorio, f'{prefixo}-*.json')))
+    caminho = os.path.join(diretorio, f"{prefixo}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(caminho, 'w') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    print(f"\nResultado gravado em {caminho}")
+
+    # Compara com o resultado mais recente obtido com a mesma configuração
+    for caminho_anterior in reversed(anteriores):
+        with open(caminho_anterior) as f:
+            anterior = json.load(f)
+        if anterior.get('configuracao') == resultado['configuracao']:
+            print(f"\nComparação com {os.path.basename(caminho_anterior)} ({anterior.get('versao_codigo')}):")
+            for linha in comparar(resultado, anterior, metricas):
+                print(f"  {linha}")
+            break
+    else:
+        print("\nNenhum resultado anterior com a mesma configuração para comparar.")
+
+    return caminho
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Gerador de dados sintéticos em grande volume para os benchmarks do banco e dos painéis.
+
+Carrega dezenas de milhões de linhas realistas em 'coletas', 'auditoria' e
+'status_fontes' de um banco separado:
+
+- termos e serviços .onion com distribuição de Zipf (poucos termos e
+  serviços concentram a maior parte das coletas), fontes com pesos
+  desiguais (o Ahmia domina);
+- datas com crescimento ao longo do período, ciclo diário e menos
+  atividade nos fins de semana (em ordem crescente de id, como na coleta);
+- proporção de validados, faixas de score e métodos de validação
+  próximos aos da coleta real, e uma fração de espelhos (mesmo
+  hash_conteudo, apontando para a coleta canônica);
+- ações de auditoria com a frequência relativa da coleta real, encadeadas
+  na cadeia de hashes da auditoria.
+
+A carga usa executemany em lotes, transações grandes, PRAGMAs de carga
+(journal desligado, synchronous=OFF, cache grande) e recria os índices
+secundários só no fim.
+
+Uso:
+    python benchmarks/gerar_dados_sinteticos.py --banco /tmp/onion_monitor_grande.db --coletas 10000000 --auditoria 30000000
+"""
+import os
+import sys
+import time
+import base64
+import bisect
+import random
+import hashlib
+import logging
+import argparse
+import datetime
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger("gerar_dados_sinteticos")
+
+EMPRESAS = [
+    'acme', 'globex', 'initech', 'umbrella', 'hooli', 'soylent', 'stark', 'wayne', 'wonka', 'cyberdyne',
+    'tyrell', 'oscorp', 'gringotts', 'monarch', 'vandelay', 'dunder', 'pied piper', 'aperture', 'black mesa', 'massive dynamic'
+]
+SUFIXOS_TERMO = ['', ' senha', ' vazamento', ' database', ' credenciais', ' dump', ' clientes', ' funcionarios', ' cpf', ' cartao']
+PALAVRAS_TITULO = ['Vazamento', 'Dump', 'Database', 'Leak', 'Breach', 'Credenciais', 'Combo list', 'Backup', 'Fórum', 'Mercado']
+CAMINHOS = ['', 'index.html', 'leaks/', 'dump.txt', 'forum/thread', 'wiki/', 'files/', 'market/item']
+
+# Peso relativo de cada fonte padrão (as demais fontes cadastradas recebem o menor peso)
+PESOS_FONTES = {'Ahmia': 50, 'Dark.fail': 12, 'Onion.live': 12, 'Tor.taxi': 8, 'Onion.land': 10, 'DarkSearch': 8}
+
+# Ações de auditoria e sua frequência relativa na coleta real
+ACOES_AUDITORIA = [
+    ('validacao_automatica', 300), ('registrar_coleta', 250), ('busca_fonte', 60), ('verificar_fonte', 60),
+    ('registrar_validacao', 45), ('coleta_duplicada', 30), ('iniciar_busca', 12), ('concluir_busca', 12),
+    ('busca_agendada', 8), ('busca_agendada_concluida', 8), ('visualizar_analise', 6), ('visualizar_registros', 2),
+    ('consultar_coletas', 3), ('validacao_manual', 2), ('visualizar_relatorio', 1), ('exportacao_csv', 0.5),
+    ('exportacao_auditoria', 0.2), ('erro', 0.5), ('adicionar_fonte', 0.01),
+]
+
+# Validação: fração de validados e distribuição dos métodos entre eles
+TAXA_VALIDADOS = 0.15
+METODOS_VALIDACAO = [('automático', 80), ('manual', 15), ('semântico', 5)]
+
+# Status das verificações de fontes
+STATUS_FONTES = [('ativo', 93), ('inativo', 5), ('erro', 2)]
+
+# Tabelas carregadas (os índices secundários delas são recriados no fim)
+TABELAS = ('coletas', 'auditoria', 'status_fontes')
+
+def _pesos_acumulados(pesos):
+    return list(itertools.accumulate(pesos))
+
+class Distribuicoes:
+    """
+    Distribuições usadas na geração (termos, serviços, fontes e horários).
+    """
+
+    def __init__(self, aleatorio, fontes, dias, termos, servicos, expoente_zipf=1.1):
+        """
+        Prepara as distribuições.
+
+        Args:
+            aleatorio (random.Random): Gerador de números aleatórios
+            fontes (list): Fontes cadastradas (id, nome)
+            dias (int): Período coberto, terminando agora
+            termos (int): Quantidade de termos distintos
+            servicos (int): Quantidade de serviços .onion distintos
+            expoente_zipf (float, optional): Expoente da distribuição de Zipf
+        """
+        self.aleatorio = aleatorio
+
+        # Termos: empresas combinadas com sufixos, com popularidade de Zipf
+        combinacoes = [f"{empresa}{sufixo}" for sufixo in SUFIXOS_TERMO for empresa in EMPRESAS]
+        self.termos = [
+            combinacoes[i] if i < len(combinacoes) else f"{combinacoes[i % len(combinacoes)]} {i // len(combinacoes)}"
+            for i in range(termos)
+        ]
+        aleatorio.shuffle(self.termos)
+        self.pesos_termos = _pesos_acumulados([1 / (posto ** expoente_zipf) for posto in range(1, termos + 1)])
+
+        # Serviços .onion: poucos concentram a maior parte dos resultados
+        self.servicos = [
+            base64.b32encode(aleatorio.getrandbits(280).to_bytes(35, 'big')).decode('ascii').lower()
+            for _ in range(servicos)
+        ]
+        self.pesos_servicos = _pesos_acumulados([1 / (posto ** expoente_zipf) for posto in range(1, servicos + 1)])
+
+        self.fontes = [fonte_id for fonte_id, _ in fontes]
+        self.pesos_fontes = _pesos_acumulados([PESOS_FONTES.get(nome, 5) for _, nome in fontes])
+
+        # Horários: uma faixa por hora do período, com peso de crescimento,
+        # ciclo diário e fim de semana
+        fim = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+        inicio = fim - datetime.timedelta(days=dias)
+        self.horas = []
+        pesos = []
+        hora = inicio
+        while hora < fim:
+            progresso = (hora - inicio) / (fim - inicio)
+            diurno = 0.3 + 0.7 * max(0.0, 1 - abs(hora.hour - 14) / 10)
+            semana = 0.6 if hora.weekday() >= 5 else 1.0
+            self.horas.append(hora.strftime('%Y-%m-%d %H:'))
+            pesos.append((1 + 3 * progresso) * diurno * semana)
+            hora += datetime.timedelta(hours=1)
+        self.pesos_horas = _pesos_acumulados(pesos)
+
+    def _escolher(self, valores, acumulados):
+        return valores[bisect.bisect(acumulados, self.aleatorio.random() * acumulados[-1])]
+
+    def termo(self):
+        return self._escolher(self.termos, self.pesos_termos)
+
+    def servico(self):
+        return self._escolher(self.servicos, self.pesos_servicos)
+
+    def fonte(self):
+        return self._escolher(self.fontes, self.pesos_fontes)
+
+    def data_hora(self, indice_hora=None):
+        """
+        Sorteia um horário (em UTC, como CURRENT_TIMESTAMP).
+
+        Args:
+            indice_hora (int, optional): Faixa de hora; sorteada pelos pesos se omitida
+
+        Returns:
+            str: Data e hora 'YYYY-MM-DD HH:MM:SS'
+        """
+        if indice_hora is None:
+            indice_hora = bisect.bisect(self.pesos_horas, self.aleatorio.random() * self.pesos_horas[-1])
+        segundos = self.aleatorio.randrange(3600)
+        return f"{self.horas[min(indice_hora, len(self.horas) - 1)]}{segundos // 60:02d}:{segundos % 60:02d}"
+
+    def horarios(self, quantidade):
+        """
+        Gera horários em ordem crescente, distribuídos pelos pesos das faixas de
+        hora. Assim os ids crescem com a data, como na coleta real.
+
+        Args:
+            quantidade (int): Quantidade de horários
+
+        Yields:
+            tuple: (indice_hora, 'YYYY-MM-DD HH:MM:SS')
+        """
+        total = self.pesos_horas[-1]
+        gerados = 0
+        for indice_hora, acumulado in enumerate(self.pesos_horas):
+            # Arredondamento acumulado: a soma das faixas é exatamente a quantidade
+            ate_aqui = round(quantidade * acumulado / total)
+            segundos = sorted(self.aleatorio.randrange(3600) for _ in range(ate_aqui - gerados))
+            gerados = ate_aqui
+            for segundo in segundos:
+                yield indice_hora, f"{self.horas[indice_hora]}{segundo // 60:02d}:{segundo % 60:02d}"
+
+def gerar_coletas(distribuicoes, quantidade, primeiro_id, taxa_espelhos=0.08):
+    """
+    Gera linhas da tabela coletas.
+
+    Args:
+        distribuicoes (Distribuicoes): Distribuições da geração
+        quantidade (int): Linhas a gerar
+        primeiro_id (int): Id da primeira linha
+        taxa_espelhos (float, optional): Fração de coletas que repetem o conteúdo de uma anterior
+
+    Yields:
+        tuple: Valores na ordem de COLUNAS_COLETAS
+    """
+    aleatorio = distribuicoes.aleatorio
+    metodos = [metodo for metodo, _ in METODOS_VALIDACAO]
+    pesos_metodos = _pesos_acumulados([peso for _, peso in METODOS_VALIDACAO])
+
+    for coleta_id, (indice_hora, data_coleta) in zip(itertools.count(primeiro_id), distribuicoes.horarios(quantidade)):
+        termo = distribuicoes.termo()
+        servico = distribuicoes.servico()
+        palavra = PALAVRAS_TITULO[coleta_id % len(PALAVRAS_TITULO)]
+
+        # Espelhos apontam para uma coleta anterior com o mesmo conteúdo
+        canonica = None
+        if coleta_id > primeiro_id and aleatorio.random() < taxa_espelhos:
+            canonica = aleatorio.randrange(max(1, coleta_id - 100000), coleta_id)
+        hash_conteudo = hashlib.sha256(str(canonica or coleta_id).encode('ascii')).hexdigest()
+
+        if aleatorio.random() < TAXA_VALIDADOS:
+            validado = 1
+            score = min(100, 40 + int(aleatorio.expovariate(1 / 20)))
+            metodo = metodos[bisect.bisect(pesos_metodos, aleatorio.random() * pesos_metodos[-1])]
+            observacoes = f"Link .onion (+20), Palavra-chave no título: {palavra.lower()} (+10), Padrão de E-mail encontrado (+15)"
+            # A validação automática é imediata; a manual vem horas depois
+            data_validacao = distribuicoes.data_hora(indice_hora + aleatorio.randrange(1, 48)) if metodo == 'manual' else data_coleta
+        else:
+            validado = 0
+            score = aleatorio.choice((0, 5, 10, 15, 20, 25, 30, 35))
+            metodo = observacoes = data_validacao = None
+
+        yield (
+            coleta_id, termo,
+            f"http://{servico}.onion/{CAMINHOS[coleta_id % len(CAMINHOS)]}",
+            f"{palavra} {termo} #{coleta_id % 1000}",
+            f"{palavra} de dados de {termo} com e-mails e senhas de clientes",
+            distribuicoes.fonte(), data_coleta, validado, score, metodo, observacoes, data_validacao,
+            hash_conteudo, canonica
+        )
+
+COLUNAS_COLETAS = (
+    'id', 'termo_busca', 'link_encontrado', 'titulo', 'descricao', 'fonte_id', 'data_coleta', 'validado',
+    'score_validacao', 'metodo_validacao', 'observacoes_validacao', 'data_validacao', 'hash_conteudo', 'coleta_canonica_id'
+)
+
+def gerar_auditoria(distribuicoes, quantidade):
+    """
+    Gera linhas da tabela auditoria.
+
+    Args:
+        distribuicoes (Distribuicoes): Distribuições da geração
+        quantidade (int): Linhas a gerar
+
+    Yields:
+        tuple: (acao, descricao, dados, data_hora)
+    """
+    aleatorio = distribuicoes.aleatorio
+    acoes = [acao for acao, _ in ACOES_AUDITORIA]
+    pesos = _pesos_acumulados([peso for _, peso in ACOES_AUDITORIA])
+
+    for _, data_hora in distribuicoes.horarios(quantidade):
+        acao = acoes[bisect.bisect(pesos, aleatorio.random() * pesos[-1])]
+        termo = distribuicoes.termo()
+        if acao == 'validacao_automatica':
+            score = aleatorio.choice((20, 30, 45, 50, 65))
+            descricao = f"Validação automática de link: http://{distribuicoes.servico()}.onion/"
+            dados = f"Score: {score}, Validado: {score >= 40}, Observações: Link .onion (+20)"
+        elif acao in ('registrar_coleta', 'coleta_duplicada', 'registrar_validacao'):
+            descricao = f"Coleta registrada para o termo: {termo}"
+            dados = f"Link: http://{distribuicoes.servico()}.onion/, Fonte ID: {distribuicoes.fonte()}"
+        elif acao == 'verificar_fonte':
+            fonte_id = distribuicoes.fonte()
+            descricao = f"Verificação de status da fonte ID {fonte_id}"
+            dados = "Status: ativo, Detalhes: Fonte ativa. Status code: 200"
+        else:
+            descricao = f"{acao.replace('_', ' ').capitalize()} para o termo: {termo}"
+            dados = f"Resultados: {aleatorio.randrange(50)}"
+        yield (acao, descricao, dados, data_hora)
+
+def gerar_status_fontes(distribuicoes, quantidade):
+    """
+    Gera linhas da tabela status_fontes.
+
+    Args:
+        distribuicoes (Distribuicoes): Distribuições da geração
+        quantidade (int): Linhas a gerar
+
+    Yields:
+        tuple: (fonte_id, status, data_verificacao, detalhes)
+    """
+    aleatorio = distribuicoes.aleatorio
+    status = [valor for valor, _ in STATUS_FONTES]
+    pesos = _pesos_acumulados([peso for _, peso in STATUS_FONTES])
+
+    for _, data_verificacao in distribuicoes.horarios(quantidade):
+        valor = status[bisect.bisect(pesos, aleatorio.random() * pesos[-1])]
+        if valor == 'ativo':
+            detalhes = "Fonte ativa. Status code: 200"
+        elif valor == 'inativo':
+            detalhes = f"Fonte inativa. Status code: {aleatorio.choice((403, 404, 502, 503))}"
+        else:
+            detalhes = "Erro ao verificar fonte: Read timed out. (read timeout=10)"
+        yield (distribuicoes.fonte(), valor, data_verificacao, detalhes)
+
+def configurar_carga(conn, cache_mb=512):
+    """
+    Ajusta a conexão para carga em massa. O arquivo não tem journal durante a
+    carga: uma interrupção pode deixar o banco inconsistente (é um banco de teste).
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco
+        cache_mb (int, optional): Tamanho do cache de páginas
+    """
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA locking_mode = EXCLUSIVE')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute(f'PRAGMA cache_size = -{cache_mb * 1024}')
+
+def remover_indices(conn, tabelas=TABELAS):
+    """
+    Remove os índices secundários das tabelas (são recriados após a carga).
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco
+        tabelas (tuple, optional): Tabelas afetadas
+
+    Returns:
+        list: Comandos CREATE INDEX dos índices removidos
+    """
+    indices = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        f"AND tbl_name IN ({', '.join('?' for _ in tabelas)})",
+        tabelas
+    ).fetchall()
+    for nome, _ in indices:
+        conn.execute(f'DROP INDEX "{nome}"')
+    return [sql for _, sql in indices]
+
+def carregar(conn, tabela, colunas, linhas, total, tamanho_lote, linhas_por_transacao):
+    """
+    Insere as linhas com executemany, em lotes, com commit a cada transação grande.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco
+        tabela (str): Tabela de destino
+        colunas (tuple): Colunas inseridas
+        linhas (iterator): Linhas a inserir
+        total (int): Total de linhas (para o progresso)
+        tamanho_lote (int): Linhas por executemany
+        linhas_por_transacao (int): Linhas por commit
+
+    Returns:
+        float: Linhas inseridas por segundo
+    """
+    comando = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})"
+    inseridas = 0
+    desde_commit = 0
+    inicio = time.perf_counter()
+
+    conn.execute('BEGIN')
+    while True:
+        lote = list(itertools.islice(linhas, tamanho_lote))
+        if not lote:
+            break
+        conn.executemany(comando, lote)
+        inseridas += len(lote)
+        desde_commit += len(lote)
+
+        if desde_commit >= linhas_por_transacao:
+            conn.execute('COMMIT')
+            conn.execute('BEGIN')
+            desde_commit = 0
+            decorrido = time.perf_counter() - inicio
+            logger.info(f"{tabela}: {inseridas:,}/{total:,} linhas ({inseridas / decorrido:,.0f} linhas/s)")
+    conn.execute('COMMIT')
+
+    decorrido = time.perf_counter() - inicio
+    taxa = inseridas / decorrido if decorrido else 0
+    logger.info(f"{tabela}: {inseridas:,} linhas em {decorrido:.1f}s ({taxa:,.0f} linhas/s)")
+    return taxa
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos em grande volume para benchmarks")
+    parser.add_argument('--banco', required=True, help="Arquivo do banco a popular (nunca o banco de produção)")
+    parser.add_argument('--coletas', type=int, default=1000000)
+    parser.add_argument('--auditoria', type=int, default=3000000)
+    parser.add_argument('--status-fontes', type=int, default=100000)
+    parser.add_argument('--dias', type=int, default=365, help="Período coberto pelos dados, terminando agora")
+    parser.add_argument('--termos', type=int, default=2000, help="Termos distintos")
+    parser.add_argument('--servicos', type=int, default=200000, help="Serviços .onion distintos")
+    parser.add_argument('--lote', type=int, default=50000, help="Linhas por executemany")
+    parser.add_argument('--transacao', type=int, default=1000000, help="Linhas por transação")
+    parser.add_argument('--semente', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # O schema vem do db.py, no banco indicado
+    os.environ['DATABASE_PATH'] = os.path.abspath(args.banco)
+    import db
+    from cadeia_auditoria import encadear, ultimo_hash
+    db.DB_PATH = os.path.abspath(args.banco)
+    db.init_db()
+
+    conn = db.get_db_connection()
+    conn.isolation_level = None
+    try:
+        configurar_carga(conn)
+        fontes = [(row['id'], row['nome']) for row in conn.execute('SELECT id, nome FROM fontes ORDER BY id')]
+        primeiro_id = (conn.execute('SELECT MAX(id) FROM coletas').fetchone()[0] or 0) + 1
+
+        aleatorio = random.Random(args.semente)
+        distribuicoes = Distribuicoes(aleatorio, fontes, args.dias, args.termos, args.servicos)
+        indices = remover_indices(conn)
+        inicio = time.perf_counter()
+
+        carregar(
+            conn, 'coletas', COLUNAS_COLETAS, gerar_coletas(distribuicoes, args.coletas, primeiro_id),
+            args.coletas, args.lote, args.transacao
+        )
+        # Os eventos entram na cadeia de hashes da auditoria, como na gravação real
+        eventos = ((acao, descricao, dados, 'sistema', data_hora) for acao, descricao, dados, data_hora in gerar_auditoria(distribuicoes, args.auditoria))
+        carregar(
+            conn, 'auditoria', ('acao', 'descricao', 'dados', 'usuario', 'data_hora', 'hash'), encadear(eventos, ultimo_hash(conn)),
+            args.auditoria, args.lote, args.transacao
+        )
+        carregar(
+            conn, 'status_fontes', ('fonte_id', 'status', 'data_verificacao', 'detalhes'),
+            gerar_status_fontes(distribuicoes, args.status_fontes), args.status_fontes, args.lote, args.transacao
+        )
+
+        logger.info(f"Recriando {len(indices)} índices")
+        for sql in indices:
+            conn.execute(sql)
+
+        # Os painéis em cache passam a refletir os novos dados
+        conn.execute('UPDATE versao_dados SET versao = versao + 1 WHERE id = 1')
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+
+    duracao = time.perf_counter() - inicio
+    tamanho_mb = os.path.getsize(args.banco) / (1024 * 1024)
+    logger.info(
+        f"Concluído em {duracao:.1f}s: {args.coletas:,} coletas, {args.auditoria:,} eventos de auditoria, "
+        f"{args.status_fontes:,} verificações de fontes ({tamanho_mb:,.0f} MB)"
+    )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Receptor HTTP local que substitui o webhook de um sistema externo (ex.: SOAR)
+nos testes do despachante da saída de eventos (saida_eventos.py).
+
+Aceita POSTs com {"consumidor", "eventos": [...]}, confere a assinatura
+X-Assinatura (se houver segredo), descarta eventos repetidos pelo id e
+responde 503 numa fração configurável das requisições, para exercitar as
+novas tentativas. /_estatisticas devolve as contagens (JSON).
+
+Uso:
+    python benchmarks/receptor_webhook.py --porta 8900 --taxa-falhas 0.2 --segredo teste
+    python saida_eventos.py despachar --consumidor teste --url http://127.0.0.1:8900/ --segredo teste
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import collections
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from saida_eventos import assinar
+
+logger = logging.getLogger("receptor_webhook")
+
+CONFIGURACAO_PADRAO = {
+    'latencia': 0.0,        # segundos por requisição
+    'taxa_falhas': 0.0,     # fração das requisições respondidas com 503
+    'segredo': None,        # segredo da assinatura HMAC (None: não confere)
+    'semente': 42,
+}
+
+class ReceptorWebhook(ThreadingHTTPServer):
+    """
+    Receptor com configuração, estatísticas e ids recebidos compartilhados pelas threads.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, endereco, configuracao=None):
+        self.configuracao = dict(CONFIGURACAO_PADRAO, **(configuracao or {}))
+        self.estatisticas = collections.Counter()
+        self.recebidos = set()
+        self._lock = threading.Lock()
+        self._aleatorio = random.Random(self.configuracao['semente'])
+        super().__init__(endereco, ManipuladorWebhook)
+
+    @property
+    def url_base(self):
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def sortear(self):
+        with self._lock:
+            return self._aleatorio.random()
+
+    def receber(self, eventos):
+        with self._lock:
+            self.estatisticas['lotes'] += 1
+            for evento in eventos:
+                if evento['id'] in self.recebidos:
+                    self.estatisticas['repetidos'] += 1
+                else:
+                    self.recebidos.add(evento['id'])
+                    self.estatisticas['eventos'] += 1
+
+class ManipuladorWebhook(BaseHTTPRequestHandler):
+    """
+    Recebe os lotes de eventos do despachante.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        logger.debug(formato % args)
+
+    def do_GET(self):
+        if self.path == '/_estatisticas':
+            self._responder(200, dict(self.server.estatisticas))
+        else:
+            self._responder(404, {'erro': 'não encontrado'})
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        configuracao = self.server.configuracao
+
+        if configuracao['latencia'] > 0:
+            time.sleep(configuracao['latencia'])
+
+        if configuracao['taxa_falhas'] and self.server.sortear() < configuracao['taxa_falhas']:
+            self.server.estatisticas['falhas_simuladas'] += 1
+            self._responder(503, {'erro': 'indisponível'})
+            return
+
+        if configuracao['segredo'] and not hmac.compare_digest(
+            self.headers.get('X-Assinatura', ''), assinar(corpo, configuracao['segredo'])
+        ):
+            self.server.estatisticas['assinaturas_invalidas'] += 1
+            self._responder(401, {'erro': 'assinatura inválida'})
+            return
+
+        try:
+            eventos = json.loads(corpo)['eventos']
+        except (ValueError, KeyError):
+            self._responder(400, {'erro': 'corpo inválido'})
+            return
+
+        self.server.receber(eventos)
+        logger.info(f"Recebidos {len(eventos)} eventos de {self.headers.get('X-Consumidor')}")
+        self._responder(200, {'recebidos': len(eventos)})
+
+    def _responder(self, status, dados):
+        corpo = json.dumps(dados).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Receptor local de webhook para a saída de eventos")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8900)
+    parser.add_argument('--latencia', type=float, default=CONFIGURACAO_PADRAO['latencia'])
+    parser.add_argument('--taxa-falhas', type=float, default=CONFIGURACAO_PADRAO['taxa_falhas'])
+    parser.add_argument('--segredo', default=None, help="Segredo da assinatura HMAC")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    receptor = ReceptorWebhook((args.host, args.porta), {
+        'latencia': args.latencia,
+        'taxa_falhas': args.taxa_falhas,
+        'segredo': args.segredo,
+    })
+    logger.info(f"Receptor de webhook em {receptor.url_base}")
+
+    try:
+        receptor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info(f"Estatísticas: {dict(receptor.estatisticas)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local que imita as fontes do Onion Monitor nos benchmarks.
+
+Atende, num único processo:
+
+- /ahmia/ e /ahmia/search/?q=termo: página de busca com a marcação '.result'
+  do Ahmia (h4, link de redirecionamento e '.description');
+- /lista/<n>/ e /lista/<n>/pagina/<k>: páginas de listas de links .onion,
+  com paginação no próprio host;
+- requisições de proxy para http://<endereco>.onion/: páginas de vazamento
+  grandes. Apontando TOR_PROXY para este servidor, a fronteira e a
+  reverificação buscam os serviços .onion aqui em vez de na rede Tor;
+- /_estatisticas: contagem das requisições atendidas (JSON).
+
+A latência (com variação de ±50%) e a taxa de falhas (respostas 503) são
+configuráveis; o conteúdo é determinístico por URL, então a mesma página
+devolve sempre o mesmo corpo (importante para as duplicatas e o índice).
+"""
+import sys
+import html
+import json
+import time
+import base64
+import random
+import hashlib
+import logging
+import argparse
+import threading
+import functools
+import collections
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote_plus
+
+logger = logging.getLogger("servidor_simulado")
+
+CONFIGURACAO_PADRAO = {
+    'latencia': 0.05,            # segundos por requisição às páginas da surface (Ahmia e listas)
+    'latencia_onion': 0.3,       # segundos por requisição aos serviços .onion (via "proxy")
+    'taxa_falhas': 0.0,          # fração das requisições respondidas com 503
+    'resultados_ahmia': 10,      # resultados por página de busca
+    'paginas_lista': 3,          # páginas de cada lista (paginação)
+    'links_por_pagina': 20,      # serviços .onion por página de lista
+    'links_vazamento': 2,        # links para outros serviços .onion em cada vazamento
+    'tamanho_vazamento': 256,    # KB por página de vazamento
+    'taxa_mencao': 0.3,          # fração das páginas que mencionam cada termo
+    'termos': [],                # termos que podem aparecer nas listas e vazamentos
+    'semente': 42,
+}
+
+PALAVRAS_TITULO = ['leak', 'dump', 'database', 'breach', 'market', 'forum', 'wiki', 'mirror']
+
+def _numero(*partes):
+    # Número determinístico para as partes (mesma URL, mesmo conteúdo)
+    return int.from_bytes(hashlib.sha256('|'.join(str(p) for p in partes).encode('utf-8')).digest()[:8], 'big')
+
+def endereco_onion(*partes):
+    """
+    Gera um endereço .onion v3 determinístico, com versão e checksum válidos
+    (os links com endereço inválido são descartados pela normalização).
+
+    Args:
+        *partes: Valores que identificam o serviço
+
+    Returns:
+        str: Host .onion
+    """
+    chave_publica = hashlib.sha256('|'.join(str(p) for p in partes).encode('utf-8')).digest()
+    versao = b'\x03'
+    checksum = hashlib.sha3_256(b'.onion checksum' + chave_publica + versao).digest()[:2]
+    return base64.b32encode(chave_publica + checksum + versao).decode('ascii').lower() + '.onion'
+
+class ServidorSimulado(ThreadingHTTPServer):
+    """
+    Servidor das fontes simuladas, com configuração e estatísticas compartilhadas pelas threads.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, endereco, configuracao=None):
+        self.configuracao = dict(CONFIGURACAO_PADRAO, **(configuracao or {}))
+        self.estatisticas = collections.Counter()
+        self._lock = threading.Lock()
+        self._aleatorio = random.Random(self.configuracao['semente'])
+        super().__init__(endereco, ManipuladorSimulado)
+
+    @property
+    def url_base(self):
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def contar(self, chave):
+        with self._lock:
+            self.estatisticas[chave] += 1
+
+    def sortear(self):
+        with self._lock:
+            return self._aleatorio.random()
+
+    def menciona(self, termo, *partes):
+        # O termo aparece numa fração fixa das páginas, sempre nas mesmas
+        return (_numero(termo.lower(), *partes) % 10000) < self.configuracao['taxa_mencao'] * 10000
+
+    def termos_mencionados(self, *partes):
+        return [termo for termo in self.configuracao['termos'] if self.menciona(termo, *partes)]
+
+class ManipuladorSimulado(BaseHTTPRequestHandler):
+    """
+    Gera as páginas da busca do Ahmia, das listas e dos vazamentos.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        logger.debug(formato % args)
+
+    def do_GET(self):
+        partes = urlsplit(self.path)
+        host = partes.hostname or ''
+        caminho = partes.path or '/'
+
+        if caminho == '/_estatisticas':
+            self._responder(200, json.dumps(dict(self.server.estatisticas)), 'application/json')
+            return
+
+        configuracao = self.server.configuracao
+        onion = host.endswith('.onion')
+        tipo = 'onion' if onion else caminho.strip('/').split('/')[0] or 'raiz'
+
+        # Latência com variação de ±50%
+        latencia = configuracao['latencia_onion'] if onion else configuracao['latencia']
+        if latencia > 0:
+            time.sleep(latencia * (0.5 + self.server.sortear()))
+
+        if configuracao['taxa_falhas'] and self.server.sortear() < configuracao['taxa_falhas']:
+            self.server.contar(f"{tipo}_503")
+            self._responder(503, '<html><body>Service Unavailable</body></html>')
+            return
+
+        try:
+            if onion:
+                corpo = pagina_vazamento(host, caminho, _congelar(configuracao))
+            elif caminho.startswith('/ahmia'):
+                corpo = self._pagina_ahmia(caminho, parse_qs(partes.query))
+            elif caminho.startswith('/lista/'):
+                corpo = self._pagina_lista(caminho)
+            else:
+                corpo = None
+        except (ValueError, IndexError):
+            corpo = None
+
+        if corpo is None:
+            self.server.contar(f"{tipo}_404")
+            self._responder(404, '<html><body>Not Found</body></html>')
+            return
+
+        self.server.contar(tipo)
+        self._responder(200, corpo)
+
+    def _responder(self, status, corpo, content_type='text/html; charset=utf-8'):
+        dados = corpo.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _pagina_ahmia(self, caminho, parametros):
+        if caminho.rstrip('/') == '/ahmia':
+            return '<html><head><title>Ahmia</title></head><body><form action="/ahmia/search/"><input name="q"></form></body></html>'
+        if caminho.rstrip('/') != '/ahmia/search':
+            return None
+
+        termo = html.escape((parametros.get('q') or [''])[0])
+        itens = []
+        for i in range(self.server.configuracao['resultados_ahmia']):
+            host = endereco_onion('ahmia', termo.lower(), i)
+            numero = _numero('ahmia', termo.lower(), i)
+            palavra = PALAVRAS_TITULO[numero % len(PALAVRAS_TITULO)]
+            descricao = f"{termo} {palavra} index with personal records"
+            if numero % 3 == 0:
+                descricao += f" - contact admin{numero % 997}@example.com password list"
+            redirecionamento = f"/ahmia/search/redirect?search_term={quote_plus(termo)}&redirect_url=http://{host}/"
+            itens.append(
+                f'<li class="result"><h4><a href="{redirecionamento}">{termo} {palavra} #{i}</a></h4>'
+                f'<p class="description">{descricao}</p><p class="urlinfo"><cite>{host}</cite></p></li>'
+            )
+        return (
+            f'<html><head><title>Ahmia - {termo}</title></head><body>'
+            f'<ol class="searchResults">{"".join(itens)}</ol></body></html>'
+        )
+
+    def _pagina_lista(self, caminho):
+        partes = caminho.strip('/').split('/')
+        lista = int(partes[1])
+        pagina = int(partes[3]) if len(partes) >= 4 and partes[2] == 'pagina' else 1
+        configuracao = self.server.configuracao
+        if not 1 <= pagina <= configuracao['paginas_lista']:
+            return None
+
+        links = []
+        for i in range(configuracao['links_por_pagina']):
+            host = endereco_onion('lista', lista, pagina, i)
+            palavra = PALAVRAS_TITULO[_numero('lista', lista, pagina, i) % len(PALAVRAS_TITULO)]
+            mencionados = self.server.termos_mencionados('lista', lista, pagina, i)
+            texto = f"{palavra} {' '.join(mencionados)} service {i}".replace('  ', ' ')
+            links.append(f'<li><a href="http://{host}/">{texto}</a></li>')
+
+        paginacao = ''.join(
+            f'<a href="/lista/{lista}/pagina/{k}">{k}</a> '
+            for k in range(1, configuracao['paginas_lista'] + 1) if k != pagina
+        )
+        return (
+            f'<html><head><title>Onion list {lista} - page {pagina}</title>'
+            f'<meta name="description" content="Verified onion links"></head><body>'
+            f'<ul>{"".join(links)}</ul><div class="pages">{paginacao}</div></body></html>'
+        )
+
+def _congelar(configuracao):
+    # Chave hashável para o cache das páginas de vazamento
+    return tuple(sorted((chave, tuple(valor) if isinstance(valor, list) else valor) for chave, valor in configuracao.items()))
+
+@functools.lru_cache(maxsize=512)
+def pagina_vazamento(host, caminho, configuracao):
+    """
+    Gera a página de vazamento de um serviço .onion (do tamanho configurado).
+
+    Args:
+        host (str): Host .onion
+        caminho (str): Caminho requisitado
+        configuracao (tuple): Configuração do servidor (congelada)
+
+    Returns:
+        str: HTML da página
+    """
+    configuracao = dict(configuracao)
+    aleatorio = random.Random(_numero(host, caminho, configuracao['semente']))
+    mencionados = [
+        termo for termo in configuracao['termos']
+        if (_numero(termo.lower(), host) % 10000) < configuracao['taxa_mencao'] * 10000
+    ]
+
+    linhas = []
+    tamanho = 0
+    limite = configuracao['tamanho_vazamento'] * 1024
+    while tamanho < limite:
+        usuario = f"user{aleatorio.randrange(10 ** 6)}"
+        dominio = aleatorio.choice(mencionados or ['example']).lower().replace(' ', '')
+        linha = f"{usuario}@{dominio}.com;{aleatorio.getrandbits(48):012x};{aleatorio.randrange(10 ** 11):011d}<br>"
+        linhas.append(linha)
+        tamanho += len(linha)
+
+    links = ''.join(
+        f'<a href="http://{endereco_onion(host, i)}/">mirror {i}</a> '
+        for i in range(configuracao['links_vazamento'])
+    )
+    titulo = f"{' '.join(mencionados)} database dump".strip()
+    return (
+        f'<html><head><title>{titulo}</title></head><body>'
+        f'<h1>{titulo}</h1><p>Leaked credentials: {" ".join(mencionados)}</p>'
+        f'<div class="dump">{"".join(linhas)}</div><p>{links}</p></body></html>'
+    )
+
+def _executar_processo(configuracao, host, fila):
+    servidor = ServidorSimulado((host, 0), configuracao)
+    fila.put(servidor.server_address[1])
+    servidor.serve_forever()
+
+def iniciar_servidor_processo(configuracao=None, host='127.0.0.1'):
+    """
+    Inicia o servidor num processo separado, para que ele não dispute a GIL
+    nem entre no pico de memória do processo medido.
+
+    Args:
+        configuracao (dict, optional): Sobrescreve CONFIGURACAO_PADRAO
+        host (str, optional): Endereço de escuta
+
+    Returns:
+        tuple: (processo, url_base)
+    """
+    fila = multiprocessing.Queue()
+    processo = multiprocessing.Process(target=_executar_processo, args=(configuracao, host, fila), daemon=True)
+    processo.start()
+    porta = fila.get(timeout=30)
+    return processo, f"http://{host}:{porta}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita o Ahmia, listas .onion e páginas de vazamento")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8800)
+    parser.add_argument('--latencia', type=float, default=CONFIGURACAO_PADRAO['latencia'])
+    parser.add_argument('--latencia-onion', type=float, default=CONFIGURACAO_PADRAO['latencia_onion'])
+    parser.add_argument('--taxa-falhas', type=float, default=CONFIGURACAO_PADRAO['taxa_falhas'])
+    parser.add_argument('--tamanho-vazamento', type=int, default=CONFIGURACAO_PADRAO['tamanho_vazamento'], help="KB por página de vazamento")
+    parser.add_argument('--termos', default='', help="Termos separados por vírgula mencionados nas listas e vazamentos")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    servidor = ServidorSimulado((args.host, args.porta), {
+        'latencia': args.latencia,
+        'latencia_onion': args.latencia_onion,
+        'taxa_falhas': args.taxa_falhas,
+        'tamanho_vazamento': args.tamanho_vazamento,
+        'termos': [termo.strip() for termo in args.termos.split(',') if termo.strip()],
+    })
+    logger.info(f"Servidor simulado em {servidor.url_base} (use TOR_PROXY={servidor.url_base} para os .onion)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
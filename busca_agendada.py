@@ -2,46 +2,148 @@
 import os
 import sys
 import datetime
-from coletor import buscar_termo
-from db import registrar_auditoria
+from tarefas import buscar_coalescido, obter_tarefa
+from db import registrar_auditoria, obter_estatisticas_indice
+from reverificacao import executar_reverificacao
+from retencao_auditoria import executar_retencao
+from saida_eventos import limpar_eventos
+from metricas import enviar_metricas
+from coleta_paralela import executar_coleta, PROCESSOS
 
-log_file = open('busca_agendada.log', 'a')
-log_file.write(f"\n--- Execução em {datetime.datetime.now()} ---\n")
+# Com COLETA_PROCESSOS > 1 os termos são buscados pela coleta paralela
+COLETA_PARALELA = 'COLETA_PROCESSOS' in os.environ and PROCESSOS > 1
 
-try:
-    with open('termos_busca.txt', 'r') as f:
-        termos = {linha.strip() for linha in f if linha.strip()}
-        log_file.write(f"Termos carregados: {len(termos)}\n")
+def main():
+    log_file = open('busca_agendada.log', 'a')
+    log_file.write(f"\n--- Execução em {datetime.datetime.now()} ---\n")
 
-    for termo in termos:
-        log_file.write(f"Buscando termo: {termo}\n")
-        try:
-            registrar_auditoria(
-                acao="busca_agendada",
-                descricao=f"Busca agendada para o termo: {termo}",
-                dados=f"Timestamp: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    try:
+        with open('termos_busca.txt', 'r') as f:
+            termos = {linha.strip() for linha in f if linha.strip()}
+            log_file.write(f"Termos carregados: {len(termos)}\n")
+
+        if COLETA_PARALELA:
+            for termo in termos:
+                registrar_auditoria(
+                    acao="busca_agendada",
+                    descricao=f"Busca agendada para o termo: {termo}",
+                    dados=f"Timestamp: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                )
+
+            # Todos os termos x fontes num lote, executado pelos processos trabalhadores;
+            # termos já em busca em outra execução ficam fora do lote
+            log_file.write(f"Coleta paralela com {PROCESSOS} processos\n")
+            resumo_coleta = executar_coleta(termos, PROCESSOS)
+            log_file.write(
+                f"Lote {resumo_coleta['lote']}: tarefas {resumo_coleta['tarefas']}, "
+                f"resultados: {resumo_coleta['resultados']}\n"
             )
-            resultados = buscar_termo(termo)
-            registrar_auditoria(
-                acao="busca_agendada_concluida",
-                descricao=f"Busca agendada concluída para o termo: {termo}",
-                dados=f"Resultados: {len(resultados)}"
+            if resumo_coleta['interrompido']:
+                log_file.write(f"Coleta interrompida; retome com: python coleta_paralela.py --retomar {resumo_coleta['lote']}\n")
+
+            proprias = {item['tarefa_id'] for item in resumo_coleta['buscas'] if item['origem'] == 'nova'}
+            for item in resumo_coleta['buscas']:
+                termo = item['termo']
+                try:
+                    if item['tarefa_id'] in proprias:
+                        tarefa = obter_tarefa(item['tarefa_id'], incluir_resultados=False)
+                        if tarefa['status'] != 'concluida':
+                            raise RuntimeError(f"Busca {item['tarefa_id']} terminou com status '{tarefa['status']}'")
+                        total = tarefa['total_resultados']
+                    else:
+                        # Busca em andamento em outra execução (ex.: disparada pela interface):
+                        # aguarda o resultado dela em vez de repetir a coleta
+                        total = len(buscar_coalescido(termo))
+                    registrar_auditoria(
+                        acao="busca_agendada_concluida",
+                        descricao=f"Busca agendada concluída para o termo: {termo}",
+                        dados=f"Resultados: {total}"
+                    )
+                    log_file.write(f"Termo '{termo}': {total} resultados\n")
+                except Exception as e:
+                    log_file.write(f"ERRO ao buscar termo '{termo}': {str(e)}\n")
+                    registrar_auditoria(
+                        acao="erro",
+                        descricao=f"Erro na busca agendada para o termo: {termo}",
+                        dados=f"Erro: {str(e)}"
+                    )
+        else:
+            for termo in termos:
+                log_file.write(f"Buscando termo: {termo}\n")
+                try:
+                    registrar_auditoria(
+                        acao="busca_agendada",
+                        descricao=f"Busca agendada para o termo: {termo}",
+                        dados=f"Timestamp: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                    )
+                    # Se a mesma busca já estiver em andamento (ex.: disparada pela interface),
+                    # aguarda o resultado dela em vez de repetir a coleta
+                    resultados = buscar_coalescido(termo)
+                    registrar_auditoria(
+                        acao="busca_agendada_concluida",
+                        descricao=f"Busca agendada concluída para o termo: {termo}",
+                        dados=f"Resultados: {len(resultados)}"
+                    )
+                    log_file.write(f"Resultados encontrados: {len(resultados)}\n")
+                except Exception as e:
+                    log_file.write(f"ERRO ao buscar termo '{termo}': {str(e)}\n")
+                    registrar_auditoria(
+                        acao="erro",
+                        descricao=f"Erro na busca agendada para o termo: {termo}",
+                        dados=f"Erro: {str(e)}"
+                    )
+        # Reverificação das URLs já conhecidas: apenas as vencidas são buscadas
+        log_file.write("Reverificando URLs do índice\n")
+        resumo = executar_reverificacao()
+        log_file.write(
+            f"URLs verificadas: {resumo['verificadas']}, alteradas: {len(resumo['alteradas'])}, "
+            f"inalteradas: {resumo['inalteradas']}, erros: {resumo['erros']}\n"
+        )
+
+        for pagina in resumo['alteradas']:
+            texto = pagina['texto'].lower()
+            termos_encontrados = [termo for termo in termos if termo.lower() in texto]
+            if termos_encontrados:
+                log_file.write(f"Página alterada com termos monitorados: {pagina['url']} ({', '.join(termos_encontrados)})\n")
+                registrar_auditoria(
+                    acao="url_alterada",
+                    descricao=f"Conteúdo alterado em URL monitorada: {pagina['url']}",
+                    dados=f"Termos: {', '.join(termos_encontrados)}"
+                )
+
+        log_file.write(f"Índice: {obter_estatisticas_indice()}\n")
+
+        # Retenção da auditoria: eventos antigos vão para os arquivos mensais e
+        # ficam contados apenas nos totais diários
+        try:
+            resumo_retencao = executar_retencao()
+            log_file.write(
+                f"Auditoria arquivada: {resumo_retencao['arquivados']} eventos anteriores a {resumo_retencao['corte']}, "
+                f"páginas liberadas: {resumo_retencao['paginas_liberadas']}\n"
             )
-            log_file.write(f"Resultados encontrados: {len(resultados)}\n")
         except Exception as e:
-            log_file.write(f"ERRO ao buscar termo '{termo}': {str(e)}\n")
-            registrar_auditoria(
-                acao="erro",
-                descricao=f"Erro na busca agendada para o termo: {termo}",
-                dados=f"Erro: {str(e)}"
-            )
-except Exception as e:
-    log_file.write(f"ERRO CRÍTICO: {str(e)}\n")
-    registrar_auditoria(
-        acao="erro_critico",
-        descricao="Erro crítico na execução da busca agendada",
-        dados=f"Erro: {str(e)}"
-    )
-
-log_file.write("--- Fim da execução ---\n")
-log_file.close()
\ No newline at end of file
+            log_file.write(f"ERRO na retenção da auditoria: {str(e)}\n")
+
+        try:
+            log_file.write(f"Eventos de saída removidos pela retenção: {limpar_eventos()}\n")
+        except Exception as e:
+            log_file.write(f"ERRO na limpeza da saída de eventos: {str(e)}\n")
+    except Exception as e:
+        log_file.write(f"ERRO CRÍTICO: {str(e)}\n")
+        registrar_auditoria(
+            acao="erro_critico",
+            descricao="Erro crítico na execução da busca agendada",
+            dados=f"Erro: {str(e)}"
+        )
+
+    # Processo de curta duração: as métricas vão para o Pushgateway (se configurado)
+    if enviar_metricas('busca_agendada'):
+        log_file.write("Métricas enviadas ao Pushgateway\n")
+
+    log_file.write("--- Fim da execução ---\n")
+    log_file.close()
+
+# Os processos da coleta paralela importam este script ao iniciar: a execução
+# fica restrita ao processo principal
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import logging
+import threading
+
+logger = logging.getLogger("cache_versionado")
+
+class CacheVersionado:
+    """
+    Cache em memória de valores calculados a partir do banco, válido enquanto a
+    versão dos dados (ver db.obter_versao_dados) não mudar.
+    """
+
+    def __init__(self):
+        self._itens = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave, versao, calcular):
+        """
+        Obtém o valor da chave para a versão informada, calculando-o se necessário.
+
+        Args:
+            chave (str): Identificador do valor (ex.: 'analise')
+            versao (int | str): Versão atual dos dados (ex.: a versão do banco mais a data)
+            calcular (callable): Função sem argumentos que calcula o valor
+
+        Returns:
+            object: Valor em cache ou recém-calculado
+        """
+        with self._lock:
+            item = self._itens.get(chave)
+
+        if item is not None and item[0] == versao:
+            return item[1]
+
+        # Calcula fora do lock; se houver uma escrita durante o cálculo, a próxima
+        # requisição verá a nova versão e recalculará
+        valor = calcular()
+        logger.debug(f"Cache '{chave}' recalculado para a versão {versao}")
+
+        with self._lock:
+            self._itens[chave] = (versao, valor)
+
+        return valor
+
+    def limpar(self):
+        """Descarta todos os valores em cache."""
+        with self._lock:
+            self._itens.clear()
+
+def etag_versao(chave, versao):
+    """
+    Monta o ETag de uma resposta derivada de uma versão dos dados.
+
+    Args:
+        chave (str): Identificador da resposta
+        versao (int | str): Versão dos dados
+
+    Returns:
+        str: Valor do ETag (sem aspas)
+    """
+    return f"{chave}-v{versao}"
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Cadeia de hashes da auditoria.
+
+Cada evento da tabela auditoria guarda em 'hash' o SHA-256 do hash do evento
+anterior (em ordem de id) com o seu próprio conteúdo; alterar, remover ou
+reordenar um evento quebra a cadeia a partir dele. Quando a retenção remove
+os eventos mais antigos, o último evento removido fica como âncora da cadeia
+(tabela auditoria_ancora).
+
+A verificação lê o banco em blocos de ids, em paralelo: cada evento é
+conferido apenas com o hash gravado no evento anterior.
+
+Uso:
+    python cadeia_auditoria.py
+    python cadeia_auditoria.py --banco /caminho/onion_monitor.db --processos 8
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import multiprocessing
+
+logger = logging.getLogger("cadeia_auditoria")
+
+# Hash "anterior" do primeiro evento da cadeia
+HASH_INICIAL = '0' * 64
+
+# Ids verificados por bloco (unidade de trabalho de cada processo)
+TAMANHO_BLOCO = 1000000
+
+COLUNAS = 'id, acao, descricao, dados, usuario, data_hora, hash'
+
+def _campo(valor):
+    # Campo prefixado pelo tamanho: nenhum conteúdo consegue imitar a divisão entre campos
+    if valor is None:
+        return '-'
+    valor = str(valor)
+    return f'{len(valor)}:{valor}'
+
+def calcular_hash(anterior, acao, descricao, dados, usuario, data_hora):
+    """
+    Calcula o hash encadeado de um evento de auditoria.
+
+    Args:
+        anterior (str): Hash do evento anterior (HASH_INICIAL no início da cadeia)
+        acao (str): Tipo de ação
+        descricao (str): Descrição da ação
+        dados (str): Dados adicionais
+        usuario (str): Usuário
+        data_hora (str): Data e hora do evento ('YYYY-MM-DD HH:MM:SS', UTC)
+
+    Returns:
+        str: Hash SHA-256 hexadecimal
+    """
+    conteudo = '|'.join((anterior, _campo(acao), _campo(descricao), _campo(dados), _campo(usuario), _campo(data_hora)))
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def ultimo_hash(conn):
+    """
+    Obtém o hash do último evento da cadeia.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco de dados
+
+    Returns:
+        str: Hash do último evento, da âncora (tabela vazia após a retenção) ou HASH_INICIAL
+    """
+    linha = conn.execute('SELECT hash FROM auditoria ORDER BY id DESC LIMIT 1').fetchone()
+    if linha is not None:
+        # Eventos anteriores à cadeia não têm hash: a cadeia recomeça
+        return linha[0] or HASH_INICIAL
+
+    try:
+        ancora = conn.execute('SELECT hash FROM auditoria_ancora WHERE chave = 1').fetchone()
+    except sqlite3.OperationalError:
+        # Banco ainda sem as tabelas de init_db()
+        return HASH_INICIAL
+    return ancora[0] if ancora else HASH_INICIAL
+
+def encadear(registros, anterior):
+    """
+    Acrescenta o hash encadeado a cada registro.
+
+    Args:
+        registros (iterable): Tuplas (acao, descricao, dados, usuario, data_hora) em ordem de inserção
+        anterior (str): Hash do último evento já gravado
+
+    Yields:
+        tuple: (acao, descricao, dados, usuario, data_hora, hash)
+    """
+    for acao, descricao, dados, usuario, data_hora in registros:
+        anterior = calcular_hash(anterior, acao, descricao, dados, usuario, data_hora)
+        yield (acao, descricao, dados, usuario, data_hora, anterior)
+
+def inserir_registros(conn, registros):
+    """
+    Insere eventos de auditoria encadeados ao último evento gravado.
+
+    Abre uma transação IMMEDIATE (se ainda não houver uma) para que nenhum
+    outro processo grave entre a leitura do último hash e a inserção; o
+    commit fica a cargo de quem chamou.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco de dados
+        registros (list): Tuplas (acao, descricao, dados, usuario, data_hora)
+    """
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+
+    conn.executemany(
+        'INSERT INTO auditoria (acao, descricao, dados, usuario, data_hora, hash) VALUES (?, ?, ?, ?, ?, ?)',
+        encadear(registros, ultimo_hash(conn))
+    )
+
+def _conectar_leitura(caminho_db):
+    return sqlite3.connect(f'file:{caminho_db}?mode=ro', uri=True)
+
+def verificar_bloco(caminho_db, inicio, fim):
+    """
+    Verifica os eventos com id em [inicio, fim).
+
+    Args:
+        caminho_db (str): Caminho do banco de dados
+        inicio (int): Primeiro id do bloco
+        fim (int): Id seguinte ao último do bloco
+
+    Returns:
+        dict: {'verificados', 'sem_hash', 'quebra'} onde quebra é None ou {'id', 'motivo'}
+    """
+    conn = _conectar_leitura(caminho_db)
+
+    try:
+        anterior = conn.execute('SELECT hash FROM auditoria WHERE id < ? ORDER BY id DESC LIMIT 1', (inicio,)).fetchone()
+        if anterior is None:
+            # Primeiro evento da tabela: encadeado à âncora da retenção, se houver
+            ancora = conn.execute('SELECT hash FROM auditoria_ancora WHERE chave = 1').fetchone()
+            anterior = ancora[0] if ancora else None
+            inicio_tabela = True
+        else:
+            anterior = anterior[0]
+            inicio_tabela = False
+
+        verificados = sem_hash = 0
+        cursor = conn.execute(f'SELECT {COLUNAS} FROM auditoria WHERE id >= ? AND id < ? ORDER BY id', (inicio, fim))
+        cursor.arraysize = 10000
+
+        while True:
+            linhas = cursor.fetchmany()
+            if not linhas:
+                break
+            for id_evento, acao, descricao, dados, usuario, data_hora, hash_evento in linhas:
+                if hash_evento is None:
+                    # Eventos sem hash só são aceitos antes do início da cadeia
+                    if anterior is not None and not inicio_tabela:
+                        return {'verificados': verificados, 'sem_hash': sem_hash,
+                                'quebra': {'id': id_evento, 'motivo': 'evento sem hash depois do início da cadeia'}}
+                    sem_hash += 1
+                    anterior = None
+                    continue
+
+                esperado = calcular_hash(anterior or HASH_INICIAL, acao, descricao, dados, usuario, data_hora)
+                if esperado != hash_evento:
+                    return {'verificados': verificados, 'sem_hash': sem_hash,
+                            'quebra': {'id': id_evento, 'motivo': 'hash não confere (evento alterado, removido ou reordenado)'}}
+                anterior = hash_evento
+                inicio_tabela = False
+                verificados += 1
+
+        return {'verificados': verificados, 'sem_hash': sem_hash, 'quebra': None}
+
+    finally:
+        conn.close()
+
+def _verificar_bloco(argumentos):
+    return verificar_bloco(*argumentos)
+
+def verificar_cadeia(caminho_db, processos=None, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Verifica a cadeia de hashes de toda a tabela auditoria.
+
+    Os blocos são verificados em paralelo e conferidos em ordem; a
+    verificação para no primeiro bloco com quebra, que é a primeira da cadeia.
+
+    Args:
+        caminho_db (str): Caminho do banco de dados
+        processos (int, optional): Processos de verificação. Defaults to os.cpu_count().
+        tamanho_bloco (int, optional): Ids por bloco. Defaults to TAMANHO_BLOCO.
+
+    Returns:
+        dict: {'verificados', 'sem_hash', 'quebra', 'ultimo_id', 'ultimo_hash', 'duracao_s', 'eventos_por_s'}
+    """
+    inicio = time.perf_counter()
+    conn = _conectar_leitura(caminho_db)
+
+    try:
+        menor, maior = conn.execute('SELECT MIN(id), MAX(id) FROM auditoria').fetchone()
+        ultimo = conn.execute('SELECT id, hash FROM auditoria ORDER BY id DESC LIMIT 1').fetchone()
+    finally:
+        conn.close()
+
+    resumo = {'verificados': 0, 'sem_hash': 0, 'quebra': None}
+    if menor is not None:
+        blocos = [(caminho_db, bloco, min(bloco + tamanho_bloco, maior + 1)) for bloco in range(menor, maior + 1, tamanho_bloco)]
+        with multiprocessing.Pool(processos or os.cpu_count()) as pool:
+            for resultado in pool.imap(_verificar_bloco, blocos):
+                resumo['verificados'] += resultado['verificados']
+                resumo['sem_hash'] += resultado['sem_hash']
+                if resultado['quebra']:
+                    resumo['quebra'] = resultado['quebra']
+                    pool.terminate()
+                    break
+
+    duracao = time.perf_counter() - inicio
+    resumo.update({
+        # Guardar o último hash fora do banco permite detectar a remoção dos eventos finais
+        'ultimo_id': ultimo[0] if ultimo else None,
+        'ultimo_hash': ultimo[1] if ultimo else None,
+        'duracao_s': round(duracao, 2),
+        'eventos_por_s': round((resumo['verificados'] + resumo['sem_hash']) / duracao) if duracao else None,
+    })
+    return resumo
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    from db import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Verificação da cadeia de hashes da auditoria")
+    parser.add_argument('--banco', default=DB_PATH, help="Banco de dados a verificar")
+    parser.add_argument('--processos', type=int, default=os.cpu_count(), help="Processos de verificação")
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO, help="Ids por bloco")
+    args = parser.parse_args()
+
+    resumo = verificar_cadeia(os.path.abspath(args.banco), args.processos, args.bloco)
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+
+    if resumo['quebra']:
+        logger.error(f"Cadeia quebrada no evento {resumo['quebra']['id']}: {resumo['quebra']['motivo']}")
+        sys.exit(1)
+
+    logger.info(f"Cadeia íntegra: {resumo['verificados']} eventos verificados, {resumo['sem_hash']} anteriores à cadeia")
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Coleta paralela em vários processos.
+
+Cada busca de um termo em uma fonte (termo x fonte) é uma tarefa da tabela
+fila_coleta, agrupada num lote. N processos trabalhadores executam as
+tarefas (requisições, parsing e validação) em paralelo, cada um com a sua
+GIL; o processo coordenador distribui as tarefas e é o único que grava no
+banco: as funções @escrita chamadas nos trabalhadores são encaminhadas a
+ele por uma fila e executadas uma a uma (ver escritor_db.py). Os
+trabalhadores apenas leem o banco. Com o serviço escritor ativo
+(ESCRITOR_DB_ENDERECO), o coordenador repassa a ele essas escritas e as
+suas próprias.
+
+SIGTERM ou Ctrl+C encerram o lote de forma ordenada: nenhuma tarefa nova é
+iniciada, as tarefas em andamento terminam e as demais ficam pendentes,
+retomadas com --retomar. Um segundo sinal encerra os trabalhadores
+imediatamente.
+
+Uso:
+    python coleta_paralela.py --processos 16
+    python coleta_paralela.py --termos-arquivo termos_busca.txt --retomar 3f2a...
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import signal
+import logging
+import argparse
+import datetime
+import threading
+import multiprocessing
+from db import get_db_connection, obter_fontes, registrar_auditoria
+from escritor_db import escrita, definir_encaminhador, executar_escrita, EncaminhadorFila
+
+logger = logging.getLogger("coleta_paralela")
+
+# Processos trabalhadores (padrão: um por núcleo)
+PROCESSOS = int(os.environ.get('COLETA_PROCESSOS', os.cpu_count() or 1))
+
+# Tarefas simultâneas na mesma fonte de busca (surface); fontes do tipo 'lista'
+# têm uma tarefa por vez, pois a rodada da fronteira é compartilhada pela fonte
+TAREFAS_POR_FONTE = int(os.environ.get('COLETA_TAREFAS_POR_FONTE', 4))
+
+# Execuções de uma tarefa cujo trabalhador morreu antes de ela ser marcada como erro
+MAX_TENTATIVAS = 2
+
+# Espera máxima (s) de um trabalhador pela resposta do escritor
+ESPERA_ESCRITOR = 300
+
+def _agora():
+    # Mesmo fuso de CURRENT_TIMESTAMP (UTC), como as demais datas da fila
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+@escrita
+def criar_lote(termos, fontes):
+    """
+    Cria um lote com uma tarefa pendente por termo x fonte.
+
+    Args:
+        termos (list): Termos buscados
+        fontes (list): Fontes (dicionários de obter_fontes)
+
+    Returns:
+        str: Identificador do lote
+    """
+    lote = uuid.uuid4().hex
+    conn = get_db_connection()
+
+    try:
+        conn.executemany(
+            'INSERT INTO fila_coleta (lote, termo, fonte_id) VALUES (?, ?, ?)',
+            [(lote, termo, fonte['id']) for termo in termos for fonte in fontes]
+        )
+        conn.commit()
+        return lote
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@escrita
+def preparar_retomada(lote):
+    """
+    Devolve a pendente as tarefas de um lote interrompido que ficaram em execução.
+
+    Args:
+        lote (str): Identificador do lote
+
+    Returns:
+        int: Quantidade de tarefas devolvidas
+    """
+    conn = get_db_connection()
+
+    try:
+        cursor = conn.execute(
+            "UPDATE fila_coleta SET status = 'pendente', data_inicio = NULL WHERE lote = ? AND status = 'executando'",
+            (lote,)
+        )
+        conn.commit()
+        return cursor.rowcount
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def obter_tarefas_pendentes(lote):
+    """
+    Obtém as tarefas pendentes de um lote, em ordem de criação.
+
+    Args:
+        lote (str): Identificador do lote
+
+    Returns:
+        list: Dicionários (id, termo, fonte_id, tentativas)
+    """
+    conn = get_db_connection()
+
+    try:
+        cursor = conn.execute(
+            "SELECT id, termo, fonte_id, tentativas FROM fila_coleta WHERE lote = ? AND status = 'pendente' ORDER BY id",
+            (lote,)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def resumir_lote(lote):
+    """
+    Conta as tarefas e resultados de um lote por status.
+
+    Args:
+        lote (str): Identificador do lote
+
+    Returns:
+        dict: {'lote', 'tarefas': {status: quantidade}, 'resultados'}
+    """
+    conn = get_db_connection()
+
+    try:
+        linhas = conn.execute(
+            'SELECT status, COUNT(*) AS quantidade, SUM(resultados) AS resultados FROM fila_coleta WHERE lote = ? GROUP BY status',
+            (lote,)
+        ).fetchall()
+        return {
+            'lote': lote,
+            'tarefas': {linha['status']: linha['quantidade'] for linha in linhas},
+            'resultados': sum(linha['resultados'] or 0 for linha in linhas),
+        }
+    finally:
+        conn.close()
+
+@escrita
+def _atualizar_tarefa(tarefa_id, **campos):
+    atribuicoes = ', '.join(f'{campo} = ?' for campo in campos)
+    conn = get_db_connection()
+
+    try:
+        conn.execute(f'UPDATE fila_coleta SET {atribuicoes} WHERE id = ?', (*campos.values(), tarefa_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _trabalhador(indice, tarefas, pedidos, respostas):
+    """
+    Processo trabalhador: executa as tarefas recebidas até receber None.
+
+    Args:
+        indice (int): Número do trabalhador
+        tarefas (multiprocessing.Queue): Tarefas (tarefa_id, termo, fonte) deste trabalhador
+        pedidos (multiprocessing.Queue): Escritas e conclusões, lidas pelo coordenador
+        respostas (multiprocessing.Queue): Respostas do escritor a este trabalhador
+    """
+    # O encerramento é decidido pelo coordenador (Ctrl+C chega a todo o grupo de processos)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    definir_encaminhador(EncaminhadorFila(indice, pedidos, respostas, timeout=ESPERA_ESCRITOR))
+
+    from coletor import buscar_em_fonte, PAUSA_ENTRE_FONTES
+
+    pai = multiprocessing.parent_process()
+
+    while True:
+        try:
+            tarefa = tarefas.get(timeout=1)
+        except queue.Empty:
+            # Coordenador encerrado sem avisar: não há mais quem grave os resultados
+            if pai is not None and not pai.is_alive():
+                return
+            continue
+
+        if tarefa is None:
+            return
+
+        tarefa_id, termo, fonte = tarefa
+
+        try:
+            resultados = buscar_em_fonte(termo, fonte)
+            if resultados is None:
+                pedidos.put(('erro', indice, (tarefa_id, [], f"Tipo de fonte desconhecido: {fonte['tipo']}")))
+            else:
+                pedidos.put(('concluida', indice, (tarefa_id, resultados, None)))
+        except Exception as e:
+            logger.error(f"Erro na tarefa {tarefa_id} ({termo} em {fonte['nome']}): {str(e)}")
+            pedidos.put(('erro', indice, (tarefa_id, [], str(e))))
+
+        # Pausa para não sobrecarregar as fontes
+        time.sleep(PAUSA_ENTRE_FONTES)
+
+class CoordenadorColeta:
+    """
+    Distribui as tarefas de um lote entre os trabalhadores e grava no banco
+    as escritas deles e o andamento das tarefas.
+    """
+
+    def __init__(self, lote, fontes, processos, buscas=None):
+        """
+        Args:
+            lote (str): Identificador do lote
+            fontes (dict): Fontes do lote por id
+            processos (int): Quantidade de trabalhadores
+            buscas (dict, optional): Termo -> tarefa de busca reservada (ver tarefas.reservar_buscas)
+        """
+        self.lote = lote
+        self.fontes = fontes
+        self.buscas = buscas or {}
+        self.total_fontes = {}
+        self.fontes_concluidas = {}
+        self.processos = max(1, processos)
+        self.contexto = multiprocessing.get_context('spawn')
+        self.pedidos = self.contexto.Queue()
+        self.trabalhadores = {}
+        self.em_andamento = {}
+        self.sinais = 0
+        self._proximo_indice = 0
+
+    def _iniciar_trabalhador(self):
+        # Um trabalhador reiniciado ganha um novo índice: respostas a pedidos do
+        # trabalhador anterior nunca chegam à fila do novo
+        indice = self._proximo_indice
+        self._proximo_indice += 1
+        tarefas = self.contexto.Queue()
+        respostas = self.contexto.Queue()
+        processo = self.contexto.Process(
+            target=_trabalhador, args=(indice, tarefas, self.pedidos, respostas),
+            name=f'coleta-{indice}'
+        )
+        processo.start()
+        self.trabalhadores[indice] = (processo, tarefas, respostas)
+
+    def _ao_sinal(self, numero, quadro):
+        self.sinais += 1
+        if self.sinais == 1:
+            logger.warning(f"Sinal {numero} recebido: aguardando {len(self.em_andamento)} tarefa(s) em andamento")
+        else:
+            logger.warning("Segundo sinal recebido: encerrando os trabalhadores")
+            for processo, _, _ in self.trabalhadores.values():
+                processo.kill()
+
+    def _proxima_tarefa(self, pendentes):
+        # Primeira tarefa pendente cuja fonte ainda comporta mais uma tarefa simultânea
+        ocupacao = {}
+        for tarefa in self.em_andamento.values():
+            ocupacao[tarefa['fonte_id']] = ocupacao.get(tarefa['fonte_id'], 0) + 1
+
+        for posicao, tarefa in enumerate(pendentes):
+            limite = 1 if self.fontes[tarefa['fonte_id']]['tipo'] == 'lista' else TAREFAS_POR_FONTE
+            if ocupacao.get(tarefa['fonte_id'], 0) < limite:
+                return pendentes.pop(posicao)
+        return None
+
+    def _distribuir(self, pendentes):
+        for indice, (_, tarefas, _) in self.trabalhadores.items():
+            if indice in self.em_andamento:
+                continue
+
+            tarefa = self._proxima_tarefa(pendentes)
+            if tarefa is None:
+                return
+
+            tarefa['tentativas'] += 1
+            _atualizar_tarefa(
+                tarefa['id'], status='executando', tentativas=tarefa['tentativas'],
+                data_inicio=_agora(), erro=None
+            )
+            self.em_andamento[indice] = tarefa
+            tarefas.put((tarefa['id'], tarefa['termo'], self.fontes[tarefa['fonte_id']]))
+
+    def _registrar_busca(self, termo, resultados):
+        # Resultados da fonte na busca reservada do termo, lidos por quem aguarda a mesma busca
+        if termo not in self.buscas:
+            return
+        from tarefas import registrar_progresso_busca
+
+        self.fontes_concluidas[termo] = self.fontes_concluidas.get(termo, 0) + 1
+        registrar_progresso_busca(
+            self.buscas[termo], resultados, self.fontes_concluidas[termo], self.total_fontes.get(termo, 0)
+        )
+
+    def _atender(self, mensagem):
+        tipo, indice, conteudo = mensagem
+
+        if tipo == 'escrita':
+            resposta = executar_escrita(*conteudo)
+            if indice in self.trabalhadores:
+                self.trabalhadores[indice][2].put(resposta)
+            return
+
+        tarefa_id, resultados, erro = conteudo
+        tarefa = self.em_andamento.pop(indice, None)
+        _atualizar_tarefa(
+            tarefa_id, status='concluida' if tipo == 'concluida' else 'erro',
+            resultados=len(resultados), erro=erro, data_fim=_agora()
+        )
+        if tarefa is not None:
+            self._registrar_busca(tarefa['termo'], resultados)
+
+    def _verificar_trabalhadores(self, pendentes):
+        for indice, (processo, _, _) in list(self.trabalhadores.items()):
+            if processo.is_alive():
+                continue
+
+            del self.trabalhadores[indice]
+            tarefa = self.em_andamento.pop(indice, None)
+
+            if tarefa is not None:
+                logger.error(f"Trabalhador {indice} encerrado (código {processo.exitcode}) durante a tarefa {tarefa['id']}")
+                if self.sinais > 1:
+                    # Encerrado pelo segundo sinal: a tarefa fica para a retomada
+                    _atualizar_tarefa(tarefa['id'], status='pendente', data_inicio=None)
+                elif tarefa['tentativas'] < MAX_TENTATIVAS:
+                    _atualizar_tarefa(tarefa['id'], status='pendente', data_inicio=None)
+                    pendentes.append(tarefa)
+                else:
+                    _atualizar_tarefa(
+                        tarefa['id'], status='erro', data_fim=_agora(),
+                        erro=f"Trabalhador encerrado (código {processo.exitcode})"
+                    )
+                    self._registrar_busca(tarefa['termo'], [])
+
+            if not self.sinais and pendentes:
+                self._iniciar_trabalhador()
+
+    def executar(self):
+        """
+        Executa as tarefas pendentes do lote até o fim ou até um sinal de encerramento.
+
+        Returns:
+            bool: True se o lote foi interrompido
+        """
+        pendentes = []
+
+        for tarefa in obter_tarefas_pendentes(self.lote):
+            if tarefa['fonte_id'] in self.fontes:
+                pendentes.append(tarefa)
+            else:
+                _atualizar_tarefa(tarefa['id'], status='erro', erro="Fonte removida", data_fim=_agora())
+
+        for tarefa in pendentes:
+            self.total_fontes[tarefa['termo']] = self.total_fontes.get(tarefa['termo'], 0) + 1
+
+        # Sinais só podem ser tratados na thread principal
+        sinais_anteriores = {}
+        if threading.current_thread() is threading.main_thread():
+            sinais_anteriores = {
+                numero: signal.signal(numero, self._ao_sinal) for numero in (signal.SIGINT, signal.SIGTERM)
+            }
+
+        try:
+            for _ in range(min(self.processos, len(pendentes))):
+                self._iniciar_trabalhador()
+
+            ultima_verificacao = time.monotonic()
+            while self.trabalhadores and (self.em_andamento or (pendentes and not self.sinais)):
+                if not self.sinais:
+                    self._distribuir(pendentes)
+
+                try:
+                    self._atender(self.pedidos.get(timeout=1))
+                except queue.Empty:
+                    pass
+
+                if time.monotonic() - ultima_verificacao >= 1:
+                    self._verificar_trabalhadores(pendentes)
+                    ultima_verificacao = time.monotonic()
+
+            return bool(self.sinais) and bool(pendentes or self.em_andamento)
+
+        finally:
+            for processo, tarefas, _ in self.trabalhadores.values():
+                tarefas.put(None)
+            for processo, _, _ in self.trabalhadores.values():
+                processo.join(timeout=30)
+                if processo.is_alive():
+                    processo.kill()
+
+            # Tarefas de trabalhadores encerrados à força voltam a pendente
+            for tarefa in self.em_andamento.values():
+                _atualizar_tarefa(tarefa['id'], status='pendente', data_inicio=None)
+
+            for numero, anterior in sinais_anteriores.items():
+                signal.signal(numero, anterior)
+
+def executar_coleta(termos=None, processos=None, lote=None):
+    """
+    Busca os termos em todas as fontes ativas com vários processos trabalhadores.
+
+    Cada termo tem a sua busca reservada na tabela tarefas antes de entrar no
+    lote (single-flight com a interface, a API e outras execuções): termos já
+    em andamento ou em cache ficam com a tarefa existente e não são buscados.
+    Os resultados de cada fonte entram na tarefa do termo e, ao fim do lote, a
+    tarefa é concluída, ou marcada como interrompida se o lote não terminar.
+
+    Args:
+        termos (list, optional): Termos buscados (ignorados ao retomar um lote)
+        processos (int, optional): Quantidade de trabalhadores. Defaults to PROCESSOS.
+        lote (str, optional): Lote interrompido a retomar. Defaults to None.
+
+    Returns:
+        dict: {'lote', 'tarefas': {status: quantidade}, 'resultados', 'interrompido', 'duracao_s',
+               'buscas': [{'termo', 'tarefa_id', 'coalescida', 'origem'}] (vazia ao retomar)}
+    """
+    inicio = time.perf_counter()
+    buscas, itens = {}, []
+
+    if lote:
+        devolvidas = preparar_retomada(lote)
+        logger.info(f"Retomando o lote {lote} ({devolvidas} tarefa(s) em execução devolvidas à fila)")
+        fontes = {fonte['id']: fonte for fonte in obter_fontes(apenas_ativas=False)}
+    else:
+        # O status das fontes é verificado uma vez por lote, e não a cada termo
+        from coletor import verificar_status_fonte
+        from tarefas import reservar_buscas
+
+        fontes = {}
+        for fonte in obter_fontes(apenas_ativas=True):
+            status, _ = verificar_status_fonte(fonte['id'], fonte['url'])
+            if status == 'ativo':
+                fontes[fonte['id']] = fonte
+            else:
+                logger.warning(f"Fonte {fonte['nome']} está {status}. Pulando.")
+
+        buscas, itens = reservar_buscas(sorted(set(termos or [])))
+        lote = criar_lote(sorted(buscas), list(fontes.values()))
+
+    registrar_auditoria(
+        acao="coleta_paralela",
+        descricao=f"Coleta paralela do lote {lote}",
+        dados=f"Processos: {processos or PROCESSOS}, Fontes: {len(fontes)}, "
+              f"Termos: {len(buscas)}, Coalescidos: {len(itens) - len(buscas)}"
+    )
+
+    interrompido = True
+    try:
+        interrompido = CoordenadorColeta(lote, fontes, processos or PROCESSOS, buscas).executar()
+    finally:
+        if buscas:
+            from tarefas import encerrar_busca
+
+            # Busca de lote interrompido é assumida por quem a aguardava (ou pela próxima execução)
+            for tarefa_id in buscas.values():
+                encerrar_busca(tarefa_id, 'interrompida' if interrompido else 'concluida')
+
+    resumo = resumir_lote(lote)
+    resumo['interrompido'] = interrompido
+    resumo['buscas'] = itens
+    resumo['duracao_s'] = round(time.perf_counter() - inicio, 2)
+
+    registrar_auditoria(
+        acao="coleta_paralela_interrompida" if interrompido else "coleta_paralela_concluida",
+        descricao=f"Coleta paralela do lote {lote} {'interrompida' if interrompido else 'concluída'}",
+        dados=f"Tarefas: {resumo['tarefas']}, Resultados: {resumo['resultados']}"
+    )
+    logger.info(f"Lote {lote}: {resumo['tarefas']}, {resumo['resultados']} resultados em {resumo['duracao_s']}s")
+
+    return resumo
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Coleta paralela dos termos monitorados")
+    parser.add_argument('--processos', type=int, default=PROCESSOS, help="Processos trabalhadores")
+    parser.add_argument('--termos-arquivo', default='termos_busca.txt', help="Arquivo com um termo por linha")
+    parser.add_argument('--retomar', metavar='LOTE', help="Retoma as tarefas pendentes de um lote interrompido")
+    args = parser.parse_args()
+
+    termos = None
+    if not args.retomar:
+        with open(args.termos_arquivo, 'r') as f:
+            termos = [linha.strip() for linha in f if linha.strip()]
+
+    resumo = executar_coleta(termos, args.processos, args.retomar)
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+    sys.exit(3 if resumo['interrompido'] else 0)
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
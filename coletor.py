@@ -6,7 +6,15 @@ import logging
 import datetime
 import random
 import time
-from db import get_db_connection, registrar_coleta, registrar_validacao, registrar_auditoria, obter_fontes
+import os
+from urllib.parse import urljoin, quote_plus
+from db import registrar_coleta, registrar_validacao, registrar_auditoria, registrar_status_fonte, obter_fontes, obter_duplicata_exata
+from busca_valida_semantica import ler_corpo_limitado, termo_presente_em_contexto
+from fronteira import FronteiraRastreamento, buscar_descobertos
+from eventos import publicar as publicar_evento
+from normalizacao_url import normalizar_link, extrair_host
+from metricas import medir_requisicao, DURACAO_VALIDACAO
+from perfilamento import execucao, span, instrumentar
 
 # Configuração de logging
 logging.basicConfig(
@@ -19,16 +27,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger("coletor")
 
-def buscar_termo(termo):
+# Pausa entre fontes para não sobrecarregar os sites (segundos)
+PAUSA_ENTRE_FONTES = float(os.environ.get('COLETOR_PAUSA_FONTES', 1))
+
+def buscar_termo(termo, ao_progredir=None, perfilar=False):
     """
     Busca um termo nas fontes cadastradas e registra os resultados.
     
+    Cada busca é registrada como uma execução com o tempo de cada etapa
+    (página /perfilamento).
+    
     Args:
         termo (str): Termo a ser buscado
+        ao_progredir (callable, optional): Chamada ao fim de cada fonte com
+            (fonte, novos_resultados, fontes_concluidas, total_fontes). Defaults to None.
+        perfilar (bool, optional): Captura também um cProfile da busca. Defaults to False.
         
     Returns:
         list: Lista de resultados encontrados
     """
+    with execucao('buscar_termo', detalhes=termo, perfilar=perfilar):
+        return _buscar_termo(termo, ao_progredir)
+
+def _buscar_termo(termo, ao_progredir):
     logger.info(f"Iniciando busca pelo termo: {termo}")
     
     # Registra a ação de busca
@@ -48,9 +69,12 @@ def buscar_termo(termo):
     resultados = []
     
     # Para cada fonte, realiza a busca
-    for fonte in fontes:
+    for indice, fonte in enumerate(fontes, start=1):
+        novos_resultados = []
+        
         try:
             logger.info(f"Buscando em {fonte['nome']} ({fonte['url']})")
+            publicar_evento('fonte_iniciada', {'fonte': fonte['nome'], 'indice': indice, 'total_fontes': len(fontes)})
             
             # Verifica o status da fonte antes de buscar
             status, _ = verificar_status_fonte(fonte['id'], fonte['url'])
@@ -60,31 +84,32 @@ def buscar_termo(termo):
                 continue
             
             # Realiza a busca de acordo com o tipo de fonte
-            if fonte['tipo'] == 'surface':
-                # Fontes da surface web (Ahmia, DarkSearch, etc.)
-                novos_resultados = buscar_em_surface(termo, fonte)
-            elif fonte['tipo'] == 'lista':
-                # Fontes de listas de links .onion (Dark.fail, Onion.live, etc.)
-                novos_resultados = buscar_em_lista(termo, fonte)
-            else:
-                logger.warning(f"Tipo de fonte desconhecido: {fonte['tipo']}")
+            resultados_fonte = buscar_em_fonte(termo, fonte)
+            if resultados_fonte is None:
                 continue
             
             # Adiciona os resultados à lista
+            novos_resultados = resultados_fonte
             resultados.extend(novos_resultados)
             
-            # Registra a ação de busca na fonte
-            registrar_auditoria(
-                acao="busca_fonte",
-                descricao=f"Busca em {fonte['nome']} para o termo: {termo}",
-                dados=f"Resultados: {len(novos_resultados)}"
-            )
-            
             # Pausa para não sobrecarregar as fontes
-            time.sleep(1)
+            with span('pausa'):
+                time.sleep(PAUSA_ENTRE_FONTES)
             
         except Exception as e:
             logger.error(f"Erro ao buscar em {fonte['nome']}: {str(e)}")
+        
+        finally:
+            # Informa o progresso também para fontes puladas ou com erro
+            publicar_evento('fonte_concluida', {
+                'fonte': fonte['nome'],
+                'resultados': len(novos_resultados),
+                'fontes_concluidas': indice,
+                'total_fontes': len(fontes)
+            })
+            
+            if ao_progredir:
+                ao_progredir(fonte, novos_resultados, indice, len(fontes))
     
     # Registra a conclusão da busca
     registrar_auditoria(
@@ -97,6 +122,38 @@ def buscar_termo(termo):
     
     return resultados
 
+def buscar_em_fonte(termo, fonte):
+    """
+    Busca um termo em uma fonte, de acordo com o tipo da fonte, e registra a
+    busca na auditoria. Não verifica o status da fonte.
+    
+    Args:
+        termo (str): Termo a ser buscado
+        fonte (dict): Informações da fonte
+        
+    Returns:
+        list: Lista de resultados encontrados (None se o tipo da fonte for desconhecido)
+    """
+    if fonte['tipo'] == 'surface':
+        # Fontes da surface web (Ahmia, DarkSearch, etc.)
+        resultados = buscar_em_surface(termo, fonte)
+    elif fonte['tipo'] == 'lista':
+        # Fontes de listas de links .onion (Dark.fail, Onion.live, etc.)
+        resultados = buscar_em_lista(termo, fonte)
+    else:
+        logger.warning(f"Tipo de fonte desconhecido: {fonte['tipo']}")
+        return None
+    
+    # Registra a ação de busca na fonte
+    registrar_auditoria(
+        acao="busca_fonte",
+        descricao=f"Busca em {fonte['nome']} para o termo: {termo}",
+        dados=f"Resultados: {len(resultados)}"
+    )
+    
+    return resultados
+
+@instrumentar(atributos=lambda termo, fonte: {'fonte': fonte['nome']})
 def buscar_em_surface(termo, fonte):
     """
     Busca um termo em fontes da surface web.
@@ -113,17 +170,27 @@ def buscar_em_surface(termo, fonte):
     try:
         # Ahmia
         if fonte['nome'] == 'Ahmia':
-            url = f"https://ahmia.fi/search/?q={termo}"
+            # A busca fica sob a URL cadastrada da fonte (https://ahmia.fi/ por padrão)
+            url = urljoin(fonte['url'], f"search/?q={quote_plus(termo)}")
             
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            with medir_requisicao(fonte['nome']) as medicao, span('fetch', url=url):
+                response = requests.get(url, headers=headers, timeout=10, stream=True)
+                medicao['status'] = response.status_code
+                if response.status_code == 200:
+                    html = ler_corpo_limitado(response)
+                else:
+                    html = None
+                    response.close()
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                resultados_html = soup.select('.result')
+                with span('parse'):
+                    soup = BeautifulSoup(html, 'html.parser')
+                    resultados_html = soup.select('.result')
+                links_vistos = set()
                 
                 for resultado in resultados_html:
                     try:
@@ -131,34 +198,49 @@ def buscar_em_surface(termo, fonte):
                         link_elem = resultado.select_one('a')
                         descricao_elem = resultado.select_one('.description')
                         
-                        if titulo_elem and link_elem:
+                        # Link canônico (resolve redirecionamentos e links relativos)
+                        link = normalizar_link(link_elem.get('href'), base=url) if link_elem else None
+                        
+                        if titulo_elem and link and link not in links_vistos:
+                            links_vistos.add(link)
                             titulo = titulo_elem.text.strip()
-                            link = link_elem['href']
                             descricao = descricao_elem.text.strip() if descricao_elem else ""
                             
-                            # Registra a coleta
+                            # Registra a coleta (com impressão digital do resultado)
                             coleta_id = registrar_coleta(
                                 termo_busca=termo,
                                 link_encontrado=link,
                                 titulo=titulo,
                                 descricao=descricao,
-                                fonte_id=fonte['id']
+                                fonte_id=fonte['id'],
+                                # O resultado do Ahmia é só título e descrição: espelhos em
+                                # outros hosts com o mesmo título e descrição são duplicatas
+                                conteudo=f"{titulo}\n{descricao}"
                             )
                             
-                            # Valida o vazamento
-                            validado, score, metodo, observacoes = validar_vazamento(link, titulo, descricao)
+                            duplicata = obter_duplicata_exata(coleta_id)
                             
-                            if validado:
-                                registrar_validacao(
-                                    coleta_id=coleta_id,
-                                    validado=validado,
-                                    score_validacao=score,
-                                    metodo_validacao=metodo,
-                                    observacoes=observacoes
-                                )
+                            if duplicata:
+                                # Espelho de conteúdo já coletado: reaproveita a validação
+                                validado = bool(duplicata['validado'])
+                                score = duplicata['score_validacao']
+                                metodo = duplicata['metodo_validacao']
+                                observacoes = duplicata['observacoes_validacao']
+                            else:
+                                # Valida o vazamento
+                                validado, score, metodo, observacoes = validar_vazamento(link, titulo, descricao)
+                                
+                                if validado:
+                                    registrar_validacao(
+                                        coleta_id=coleta_id,
+                                        validado=validado,
+                                        score_validacao=score,
+                                        metodo_validacao=metodo,
+                                        observacoes=observacoes
+                                    )
                             
                             # Adiciona ao resultado
-                            resultados.append({
+                            novo_resultado = {
                                 'id': coleta_id,
                                 'termo_busca': termo,
                                 'link_encontrado': link,
@@ -171,7 +253,11 @@ def buscar_em_surface(termo, fonte):
                                 'score_validacao': score,
                                 'metodo_validacao': metodo,
                                 'observacoes_validacao': observacoes
-                            })
+                            }
+                            resultados.append(novo_resultado)
+                            
+                            # Envia o resultado a quem acompanha a busca em tempo real
+                            publicar_evento('resultado', novo_resultado)
                     except Exception as e:
                         logger.error(f"Erro ao processar resultado de {fonte['nome']}: {str(e)}")
         
@@ -208,7 +294,7 @@ def buscar_em_surface(termo, fonte):
                     )
                 
                 # Adiciona ao resultado
-                resultados.append({
+                novo_resultado = {
                     'id': coleta_id,
                     'termo_busca': termo,
                     'link_encontrado': link,
@@ -221,7 +307,11 @@ def buscar_em_surface(termo, fonte):
                     'score_validacao': score,
                     'metodo_validacao': metodo,
                     'observacoes_validacao': observacoes
-                })
+                }
+                resultados.append(novo_resultado)
+                
+                # Envia o resultado a quem acompanha a busca em tempo real
+                publicar_evento('resultado', novo_resultado)
         
         else:
             logger.warning(f"Fonte surface não implementada: {fonte['nome']}")
@@ -231,10 +321,16 @@ def buscar_em_surface(termo, fonte):
     
     return resultados
 
+@instrumentar(atributos=lambda termo, fonte: {'fonte': fonte['nome']})
 def buscar_em_lista(termo, fonte):
     """
     Busca um termo em fontes de listas de links .onion.
     
+    Executa uma rodada limitada da fronteira de rastreamento da fonte (páginas
+    da lista e serviços .onion descobertos) e registra como coleta as páginas
+    visitadas que contêm o termo e os endereços descobertos cujo título ou
+    descrição na lista mencionam o termo.
+    
     Args:
         termo (str): Termo a ser buscado
         fonte (dict): Informações da fonte
@@ -243,26 +339,28 @@ def buscar_em_lista(termo, fonte):
         list: Lista de resultados encontrados
     """
     resultados = []
+    links_vistos = set()
     
-    try:
-        # Simulação de resultados para fontes de listas
-        # Em um ambiente real, seria necessário implementar scrapers específicos
+    def registrar_resultado(link, titulo, descricao, conteudo):
+        # Registra a coleta (com impressão digital do conteúdo)
+        coleta_id = registrar_coleta(
+            termo_busca=termo,
+            link_encontrado=link,
+            titulo=titulo,
+            descricao=descricao,
+            fonte_id=fonte['id'],
+            conteudo=conteudo
+        )
         
-        # Gera alguns resultados simulados
-        for i in range(2):
-            titulo = f"Resultado {i+1} para {termo} em {fonte['nome']}"
-            link = f"http://{termo.lower().replace(' ', '')}{random.randint(1000, 9999)}.onion/index.html"
-            descricao = f"Descrição do resultado {i+1} para o termo {termo} encontrado em {fonte['nome']}."
-            
-            # Registra a coleta
-            coleta_id = registrar_coleta(
-                termo_busca=termo,
-                link_encontrado=link,
-                titulo=titulo,
-                descricao=descricao,
-                fonte_id=fonte['id']
-            )
-            
+        duplicata = obter_duplicata_exata(coleta_id)
+        
+        if duplicata:
+            # Espelho de conteúdo já coletado: reaproveita a validação
+            validado = bool(duplicata['validado'])
+            score = duplicata['score_validacao']
+            metodo = duplicata['metodo_validacao']
+            observacoes = duplicata['observacoes_validacao']
+        else:
             # Valida o vazamento
             validado, score, metodo, observacoes = validar_vazamento(link, titulo, descricao)
             
@@ -274,28 +372,65 @@ def buscar_em_lista(termo, fonte):
                     metodo_validacao=metodo,
                     observacoes=observacoes
                 )
-            
-            # Adiciona ao resultado
-            resultados.append({
-                'id': coleta_id,
-                'termo_busca': termo,
-                'link_encontrado': link,
-                'titulo': titulo,
-                'descricao': descricao,
-                'fonte_id': fonte['id'],
-                'fonte_nome': fonte['nome'],
-                'data_coleta': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'validado': validado,
-                'score_validacao': score,
-                'metodo_validacao': metodo,
-                'observacoes_validacao': observacoes
-            })
+        
+        # Adiciona ao resultado
+        novo_resultado = {
+            'id': coleta_id,
+            'termo_busca': termo,
+            'link_encontrado': link,
+            'titulo': titulo,
+            'descricao': descricao,
+            'fonte_id': fonte['id'],
+            'fonte_nome': fonte['nome'],
+            'data_coleta': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'validado': validado,
+            'score_validacao': score,
+            'metodo_validacao': metodo,
+            'observacoes_validacao': observacoes
+        }
+        resultados.append(novo_resultado)
+        
+        # Envia o resultado a quem acompanha a busca em tempo real
+        publicar_evento('resultado', novo_resultado)
+    
+    try:
+        # Rodada da fronteira: páginas visitadas que contêm o termo
+        fronteira = FronteiraRastreamento(fonte)
+        
+        for pagina in fronteira.executar():
+            try:
+                # As páginas da própria lista são apenas índices; os resultados são os serviços
+                if extrair_host(pagina.url) == fronteira.host_semente:
+                    continue
+                
+                contexto = termo_presente_em_contexto(pagina.html, termo)
+                
+                if contexto and pagina.url not in links_vistos:
+                    links_vistos.add(pagina.url)
+                    titulo = pagina.titulo or pagina.url
+                    registrar_resultado(pagina.url, titulo, contexto, pagina.texto)
+            except Exception as e:
+                logger.error(f"Erro ao processar página {pagina.url} de {fonte['nome']}: {str(e)}")
+        
+        # Endereços descobertos (nesta e em rodadas anteriores) cuja descrição na lista cita o termo
+        for descoberto in buscar_descobertos(fonte['id'], termo):
+            try:
+                if descoberto['url'] in links_vistos:
+                    continue
+                
+                links_vistos.add(descoberto['url'])
+                titulo = descoberto['titulo'] or descoberto['url']
+                descricao = descoberto['descricao'] or ""
+                registrar_resultado(descoberto['url'], titulo, descricao, f"{titulo}\n{descricao}")
+            except Exception as e:
+                logger.error(f"Erro ao processar endereço {descoberto['url']} de {fonte['nome']}: {str(e)}")
     
     except Exception as e:
         logger.error(f"Erro ao buscar em {fonte['nome']}: {str(e)}")
     
     return resultados
 
+@instrumentar()
 def validar_vazamento(link, titulo, descricao):
     """
     Valida se um link é um vazamento real.
@@ -309,6 +444,7 @@ def validar_vazamento(link, titulo, descricao):
         tuple: (validado, score, metodo, observacoes)
     """
     logger.info(f"Validando vazamento: {link}")
+    inicio = time.perf_counter()
     
     # Inicializa o score
     score = 0
@@ -360,9 +496,11 @@ def validar_vazamento(link, titulo, descricao):
     )
     
     logger.info(f"Validação concluída: score={score}, validado={validado}")
+    DURACAO_VALIDACAO.labels(metodo='automatico').observe(time.perf_counter() - inicio)
     
     return validado, score, metodo, ", ".join(observacoes)
 
+@instrumentar(atributos=lambda fonte_id, url: {'fonte_id': fonte_id})
 def verificar_status_fonte(fonte_id, url):
     """
     Verifica o status de uma fonte.
@@ -382,7 +520,9 @@ def verificar_status_fonte(fonte_id, url):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        # Apenas o status interessa: não baixa o corpo da página
+        response = requests.get(url, headers=headers, timeout=10, stream=True)
+        response.close()
         
         # Verifica o status da resposta
         if response.status_code == 200:
@@ -393,30 +533,7 @@ def verificar_status_fonte(fonte_id, url):
             detalhes = f"Fonte inativa. Status code: {response.status_code}"
         
         # Atualiza o status da fonte no banco de dados
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Atualiza o status e a data de verificação
-            cursor.execute(
-                'UPDATE fontes SET status = ?, ultimo_check = CURRENT_TIMESTAMP WHERE id = ?',
-                (status, fonte_id)
-            )
-            
-            # Registra o status na tabela status_fontes
-            cursor.execute(
-                'INSERT INTO status_fontes (fonte_id, status, detalhes) VALUES (?, ?, ?)',
-                (fonte_id, status, detalhes)
-            )
-            
-            conn.commit()
-            
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Erro ao atualizar status da fonte: {str(e)}")
-            
-        finally:
-            conn.close()
+        registrar_status_fonte(fonte_id, status, detalhes)
         
         # Registra a ação de verificação
         registrar_auditoria(
@@ -434,30 +551,7 @@ def verificar_status_fonte(fonte_id, url):
         detalhes = f"Erro ao acessar a fonte: {str(e)}"
         
         # Atualiza o status da fonte no banco de dados
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Atualiza o status e a data de verificação
-            cursor.execute(
-                'UPDATE fontes SET status = ?, ultimo_check = CURRENT_TIMESTAMP WHERE id = ?',
-                (status, fonte_id)
-            )
-            
-            # Registra o status na tabela status_fontes
-            cursor.execute(
-                'INSERT INTO status_fontes (fonte_id, status, detalhes) VALUES (?, ?, ?)',
-                (fonte_id, status, detalhes)
-            )
-            
-            conn.commit()
-            
-        except Exception as db_error:
-            conn.rollback()
-            logger.error(f"Erro ao atualizar status da fonte: {str(db_error)}")
-            
-        finally:
-            conn.close()
+        registrar_status_fonte(fonte_id, status, detalhes)
         
         # Registra a ação de verificação
         registrar_auditoria(
@@ -0,0 +1,219 @@
+import os
+import gzip
+import zlib
+import hashlib
+import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger("compressao")
+
+# Respostas menores que isso não compensam a compressão
+TAMANHO_MINIMO = int(os.environ.get('COMPRESSAO_MIN_BYTES', 1024))
+
+# Nível de compressão do gzip (1-9) e qualidade do brotli (0-11)
+NIVEL_GZIP = int(os.environ.get('COMPRESSAO_NIVEL_GZIP', 6))
+QUALIDADE_BROTLI = int(os.environ.get('COMPRESSAO_QUALIDADE_BROTLI', 5))
+
+TIPOS_COMPRESSIVEIS = (
+    'text/html',
+    'text/css',
+    'text/csv',
+    'text/plain',
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+)
+
+# Respostas em fluxo comprimidas parte a parte (SSE e downloads de arquivo ficam de fora)
+TIPOS_FLUXO_COMPRESSIVEIS = (
+    'application/x-ndjson',
+)
+
+def _codificacoes_suportadas():
+    # Brotli só é oferecido se o pacote opcional estiver instalado
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+def escolher_codificacao(accept_encodings):
+    """
+    Escolhe a codificação de conteúdo preferida pelo cliente.
+
+    Args:
+        accept_encodings: Cabeçalho Accept-Encoding já interpretado (request.accept_encodings)
+
+    Returns:
+        str: 'br', 'gzip' ou None
+    """
+    melhor, melhor_qualidade = None, 0
+    for codificacao in _codificacoes_suportadas():
+        qualidade = accept_encodings[codificacao]
+        if qualidade > melhor_qualidade:
+            melhor, melhor_qualidade = codificacao, qualidade
+    return melhor
+
+def comprimir(dados, codificacao):
+    """
+    Comprime o corpo de uma resposta.
+
+    Args:
+        dados (bytes): Corpo original
+        codificacao (str): 'br' ou 'gzip'
+
+    Returns:
+        bytes: Corpo comprimido
+    """
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=QUALIDADE_BROTLI)
+    return gzip.compress(dados, compresslevel=NIVEL_GZIP)
+
+def comprimir_fluxo(partes, codificacao):
+    """
+    Comprime um corpo em fluxo parte a parte.
+
+    O compressor é descarregado ao fim de cada parte, então o cliente recebe
+    cada parte assim que ela é gerada; partes grandes (ex.: um lote de linhas)
+    comprimem quase tão bem quanto o corpo inteiro.
+
+    Args:
+        partes (iterable): Partes do corpo (bytes ou str)
+        codificacao (str): 'br' ou 'gzip'
+
+    Yields:
+        bytes: Partes comprimidas
+    """
+    if codificacao == 'br':
+        compressor = brotli.Compressor(quality=QUALIDADE_BROTLI)
+        comprimir_parte = lambda dados: compressor.process(dados) + compressor.flush()
+        finalizar = compressor.finish
+    else:
+        # wbits=31: formato gzip
+        compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+        comprimir_parte = lambda dados: compressor.compress(dados) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        finalizar = compressor.flush
+
+    try:
+        for parte in partes:
+            if isinstance(parte, str):
+                parte = parte.encode('utf-8')
+            if parte:
+                yield comprimir_parte(parte)
+        yield finalizar()
+    finally:
+        # Fecha o gerador original (libera conexões quando o cliente desconecta)
+        if hasattr(partes, 'close'):
+            partes.close()
+
+def etag_corresponde(if_none_match, etag):
+    """
+    Verifica se o If-None-Match do cliente contém o ETag, em qualquer uma das
+    representações (sem compressão ou com o sufixo da codificação).
+
+    Args:
+        if_none_match: Cabeçalho If-None-Match já interpretado (request.if_none_match)
+        etag (str): ETag da representação sem compressão (sem aspas)
+
+    Returns:
+        bool: True se o cliente já tem o conteúdo
+    """
+    if not if_none_match:
+        return False
+    variantes = [etag] + [f"{etag}-{codificacao}" for codificacao in _codificacoes_suportadas()]
+    return any(if_none_match.contains_weak(variante) for variante in variantes)
+
+def _compressivel(resposta):
+    tipo = resposta.mimetype or ''
+    return (
+        resposta.status_code == 200
+        and not resposta.direct_passthrough
+        and not resposta.is_streamed
+        and 'Content-Encoding' not in resposta.headers
+        and tipo in TIPOS_COMPRESSIVEIS
+    )
+
+def _fluxo_compressivel(resposta):
+    return (
+        resposta.status_code == 200
+        and resposta.is_streamed
+        and not resposta.direct_passthrough
+        and 'Content-Encoding' not in resposta.headers
+        and (resposta.mimetype or '') in TIPOS_FLUXO_COMPRESSIVEIS
+    )
+
+def configurar_compressao(app):
+    """
+    Registra no aplicativo Flask o tratamento de ETag e compressão das respostas.
+
+    Rotas que leem o banco definem o ETag pela versão dos dados antes de
+    renderizar (ver cache_versionado.etag_versao); as demais respostas GET sem
+    ETag recebem, como alternativa, um ETag forte calculado do conteúdo. Se o
+    cliente já tiver essa versão (If-None-Match), a resposta vira 304. Em seguida,
+    HTML, JSON e CSV acima de TAMANHO_MINIMO são comprimidos com brotli (se
+    disponível) ou gzip, conforme o Accept-Encoding. Respostas NDJSON em fluxo
+    são comprimidas parte a parte, sem ETag; SSE e downloads de arquivo não
+    são alterados.
+
+    Args:
+        app (Flask): Aplicativo
+    """
+    from flask import request
+
+    @app.after_request
+    def _etag_e_compressao(resposta):
+        try:
+            if _fluxo_compressivel(resposta):
+                resposta.vary.add('Accept-Encoding')
+                codificacao = escolher_codificacao(request.accept_encodings)
+                if codificacao:
+                    resposta.response = comprimir_fluxo(resposta.response, codificacao)
+                    resposta.headers['Content-Encoding'] = codificacao
+                    resposta.headers.pop('Content-Length', None)
+                return resposta
+
+            if not _compressivel(resposta):
+                return resposta
+
+            dados = resposta.get_data()
+
+            if request.method in ('GET', 'HEAD'):
+                etag, fraco = resposta.get_etag()
+                if not etag:
+                    # Alternativa para rotas sem versão dos dados: o corpo já foi gerado
+                    etag, fraco = hashlib.sha1(dados).hexdigest(), False
+                    resposta.set_etag(etag)
+
+                if etag_corresponde(request.if_none_match, etag):
+                    resposta.status_code = 304
+                    resposta.set_data(b'')
+                    resposta.headers.pop('Content-Length', None)
+                    return resposta
+            else:
+                etag, fraco = None, False
+
+            resposta.vary.add('Accept-Encoding')
+
+            if len(dados) < TAMANHO_MINIMO:
+                return resposta
+
+            codificacao = escolher_codificacao(request.accept_encodings)
+            if not codificacao:
+                return resposta
+
+            resposta.set_data(comprimir(dados, codificacao))
+            resposta.headers['Content-Encoding'] = codificacao
+
+            # Cada codificação é uma representação diferente: o ETag forte precisa mudar
+            if etag:
+                resposta.set_etag(f"{etag}-{codificacao}", weak=fraco)
+
+        except Exception as e:
+            logger.error(f"Erro ao comprimir resposta: {str(e)}")
+
+        return resposta
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
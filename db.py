@@ -2,7 +2,16 @@ import sqlite3
 import os
 import logging
 import csv
+import json
 import datetime
+from normalizacao_url import canonicalizar_url, extrair_host
+from eventos import publicar as publicar_evento
+from metricas import medir, cronometrar, DURACAO_ESCRITA_DB, DURACAO_COMMIT_DB
+from perfilamento import instrumentar
+from politica_auditoria import decidir_modo, obter_buffer, MODO_SINCRONO, MODO_CONTADOR, MODO_DESLIGADO
+from cadeia_auditoria import inserir_registros
+from escritor_db import escrita, conexao_lote
+from impressao_conteudo import calcular_impressao, texto_para_simhash, distancia_hamming, LIMIAR_HAMMING
 
 # Configuração de logging
 logging.basicConfig(
@@ -15,20 +24,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger("db")
 
-# Caminho do banco de dados
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onion_monitor.db')
+# Caminho do banco de dados (DATABASE_PATH permite apontar para outro arquivo, ex.: benchmarks)
+DB_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onion_monitor.db')
+
+# Intervalos (em segundos) entre verificações de uma URL do índice
+INTERVALO_VERIFICACAO_MINIMO = int(os.environ.get('INTERVALO_VERIFICACAO_MINIMO', 3600))
+INTERVALO_VERIFICACAO_MAXIMO = int(os.environ.get('INTERVALO_VERIFICACAO_MAXIMO', 7 * 24 * 3600))
+
+# Execuções perfiladas mantidas no banco (as mais antigas são removidas)
+MAX_EXECUCOES_PERFILADAS = int(os.environ.get('PERFILAMENTO_MAX_EXECUCOES', 200))
 
 def get_db_connection():
     """
     Obtém uma conexão com o banco de dados.
     
+    No serviço escritor, as escritas de um lote recebem a conexão (e a
+    transação) do lote (ver escritor_db).
+    
     Returns:
         sqlite3.Connection: Conexão com o banco de dados
     """
+    conn = conexao_lote()
+    if conn is not None:
+        return conn
+    
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
+def _garantir_colunas(cursor, tabela, colunas):
+    """
+    Adiciona à tabela as colunas que ainda não existem (migração incremental).
+    
+    Args:
+        cursor (sqlite3.Cursor): Cursor do banco de dados
+        tabela (str): Nome da tabela
+        colunas (list): Lista de tuplas (nome, tipo)
+    """
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    existentes = {row[1] for row in cursor.fetchall()}
+    
+    for nome, tipo in colunas:
+        if nome not in existentes:
+            cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {nome} {tipo}")
+            logger.info(f"Coluna '{nome}' adicionada à tabela {tabela}")
+
 def init_db():
     """
     Inicializa o banco de dados, criando as tabelas necessárias.
@@ -39,6 +79,15 @@ def init_db():
     cursor = conn.cursor()
     
     try:
+        # Permite devolver ao sistema o espaço liberado pela retenção da auditoria.
+        # Só tem efeito em banco novo; bancos existentes são convertidos uma vez
+        # com retencao_auditoria.converter_auto_vacuum()
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
+        # WAL: as leituras usam um instantâneo e não esperam pelo escritor (a
+        # configuração fica gravada no arquivo do banco)
+        cursor.execute('PRAGMA journal_mode = WAL')
+        
         # Cria a tabela de fontes
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS fontes (
@@ -72,6 +121,31 @@ def init_db():
             )
         ''')
         
+        # Impressão digital do conteúdo coletado (deduplicação entre espelhos)
+        _garantir_colunas(cursor, 'coletas', [
+            ('hash_conteudo', 'TEXT'),
+            ('simhash_conteudo', 'TEXT'),
+            ('coleta_canonica_id', 'INTEGER')
+        ])
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_coletas_hash_conteudo ON coletas (hash_conteudo)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_coletas_canonica ON coletas (coleta_canonica_id)')
+        
+        # Versão dos dados em que a coleta foi incluída ou validada pela última vez
+        # (cursor incremental da API /api/coletas)
+        _garantir_colunas(cursor, 'coletas', [('versao', 'INTEGER NOT NULL DEFAULT 0')])
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_coletas_versao ON coletas (versao)')
+        
+        # Índice de bandas do SimHash para busca de quase-duplicatas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS coletas_simhash (
+                coleta_id INTEGER NOT NULL,
+                banda INTEGER NOT NULL,
+                valor INTEGER NOT NULL,
+                PRIMARY KEY (banda, valor, coleta_id),
+                FOREIGN KEY (coleta_id) REFERENCES coletas (id)
+            ) WITHOUT ROWID
+        ''')
+        
         # Cria a tabela de auditoria
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS auditoria (
@@ -80,10 +154,46 @@ def init_db():
                 descricao TEXT,
                 dados TEXT,
                 usuario TEXT DEFAULT 'sistema',
-                data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                hash TEXT
+            )
+        ''')
+        
+        # Hash encadeado ao evento anterior (ver cadeia_auditoria)
+        _garantir_colunas(cursor, 'auditoria', [('hash', 'TEXT')])
+        
+        # Último evento removido pela retenção, onde a cadeia de hashes continua
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS auditoria_ancora (
+                chave INTEGER PRIMARY KEY CHECK (chave = 1),
+                id INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            )
+        ''')
+        
+        # Contadores por minuto das ações agregadas pela política de auditoria
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS auditoria_contadores (
+                acao TEXT NOT NULL,
+                minuto TIMESTAMP NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (acao, minuto)
             )
         ''')
         
+        # Totais diários por ação dos eventos e contadores já consolidados pela retenção
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS auditoria_diaria (
+                acao TEXT NOT NULL,
+                dia DATE NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (acao, dia)
+            ) WITHOUT ROWID
+        ''')
+        # Índice de cobertura: os totais por período e ação são contados sem ler as linhas
+        cursor.execute('DROP INDEX IF EXISTS idx_auditoria_data_hora')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_auditoria_data_hora_acao ON auditoria (data_hora, acao)')
+        
         # Cria a tabela de status_fontes
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS status_fontes (
@@ -96,6 +206,215 @@ def init_db():
             )
         ''')
         
+        # Bancos anteriores tinham a URL única na tabela inteira: a segunda fonte
+        # com a mesma URL nunca a rastreava. A tabela é recriada com a chave por fonte
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'fronteira'")
+        definicao_fronteira = cursor.fetchone()
+        migrar_fronteira = bool(definicao_fronteira) and 'url TEXT NOT NULL UNIQUE' in definicao_fronteira[0]
+        if migrar_fronteira:
+            cursor.execute('ALTER TABLE fronteira RENAME TO fronteira_antiga')
+        
+        # Fronteira de rastreamento das fontes do tipo 'lista'
+        # (a unicidade da URL canônica por fonte funciona como conjunto de visitados)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fronteira (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                host TEXT NOT NULL,
+                fonte_id INTEGER,
+                profundidade INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                titulo TEXT,
+                descricao TEXT,
+                data_descoberta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_visita TIMESTAMP,
+                UNIQUE (fonte_id, url),
+                FOREIGN KEY (fonte_id) REFERENCES fontes (id)
+            )
+        ''')
+        if migrar_fronteira:
+            colunas_fronteira = (
+                'id, url, host, fonte_id, profundidade, status, tentativas, '
+                'titulo, descricao, data_descoberta, data_visita'
+            )
+            cursor.execute(f'INSERT INTO fronteira ({colunas_fronteira}) SELECT {colunas_fronteira} FROM fronteira_antiga')
+            cursor.execute('DROP TABLE fronteira_antiga')
+            logger.info("Tabela 'fronteira' migrada para URLs únicas por fonte")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fronteira_fonte_status ON fronteira (fonte_id, status, profundidade)')
+        
+        # Índice de hosts e URLs conhecidos (independente do termo buscado)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                onion INTEGER NOT NULL DEFAULT 0,
+                primeiro_visto TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ultimo_visto TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ultimo_status TEXT,
+                data_ultimo_status TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS urls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                host TEXT NOT NULL,
+                primeiro_visto TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ultimo_visto TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ultima_verificacao TIMESTAMP,
+                ultimo_status TEXT,
+                hash_conteudo TEXT,
+                data_alteracao TIMESTAMP,
+                etag TEXT,
+                last_modified TEXT,
+                falhas_consecutivas INTEGER NOT NULL DEFAULT 0,
+                intervalo_verificacao INTEGER NOT NULL DEFAULT 0,
+                proxima_verificacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (host) REFERENCES hosts (host)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_proxima_verificacao ON urls (proxima_verificacao)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_host ON urls (host)')
+        
+        # Tarefas de busca executadas em segundo plano e seus resultados parciais
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tarefas (
+                id TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                termo TEXT,
+                termo_normalizado TEXT,
+                chave TEXT,
+                opcoes TEXT,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                fontes_concluidas INTEGER NOT NULL DEFAULT 0,
+                total_fontes INTEGER,
+                total_resultados INTEGER NOT NULL DEFAULT 0,
+                erro TEXT,
+                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_inicio TIMESTAMP,
+                data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_fim TIMESTAMP
+            )
+        ''')
+        _garantir_colunas(cursor, 'tarefas', [('termo_normalizado', 'TEXT'), ('chave', 'TEXT'), ('opcoes', 'TEXT'), ('processo', 'TEXT')])
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tarefas_status ON tarefas (status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tarefas_chave ON tarefas (chave, status, data_fim)')
+        
+        # Single-flight: no máximo uma tarefa ativa por chave de busca (termo normalizado + opções)
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_tarefas_chave_ativa ON tarefas (chave)
+            WHERE status IN ('pendente', 'executando')
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tarefas_resultados (
+                tarefa_id TEXT NOT NULL,
+                ordem INTEGER NOT NULL,
+                dados TEXT NOT NULL,
+                PRIMARY KEY (tarefa_id, ordem),
+                FOREIGN KEY (tarefa_id) REFERENCES tarefas (id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Lotes de buscas enviados pela API (uma tarefa por termo)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS lotes (
+                id TEXT PRIMARY KEY,
+                total_termos INTEGER NOT NULL,
+                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS lotes_tarefas (
+                lote_id TEXT NOT NULL,
+                ordem INTEGER NOT NULL,
+                termo TEXT NOT NULL,
+                tarefa_id TEXT NOT NULL,
+                PRIMARY KEY (lote_id, ordem),
+                FOREIGN KEY (lote_id) REFERENCES lotes (id),
+                FOREIGN KEY (tarefa_id) REFERENCES tarefas (id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Fila da coleta paralela: uma linha por termo x fonte de cada lote (ver coleta_paralela.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fila_coleta (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                lote TEXT NOT NULL,
+                termo TEXT NOT NULL,
+                fonte_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                resultados INTEGER,
+                erro TEXT,
+                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_inicio TIMESTAMP,
+                data_fim TIMESTAMP,
+                FOREIGN KEY (fonte_id) REFERENCES fontes (id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fila_coleta_lote ON fila_coleta (lote, status)')
+        
+        # Saída de eventos (outbox): gravada na mesma transação que valida a coleta e
+        # lida pelos consumidores a partir do último id confirmado (ver saida_eventos.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS saida_eventos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                coleta_id INTEGER,
+                dados TEXT NOT NULL,
+                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS saida_consumidores (
+                nome TEXT PRIMARY KEY,
+                ultimo_id INTEGER NOT NULL DEFAULT 0,
+                data_confirmacao TIMESTAMP
+            )
+        ''')
+        
+        # Versão dos dados exibidos nos painéis; incrementada pelas escritas em coletas e fontes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS versao_dados (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                versao INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO versao_dados (id, versao) VALUES (1, 0)')
+        
+        # Execuções perfiladas das buscas e seus spans por etapa (ver perfilamento.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS execucoes (
+                id TEXT PRIMARY KEY,
+                nome TEXT NOT NULL,
+                detalhes TEXT,
+                status TEXT NOT NULL,
+                duracao_ms REAL,
+                total_spans INTEGER NOT NULL DEFAULT 0,
+                spans_descartados INTEGER NOT NULL DEFAULT 0,
+                perfil TEXT,
+                data_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_execucoes_data ON execucoes (data_inicio)')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS spans (
+                execucao_id TEXT NOT NULL,
+                ordem INTEGER NOT NULL,
+                pai INTEGER,
+                nome TEXT NOT NULL,
+                inicio_ms REAL NOT NULL,
+                duracao_ms REAL,
+                atributos TEXT,
+                PRIMARY KEY (execucao_id, ordem),
+                FOREIGN KEY (execucao_id) REFERENCES execucoes (id)
+            ) WITHOUT ROWID
+        ''')
+        
         # Verifica se já existem fontes cadastradas
         cursor.execute('SELECT COUNT(*) FROM fontes')
         count = cursor.fetchone()[0]
@@ -115,6 +434,7 @@ def init_db():
                 'INSERT INTO fontes (nome, url, tipo, ativo, ultimo_check, status) VALUES (?, ?, ?, ?, ?, ?)',
                 fontes_padrao
             )
+            _incrementar_versao_dados(cursor)
             
             logger.info(f"Cadastradas {len(fontes_padrao)} fontes padrão.")
         
@@ -129,6 +449,86 @@ def init_db():
     finally:
         conn.close()
 
+def _incrementar_versao_dados(cursor):
+    """
+    Incrementa a versão dos dados na transação corrente, invalidando os
+    painéis em cache (ver cache_versionado).
+    
+    Args:
+        cursor (sqlite3.Cursor): Cursor da transação que alterou coletas ou fontes
+        
+    Returns:
+        int: Nova versão dos dados
+    """
+    cursor.execute('UPDATE versao_dados SET versao = versao + 1 WHERE id = 1')
+    return cursor.execute('SELECT versao FROM versao_dados WHERE id = 1').fetchone()[0]
+
+def _registrar_saida_validacao(cursor, coleta_ids):
+    """
+    Grava na saída de eventos um evento 'coleta_validada' por coleta, na
+    transação corrente (o evento existe se e somente se a validação foi gravada).
+    
+    Args:
+        cursor (sqlite3.Cursor): Cursor da transação que validou as coletas
+        coleta_ids (list): IDs das coletas que passaram a validado = 1
+    """
+    if not coleta_ids:
+        return
+    
+    cursor.execute(
+        f'''
+        SELECT c.id, c.termo_busca, c.link_encontrado, c.titulo, c.fonte_id, f.nome AS fonte_nome,
+               c.score_validacao, c.metodo_validacao, c.data_coleta, c.data_validacao, c.coleta_canonica_id
+        FROM coletas c
+        LEFT JOIN fontes f ON c.fonte_id = f.id
+        WHERE c.id IN ({', '.join('?' * len(coleta_ids))})
+        ''',
+        list(coleta_ids)
+    )
+    cursor.executemany(
+        'INSERT INTO saida_eventos (tipo, coleta_id, dados) VALUES (?, ?, ?)',
+        [('coleta_validada', coleta['id'], json.dumps(dict(coleta), ensure_ascii=False, default=str))
+         for coleta in cursor.fetchall()]
+    )
+
+def obter_versao_dados():
+    """
+    Obtém a versão atual dos dados exibidos nos painéis.
+    
+    Returns:
+        int: Versão dos dados (0 se a tabela ainda não existir)
+    """
+    conn = get_db_connection()
+    
+    try:
+        linha = conn.execute('SELECT versao FROM versao_dados WHERE id = 1').fetchone()
+        return linha[0] if linha else 0
+        
+    except sqlite3.OperationalError as e:
+        logger.error(f"Erro ao obter versão dos dados: {str(e)}")
+        return 0
+        
+    finally:
+        conn.close()
+
+def obter_versao_auditoria():
+    """
+    Obtém a versão dos eventos de auditoria (menor e maior id da tabela), que
+    muda a cada evento gravado e a cada exclusão da retenção.
+    
+    Returns:
+        str: Versão dos eventos ('0-0' se a tabela estiver vazia)
+    """
+    conn = get_db_connection()
+    
+    try:
+        menor, maior = conn.execute('SELECT MIN(id), MAX(id) FROM auditoria').fetchone()
+        return f"{menor or 0}-{maior or 0}"
+        
+    finally:
+        conn.close()
+
+@escrita
 def adicionar_fonte(nome, url, tipo, ativo=True):
     """
     Adiciona uma nova fonte de busca.
@@ -149,6 +549,7 @@ def adicionar_fonte(nome, url, tipo, ativo=True):
             'INSERT INTO fontes (nome, url, tipo, ativo, status) VALUES (?, ?, ?, ?, ?)',
             (nome, url, tipo, ativo, 'ativo')
         )
+        _incrementar_versao_dados(cursor)
         
         conn.commit()
         logger.info(f"Fonte '{nome}' adicionada com sucesso.")
@@ -207,26 +608,130 @@ def obter_fontes(apenas_ativas=True):
     finally:
         conn.close()
 
-def registrar_coleta(termo_busca, link_encontrado, titulo, descricao, fonte_id):
+@escrita
+def registrar_status_fonte(fonte_id, status, detalhes):
+    """
+    Grava o resultado de uma verificação de fonte (status atual e histórico).
+    
+    Args:
+        fonte_id (int): ID da fonte
+        status (str): Status da fonte (ativo, inativo, erro)
+        detalhes (str): Detalhes da verificação
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # Atualiza o status e a data de verificação
+        cursor.execute(
+            'UPDATE fontes SET status = ?, ultimo_check = CURRENT_TIMESTAMP WHERE id = ?',
+            (status, fonte_id)
+        )
+        # O status da fonte aparece nas respostas em cache (ETag), que precisam ser invalidadas
+        _incrementar_versao_dados(cursor)
+        
+        # Registra o status na tabela status_fontes
+        cursor.execute(
+            'INSERT INTO status_fontes (fonte_id, status, detalhes) VALUES (?, ?, ?)',
+            (fonte_id, status, detalhes)
+        )
+        
+        conn.commit()
+        
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Erro ao atualizar status da fonte: {str(e)}")
+        
+    finally:
+        conn.close()
+
+def _buscar_coleta_canonica(cursor, termo_busca, impressao):
+    """
+    Procura uma coleta canônica com conteúdo idêntico ou quase idêntico.
+    
+    Args:
+        cursor (sqlite3.Cursor): Cursor do banco de dados
+        termo_busca (str): Termo buscado
+        impressao (dict): Impressão digital do conteúdo (ver impressao_conteudo.calcular_impressao)
+        
+    Returns:
+        tuple: (linha da coleta canônica ou None, se o conteúdo é idêntico)
+    """
+    # Conteúdo idêntico
+    cursor.execute(
+        '''
+        SELECT * FROM coletas
+        WHERE hash_conteudo = ? AND termo_busca = ? AND coleta_canonica_id IS NULL
+        ORDER BY id LIMIT 1
+        ''',
+        (impressao['hash_conteudo'], termo_busca)
+    )
+    canonica = cursor.fetchone()
+    
+    if canonica:
+        return canonica, True
+    
+    # Conteúdo quase idêntico: candidatos que compartilham ao menos uma banda do SimHash
+    simhash = texto_para_simhash(impressao['simhash'])
+    candidatos_vistos = set()
+    
+    for banda, valor in impressao['bandas']:
+        cursor.execute(
+            '''
+            SELECT c.* FROM coletas_simhash s
+            JOIN coletas c ON c.id = s.coleta_id
+            WHERE s.banda = ? AND s.valor = ? AND c.termo_busca = ?
+            ''',
+            (banda, valor, termo_busca)
+        )
+        
+        for candidato in cursor.fetchall():
+            if candidato['id'] in candidatos_vistos:
+                continue
+            candidatos_vistos.add(candidato['id'])
+            
+            if distancia_hamming(simhash, texto_para_simhash(candidato['simhash_conteudo'])) <= LIMIAR_HAMMING:
+                return candidato, False
+    
+    return None, False
+
+@instrumentar('registrar_coleta')
+@cronometrar(DURACAO_ESCRITA_DB, operacao='registrar_coleta')
+@escrita
+def registrar_coleta(termo_busca, link_encontrado, titulo, descricao, fonte_id, conteudo=None):
     """
     Registra uma coleta no banco de dados.
     
+    Quando o conteúdo da página é informado, a coleta recebe uma impressão digital
+    (SHA-256 e SimHash) e é ligada à coleta canônica do mesmo termo com conteúdo
+    idêntico ou quase idêntico (espelhos em outros hosts). Coletas com conteúdo
+    idêntico herdam a validação da canônica, inclusive em outro host, desde que
+    a parte da pontuação que depende do link seja a mesma (ver _mesma_pontuacao_link).
+    
     Args:
         termo_busca (str): Termo buscado
         link_encontrado (str): Link encontrado
         titulo (str): Título do resultado
         descricao (str): Descrição do resultado
         fonte_id (int): ID da fonte
+        conteudo (str, optional): Texto da página para impressão digital. Defaults to None.
         
     Returns:
         int: ID da coleta registrada
     """
+    # Deduplica pela forma canônica do link
+    link_encontrado = canonicalizar_url(link_encontrado) or link_encontrado
+    
     logger.info(f"Registrando coleta: {termo_busca} -> {link_encontrado}")
     
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        # Mantém o índice de URLs conhecidas (primeira e última vez vista), na
+        # mesma transação da coleta
+        _indexar_url(cursor, link_encontrado)
+        
         # Verifica se o link já existe para o mesmo termo
         cursor.execute(
             'SELECT id FROM coletas WHERE termo_busca = ? AND link_encontrado = ?',
@@ -237,6 +742,7 @@ def registrar_coleta(termo_busca, link_encontrado, titulo, descricao, fonte_id):
         
         if existente:
             logger.info(f"Link já registrado para este termo (ID: {existente['id']})")
+            conn.commit()
             
             # Registra a ação no log de auditoria
             registrar_auditoria(
@@ -247,16 +753,71 @@ def registrar_coleta(termo_busca, link_encontrado, titulo, descricao, fonte_id):
             
             return existente['id']
         
-        # Insere a nova coleta
-        cursor.execute(
-            'INSERT INTO coletas (termo_busca, link_encontrado, titulo, descricao, fonte_id) VALUES (?, ?, ?, ?, ?)',
-            (termo_busca, link_encontrado, titulo, descricao, fonte_id)
+        impressao = calcular_impressao(conteudo) if conteudo else None
+        canonica, identica = (None, False)
+        
+        if impressao:
+            canonica, identica = _buscar_coleta_canonica(cursor, termo_busca, impressao)
+        
+        versao = _incrementar_versao_dados(cursor)
+        
+        herda_validacao = (
+            canonica is not None and identica
+            and _mesma_pontuacao_link(canonica['link_encontrado'], link_encontrado)
         )
         
+        if herda_validacao:
+            # Conteúdo idêntico: reaproveita a validação da coleta canônica
+            cursor.execute(
+                '''
+                INSERT INTO coletas (
+                    termo_busca, link_encontrado, titulo, descricao, fonte_id,
+                    validado, score_validacao, metodo_validacao, observacoes_validacao, data_validacao,
+                    hash_conteudo, simhash_conteudo, coleta_canonica_id, versao
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (termo_busca, link_encontrado, titulo, descricao, fonte_id,
+                 canonica['validado'], canonica['score_validacao'], canonica['metodo_validacao'],
+                 canonica['observacoes_validacao'], canonica['data_validacao'],
+                 impressao['hash_conteudo'], impressao['simhash'], canonica['id'], versao)
+            )
+            if canonica['validado']:
+                _registrar_saida_validacao(cursor, [cursor.lastrowid])
+        else:
+            # Insere a nova coleta
+            cursor.execute(
+                '''
+                INSERT INTO coletas (
+                    termo_busca, link_encontrado, titulo, descricao, fonte_id,
+                    hash_conteudo, simhash_conteudo, coleta_canonica_id, versao
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (termo_busca, link_encontrado, titulo, descricao, fonte_id,
+                 impressao['hash_conteudo'] if impressao else None,
+                 impressao['simhash'] if impressao else None,
+                 (canonica['coleta_canonica_id'] or canonica['id']) if canonica else None,
+                 versao)
+            )
+        
         coleta_id = cursor.lastrowid
-        conn.commit()
         
-        logger.info(f"Coleta registrada com sucesso (ID: {coleta_id})")
+        # Apenas coletas canônicas entram no índice de quase-duplicatas
+        if impressao and not canonica:
+            cursor.executemany(
+                'INSERT OR IGNORE INTO coletas_simhash (coleta_id, banda, valor) VALUES (?, ?, ?)',
+                [(coleta_id, banda, valor) for banda, valor in impressao['bandas']]
+            )
+        
+        with medir(DURACAO_COMMIT_DB, operacao='registrar_coleta'):
+            conn.commit()
+        
+        if canonica:
+            logger.info(
+                f"Coleta registrada com sucesso (ID: {coleta_id}), "
+                f"{'idêntica' if identica else 'quase idêntica'} à coleta ID {canonica['id']}"
+            )
+        else:
+            logger.info(f"Coleta registrada com sucesso (ID: {coleta_id})")
         
         # Registra a ação no log de auditoria
         registrar_auditoria(
@@ -275,6 +836,55 @@ def registrar_coleta(termo_busca, link_encontrado, titulo, descricao, fonte_id):
     finally:
         conn.close()
 
+def _mesma_pontuacao_link(link_canonica, link):
+    # O único termo da validação (coletor.validar_vazamento) que depende do link é
+    # ser .onion: espelhos idênticos com o mesmo resultado nele recebem o mesmo score
+    return ('.onion' in (link_canonica or '')) == ('.onion' in (link or ''))
+
+@instrumentar('obter_duplicata_exata')
+def obter_duplicata_exata(coleta_id):
+    """
+    Verifica se uma coleta tem conteúdo idêntico ao de uma coleta canônica com
+    a mesma pontuação de link (ver _mesma_pontuacao_link).
+    
+    Coletas nessa situação já herdaram a validação da canônica em
+    registrar_coleta e não precisam ser validadas novamente.
+    
+    Args:
+        coleta_id (int): ID da coleta
+        
+    Returns:
+        dict: Coleta (com a validação herdada) ou None se não for duplicata exata
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            '''
+            SELECT c.*, k.link_encontrado AS link_canonica FROM coletas c
+            JOIN coletas k ON k.id = c.coleta_canonica_id
+            WHERE c.id = ? AND c.hash_conteudo = k.hash_conteudo
+            ''',
+            (coleta_id,)
+        )
+        coleta = cursor.fetchone()
+        
+        if not coleta or not _mesma_pontuacao_link(coleta['link_canonica'], coleta['link_encontrado']):
+            return None
+        
+        return dict(coleta)
+        
+    except Exception as e:
+        logger.error(f"Erro ao verificar duplicata da coleta {coleta_id}: {str(e)}")
+        return None
+    
+    finally:
+        conn.close()
+
+@instrumentar('registrar_validacao')
+@cronometrar(DURACAO_ESCRITA_DB, operacao='registrar_validacao')
+@escrita
 def registrar_validacao(coleta_id, validado, score_validacao, metodo_validacao, observacoes):
     """
     Registra a validação de um vazamento.
@@ -292,6 +902,22 @@ def registrar_validacao(coleta_id, validado, score_validacao, metodo_validacao,
     cursor = conn.cursor()
     
     try:
+        versao = _incrementar_versao_dados(cursor)
+        
+        # Coletas (a validada e seus espelhos idênticos) que passam a validado = 1
+        validadas = []
+        if validado:
+            cursor.execute(
+                '''
+                SELECT id FROM coletas
+                WHERE (id = ? OR (coleta_canonica_id = ?
+                                  AND hash_conteudo = (SELECT hash_conteudo FROM coletas WHERE id = ?)))
+                  AND COALESCE(validado, 0) = 0
+                ''',
+                (coleta_id, coleta_id, coleta_id)
+            )
+            validadas = [linha['id'] for linha in cursor.fetchall()]
+        
         cursor.execute(
             '''
             UPDATE coletas 
@@ -299,15 +925,41 @@ def registrar_validacao(coleta_id, validado, score_validacao, metodo_validacao,
                 score_validacao = ?, 
                 metodo_validacao = ?, 
                 observacoes_validacao = ?,
-                data_validacao = CURRENT_TIMESTAMP
+                data_validacao = CURRENT_TIMESTAMP,
+                versao = ?
             WHERE id = ?
             ''',
-            (validado, score_validacao, metodo_validacao, observacoes, coleta_id)
+            (validado, score_validacao, metodo_validacao, observacoes, versao, coleta_id)
         )
         
-        conn.commit()
+        # Propaga a validação para os espelhos com conteúdo idêntico
+        cursor.execute(
+            '''
+            UPDATE coletas
+            SET validado = ?,
+                score_validacao = ?,
+                metodo_validacao = ?,
+                observacoes_validacao = ?,
+                data_validacao = CURRENT_TIMESTAMP,
+                versao = ?
+            WHERE coleta_canonica_id = ?
+              AND hash_conteudo = (SELECT hash_conteudo FROM coletas WHERE id = ?)
+            ''',
+            (validado, score_validacao, metodo_validacao, observacoes, versao, coleta_id, coleta_id)
+        )
+        _registrar_saida_validacao(cursor, validadas)
+        
+        with medir(DURACAO_COMMIT_DB, operacao='registrar_validacao'):
+            conn.commit()
         logger.info(f"Validação registrada com sucesso para coleta ID {coleta_id}")
         
+        publicar_evento('validacao', {
+            'coleta_id': coleta_id,
+            'validado': validado,
+            'score_validacao': score_validacao,
+            'metodo_validacao': metodo_validacao
+        })
+        
         # Registra a ação no log de auditoria
         registrar_auditoria(
             acao="registrar_validacao",
@@ -395,29 +1047,157 @@ def obter_coletas(termo=None, data_inicio=None, data_fim=None, apenas_validados=
     finally:
         conn.close()
 
-def obter_estatisticas_validacao():
+def formatar_cursor_coleta(versao, coleta_id):
     """
-    Obtém estatísticas de validação.
+    Monta o cursor incremental de uma coleta ('<versao>-<id>').
     
+    Args:
+        versao (int): Versão dos dados da última inclusão ou validação da coleta
+        coleta_id (int): ID da coleta
+        
     Returns:
-        dict: Dicionário com estatísticas
+        str: Cursor
     """
-    logger.info("Obtendo estatísticas de validação")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    return f"{versao}-{coleta_id}"
+
+def ler_cursor_coleta(cursor):
+    """
+    Interpreta um cursor gerado por formatar_cursor_coleta().
     
-    try:
-        # Total de validados
-        cursor.execute('SELECT COUNT(*) FROM coletas WHERE validado = 1')
-        validados = cursor.fetchone()[0]
+    Args:
+        cursor (str): Cursor recebido do cliente
         
-        # Total de não validados
-        cursor.execute('SELECT COUNT(*) FROM coletas WHERE validado = 0')
-        nao_validados = cursor.fetchone()[0]
+    Returns:
+        tuple: (versao, id)
         
-        # Score médio
-        cursor.execute('SELECT AVG(score_validacao) FROM coletas WHERE validado = 1')
+    Raises:
+        ValueError: Se o cursor for inválido
+    """
+    try:
+        versao, coleta_id = (int(parte) for parte in str(cursor).split('-'))
+    except ValueError:
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return versao, coleta_id
+
+def iterar_coletas(termo=None, data_inicio=None, data_fim=None, apenas_validados=None, fonte=None,
+                   desde=None, limite=None, tamanho_lote=1000):
+    """
+    Percorre as coletas em lotes, em ordem de alteração (versão dos dados e id).
+    
+    Cada coleta aparece na posição da sua última inclusão ou validação; a partir
+    do cursor de uma coleta (campo 'cursor'), as próximas consultas retornam só
+    o que foi incluído ou validado depois dela. Cada lote é uma consulta curta
+    por chave (sem cursor aberto entre lotes), então o banco não fica bloqueado
+    enquanto o cliente lê e a memória usada é a de um lote.
+    
+    Args:
+        termo (str, optional): Termo para filtrar. Defaults to None.
+        data_inicio (str, optional): Data de início da coleta (formato YYYY-MM-DD). Defaults to None.
+        data_fim (str, optional): Data de fim da coleta (formato YYYY-MM-DD). Defaults to None.
+        apenas_validados (bool, optional): Filtra pela validação. Defaults to None.
+        fonte (int | str, optional): ID ou nome da fonte. Defaults to None.
+        desde (tuple, optional): (versao, id) de ler_cursor_coleta(). Defaults to None.
+        limite (int, optional): Máximo de coletas. Defaults to None (todas).
+        tamanho_lote (int, optional): Coletas por consulta. Defaults to 1000.
+        
+    Yields:
+        list: Lote de coletas (dicionários com o campo 'cursor')
+    """
+    query = '''
+        SELECT c.id, c.data_coleta, c.termo_busca, c.link_encontrado, c.titulo, c.descricao,
+               c.fonte_id, f.nome AS fonte_nome, c.validado, c.score_validacao, c.metodo_validacao,
+               c.observacoes_validacao, c.data_validacao, c.hash_conteudo, c.coleta_canonica_id, c.versao
+        FROM coletas c
+        LEFT JOIN fontes f ON c.fonte_id = f.id
+        WHERE 1=1
+    '''
+    params = []
+    
+    if termo:
+        query += ' AND c.termo_busca LIKE ?'
+        params.append(f'%{termo}%')
+    
+    if data_inicio:
+        query += ' AND c.data_coleta >= ?'
+        params.append(data_inicio)
+    
+    if data_fim:
+        # Inclui o dia final inteiro
+        query += ' AND c.data_coleta < DATE(?, \'+1 day\')'
+        params.append(data_fim)
+    
+    if apenas_validados is not None:
+        query += ' AND c.validado = ?'
+        params.append(1 if apenas_validados else 0)
+    
+    if fonte is not None and str(fonte).isdigit():
+        query += ' AND c.fonte_id = ?'
+        params.append(int(fonte))
+    elif fonte:
+        query += ' AND f.nome = ? COLLATE NOCASE'
+        params.append(fonte)
+    
+    # A comparação (versao, id) > (?, ?) só usa o índice pela versão; separada em
+    # duas consultas, cada lote começa direto na posição do cursor
+    query_mesma_versao = query + ' AND c.versao = ? AND c.id > ? ORDER BY c.id LIMIT ?'
+    query_versoes_seguintes = query + ' AND c.versao > ? ORDER BY c.versao, c.id LIMIT ?'
+    
+    versao, ultimo_id = desde or (-1, 0)
+    restantes = limite
+    
+    conn = get_db_connection()
+    
+    try:
+        while restantes is None or restantes > 0:
+            tamanho = tamanho_lote if restantes is None else min(tamanho_lote, restantes)
+            linhas = conn.execute(query_mesma_versao, params + [versao, ultimo_id, tamanho]).fetchall()
+            if len(linhas) < tamanho:
+                linhas += conn.execute(query_versoes_seguintes, params + [versao, tamanho - len(linhas)]).fetchall()
+            if not linhas:
+                break
+            
+            lote = []
+            for linha in linhas:
+                coleta = dict(linha)
+                coleta['validado'] = bool(coleta['validado'])
+                coleta['cursor'] = formatar_cursor_coleta(coleta.pop('versao'), coleta['id'])
+                lote.append(coleta)
+            
+            versao, ultimo_id = linhas[-1]['versao'], linhas[-1]['id']
+            if restantes is not None:
+                restantes -= len(linhas)
+            
+            yield lote
+            
+            if len(linhas) < tamanho:
+                break
+        
+    finally:
+        conn.close()
+
+def obter_estatisticas_validacao():
+    """
+    Obtém estatísticas de validação.
+    
+    Returns:
+        dict: Dicionário com estatísticas
+    """
+    logger.info("Obtendo estatísticas de validação")
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # Total de validados
+        cursor.execute('SELECT COUNT(*) FROM coletas WHERE validado = 1')
+        validados = cursor.fetchone()[0]
+        
+        # Total de não validados
+        cursor.execute('SELECT COUNT(*) FROM coletas WHERE validado = 0')
+        nao_validados = cursor.fetchone()[0]
+        
+        # Score médio
+        cursor.execute('SELECT AVG(score_validacao) FROM coletas WHERE validado = 1')
         score_medio = cursor.fetchone()[0]
         score_medio = round(score_medio) if score_medio else 0
         
@@ -459,6 +1239,346 @@ def obter_estatisticas_validacao():
     finally:
         conn.close()
 
+def _indexar_url(cursor, url):
+    """
+    Insere a URL (e o seu host) no índice ou atualiza a data em que foi vista.
+    
+    Args:
+        cursor (sqlite3.Cursor): Cursor do banco de dados
+        url (str): URL canônica
+    """
+    host = extrair_host(url)
+    if not host:
+        return
+    
+    cursor.execute(
+        '''
+        INSERT INTO hosts (host, onion) VALUES (?, ?)
+        ON CONFLICT(host) DO UPDATE SET ultimo_visto = CURRENT_TIMESTAMP
+        ''',
+        (host, 1 if host.endswith('.onion') else 0)
+    )
+    cursor.execute(
+        '''
+        INSERT INTO urls (url, host) VALUES (?, ?)
+        ON CONFLICT(url) DO UPDATE SET ultimo_visto = CURRENT_TIMESTAMP
+        ''',
+        (url, host)
+    )
+
+@escrita
+def indexar_urls(urls):
+    """
+    Registra no índice URLs descobertas (novas URLs ficam prontas para verificação).
+    
+    Args:
+        urls (list): URLs encontradas
+        
+    Returns:
+        int: Quantidade de URLs indexadas
+    """
+    canonicas = {canonicalizar_url(url) for url in urls}
+    canonicas.discard(None)
+    
+    if not canonicas:
+        return 0
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        for url in canonicas:
+            _indexar_url(cursor, url)
+        
+        conn.commit()
+        return len(canonicas)
+        
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Erro ao indexar URLs: {str(e)}")
+        return 0
+    
+    finally:
+        conn.close()
+
+@escrita
+def registrar_verificacao_url(url, status, hash_conteudo=None, etag=None, last_modified=None):
+    """
+    Registra o resultado de uma busca de URL no índice e agenda a próxima verificação.
+    
+    O intervalo até a próxima verificação é adaptativo: volta ao mínimo quando o
+    conteúdo muda e dobra (até o máximo) quando a página não mudou ou está fora do ar.
+    A primeira verificação com conteúdo de uma URL a classifica como nova, não
+    como alterada.
+    
+    Args:
+        url (str): URL verificada
+        status (str): 'alterado', 'inalterado' ou código/descrição do erro
+        hash_conteudo (str, optional): Hash do conteúdo obtido. Defaults to None.
+        etag (str, optional): Cabeçalho ETag da resposta. Defaults to None.
+        last_modified (str, optional): Cabeçalho Last-Modified da resposta. Defaults to None.
+        
+    Returns:
+        dict: {'alterado': bool, 'novo': bool, 'intervalo': int} ou None em caso de erro
+    """
+    url = canonicalizar_url(url) or url
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        _indexar_url(cursor, url)
+        
+        cursor.execute(
+            'SELECT hash_conteudo, intervalo_verificacao, falhas_consecutivas FROM urls WHERE url = ?',
+            (url,)
+        )
+        atual = cursor.fetchone()
+        
+        sucesso = status in ('alterado', 'inalterado')
+        novo = sucesso and atual['hash_conteudo'] is None and hash_conteudo is not None
+        alterado = (
+            sucesso and not novo and hash_conteudo is not None
+            and hash_conteudo != atual['hash_conteudo']
+        )
+        
+        if alterado or novo:
+            intervalo = INTERVALO_VERIFICACAO_MINIMO
+        else:
+            intervalo = min(
+                max(atual['intervalo_verificacao'] * 2, INTERVALO_VERIFICACAO_MINIMO),
+                INTERVALO_VERIFICACAO_MAXIMO
+            )
+        
+        if novo:
+            status_registrado = 'novo'
+        elif sucesso:
+            status_registrado = 'alterado' if alterado else 'inalterado'
+        else:
+            status_registrado = status
+        
+        cursor.execute(
+            '''
+            UPDATE urls SET
+                ultima_verificacao = CURRENT_TIMESTAMP,
+                ultimo_status = ?,
+                hash_conteudo = COALESCE(?, hash_conteudo),
+                data_alteracao = CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE data_alteracao END,
+                etag = CASE WHEN ? THEN ? ELSE etag END,
+                last_modified = CASE WHEN ? THEN ? ELSE last_modified END,
+                falhas_consecutivas = CASE WHEN ? THEN 0 ELSE falhas_consecutivas + 1 END,
+                intervalo_verificacao = ?,
+                proxima_verificacao = datetime('now', ?)
+            WHERE url = ?
+            ''',
+            (status_registrado, hash_conteudo, alterado,
+             sucesso, etag, sucesso, last_modified,
+             sucesso, intervalo, f'+{intervalo} seconds', url)
+        )
+        
+        cursor.execute(
+            '''
+            UPDATE hosts SET ultimo_status = ?, data_ultimo_status = CURRENT_TIMESTAMP
+            WHERE host = ?
+            ''',
+            ('online' if sucesso else 'offline', extrair_host(url))
+        )
+        
+        conn.commit()
+        
+        return {'alterado': alterado, 'novo': novo, 'intervalo': intervalo}
+        
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Erro ao registrar verificação de {url}: {str(e)}")
+        return None
+    
+    finally:
+        conn.close()
+
+def obter_urls_para_verificar(limite=100, apenas_onion=False):
+    """
+    Obtém as URLs do índice cuja próxima verificação já venceu.
+    
+    Args:
+        limite (int, optional): Quantidade máxima de URLs. Defaults to 100.
+        apenas_onion (bool, optional): Considera apenas hosts .onion. Defaults to False.
+        
+    Returns:
+        list: Lista de dicionários com url, host, etag, last_modified e hash_conteudo
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        query = '''
+            SELECT u.url, u.host, u.etag, u.last_modified, u.hash_conteudo
+            FROM urls u
+            JOIN hosts h ON h.host = u.host
+            WHERE u.proxima_verificacao <= CURRENT_TIMESTAMP
+        '''
+        if apenas_onion:
+            query += ' AND h.onion = 1'
+        query += ' ORDER BY u.proxima_verificacao LIMIT ?'
+        
+        cursor.execute(query, (limite,))
+        return [dict(row) for row in cursor.fetchall()]
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter URLs para verificar: {str(e)}")
+        return []
+    
+    finally:
+        conn.close()
+
+def obter_estatisticas_indice():
+    """
+    Obtém estatísticas do índice de hosts e URLs.
+    
+    Returns:
+        dict: Dicionário com estatísticas
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            SELECT COUNT(*) AS hosts,
+                   COALESCE(SUM(onion), 0) AS hosts_onion,
+                   COALESCE(SUM(CASE WHEN ultimo_status = 'online' THEN 1 ELSE 0 END), 0) AS hosts_online
+            FROM hosts
+        ''')
+        hosts = dict(cursor.fetchone())
+        
+        cursor.execute('''
+            SELECT COUNT(*) AS urls,
+                   COALESCE(SUM(CASE WHEN proxima_verificacao <= CURRENT_TIMESTAMP THEN 1 ELSE 0 END), 0) AS urls_pendentes,
+                   COALESCE(SUM(CASE WHEN data_alteracao >= datetime('now', '-1 day') THEN 1 ELSE 0 END), 0) AS urls_alteradas_24h
+            FROM urls
+        ''')
+        hosts.update(dict(cursor.fetchone()))
+        
+        return hosts
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter estatísticas do índice: {str(e)}")
+        return {'hosts': 0, 'hosts_onion': 0, 'hosts_online': 0, 'urls': 0, 'urls_pendentes': 0, 'urls_alteradas_24h': 0}
+    
+    finally:
+        conn.close()
+
+@escrita
+def registrar_execucao_perfilada(execucao):
+    """
+    Grava uma execução perfilada e seus spans, removendo as execuções mais
+    antigas além de MAX_EXECUCOES_PERFILADAS.
+    
+    Args:
+        execucao (perfilamento.Execucao): Execução concluída
+    """
+    conn = get_db_connection()
+    
+    try:
+        conn.execute(
+            '''
+            INSERT INTO execucoes (id, nome, detalhes, status, duracao_ms, total_spans, spans_descartados, perfil)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''',
+            (execucao.id, execucao.nome, execucao.detalhes, execucao.status, execucao.duracao_ms,
+             len(execucao.spans), execucao.descartados, execucao.perfil)
+        )
+        conn.executemany(
+            '''
+            INSERT INTO spans (execucao_id, ordem, pai, nome, inicio_ms, duracao_ms, atributos)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''',
+            [(execucao.id, s['ordem'], s['pai'], s['nome'], s['inicio_ms'], s['duracao_ms'], s['atributos'])
+             for s in execucao.spans]
+        )
+        
+        antigas = [linha[0] for linha in conn.execute(
+            'SELECT id FROM execucoes ORDER BY data_inicio DESC, rowid DESC LIMIT -1 OFFSET ?',
+            (MAX_EXECUCOES_PERFILADAS,)
+        )]
+        if antigas:
+            conn.executemany('DELETE FROM spans WHERE execucao_id = ?', [(i,) for i in antigas])
+            conn.executemany('DELETE FROM execucoes WHERE id = ?', [(i,) for i in antigas])
+        
+        conn.commit()
+        logger.info(f"Execução perfilada {execucao.id} gravada: {len(execucao.spans)} spans, {execucao.duracao_ms:.0f} ms")
+        
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Erro ao gravar execução perfilada: {str(e)}")
+        
+    finally:
+        conn.close()
+
+def obter_execucoes_perfiladas(limite=50):
+    """
+    Obtém as execuções perfiladas mais recentes (sem os spans).
+    
+    Args:
+        limite (int, optional): Quantidade máxima de execuções. Defaults to 50.
+        
+    Returns:
+        list: Lista de dicionários com as execuções
+    """
+    conn = get_db_connection()
+    
+    try:
+        cursor = conn.execute(
+            '''
+            SELECT id, nome, detalhes, status, duracao_ms, total_spans, spans_descartados,
+                   perfil IS NOT NULL AS tem_perfil, data_inicio
+            FROM execucoes
+            ORDER BY data_inicio DESC, rowid DESC
+            LIMIT ?
+            ''',
+            (limite,)
+        )
+        return [dict(linha) for linha in cursor.fetchall()]
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter execuções perfiladas: {str(e)}")
+        return []
+        
+    finally:
+        conn.close()
+
+def obter_execucao_perfilada(execucao_id):
+    """
+    Obtém uma execução perfilada com todos os seus spans.
+    
+    Args:
+        execucao_id (str): ID da execução
+        
+    Returns:
+        dict: Execução com a lista 'spans', ou None se não existir
+    """
+    conn = get_db_connection()
+    
+    try:
+        linha = conn.execute('SELECT * FROM execucoes WHERE id = ?', (execucao_id,)).fetchone()
+        if not linha:
+            return None
+        
+        execucao = dict(linha)
+        execucao['spans'] = [
+            dict(s) for s in conn.execute(
+                'SELECT ordem, pai, nome, inicio_ms, duracao_ms, atributos FROM spans WHERE execucao_id = ? ORDER BY ordem',
+                (execucao_id,)
+            )
+        ]
+        return execucao
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter execução perfilada: {str(e)}")
+        return None
+        
+    finally:
+        conn.close()
+
 def exportar_coletas_csv(filepath, termo=None, data_inicio=None, data_fim=None, apenas_validados=None):
     """
     Exporta coletas para um arquivo CSV.
@@ -511,15 +1631,46 @@ def exportar_coletas_csv(filepath, termo=None, data_inicio=None, data_fim=None,
         logger.error(f"Erro ao exportar coletas para CSV: {str(e)}")
         raise
 
+@instrumentar('registrar_auditoria', atributos=lambda acao, *args, **kwargs: {'acao': acao})
 def registrar_auditoria(acao, descricao, dados=None):
     """
     Registra uma ação no log de auditoria.
     
+    O modo de registro segue a política de auditoria da categoria da ação
+    (ver politica_auditoria): gravação imediata, em lote em segundo plano,
+    apenas contador por minuto ou descarte. O modo é decidido no processo que
+    registra; só a gravação imediata é encaminhada ao escritor.
+    
     Args:
         acao (str): Tipo de ação realizada
         descricao (str): Descrição da ação
         dados (str, optional): Dados adicionais. Defaults to None.
     """
+    modo = decidir_modo(acao)
+    
+    if modo == MODO_DESLIGADO:
+        return
+    
+    if modo == MODO_CONTADOR:
+        obter_buffer(_gravar_lote_auditoria).contar(acao)
+        return
+    
+    if modo != MODO_SINCRONO:
+        obter_buffer(_gravar_lote_auditoria).adicionar(acao, descricao, dados)
+        return
+    
+    _gravar_auditoria(acao, descricao, dados)
+
+@escrita
+def _gravar_auditoria(acao, descricao, dados):
+    """
+    Grava imediatamente um registro de auditoria (modo síncrono).
+    
+    Args:
+        acao (str): Tipo de ação realizada
+        descricao (str): Descrição da ação
+        dados (str): Dados adicionais
+    """
     logger.info(f"Registrando auditoria: {acao} - {descricao}")
     
     conn = get_db_connection()
@@ -537,18 +1688,18 @@ def registrar_auditoria(acao, descricao, dados=None):
                     descricao TEXT,
                     dados TEXT,
                     usuario TEXT DEFAULT 'sistema',
-                    data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    hash TEXT
                 )
             ''')
             logger.info("Tabela 'auditoria' criada.")
         
-        # Insere o registro de auditoria
-        cursor.execute(
-            'INSERT INTO auditoria (acao, descricao, dados) VALUES (?, ?, ?)',
-            (acao, descricao, dados)
-        )
+        # Insere o registro de auditoria encadeado ao anterior (data_hora em UTC, como CURRENT_TIMESTAMP)
+        data_hora = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        inserir_registros(conn, [(acao, descricao, dados, 'sistema', data_hora)])
         
-        conn.commit()
+        with medir(DURACAO_COMMIT_DB, operacao='registrar_auditoria'):
+            conn.commit()
         logger.info(f"Auditoria registrada com sucesso: {acao}")
         
     except Exception as e:
@@ -558,6 +1709,77 @@ def registrar_auditoria(acao, descricao, dados=None):
     finally:
         conn.close()
 
+@cronometrar(DURACAO_ESCRITA_DB, operacao='gravar_lote_auditoria')
+@escrita
+def _gravar_lote_auditoria(registros, contadores):
+    """
+    Grava um lote de registros e contadores de auditoria numa única transação.
+    
+    Os registros entram na cadeia de hashes da auditoria (ver cadeia_auditoria).
+    
+    Args:
+        registros (list): Tuplas (acao, descricao, dados, data_hora)
+        contadores (dict): {(acao, minuto): total}
+    """
+    conn = get_db_connection()
+    
+    try:
+        inserir_registros(conn, [(acao, descricao, dados, 'sistema', data_hora) for acao, descricao, dados, data_hora in registros])
+        conn.executemany(
+            '''
+            INSERT INTO auditoria_contadores (acao, minuto, total) VALUES (?, ?, ?)
+            ON CONFLICT (acao, minuto) DO UPDATE SET total = total + excluded.total
+            ''',
+            [(acao, minuto, total) for (acao, minuto), total in contadores.items()]
+        )
+        with medir(DURACAO_COMMIT_DB, operacao='gravar_lote_auditoria'):
+            conn.commit()
+        logger.debug(f"Lote de auditoria gravado: {len(registros)} registros, {len(contadores)} contadores")
+        
+    except Exception:
+        conn.rollback()
+        raise
+        
+    finally:
+        conn.close()
+
+def obter_contadores_auditoria(data_inicio=None):
+    """
+    Obtém o total de ocorrências que não estão mais (ou nunca estiveram) na
+    tabela auditoria: ações registradas apenas como contadores por minuto e
+    eventos já consolidados em totais diários pela retenção.
+    
+    Args:
+        data_inicio (str, optional): Considera apenas ocorrências a partir desta data. Defaults to None.
+        
+    Returns:
+        list: Lista de dicionários {'acao', 'quantidade'}
+    """
+    conn = get_db_connection()
+    
+    try:
+        filtro_minuto = ' WHERE minuto >= ?' if data_inicio else ''
+        filtro_dia = ' WHERE dia >= DATE(?)' if data_inicio else ''
+        params = [data_inicio, data_inicio] if data_inicio else []
+        
+        query = f'''
+            SELECT acao, SUM(total) AS quantidade FROM (
+                SELECT acao, total FROM auditoria_contadores{filtro_minuto}
+                UNION ALL
+                SELECT acao, total FROM auditoria_diaria{filtro_dia}
+            )
+            GROUP BY acao ORDER BY quantidade DESC
+        '''
+        
+        return [dict(linha) for linha in conn.execute(query, params).fetchall()]
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter contadores de auditoria: {str(e)}")
+        return []
+        
+    finally:
+        conn.close()
+
 def obter_registros_auditoria(data_inicio=None, data_fim=None, limite=100):
     """
     Obtém registros de auditoria com filtros.
@@ -609,6 +1831,74 @@ def obter_registros_auditoria(data_inicio=None, data_fim=None, limite=100):
     finally:
         conn.close()
 
+def iterar_auditoria(acoes=None, data_inicio=None, data_fim=None, desde=None, limite=None, tamanho_lote=1000):
+    """
+    Percorre os eventos de auditoria em lotes, em ordem de id.
+    
+    O id do último evento recebido serve de cursor: com desde=<id>, retorna só
+    os eventos gravados depois dele. Como em iterar_coletas(), cada lote é uma
+    consulta curta por chave.
+    
+    Args:
+        acoes (list, optional): Ações a incluir. Defaults to None (todas).
+        data_inicio (str, optional): Data de início (formato YYYY-MM-DD, UTC). Defaults to None.
+        data_fim (str, optional): Data de fim (formato YYYY-MM-DD, UTC). Defaults to None.
+        desde (int, optional): Id do último evento já recebido. Defaults to None.
+        limite (int, optional): Máximo de eventos. Defaults to None (todos).
+        tamanho_lote (int, optional): Eventos por consulta. Defaults to 1000.
+        
+    Yields:
+        list: Lote de eventos (dicionários)
+    """
+    # O prefixo "+" impede o uso do índice de data_hora: a ordem de id é que limita cada lote
+    query = 'SELECT id, data_hora, acao, descricao, dados, usuario, hash FROM auditoria WHERE id > ?'
+    params = []
+    
+    if acoes:
+        query += f" AND acao IN ({', '.join('?' * len(acoes))})"
+        params.extend(acoes)
+    
+    if data_inicio:
+        query += ' AND +data_hora >= ?'
+        params.append(data_inicio)
+    
+    if data_fim:
+        query += ' AND +data_hora < DATE(?, \'+1 day\')'
+        params.append(data_fim)
+    
+    query += ' ORDER BY id LIMIT ?'
+    
+    ultimo_id = desde or 0
+    restantes = limite
+    
+    conn = get_db_connection()
+    
+    try:
+        if data_inicio:
+            # Nenhum evento com id menor que o primeiro do período pode estar nele
+            primeiro = conn.execute('SELECT MIN(id) FROM auditoria WHERE data_hora >= ?', (data_inicio,)).fetchone()[0]
+            if primeiro is None:
+                return
+            ultimo_id = max(ultimo_id, primeiro - 1)
+        
+        while restantes is None or restantes > 0:
+            tamanho = tamanho_lote if restantes is None else min(tamanho_lote, restantes)
+            linhas = conn.execute(query, [ultimo_id] + params + [tamanho]).fetchall()
+            if not linhas:
+                break
+            
+            ultimo_id = linhas[-1]['id']
+            if restantes is not None:
+                restantes -= len(linhas)
+            
+            yield [dict(linha) for linha in linhas]
+            
+            if len(linhas) < tamanho:
+                break
+        
+    finally:
+        conn.close()
+
 # Desenvolvido por Luiz Vaisconcelos
 # Email: luiz.vaisconcelos@gmail.com
 # LinkedIn: https://www.linkedin.com/in/vaisconcelos/
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Encaminhamento das escritas no banco para um único processo escritor.
+
+As funções que gravam no banco são marcadas com @escrita. Num processo sem
+encaminhador (o padrão), elas executam normalmente; num processo com
+encaminhador, a chamada é enviada ao processo escritor, que a executa e
+devolve o resultado ou a exceção. Assim um único processo grava no banco e
+os demais apenas leem (em WAL, cada leitura vê um instantâneo consistente).
+
+Há dois escritores:
+
+- o coordenador da coleta paralela, que recebe as escritas dos seus
+  trabalhadores por filas do multiprocessing (EncaminhadorFila);
+- o serviço escritor (ServicoEscritor), um processo dedicado que atende por
+  um socket Unix local a app Flask, o busca_agendada.py e os scripts. Com
+  ESCRITOR_DB_ENDERECO definido, todo processo que importa este módulo
+  encaminha suas escritas ao serviço (EncaminhadorSocket).
+
+O serviço agrupa as escritas que chegam ao mesmo tempo numa única transação
+(um commit e um fsync por lote); cada escrita roda num savepoint próprio, e
+a falha de uma não desfaz as demais.
+
+Uso:
+    ESCRITOR_DB_ENDERECO=/run/onion_monitor/escritor.sock python escritor_db.py
+"""
+import os
+import sys
+import queue
+import pickle
+import signal
+import logging
+import argparse
+import functools
+import importlib
+import threading
+from multiprocessing.connection import Listener, Client
+
+logger = logging.getLogger("escritor_db")
+
+# Socket Unix do serviço escritor; sem ele cada processo grava diretamente no banco
+ENDERECO = os.environ.get('ESCRITOR_DB_ENDERECO')
+
+# Chave de autenticação opcional das conexões ao serviço
+CHAVE = os.environ.get('ESCRITOR_DB_CHAVE', '').encode() or None
+
+# Máximo de escritas agrupadas numa transação do serviço
+TAMANHO_LOTE = int(os.environ.get('ESCRITOR_DB_LOTE', 200))
+
+# Espera máxima (s) de um cliente pela resposta do serviço
+TIMEOUT = float(os.environ.get('ESCRITOR_DB_TIMEOUT', 60))
+
+_encaminhador = None
+_local = threading.local()
+_aviso_indisponivel = False
+
+class EscritorIndisponivel(ConnectionError):
+    """
+    O serviço escritor não aceitou a conexão; nada foi enviado a ele.
+    """
+
+def escrita(funcao):
+    """
+    Marca uma função que grava no banco de dados, permitindo encaminhá-la ao
+    processo escritor.
+
+    Args e retorno da função precisam ser serializáveis (pickle).
+    """
+    modulo = funcao.__module__
+    if modulo == '__main__':
+        # Módulo executado como script: o escritor o importa pelo nome do arquivo
+        modulo = os.path.splitext(os.path.basename(sys.modules['__main__'].__file__))[0]
+    nome = f"{modulo}.{funcao.__qualname__}"
+
+    @functools.wraps(funcao)
+    def wrapper(*args, **kwargs):
+        global _aviso_indisponivel
+
+        # Dentro de um lote do serviço escritor a escrita é sempre local
+        if _encaminhador is not None and conexao_lote() is None:
+            try:
+                return _encaminhador(nome, args, kwargs)
+            except EscritorIndisponivel as e:
+                # Sem o serviço, o processo volta a gravar diretamente (com o lock do SQLite)
+                if not _aviso_indisponivel:
+                    _aviso_indisponivel = True
+                    logger.warning(f"Serviço escritor indisponível ({str(e)}); gravando diretamente no banco")
+        return funcao(*args, **kwargs)
+
+    wrapper.escrita = True
+    # Decoradores aplicados por fora (spans, métricas) copiam os atributos com
+    # functools.wraps: o escritor executa só este wrapper e as medições ficam
+    # no processo que chamou
+    wrapper.funcao_escrita = wrapper
+    return wrapper
+
+def definir_encaminhador(encaminhador):
+    """
+    Define como o processo corrente encaminha as escritas.
+
+    Args:
+        encaminhador (callable): Recebe (nome, args, kwargs) e devolve o
+            resultado da função; None volta a gravar localmente
+    """
+    global _encaminhador
+    _encaminhador = encaminhador
+
+def conexao_lote():
+    """
+    Obtém a conexão do lote em execução na thread corrente do serviço escritor.
+
+    get_db_connection() a devolve no lugar de uma conexão nova, para que as
+    escritas do lote compartilhem a mesma transação.
+
+    Returns:
+        _ConexaoLote: Conexão do lote ou None fora de um lote
+    """
+    return getattr(_local, 'conexao', None)
+
+def executar_escrita(nome, args, kwargs):
+    """
+    Executa uma escrita recebida de outro processo.
+
+    A função é chamada pelo wrapper de @escrita: dentro de um lote do serviço
+    ela roda localmente; no coordenador da coleta paralela, é repassada ao
+    serviço escritor se houver um.
+
+    Args:
+        nome (str): Nome qualificado da função (módulo.função)
+        args (tuple): Argumentos posicionais
+        kwargs (dict): Argumentos nomeados
+
+    Returns:
+        tuple: (True, resultado) ou (False, exceção)
+    """
+    try:
+        modulo, _, funcao = nome.rpartition('.')
+        alvo = getattr(getattr(importlib.import_module(modulo), funcao, None), 'funcao_escrita', None)
+        if alvo is None:
+            raise ValueError(f"Função de escrita desconhecida: {nome}")
+        return True, alvo(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Erro ao executar {nome}: {str(e)}")
+        try:
+            pickle.dumps(e)
+        except Exception:
+            # Exceções que não atravessam o pickle seguem como texto
+            e = RuntimeError(f"{type(e).__name__}: {str(e)}")
+        return False, e
+
+class EncaminhadorFila:
+    """
+    Encaminhador por filas do multiprocessing: os pedidos vão numa fila
+    compartilhada com o escritor e a resposta volta na fila do processo.
+    """
+
+    def __init__(self, identificador, pedidos, respostas, timeout=None):
+        """
+        Args:
+            identificador: Identifica o processo nas mensagens ao escritor
+            pedidos (multiprocessing.Queue): Fila lida pelo escritor
+            respostas (multiprocessing.Queue): Fila exclusiva deste processo
+            timeout (float, optional): Espera máxima (s) pela resposta. Defaults to None.
+        """
+        self.identificador = identificador
+        self.pedidos = pedidos
+        self.respostas = respostas
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def __call__(self, nome, args, kwargs):
+        # Um pedido por vez: as respostas chegam na ordem dos pedidos
+        with self._lock:
+            self.pedidos.put(('escrita', self.identificador, (nome, args, kwargs)))
+            try:
+                sucesso, valor = self.respostas.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f"Escritor não respondeu a {nome} em {self.timeout}s")
+
+        if not sucesso:
+            raise valor
+        return valor
+
+class EncaminhadorSocket:
+    """
+    Encaminhador para o serviço escritor, com uma conexão por thread (as
+    escritas simultâneas de várias threads entram no mesmo lote do serviço).
+    """
+
+    def __init__(self, endereco, chave=None, timeout=TIMEOUT):
+        """
+        Args:
+            endereco (str): Caminho do socket Unix do serviço
+            chave (bytes, optional): Chave de autenticação. Defaults to None.
+            timeout (float, optional): Espera máxima (s) pela resposta. Defaults to TIMEOUT.
+        """
+        self.endereco = endereco
+        self.chave = chave
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conexao(self, nova=False):
+        # A conexão não é herdada por processos filhos (fork): cada processo abre a sua
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is not None and not nova and self._local.pid == os.getpid():
+            return conexao
+
+        self._descartar()
+        try:
+            conexao = Client(self.endereco, family='AF_UNIX', authkey=self.chave)
+        except (OSError, EOFError) as e:
+            raise EscritorIndisponivel(str(e)) from e
+        self._local.conexao = conexao
+        self._local.pid = os.getpid()
+        return conexao
+
+    def _descartar(self):
+        conexao = getattr(self._local, 'conexao', None)
+        self._local.conexao = None
+        if conexao is not None and getattr(self._local, 'pid', None) == os.getpid():
+            try:
+                conexao.close()
+            except OSError:
+                pass
+
+    def __call__(self, nome, args, kwargs):
+        conexao = self._conexao()
+        try:
+            conexao.send((nome, args, kwargs))
+        except OSError:
+            # Conexão encerrada pelo serviço (ex.: reiniciado): o pedido não chegou, abre outra
+            conexao = self._conexao(nova=True)
+            conexao.send((nome, args, kwargs))
+
+        try:
+            if not conexao.poll(self.timeout):
+                raise TimeoutError(f"Serviço escritor não respondeu a {nome} em {self.timeout}s")
+            sucesso, valor = conexao.recv()
+        except BaseException:
+            # Resposta perdida: a próxima escrita usa uma conexão nova
+            self._descartar()
+            raise
+
+        if not sucesso:
+            raise valor
+        return valor
+
+class _ConexaoLote:
+    """
+    Conexão de um lote do serviço escritor, entregue às funções @escrita no
+    lugar de uma conexão própria: commit() e rollback() valem apenas para o
+    savepoint da escrita corrente e close() não fecha a conexão; o commit
+    real é feito pelo serviço ao fim do lote.
+    """
+
+    SAVEPOINT = 'escrita_lote'
+
+    def __init__(self, conn):
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._conn, nome, valor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreamento):
+        if tipo is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def commit(self):
+        self._conn.execute(f'RELEASE {self.SAVEPOINT}')
+        self._conn.execute(f'SAVEPOINT {self.SAVEPOINT}')
+
+    def rollback(self):
+        self._conn.execute(f'ROLLBACK TO {self.SAVEPOINT}')
+
+    def close(self):
+        pass
+
+class _Pedido:
+    """
+    Escrita aguardando um lote do serviço escritor.
+    """
+
+    __slots__ = ('nome', 'args', 'kwargs', 'resultado', 'concluido')
+
+    def __init__(self, nome, args, kwargs):
+        self.nome = nome
+        self.args = args
+        self.kwargs = kwargs
+        self.resultado = None
+        self.concluido = threading.Event()
+
+class ServicoEscritor:
+    """
+    Processo escritor dedicado: recebe as escritas pelo socket Unix e as
+    executa em lotes, cada lote numa transação.
+    """
+
+    def __init__(self, endereco, chave=None, tamanho_lote=TAMANHO_LOTE):
+        """
+        Args:
+            endereco (str): Caminho do socket Unix
+            chave (bytes, optional): Chave de autenticação. Defaults to None.
+            tamanho_lote (int, optional): Máximo de escritas por transação. Defaults to TAMANHO_LOTE.
+        """
+        self.endereco = endereco
+        self.chave = chave
+        self.tamanho_lote = tamanho_lote
+        self.fila = queue.Queue()
+        self.encerrar = threading.Event()
+        self.estatisticas = {'lotes': 0, 'escritas': 0, 'erros': 0}
+        self._listener = None
+
+    def _encaminhar_local(self, nome, args, kwargs):
+        # Escritas de outras threads do próprio serviço (ex.: buffer da auditoria) entram nos lotes
+        pedido = _Pedido(nome, args, kwargs)
+        self.fila.put(pedido)
+        pedido.concluido.wait()
+        sucesso, valor = pedido.resultado
+        if not sucesso:
+            raise valor
+        return valor
+
+    def _aceitar(self):
+        while not self.encerrar.is_set():
+            try:
+                conexao = self._listener.accept()
+            except OSError:
+                # Listener fechado no encerramento
+                return
+            except Exception as e:
+                # Ex.: cliente com chave errada
+                logger.warning(f"Conexão recusada: {str(e)}")
+                continue
+            threading.Thread(target=self._atender, args=(conexao,), name='escritor-cliente', daemon=True).start()
+
+    def _atender(self, conexao):
+        try:
+            while True:
+                try:
+                    nome, args, kwargs = conexao.recv()
+                except (EOFError, OSError):
+                    return
+                pedido = _Pedido(nome, args, kwargs)
+                self.fila.put(pedido)
+                pedido.concluido.wait()
+                conexao.send(pedido.resultado)
+        except Exception as e:
+            logger.error(f"Erro ao atender cliente do serviço escritor: {str(e)}")
+        finally:
+            conexao.close()
+
+    def executar_lote(self, pedidos):
+        """
+        Executa um lote de escritas numa única transação.
+
+        Args:
+            pedidos (list): Pedidos (_Pedido) do lote; cada um recebe o seu resultado
+        """
+        # Importado aqui: o db importa este módulo
+        import db
+
+        conn = db.get_db_connection()
+        fabrica_linhas = conn.row_factory
+        lote = _ConexaoLote(conn)
+
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            _local.conexao = lote
+            try:
+                for pedido in pedidos:
+                    conn.row_factory = fabrica_linhas
+                    conn.execute(f'SAVEPOINT {_ConexaoLote.SAVEPOINT}')
+                    pedido.resultado = executar_escrita(pedido.nome, pedido.args, pedido.kwargs)
+                    if not pedido.resultado[0]:
+                        # Desfaz o que a escrita com erro deixou sem desfazer
+                        conn.execute(f'ROLLBACK TO {_ConexaoLote.SAVEPOINT}')
+                        self.estatisticas['erros'] += 1
+                    conn.execute(f'RELEASE {_ConexaoLote.SAVEPOINT}')
+            finally:
+                _local.conexao = None
+            conn.commit()
+
+        except Exception as e:
+            logger.error(f"Erro no lote de {len(pedidos)} escritas: {str(e)}")
+            conn.rollback()
+            for pedido in pedidos:
+                pedido.resultado = (False, RuntimeError(f"Lote de escritas desfeito: {type(e).__name__}: {str(e)}"))
+
+        finally:
+            conn.close()
+            self.estatisticas['lotes'] += 1
+            self.estatisticas['escritas'] += len(pedidos)
+            for pedido in pedidos:
+                pedido.concluido.set()
+
+    def servir(self):
+        """
+        Atende os clientes até encerrar() (ou SIGTERM/SIGINT, se chamado na thread principal).
+        """
+        if os.path.exists(self.endereco):
+            # Socket deixado por uma execução anterior
+            os.unlink(self.endereco)
+        self._listener = Listener(self.endereco, family='AF_UNIX', authkey=self.chave)
+        os.chmod(self.endereco, 0o660)
+
+        if threading.current_thread() is threading.main_thread():
+            for numero in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(numero, lambda numero, quadro: self.encerrar.set())
+
+        definir_encaminhador(self._encaminhar_local)
+        threading.Thread(target=self._aceitar, name='escritor-aceitar', daemon=True).start()
+        logger.info(f"Serviço escritor em {self.endereco} (lotes de até {self.tamanho_lote} escritas)")
+
+        try:
+            while not self.encerrar.is_set() or not self.fila.empty():
+                try:
+                    pedidos = [self.fila.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+
+                # Agrupa o que chegou enquanto o lote anterior era gravado
+                while len(pedidos) < self.tamanho_lote:
+                    try:
+                        pedidos.append(self.fila.get_nowait())
+                    except queue.Empty:
+                        break
+
+                self.executar_lote(pedidos)
+
+        finally:
+            self._listener.close()
+            if os.path.exists(self.endereco):
+                os.unlink(self.endereco)
+            # O que ainda estiver no buffer da auditoria é gravado diretamente ao sair
+            definir_encaminhador(None)
+            restantes = []
+            while not self.fila.empty():
+                restantes.append(self.fila.get_nowait())
+            if restantes:
+                self.executar_lote(restantes)
+            logger.info(f"Serviço escritor encerrado: {self.estatisticas}")
+
+    def encerrar_servico(self):
+        """
+        Encerra o serviço depois de gravar os pedidos já recebidos.
+        """
+        self.encerrar.set()
+
+if ENDERECO:
+    definir_encaminhador(EncaminhadorSocket(ENDERECO, CHAVE))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Serviço escritor do banco de dados")
+    parser.add_argument('--endereco', default=ENDERECO, help="Socket Unix (padrão: ESCRITOR_DB_ENDERECO)")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Máximo de escritas por transação")
+    args = parser.parse_args()
+
+    if not args.endereco:
+        parser.error("informe --endereco ou ESCRITOR_DB_ENDERECO")
+
+    # Executado como script, este módulo é __main__: as funções @escrita usam o escritor_db importado pelo db
+    import db
+    import escritor_db
+
+    # O próprio serviço grava diretamente (o socket ainda não existe)
+    escritor_db.definir_encaminhador(None)
+    db.init_db()
+    servico = escritor_db.ServicoEscritor(args.endereco, CHAVE, args.lote)
+    servico.servir()
+    sys.exit(0)
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
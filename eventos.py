@@ -0,0 +1,113 @@
+import json
+import queue
+import logging
+import threading
+import contextlib
+import contextvars
+
+logger = logging.getLogger("eventos")
+
+# Tamanho máximo da fila de cada assinante; eventos excedentes são descartados
+# (o assinante recupera o estado consultando a tarefa no banco)
+TAMANHO_FILA_ASSINANTE = 1000
+
+# Canal de eventos do contexto atual (ex.: ID da tarefa em execução)
+_canal_atual = contextvars.ContextVar('canal_eventos', default=None)
+
+_assinantes = {}
+_lock = threading.Lock()
+
+@contextlib.contextmanager
+def canal_eventos(canal):
+    """
+    Define o canal para o qual os eventos publicados no contexto serão enviados.
+
+    Args:
+        canal (str): Nome do canal (ex.: ID da tarefa)
+    """
+    token = _canal_atual.set(canal)
+    try:
+        yield
+    finally:
+        _canal_atual.reset(token)
+
+def canal_atual():
+    """
+    Obtém o canal de eventos do contexto atual.
+
+    Returns:
+        str: Nome do canal ou None
+    """
+    return _canal_atual.get()
+
+def publicar(tipo, dados=None, canal=None):
+    """
+    Publica um evento para os assinantes do canal (por padrão, o canal do contexto).
+
+    Publicar sem canal ou sem assinantes não tem custo além da consulta ao dicionário.
+
+    Args:
+        tipo (str): Tipo do evento (ex.: 'resultado', 'fonte_concluida')
+        dados (dict, optional): Dados do evento
+        canal (str, optional): Canal de destino. Defaults to None (canal do contexto).
+    """
+    canal = canal or _canal_atual.get()
+    if canal is None:
+        return
+
+    with _lock:
+        filas = list(_assinantes.get(canal, ()))
+
+    for fila in filas:
+        try:
+            fila.put_nowait((tipo, dados))
+        except queue.Full:
+            logger.debug(f"Fila de assinante cheia no canal {canal}; evento '{tipo}' descartado")
+
+def assinar(canal):
+    """
+    Assina um canal de eventos.
+
+    Args:
+        canal (str): Nome do canal
+
+    Returns:
+        queue.Queue: Fila que recebe tuplas (tipo, dados)
+    """
+    fila = queue.Queue(maxsize=TAMANHO_FILA_ASSINANTE)
+    with _lock:
+        _assinantes.setdefault(canal, set()).add(fila)
+    return fila
+
+def cancelar_assinatura(canal, fila):
+    """
+    Remove a assinatura de um canal.
+
+    Args:
+        canal (str): Nome do canal
+        fila (queue.Queue): Fila retornada por assinar()
+    """
+    with _lock:
+        filas = _assinantes.get(canal)
+        if filas:
+            filas.discard(fila)
+            if not filas:
+                del _assinantes[canal]
+
+def formatar_sse(tipo, dados):
+    """
+    Formata um evento no padrão Server-Sent Events.
+
+    Args:
+        tipo (str): Tipo do evento
+        dados (dict): Dados do evento (serializados em JSON)
+
+    Returns:
+        str: Evento pronto para envio
+    """
+    return f"event: {tipo}\ndata: {json.dumps(dados, default=str)}\n\n"
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Exportação colunar (Parquet) de coletas e auditoria.
+
+Lê o SQLite em lotes pelo cursor (ordem de id, sem carregar a tabela em
+memória), converte cada lote para Arrow com tipos explícitos (datas como
+timestamp, validado como booleano) e grava um row group por lote, com
+compressão e particionamento por mês ou dia no formato chave=valor
+(ex.: coletas/mes=2025-01/parte-...parquet), lido diretamente por
+pyarrow.dataset, DuckDB, Spark e pandas.
+
+Uso:
+    python exportacao_colunar.py coletas /dados/exportacao --particao mes
+    python exportacao_colunar.py auditoria /dados/exportacao --data-inicio 2025-01-01 --particao dia
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import datetime
+import db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+logger = logging.getLogger("exportacao_colunar")
+
+# Linhas lidas do cursor e gravadas por row group
+LINHAS_POR_LOTE = int(os.environ.get('EXPORTACAO_LINHAS_LOTE', 100000))
+
+# Compressão dos arquivos Parquet (zstd, snappy, gzip, brotli ou none)
+COMPRESSAO = os.environ.get('EXPORTACAO_COMPRESSAO', 'zstd')
+
+# Arquivos de partição mantidos abertos ao mesmo tempo
+MAX_ARQUIVOS_ABERTOS = 16
+
+# Granularidade das partições: tamanho do prefixo da data ('YYYY-MM' ou 'YYYY-MM-DD')
+PARTICOES = {'mes': 7, 'dia': 10}
+
+# Consulta, coluna de data (filtros e partição) e colunas (nome, tipo Arrow) de cada tabela
+if PYARROW_DISPONIVEL:
+    TABELAS = {
+        'coletas': {
+            'consulta': '''
+                SELECT c.id, c.data_coleta, c.termo_busca, c.link_encontrado, c.titulo, c.descricao,
+                       c.fonte_id, f.nome AS fonte_nome, c.validado, c.score_validacao, c.metodo_validacao,
+                       c.observacoes_validacao, c.data_validacao, c.hash_conteudo, c.coleta_canonica_id
+                FROM coletas c
+                LEFT JOIN fontes f ON c.fonte_id = f.id
+                WHERE 1=1
+            ''',
+            'coluna_data': 'c.data_coleta',
+            'colunas': [
+                ('id', pa.int64()), ('data_coleta', pa.timestamp('us')), ('termo_busca', pa.string()),
+                ('link_encontrado', pa.string()), ('titulo', pa.string()), ('descricao', pa.string()),
+                ('fonte_id', pa.int64()), ('fonte_nome', pa.string()), ('validado', pa.bool_()),
+                ('score_validacao', pa.float64()), ('metodo_validacao', pa.string()),
+                ('observacoes_validacao', pa.string()), ('data_validacao', pa.timestamp('us')),
+                ('hash_conteudo', pa.string()), ('coleta_canonica_id', pa.int64()),
+            ],
+        },
+        'auditoria': {
+            'consulta': 'SELECT id, data_hora, acao, descricao, dados, usuario, hash FROM auditoria a WHERE 1=1',
+            'coluna_data': 'a.data_hora',
+            'colunas': [
+                ('id', pa.int64()), ('data_hora', pa.timestamp('us')), ('acao', pa.string()),
+                ('descricao', pa.string()), ('dados', pa.string()), ('usuario', pa.string()),
+                ('hash', pa.string()),
+            ],
+        },
+    }
+
+def _coluna(valores, tipo):
+    """
+    Converte os valores de uma coluna do SQLite para um array Arrow do tipo indicado.
+    """
+    if pa.types.is_timestamp(tipo):
+        # Datas são texto no SQLite ('YYYY-MM-DD HH:MM:SS[.ffffff]'); o cast as interpreta
+        return pa.array(valores, pa.string()).cast(tipo)
+    if pa.types.is_boolean(tipo):
+        return pa.array([None if valor is None else bool(valor) for valor in valores], tipo)
+    if pa.types.is_string(tipo):
+        return pa.array([valor if valor is None or isinstance(valor, str) else str(valor) for valor in valores], tipo)
+    return pa.array(valores, tipo)
+
+def converter_lote(linhas, esquema):
+    """
+    Converte um lote de linhas do cursor numa tabela Arrow.
+
+    Args:
+        linhas (list): Tuplas na ordem das colunas do esquema
+        esquema (pyarrow.Schema): Esquema da tabela
+
+    Returns:
+        pyarrow.Table: Lote convertido
+    """
+    colunas = list(zip(*linhas))
+    return pa.Table.from_arrays(
+        [_coluna(list(valores), campo.type) for valores, campo in zip(colunas, esquema)],
+        schema=esquema
+    )
+
+class _ArquivosParticao:
+    """
+    Escritores Parquet abertos por partição. Como os lotes vêm em ordem de id
+    (e portanto quase em ordem de data), só as partições mais recentes ficam
+    abertas; uma partição reaberta ganha um novo arquivo.
+    """
+
+    def __init__(self, diretorio, prefixo, esquema, compressao):
+        self.diretorio = diretorio
+        self.prefixo = prefixo
+        self.esquema = esquema
+        self.compressao = compressao
+        self.abertos = {}
+        self.arquivos = []
+
+    def escrever(self, particao, tabela):
+        escritor = self.abertos.pop(particao, None)
+        if escritor is None:
+            if len(self.abertos) >= MAX_ARQUIVOS_ABERTOS:
+                # Fecha a partição usada há mais tempo
+                self.abertos.pop(next(iter(self.abertos))).close()
+            caminho = os.path.join(self.diretorio, particao, f'{self.prefixo}-{len(self.arquivos):04d}.parquet')
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            escritor = pq.ParquetWriter(caminho, self.esquema, compression=self.compressao)
+            self.arquivos.append(caminho)
+        escritor.write_table(tabela)
+        # Reinsere no fim: a ordem do dicionário é a ordem de uso
+        self.abertos[particao] = escritor
+
+    def fechar(self):
+        for escritor in self.abertos.values():
+            escritor.close()
+        self.abertos = {}
+
+def exportar_parquet(tabela, destino, data_inicio=None, data_fim=None, particao='mes',
+                     compressao=None, linhas_por_lote=None, termo=None, apenas_validados=None):
+    """
+    Exporta uma tabela para Parquet, em lotes.
+
+    Cada lote é uma consulta curta por chave (id maior que o último exportado),
+    sem cursor aberto entre lotes, então a exportação não segura um snapshot de
+    leitura do banco enquanto escreve os arquivos.
+
+    Args:
+        tabela (str): 'coletas' ou 'auditoria'
+        destino (str): Diretório da exportação ou, sem particionamento, caminho do arquivo
+        data_inicio (str, optional): Data de início (formato YYYY-MM-DD). Defaults to None.
+        data_fim (str, optional): Data de fim (formato YYYY-MM-DD). Defaults to None.
+        particao (str, optional): 'mes', 'dia' ou None (um único arquivo). Defaults to 'mes'.
+        compressao (str, optional): Codec dos arquivos. Defaults to COMPRESSAO.
+        linhas_por_lote (int, optional): Linhas por lote/row group. Defaults to LINHAS_POR_LOTE.
+        termo (str, optional): Apenas coletas: filtra pelo termo. Defaults to None.
+        apenas_validados (bool, optional): Apenas coletas: filtra pela validação. Defaults to None.
+
+    Returns:
+        dict: {'tabela', 'linhas', 'arquivos', 'duracao_s'}
+    """
+    if not PYARROW_DISPONIVEL:
+        raise RuntimeError("A exportação Parquet requer o pacote pyarrow (pip install pyarrow)")
+    if tabela not in TABELAS:
+        raise ValueError(f"Tabela não exportável: {tabela}")
+    if particao is not None and particao not in PARTICOES:
+        raise ValueError(f"Partição inválida: {particao} (use {', '.join(PARTICOES)})")
+
+    inicio = time.perf_counter()
+    definicao = TABELAS[tabela]
+    esquema = pa.schema(definicao['colunas'])
+    compressao = compressao or COMPRESSAO
+    coluna_data = definicao['coluna_data']
+
+    query = definicao['consulta']
+    params = []
+
+    if data_inicio:
+        query += f' AND {coluna_data} >= ?'
+        params.append(data_inicio)
+
+    if data_fim:
+        # Inclui o dia final inteiro
+        query += f' AND {coluna_data} < DATE(?, \'+1 day\')'
+        params.append(data_fim)
+
+    if tabela == 'coletas' and termo:
+        query += ' AND c.termo_busca LIKE ?'
+        params.append(f'%{termo}%')
+
+    if tabela == 'coletas' and apenas_validados is not None:
+        query += ' AND c.validado = ?'
+        params.append(1 if apenas_validados else 0)
+
+    alias = coluna_data.split('.')[0]
+    query += f' AND {alias}.id > ? ORDER BY {alias}.id LIMIT ?'
+    tamanho_lote = linhas_por_lote or LINHAS_POR_LOTE
+
+    logger.info(f"Exportando {tabela} para Parquet em {destino} (partição: {particao}, compressão: {compressao})")
+
+    conn = db.get_db_connection()
+    # Tuplas simples: a conversão é por coluna
+    conn.row_factory = None
+    linhas_exportadas = 0
+
+    if particao:
+        arquivos = _ArquivosParticao(
+            os.path.join(destino, tabela), f"parte-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}",
+            esquema, compressao
+        )
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+        escritor = pq.ParquetWriter(destino, esquema, compression=compressao)
+
+    try:
+        tamanho_prefixo = PARTICOES.get(particao)
+        ultimo_id = 0
+
+        while True:
+            linhas = conn.execute(query, params + [ultimo_id, tamanho_lote]).fetchall()
+            if not linhas:
+                break
+            # O id é a primeira coluna das consultas
+            ultimo_id = linhas[-1][0]
+            linhas_exportadas += len(linhas)
+
+            if not particao:
+                escritor.write_table(converter_lote(linhas, esquema))
+                continue
+
+            # Agrupa o lote por partição (a data é a segunda coluna das consultas)
+            grupos = {}
+            for linha in linhas:
+                chave = f"{particao}={str(linha[1])[:tamanho_prefixo] if linha[1] else 'sem_data'}"
+                grupos.setdefault(chave, []).append(linha)
+            for chave, grupo in grupos.items():
+                arquivos.escrever(chave, converter_lote(grupo, esquema))
+
+    finally:
+        if particao:
+            arquivos.fechar()
+        else:
+            escritor.close()
+        conn.close()
+
+    resumo = {
+        'tabela': tabela,
+        'linhas': linhas_exportadas,
+        'arquivos': arquivos.arquivos if particao else [destino],
+        'duracao_s': round(time.perf_counter() - inicio, 2),
+    }
+    logger.info(f"Exportadas {linhas_exportadas} linhas de {tabela} em {len(resumo['arquivos'])} arquivo(s)")
+    return resumo
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Exportação Parquet de coletas e auditoria")
+    parser.add_argument('tabela', choices=('coletas', 'auditoria'))
+    parser.add_argument('destino', help="Diretório da exportação (ou arquivo, com --particao nenhuma)")
+    parser.add_argument('--data-inicio', help="YYYY-MM-DD")
+    parser.add_argument('--data-fim', help="YYYY-MM-DD")
+    parser.add_argument('--particao', default='mes', choices=('mes', 'dia', 'nenhuma'))
+    parser.add_argument('--compressao', default=COMPRESSAO)
+    parser.add_argument('--lote', type=int, default=LINHAS_POR_LOTE, help="Linhas por lote/row group")
+    args = parser.parse_args()
+
+    resumo = exportar_parquet(
+        args.tabela, args.destino, args.data_inicio, args.data_fim,
+        None if args.particao == 'nenhuma' else args.particao, args.compressao, args.lote
+    )
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+    sys.exit(0)
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,423 @@
+import os
+import time
+import logging
+import collections
+import requests
+from bs4 import BeautifulSoup
+from db import get_db_connection, indexar_urls, registrar_verificacao_url
+from busca_valida_semantica import ler_corpo_limitado
+from normalizacao_url import canonicalizar_url, normalizar_links, extrair_host, eh_onion
+from impressao_conteudo import hash_conteudo
+from metricas import medir_requisicao
+from perfilamento import span
+from escritor_db import escrita
+
+logger = logging.getLogger("fronteira")
+
+# Limites de cada execução do rastreamento (por fonte)
+MAX_PAGINAS_EXECUCAO = int(os.environ.get('FRONTEIRA_MAX_PAGINAS', 50))
+MAX_PROFUNDIDADE = int(os.environ.get('FRONTEIRA_MAX_PROFUNDIDADE', 2))
+MAX_PAGINAS_POR_HOST = int(os.environ.get('FRONTEIRA_MAX_POR_HOST', 10))
+
+# Intervalo mínimo entre duas requisições ao mesmo host (segundos)
+ATRASO_POR_HOST = float(os.environ.get('FRONTEIRA_ATRASO_HOST', 2.0))
+
+# Páginas de listas costumam ser pequenas; não há motivo para ler dumps inteiros aqui
+MAX_BYTES_PAGINA_LISTA = int(os.environ.get('FRONTEIRA_MAX_BYTES', 2 * 1024 * 1024))
+
+# Número de falhas antes de desistir de uma URL
+MAX_TENTATIVAS = 3
+
+# Proxy Tor para hosts .onion
+PROXY_TOR = os.environ.get('TOR_PROXY', 'socks5h://127.0.0.1:9050')
+
+# Quantidade de URLs pendentes carregadas do banco por vez
+TAMANHO_LOTE_FILA = 500
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+PaginaVisitada = collections.namedtuple('PaginaVisitada', ['url', 'titulo', 'html', 'texto', 'profundidade'])
+
+class FronteiraRastreamento:
+    """
+    Fronteira de rastreamento limitada para fontes do tipo 'lista'.
+
+    Mantém uma fila por host (visitados em rodízio, respeitando um intervalo
+    mínimo entre requisições ao mesmo host), limites de profundidade e de
+    páginas por execução, e persiste a fronteira na tabela 'fronteira', o que
+    torna o rastreamento retomável entre execuções e evita visitar de novo
+    URLs já vistas.
+    """
+
+    def __init__(self, fonte, max_paginas=MAX_PAGINAS_EXECUCAO, max_profundidade=MAX_PROFUNDIDADE,
+                 max_por_host=MAX_PAGINAS_POR_HOST, atraso_host=ATRASO_POR_HOST):
+        """
+        Inicializa a fronteira para uma fonte.
+
+        Args:
+            fonte (dict): Fonte do tipo 'lista' (id, nome, url)
+            max_paginas (int, optional): Páginas visitadas por execução
+            max_profundidade (int, optional): Profundidade máxima a partir da página inicial
+            max_por_host (int, optional): Páginas visitadas por host em cada execução
+            atraso_host (float, optional): Intervalo mínimo entre requisições ao mesmo host
+        """
+        self.fonte = fonte
+        self.max_paginas = max_paginas
+        self.max_profundidade = max_profundidade
+        self.max_por_host = max_por_host
+        self.atraso_host = atraso_host
+
+        self.host_semente = extrair_host(canonicalizar_url(fonte['url']) or fonte['url'])
+        self.filas = collections.OrderedDict()
+        self.ultimo_acesso = {}
+        self.visitas_por_host = collections.Counter()
+        self.tentadas = set()
+
+    def semear(self):
+        """
+        Insere a página inicial da fonte na fronteira. A página inicial é
+        revisitada a cada execução, pois a lista muda com o tempo.
+        """
+        url = canonicalizar_url(self.fonte['url'])
+        if not url:
+            logger.warning(f"URL inválida para a fonte {self.fonte['nome']}: {self.fonte['url']}")
+            return
+
+        try:
+            gravar_semente(url, extrair_host(url), self.fonte['id'])
+        except Exception as e:
+            logger.error(f"Erro ao semear fronteira de {self.fonte['nome']}: {str(e)}")
+
+    def _carregar_pendentes(self):
+        """
+        Carrega um lote de URLs pendentes do banco nas filas por host.
+
+        Returns:
+            int: Quantidade de URLs carregadas
+        """
+        conn = get_db_connection()
+        try:
+            cursor = conn.execute(
+                '''
+                SELECT url, host, profundidade FROM fronteira
+                WHERE fonte_id = ? AND status = 'pendente' AND profundidade <= ?
+                ORDER BY profundidade, id
+                LIMIT ?
+                ''',
+                (self.fonte['id'], self.max_profundidade, TAMANHO_LOTE_FILA)
+            )
+            carregadas = 0
+            enfileiradas = {url for fila in self.filas.values() for url, _ in fila}
+
+            for row in cursor.fetchall():
+                # URLs que já falharam nesta execução ficam para a próxima
+                if row['url'] in enfileiradas or row['url'] in self.tentadas:
+                    continue
+                if self.visitas_por_host[row['host']] >= self.max_por_host:
+                    continue
+                self.filas.setdefault(row['host'], collections.deque()).append((row['url'], row['profundidade']))
+                carregadas += 1
+
+            return carregadas
+        finally:
+            conn.close()
+
+    def _proxima_url(self):
+        """
+        Escolhe a próxima URL em rodízio entre os hosts, respeitando o intervalo
+        mínimo por host. Aguarda se todos os hosts com fila estiverem em espera.
+
+        Returns:
+            tuple: (url, host, profundidade) ou None se a fronteira estiver vazia
+        """
+        while True:
+            # Descarta hosts sem fila ou que já atingiram o limite da execução
+            for host in [h for h, fila in self.filas.items() if not fila or self.visitas_por_host[h] >= self.max_por_host]:
+                del self.filas[host]
+
+            if not self.filas and not self._carregar_pendentes():
+                return None
+
+            agora = time.monotonic()
+            espera_minima = None
+
+            for host in list(self.filas):
+                liberado_em = self.ultimo_acesso.get(host, 0) + self.atraso_host
+                if liberado_em <= agora:
+                    url, profundidade = self.filas[host].popleft()
+                    # Move o host para o fim (rodízio)
+                    self.filas.move_to_end(host)
+                    return url, host, profundidade
+                espera = liberado_em - agora
+                espera_minima = espera if espera_minima is None else min(espera_minima, espera)
+
+            time.sleep(espera_minima)
+
+    def _visitar(self, url, host, profundidade):
+        """
+        Busca uma página, extrai os links e atualiza a fronteira.
+
+        Args:
+            url (str): URL canônica
+            host (str): Host da URL
+            profundidade (int): Profundidade da URL
+
+        Returns:
+            PaginaVisitada: Página visitada ou None em caso de erro
+        """
+        proxies = {'http': PROXY_TOR, 'https': PROXY_TOR} if eh_onion(url) else None
+        self.ultimo_acesso[host] = time.monotonic()
+        self.tentadas.add(url)
+        self.visitas_por_host[host] += 1
+
+        try:
+            try:
+                with medir_requisicao(self.fonte['nome']) as medicao, span('fetch', url=url):
+                    response = requests.get(url, headers=HEADERS, proxies=proxies, timeout=20, stream=True)
+                    medicao['status'] = response.status_code
+                    if response.status_code != 200:
+                        response.close()
+                        raise requests.exceptions.HTTPError(f"Status {response.status_code}")
+                    html = ler_corpo_limitado(response, MAX_BYTES_PAGINA_LISTA)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Falha ao visitar {url}: {str(e)}")
+                registrar_falha_visita(url, self.fonte['id'])
+                registrar_verificacao_url(url, 'erro')
+                return None
+
+            with span('parse'):
+                soup = BeautifulSoup(html, 'html.parser')
+            titulo = soup.title.get_text(strip=True) if soup.title else None
+            descricao_meta = soup.find('meta', attrs={'name': 'description'})
+            descricao = descricao_meta.get('content') if descricao_meta else None
+
+            # Links canônicos da página com o texto da âncora (descrição na lista)
+            anchors = soup.find_all('a', href=True)
+            canonicos = normalizar_links([a['href'] for a in anchors], base=response.url or url)
+            textos = {}
+            for a in anchors:
+                canonico = canonicalizar_url(a['href'], base=response.url or url)
+                if canonico and canonico not in textos:
+                    textos[canonico] = a.get_text(' ', strip=True)[:300]
+
+            # São seguidos os links .onion (serviços descobertos) e os do próprio host da lista
+            # (paginação e categorias); o texto do link costuma descrever o serviço
+            links = [
+                (link, extrair_host(link), textos.get(link) or None) for link in canonicos
+                if eh_onion(link) or extrair_host(link) == self.host_semente
+            ]
+            novas = registrar_visita(
+                url, titulo, descricao, self.fonte['id'], links, profundidade + 1,
+                'pendente' if profundidade + 1 <= self.max_profundidade else 'limite'
+            )
+
+            # Atualiza o índice de URLs (página visitada e serviços descobertos)
+            texto = soup.get_text(separator=' ')
+            registrar_verificacao_url(
+                url,
+                'alterado',
+                hash_conteudo=hash_conteudo(texto),
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+            indexar_urls([link for link in canonicos if eh_onion(link)])
+
+            logger.info(f"Visitada {url} (profundidade {profundidade}): {len(canonicos)} links, {novas} novos")
+
+            return PaginaVisitada(url, titulo, html, texto, profundidade)
+
+        except Exception as e:
+            logger.error(f"Erro ao processar {url}: {str(e)}")
+            return None
+
+    def executar(self):
+        """
+        Executa uma rodada do rastreamento, limitada por max_paginas.
+
+        Yields:
+            PaginaVisitada: Cada página visitada com sucesso
+        """
+        self.semear()
+        visitadas = 0
+
+        while visitadas < self.max_paginas:
+            proxima = self._proxima_url()
+            if proxima is None:
+                logger.info(f"Fronteira de {self.fonte['nome']} esgotada")
+                break
+
+            pagina = self._visitar(*proxima)
+            visitadas += 1
+
+            if pagina:
+                yield pagina
+
+        logger.info(f"Rastreamento de {self.fonte['nome']} concluído: {visitadas} páginas visitadas")
+
+@escrita
+def gravar_semente(url, host, fonte_id):
+    """
+    Insere (ou volta a pendente) a página inicial de uma fonte na fronteira.
+
+    Args:
+        url (str): URL canônica da página inicial
+        host (str): Host da URL
+        fonte_id (int): ID da fonte
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            '''
+            INSERT INTO fronteira (url, host, fonte_id, profundidade)
+            VALUES (?, ?, ?, 0)
+            ON CONFLICT(fonte_id, url) DO UPDATE SET status = 'pendente', tentativas = 0
+            ''',
+            (url, host, fonte_id)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@escrita
+def registrar_falha_visita(url, fonte_id):
+    """
+    Conta uma falha ao visitar a URL; após MAX_TENTATIVAS ela passa a 'erro'.
+
+    Args:
+        url (str): URL canônica
+        fonte_id (int): ID da fonte
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            '''
+            UPDATE fronteira
+            SET tentativas = tentativas + 1,
+                status = CASE WHEN tentativas + 1 >= ? THEN 'erro' ELSE 'pendente' END,
+                data_visita = CURRENT_TIMESTAMP
+            WHERE fonte_id = ? AND url = ?
+            ''',
+            (MAX_TENTATIVAS, fonte_id, url)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@escrita
+def registrar_visita(url, titulo, descricao, fonte_id, links, profundidade, status_links):
+    """
+    Marca a URL como visitada e persiste na fronteira os links descobertos nela.
+
+    Args:
+        url (str): URL canônica visitada
+        titulo (str): Título da página
+        descricao (str): Descrição (meta description) da página
+        fonte_id (int): ID da fonte
+        links (list): Tuplas (url canônica, host, texto do link) a seguir
+        profundidade (int): Profundidade dos novos links
+        status_links (str): 'pendente' ou 'limite' (além da profundidade máxima)
+
+    Returns:
+        int: Quantidade de URLs novas na fronteira
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        novas = 0
+        for link, host, texto in links:
+            cursor.execute(
+                '''
+                INSERT OR IGNORE INTO fronteira (url, host, fonte_id, profundidade, status, titulo, descricao)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (link, host, fonte_id, profundidade, status_links, None, texto)
+            )
+            novas += cursor.rowcount
+
+        cursor.execute(
+            '''
+            UPDATE fronteira
+            SET status = 'visitado', data_visita = CURRENT_TIMESTAMP,
+                titulo = COALESCE(?, titulo), descricao = COALESCE(?, descricao)
+            WHERE fonte_id = ? AND url = ?
+            ''',
+            (titulo, descricao, fonte_id, url)
+        )
+        conn.commit()
+        return novas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def buscar_descobertos(fonte_id, termo, limite=50):
+    """
+    Busca o termo nos títulos e descrições dos endereços .onion já descobertos
+    pela fronteira de uma fonte (inclusive em execuções anteriores).
+
+    Args:
+        fonte_id (int): ID da fonte
+        termo (str): Termo buscado
+        limite (int, optional): Quantidade máxima de resultados
+
+    Returns:
+        list: Lista de dicionários (url, titulo, descricao)
+    """
+    # '%' e '_' do termo são literais, não curingas do LIKE
+    padrao = '%' + termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            r'''
+            SELECT url, titulo, descricao FROM fronteira
+            WHERE fonte_id = ? AND url LIKE 'http://%.onion/%'
+              AND (titulo LIKE ? ESCAPE '\' OR descricao LIKE ? ESCAPE '\')
+            ORDER BY id DESC
+            LIMIT ?
+            ''',
+            (fonte_id, padrao, padrao, limite)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Erro ao buscar endereços descobertos: {str(e)}")
+        return []
+    finally:
+        conn.close()
+
+def estatisticas_fronteira(fonte_id=None):
+    """
+    Obtém a contagem de URLs da fronteira por status.
+
+    Args:
+        fonte_id (int, optional): Filtra por fonte
+
+    Returns:
+        dict: Quantidade de URLs por status
+    """
+    conn = get_db_connection()
+    try:
+        query = 'SELECT status, COUNT(*) AS quantidade FROM fronteira'
+        params = []
+        if fonte_id is not None:
+            query += ' WHERE fonte_id = ?'
+            params.append(fonte_id)
+        query += ' GROUP BY status'
+
+        return {row['status']: row['quantidade'] for row in conn.execute(query, params).fetchall()}
+    finally:
+        conn.close()
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,170 @@
+import re
+import hashlib
+import logging
+
+logger = logging.getLogger("impressao_conteudo")
+
+# Número de bits do SimHash
+BITS_SIMHASH = 64
+
+# O SimHash é dividido em bandas para indexação: duas impressões com distância
+# de Hamming <= LIMIAR_HAMMING compartilham obrigatoriamente ao menos uma banda
+# (princípio da casa dos pombos), desde que NUM_BANDAS > LIMIAR_HAMMING.
+NUM_BANDAS = 4
+BITS_POR_BANDA = BITS_SIMHASH // NUM_BANDAS
+
+# Distância máxima para considerar duas páginas quase idênticas
+LIMIAR_HAMMING = 3
+
+# Quantidade de palavras por shingle
+TAMANHO_SHINGLE = 3
+
+_RE_PALAVRAS = re.compile(r'\w+', re.UNICODE)
+_RE_ESPACOS = re.compile(r'\s+')
+
+def normalizar_texto(texto):
+    """
+    Normaliza o texto para comparação (minúsculas e espaços colapsados).
+
+    Args:
+        texto (str): Texto original
+
+    Returns:
+        str: Texto normalizado
+    """
+    return _RE_ESPACOS.sub(' ', texto or '').strip().lower()
+
+def hash_conteudo(texto):
+    """
+    Calcula o hash SHA-256 do texto normalizado.
+
+    Args:
+        texto (str): Texto da página
+
+    Returns:
+        str: Hash hexadecimal do conteúdo
+    """
+    return hashlib.sha256(normalizar_texto(texto).encode('utf-8')).hexdigest()
+
+def _shingles(texto):
+    """
+    Gera os shingles (sequências de palavras) do texto.
+
+    Args:
+        texto (str): Texto normalizado
+
+    Returns:
+        list: Lista de shingles
+    """
+    palavras = _RE_PALAVRAS.findall(texto)
+
+    if len(palavras) < TAMANHO_SHINGLE:
+        return [' '.join(palavras)] if palavras else []
+
+    return [
+        ' '.join(palavras[i:i + TAMANHO_SHINGLE])
+        for i in range(len(palavras) - TAMANHO_SHINGLE + 1)
+    ]
+
+def simhash(texto):
+    """
+    Calcula o SimHash de 64 bits do texto.
+
+    Args:
+        texto (str): Texto da página
+
+    Returns:
+        int: SimHash do conteúdo (inteiro sem sinal de 64 bits)
+    """
+    pesos = [0] * BITS_SIMHASH
+
+    for shingle in _shingles(normalizar_texto(texto)):
+        valor = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(BITS_SIMHASH):
+            if valor & (1 << bit):
+                pesos[bit] += 1
+            else:
+                pesos[bit] -= 1
+
+    resultado = 0
+    for bit, peso in enumerate(pesos):
+        if peso > 0:
+            resultado |= 1 << bit
+
+    return resultado
+
+def distancia_hamming(a, b):
+    """
+    Calcula a distância de Hamming entre dois SimHashes.
+
+    Args:
+        a (int): Primeiro SimHash
+        b (int): Segundo SimHash
+
+    Returns:
+        int: Número de bits diferentes
+    """
+    return bin(a ^ b).count('1')
+
+def bandas_simhash(valor):
+    """
+    Divide o SimHash em bandas para indexação no banco de dados.
+
+    Args:
+        valor (int): SimHash
+
+    Returns:
+        list: Lista de tuplas (indice_banda, valor_banda)
+    """
+    mascara = (1 << BITS_POR_BANDA) - 1
+    return [
+        (indice, (valor >> (indice * BITS_POR_BANDA)) & mascara)
+        for indice in range(NUM_BANDAS)
+    ]
+
+def simhash_para_texto(valor):
+    """
+    Converte o SimHash para a representação armazenada no banco (hexadecimal).
+
+    Args:
+        valor (int): SimHash
+
+    Returns:
+        str: SimHash com 16 dígitos hexadecimais
+    """
+    return f"{valor:016x}"
+
+def texto_para_simhash(texto_hex):
+    """
+    Converte a representação armazenada no banco de volta para inteiro.
+
+    Args:
+        texto_hex (str): SimHash em hexadecimal
+
+    Returns:
+        int: SimHash
+    """
+    return int(texto_hex, 16)
+
+def calcular_impressao(texto):
+    """
+    Calcula a impressão digital completa de um conteúdo.
+
+    Args:
+        texto (str): Texto da página
+
+    Returns:
+        dict: {'hash_conteudo', 'simhash', 'bandas'}
+    """
+    valor = simhash(texto)
+
+    return {
+        'hash_conteudo': hash_conteudo(texto),
+        'simhash': simhash_para_texto(valor),
+        'bandas': bandas_simhash(valor)
+    }
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
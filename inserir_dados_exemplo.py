@@ -1,6 +1,7 @@
 import sqlite3
 import datetime
 import os
+from cadeia_auditoria import inserir_registros
 
 # Caminho do banco de dados
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onion_monitor.db')
@@ -85,15 +86,20 @@ def inserir_dados_exemplo():
                  score, metodo, observacoes, data_validacao)
             )
             
-            # Registra a ação no log de auditoria
-            cursor.execute(
-                'INSERT INTO auditoria (acao, descricao, dados) VALUES (?, ?, ?)',
-                (
-                    "inserir_exemplo" if not validado else "validar_exemplo",
-                    f"Inserção de dados de exemplo para o termo '{termo}'",
-                    f"Link: {link}, Fonte ID: {fonte_id}, Validado: {validado}"
-                )
-            )
+            # Registra a ação no log de auditoria (encadeada aos eventos anteriores)
+            inserir_registros(conn, [(
+                "inserir_exemplo" if not validado else "validar_exemplo",
+                f"Inserção de dados de exemplo para o termo '{termo}'",
+                f"Link: {link}, Fonte ID: {fonte_id}, Validado: {validado}",
+                'sistema',
+                datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            )])
+        
+        # Invalida os painéis em cache da aplicação (tabela criada por db.init_db)
+        try:
+            cursor.execute('UPDATE versao_dados SET versao = versao + 1 WHERE id = 1')
+        except sqlite3.OperationalError:
+            pass
         
         conn.commit()
         print(f"Inseridos {len(dados_exemplo)} registros de exemplo com sucesso.")
@@ -3,6 +3,9 @@ import logging
 import datetime
 import json
 import os
+from db import obter_contadores_auditoria
+from cadeia_auditoria import inserir_registros
+from escritor_db import escrita, conexao_lote
 
 # Configuração de logging
 logging.basicConfig(
@@ -16,19 +19,24 @@ logging.basicConfig(
 logger = logging.getLogger("integracao_auditoria")
 
 # Caminho do banco de dados
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onion_monitor.db')
+DB_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onion_monitor.db')
 
 def get_db_connection():
     """
-    Obtém uma conexão com o banco de dados.
+    Obtém uma conexão com o banco de dados (no serviço escritor, a do lote).
     
     Returns:
         sqlite3.Connection: Conexão com o banco de dados
     """
+    conn = conexao_lote()
+    if conn is not None:
+        return conn
+    
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
+@escrita
 def registrar_auditoria(acao, descricao, dados=None):
     """
     Registra uma ação no log de auditoria.
@@ -55,16 +63,15 @@ def registrar_auditoria(acao, descricao, dados=None):
                     descricao TEXT,
                     dados TEXT,
                     usuario TEXT DEFAULT 'sistema',
-                    data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    hash TEXT
                 )
             ''')
             logger.info("Tabela 'auditoria' criada.")
         
-        # Insere o registro de auditoria
-        cursor.execute(
-            'INSERT INTO auditoria (acao, descricao, dados) VALUES (?, ?, ?)',
-            (acao, descricao, dados)
-        )
+        # Insere o registro de auditoria encadeado ao anterior (data_hora em UTC, como CURRENT_TIMESTAMP)
+        data_hora = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        inserir_registros(conn, [(acao, descricao, dados, 'sistema', data_hora)])
         
         conn.commit()
         logger.info(f"Auditoria registrada com sucesso: {acao}")
@@ -76,104 +83,140 @@ def registrar_auditoria(acao, descricao, dados=None):
     finally:
         conn.close()
 
-def obter_relatorio_auditoria(periodo):
+# Eventos exibidos por página no relatório
+EVENTOS_POR_PAGINA = 50
+
+def calcular_data_inicio(periodo):
     """
-    Obtém um relatório de auditoria para o período especificado.
+    Calcula o início do período de um relatório de auditoria.
     
     Args:
-        periodo (str): Período do relatório ('hoje', 'semana', 'mes', 'tudo')
+        periodo (str): Período do relatório ('hoje', 'semana', 'mes', 'total')
         
     Returns:
-        dict: Relatório de auditoria
+        str: Data de início ('YYYY-MM-DD 00:00:00') ou None para todo o histórico
     """
-    logger.info(f"Gerando relatório de auditoria para o período: {periodo}")
+    agora = datetime.datetime.now()
+    
+    if periodo == 'hoje':
+        return agora.strftime('%Y-%m-%d 00:00:00')
+    elif periodo == 'semana':
+        return (agora - datetime.timedelta(days=7)).strftime('%Y-%m-%d 00:00:00')
+    elif periodo == 'mes':
+        return (agora - datetime.timedelta(days=30)).strftime('%Y-%m-%d 00:00:00')
     
+    # 'total' (ou período desconhecido): todo o histórico
+    return None
+
+def obter_totais_auditoria(data_inicio=None):
+    """
+    Conta os eventos de auditoria por tipo de ação, inteiramente em SQL.
+    
+    Soma os eventos da tabela auditoria (pelo índice de data_hora e acao, sem
+    ler as linhas), os contadores por minuto e os totais diários consolidados
+    pela retenção; o resultado tem uma linha por tipo de ação.
+    
+    Args:
+        data_inicio (str, optional): Considera apenas eventos a partir desta data. Defaults to None.
+        
+    Returns:
+        tuple: (total de eventos, lista de dicionários {'acao', 'quantidade'} em ordem decrescente)
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
     
     try:
-        # Define a data de início com base no período
-        data_inicio = None
-        
-        if periodo == 'hoje':
-            data_inicio = datetime.datetime.now().strftime('%Y-%m-%d 00:00:00')
-        elif periodo == 'semana':
-            data_inicio = (datetime.datetime.now() - datetime.timedelta(days=7)).strftime('%Y-%m-%d 00:00:00')
-        elif periodo == 'mes':
-            data_inicio = (datetime.datetime.now() - datetime.timedelta(days=30)).strftime('%Y-%m-%d 00:00:00')
-        elif periodo == 'total':
-            # Não define data_inicio para obter todos os registros
-            pass
-        
-        # Constrói a consulta SQL
-        query = 'SELECT * FROM auditoria'
+        query = 'SELECT acao, COUNT(*) AS quantidade FROM auditoria'
         params = []
         
         if data_inicio:
             query += ' WHERE data_hora >= ?'
             params.append(data_inicio)
         
-        query += ' ORDER BY data_hora DESC'
-        
-        # Executa a consulta
-        cursor.execute(query, params)
-        eventos = cursor.fetchall()
-        
-        # Converte para lista de dicionários
-        eventos_lista = []
-        for evento in eventos:
-            evento_dict = dict(evento)
-            eventos_lista.append(evento_dict)
-        
-        # Contagem por tipo de ação
-        cursor.execute('''
-            SELECT acao, COUNT(*) as quantidade
-            FROM auditoria
-            ''' + ('WHERE data_hora >= ?' if data_inicio else '') + '''
-            GROUP BY acao
-            ORDER BY quantidade DESC
-        ''', params if data_inicio else [])
-        
-        contagem_por_tipo = []
-        for tipo in cursor.fetchall():
-            contagem_por_tipo.append(dict(tipo))
-        
-        # Total de eventos
-        total_eventos = len(eventos_lista)
-        
-        # Se não houver eventos, cria um registro de exemplo para evitar página em branco
-        if total_eventos == 0:
-            # Registra um evento de visualização para garantir que haja pelo menos um registro
-            registrar_auditoria(
-                acao="visualizacao_relatorio",
-                descricao=f"Visualização do relatório de auditoria para o período '{periodo}'",
-                dados=f"Período: {periodo}, Data: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            )
-            
-            # Busca novamente os eventos após registrar o evento de visualização
-            cursor.execute(query, params)
-            eventos = cursor.fetchall()
-            
-            eventos_lista = []
-            for evento in eventos:
-                evento_dict = dict(evento)
-                eventos_lista.append(evento_dict)
-            
-            # Atualiza a contagem por tipo
-            cursor.execute('''
-                SELECT acao, COUNT(*) as quantidade
-                FROM auditoria
-                ''' + ('WHERE data_hora >= ?' if data_inicio else '') + '''
-                GROUP BY acao
-                ORDER BY quantidade DESC
-            ''', params if data_inicio else [])
-            
-            contagem_por_tipo = []
-            for tipo in cursor.fetchall():
-                contagem_por_tipo.append(dict(tipo))
-            
-            # Atualiza o total de eventos
-            total_eventos = len(eventos_lista)
+        query += ' GROUP BY acao'
+        
+        quantidades = {linha['acao']: linha['quantidade'] for linha in conn.execute(query, params)}
+        
+    finally:
+        conn.close()
+    
+    # Ações registradas apenas como contadores por minuto (ex.: visualizações de página)
+    # e eventos antigos já consolidados em totais diários pela retenção
+    for tipo in obter_contadores_auditoria(data_inicio):
+        quantidades[tipo['acao']] = quantidades.get(tipo['acao'], 0) + tipo['quantidade']
+    
+    contagem_por_tipo = [{'acao': acao, 'quantidade': quantidade} for acao, quantidade in quantidades.items()]
+    contagem_por_tipo.sort(key=lambda tipo: tipo['quantidade'], reverse=True)
+    
+    return sum(quantidades.values()), contagem_por_tipo
+
+def obter_eventos_auditoria(data_inicio=None, limite=EVENTOS_POR_PAGINA, antes_de_id=None):
+    """
+    Obtém uma página de eventos de auditoria, do mais recente para o mais antigo.
+    
+    A paginação é por chave (id), então o custo de cada página não depende de
+    quantas páginas vieram antes.
+    
+    Args:
+        data_inicio (str, optional): Considera apenas eventos a partir desta data. Defaults to None.
+        limite (int, optional): Eventos por página. Defaults to EVENTOS_POR_PAGINA.
+        antes_de_id (int, optional): Retorna apenas eventos com id menor (próxima página). Defaults to None.
+        
+    Returns:
+        tuple: (lista de eventos, id para a próxima página ou None na última página)
+    """
+    conn = get_db_connection()
+    
+    try:
+        query = 'SELECT * FROM auditoria WHERE 1=1'
+        params = []
+        
+        if data_inicio:
+            query += ' AND data_hora >= ?'
+            params.append(data_inicio)
+        
+        if antes_de_id:
+            query += ' AND id < ?'
+            params.append(antes_de_id)
+        
+        # Um evento a mais indica se existe próxima página
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(limite + 1)
+        
+        eventos = [dict(evento) for evento in conn.execute(query, params).fetchall()]
+        
+    finally:
+        conn.close()
+    
+    if len(eventos) > limite:
+        eventos = eventos[:limite]
+        return eventos, eventos[-1]['id']
+    
+    return eventos, None
+
+def obter_relatorio_auditoria(periodo, limite_eventos=EVENTOS_POR_PAGINA, antes_de_id=None):
+    """
+    Obtém um relatório de auditoria para o período especificado.
+    
+    Os totais cobrem todo o período e são calculados no banco; os eventos
+    trazem apenas uma página (ver obter_eventos_auditoria).
+    
+    Args:
+        periodo (str): Período do relatório ('hoje', 'semana', 'mes', 'total')
+        limite_eventos (int, optional): Eventos da página (0 para nenhum). Defaults to EVENTOS_POR_PAGINA.
+        antes_de_id (int, optional): Página de eventos com id menor que este. Defaults to None.
+        
+    Returns:
+        dict: Relatório de auditoria
+    """
+    logger.info(f"Gerando relatório de auditoria para o período: {periodo}")
+    
+    try:
+        data_inicio = calcular_data_inicio(periodo)
+        total_eventos, contagem_por_tipo = obter_totais_auditoria(data_inicio)
+        
+        eventos, proximo_id = [], None
+        if limite_eventos:
+            eventos, proximo_id = obter_eventos_auditoria(data_inicio, limite_eventos, antes_de_id)
         
         # Monta o relatório
         relatorio = {
@@ -182,7 +225,8 @@ def obter_relatorio_auditoria(periodo):
             'data_fim': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'total_eventos': total_eventos,
             'contagem_por_tipo': contagem_por_tipo,
-            'eventos': eventos_lista
+            'eventos': eventos,
+            'proximo_id': proximo_id
         }
         
         logger.info(f"Relatório gerado com sucesso: {total_eventos} eventos")
@@ -196,50 +240,64 @@ def obter_relatorio_auditoria(periodo):
             'erro': str(e),
             'total_eventos': 0,
             'contagem_por_tipo': [],
-            'eventos': []
+            'eventos': [],
+            'proximo_id': None
         }
-    
-    finally:
-        conn.close()
 
 def exportar_relatorio_csv(periodo, filepath):
     """
-    Exporta um relatório de auditoria para CSV.
+    Exporta para CSV os eventos de auditoria do período ainda na tabela
+    auditoria (os arquivados pela retenção estão nos arquivos mensais).
+    
+    Os eventos são lidos do cursor e gravados um a um, sem carregar o período
+    inteiro em memória.
     
     Args:
-        periodo (str): Período do relatório ('hoje', 'semana', 'mes', 'tudo')
+        periodo (str): Período do relatório ('hoje', 'semana', 'mes', 'total')
         filepath (str): Caminho do arquivo CSV
+        
+    Returns:
+        int: Quantidade de eventos exportados
     """
     logger.info(f"Exportando relatório de auditoria para CSV: {filepath}")
     
-    relatorio = obter_relatorio_auditoria(periodo)
+    data_inicio = calcular_data_inicio(periodo)
+    conn = get_db_connection()
     
     try:
         import csv
         
+        query = 'SELECT id, data_hora, acao, descricao, dados, usuario FROM auditoria'
+        params = []
+        
+        if data_inicio:
+            query += ' WHERE data_hora >= ?'
+            params.append(data_inicio)
+        
+        query += ' ORDER BY id DESC'
+        
+        exportados = 0
         with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            # Define os campos do CSV
-            fieldnames = ['id', 'data_hora', 'acao', 'descricao', 'dados', 'usuario']
-            
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
+            writer = csv.writer(csvfile)
+            writer.writerow(['id', 'data_hora', 'acao', 'descricao', 'dados', 'usuario'])
             
-            for evento in relatorio['eventos']:
-                # Escreve cada evento como uma linha no CSV
-                writer.writerow({
-                    'id': evento['id'],
-                    'data_hora': evento['data_hora'],
-                    'acao': evento['acao'],
-                    'descricao': evento['descricao'],
-                    'dados': evento['dados'],
-                    'usuario': evento.get('usuario', 'sistema')
-                })
-        
-        logger.info(f"Exportados {len(relatorio['eventos'])} eventos para {filepath}")
+            for evento in conn.execute(query, params):
+                writer.writerow([
+                    evento['id'], evento['data_hora'], evento['acao'],
+                    evento['descricao'], evento['dados'], evento['usuario'] or 'sistema'
+                ])
+                exportados += 1
+        
+        logger.info(f"Exportados {exportados} eventos para {filepath}")
+        
+        return exportados
         
     except Exception as e:
         logger.error(f"Erro ao exportar relatório para CSV: {str(e)}")
         raise
+        
+    finally:
+        conn.close()
 
 # Desenvolvido por Luiz Vaisconcelos
 # Email: luiz.vaisconcelos@gmail.com
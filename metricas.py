@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+import functools
+import contextlib
+import contextvars
+
+try:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Histogram, Gauge,
+        generate_latest, push_to_gateway, CONTENT_TYPE_LATEST
+    )
+    PROMETHEUS_DISPONIVEL = True
+except ImportError:
+    PROMETHEUS_DISPONIVEL = False
+
+logger = logging.getLogger("metricas")
+
+# Endereço do Pushgateway usado por processos de curta duração (ex.: busca_agendada.py)
+PUSHGATEWAY = os.environ.get('PROMETHEUS_PUSHGATEWAY', '')
+
+# Faixas dos histogramas (segundos)
+FAIXAS_REQUISICAO = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+FAIXAS_RAPIDAS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+FAIXAS_BUSCA = (1, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+class _MetricaNula:
+    """Substituta das métricas quando o prometheus_client não está instalado."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, valor):
+        pass
+
+    def inc(self, valor=1):
+        pass
+
+    def set(self, valor):
+        pass
+
+if PROMETHEUS_DISPONIVEL:
+    REGISTRO = CollectorRegistry()
+
+    LATENCIA_FONTE = Histogram(
+        'onion_monitor_requisicao_fonte_segundos', 'Latência das requisições às fontes (até o fim da leitura do corpo)',
+        ['fonte'], buckets=FAIXAS_REQUISICAO, registry=REGISTRO
+    )
+    REQUISICOES_FONTE = Counter(
+        'onion_monitor_requisicoes_fonte_total', 'Requisições às fontes por status HTTP',
+        ['fonte', 'status'], registry=REGISTRO
+    )
+    BYTES_FONTE = Counter(
+        'onion_monitor_bytes_fonte_total', 'Bytes lidos das fontes',
+        ['fonte'], registry=REGISTRO
+    )
+    DURACAO_VALIDACAO = Histogram(
+        'onion_monitor_validacao_segundos', 'Duração das validações de resultados',
+        ['metodo'], buckets=FAIXAS_RAPIDAS + FAIXAS_REQUISICAO[4:], registry=REGISTRO
+    )
+    DURACAO_ESCRITA_DB = Histogram(
+        'onion_monitor_db_escrita_segundos', 'Duração das operações de escrita no banco',
+        ['operacao'], buckets=FAIXAS_RAPIDAS, registry=REGISTRO
+    )
+    DURACAO_COMMIT_DB = Histogram(
+        'onion_monitor_db_commit_segundos', 'Duração dos commits no banco',
+        ['operacao'], buckets=FAIXAS_RAPIDAS, registry=REGISTRO
+    )
+    FILA_AUDITORIA = Gauge(
+        'onion_monitor_fila_auditoria', 'Eventos e contadores de auditoria aguardando gravação',
+        registry=REGISTRO
+    )
+    AUDITORIA_DESCARTADA = Counter(
+        'onion_monitor_auditoria_descartada_total', 'Eventos e contadores de auditoria descartados com o buffer cheio',
+        registry=REGISTRO
+    )
+    DURACAO_BUSCA = Histogram(
+        'onion_monitor_busca_segundos', 'Duração das buscas por termo',
+        ['origem', 'status'], buckets=FAIXAS_BUSCA, registry=REGISTRO
+    )
+else:
+    REGISTRO = None
+    LATENCIA_FONTE = REQUISICOES_FONTE = BYTES_FONTE = _MetricaNula()
+    DURACAO_VALIDACAO = DURACAO_ESCRITA_DB = DURACAO_COMMIT_DB = _MetricaNula()
+    FILA_AUDITORIA = AUDITORIA_DESCARTADA = DURACAO_BUSCA = _MetricaNula()
+
+# Medição de requisição em andamento no contexto atual (preenchida por contabilizar_bytes)
+_requisicao_atual = contextvars.ContextVar('requisicao_metricas', default=None)
+
+@contextlib.contextmanager
+def medir(histograma, **rotulos):
+    """
+    Mede a duração de um bloco em um histograma.
+
+    Args:
+        histograma: Histograma de destino
+        **rotulos: Rótulos do histograma
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograma.labels(**rotulos).observe(time.perf_counter() - inicio)
+
+def cronometrar(histograma, **rotulos):
+    """
+    Decorador que mede a duração de cada chamada da função em um histograma.
+
+    Args:
+        histograma: Histograma de destino
+        **rotulos: Rótulos do histograma
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            with medir(histograma, **rotulos):
+                return funcao(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+@contextlib.contextmanager
+def medir_requisicao(fonte):
+    """
+    Mede uma requisição a uma fonte: latência, status e bytes lidos.
+
+    O bloco deve preencher medicao['status'] com o status HTTP; os bytes são
+    contabilizados por ler_corpo_limitado() através de contabilizar_bytes().
+
+    Args:
+        fonte (str): Nome da fonte (rótulo de baixa cardinalidade, nunca o host)
+
+    Yields:
+        dict: Medição {'status', 'bytes'}
+    """
+    medicao = {'status': 'erro', 'bytes': 0}
+    token = _requisicao_atual.set(medicao)
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    finally:
+        _requisicao_atual.reset(token)
+        LATENCIA_FONTE.labels(fonte=fonte).observe(time.perf_counter() - inicio)
+        REQUISICOES_FONTE.labels(fonte=fonte, status=str(medicao['status'])).inc()
+        if medicao['bytes']:
+            BYTES_FONTE.labels(fonte=fonte).inc(medicao['bytes'])
+
+def contabilizar_bytes(quantidade):
+    """
+    Soma bytes lidos à requisição medida no contexto atual (se houver).
+
+    Args:
+        quantidade (int): Bytes lidos
+    """
+    medicao = _requisicao_atual.get()
+    if medicao is not None:
+        medicao['bytes'] += quantidade
+
+def gerar_metricas():
+    """
+    Gera a exposição das métricas no formato texto do Prometheus.
+
+    Returns:
+        tuple: (corpo, content_type) ou (None, None) se o prometheus_client não estiver instalado
+    """
+    if not PROMETHEUS_DISPONIVEL:
+        return None, None
+    return generate_latest(REGISTRO), CONTENT_TYPE_LATEST
+
+def enviar_metricas(job):
+    """
+    Envia as métricas do processo ao Pushgateway configurado em PROMETHEUS_PUSHGATEWAY.
+
+    Args:
+        job (str): Nome do job no Pushgateway
+
+    Returns:
+        bool: True se as métricas foram enviadas
+    """
+    if not PROMETHEUS_DISPONIVEL or not PUSHGATEWAY:
+        return False
+
+    try:
+        push_to_gateway(PUSHGATEWAY, job=job, registry=REGISTRO)
+        logger.info(f"Métricas do job '{job}' enviadas para {PUSHGATEWAY}")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao enviar métricas para o Pushgateway: {str(e)}")
+        return False
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -26,10 +26,12 @@ import logging
 import os
 import shutil
 import hashlib
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, List, Tuple, Optional
 from contextlib import contextmanager
 
+from cadeia_auditoria import inserir_registros
+
 
 class OnionMonitorMigrator:
     """
@@ -248,7 +250,9 @@ class OnionMonitorMigrator:
                     data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     usuario TEXT DEFAULT 'sistema',
                     ip_origem TEXT,
-                    resultado TEXT DEFAULT 'sucesso'
+                    resultado TEXT DEFAULT 'sucesso',
+                    data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    hash TEXT
                 )
             """,
             
@@ -418,16 +422,21 @@ class OnionMonitorMigrator:
             else:
                 self.logger.info("Fontes já existem, pulando inserção de dados padrão")
                 
-            # Registra ação de migração na auditoria
-            audit_sql = """
-                INSERT INTO auditoria (acao, descricao, dados) 
-                VALUES (?, ?, ?)
-            """
-            cursor.execute(audit_sql, (
+            # Tabela auditoria criada por versões anteriores: colunas da cadeia de hashes
+            cursor.execute("PRAGMA table_info(auditoria)")
+            existing_columns = [row[1] for row in cursor.fetchall()]
+            for column_name, column_type in [('usuario', "TEXT DEFAULT 'sistema'"), ('data_hora', 'TIMESTAMP'), ('hash', 'TEXT')]:
+                if column_name not in existing_columns:
+                    cursor.execute(f"ALTER TABLE auditoria ADD COLUMN {column_name} {column_type}")
+                    
+            # Registra ação de migração na auditoria, encadeada aos eventos anteriores
+            inserir_registros(conn, [(
                 'MIGRAÇÃO_V3',
                 'Migração completa para Onion Monitor v3',
-                f'Versão: {self.target_version}, Data: {datetime.now().isoformat()}'
-            ))
+                f'Versão: {self.target_version}, Data: {datetime.now().isoformat()}',
+                'sistema',
+                datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            )])
             
             conn.commit()
             self.logger.info("Dados padrão inseridos com sucesso")
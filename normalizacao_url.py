@@ -0,0 +1,259 @@
+import re
+import base64
+import hashlib
+import logging
+import posixpath
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger("normalizacao_url")
+
+# Parâmetros de rastreamento removidos da query string
+PARAMETROS_RASTREAMENTO = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'ref_src'
+}
+PREFIXOS_RASTREAMENTO = ('utm_',)
+
+# Parâmetros usados por buscadores (ex.: Ahmia) para redirecionar ao link real
+PARAMETROS_REDIRECIONAMENTO = ('redirect_url',)
+
+ESQUEMAS_SUPORTADOS = ('http', 'https')
+PORTAS_PADRAO = {'http': 80, 'https': 443}
+
+_RE_BARRAS = re.compile(r'/{2,}')
+_RE_ONION_V3 = re.compile(r'^[a-z2-7]{56}$')
+
+def endereco_onion_v3_valido(host):
+    """
+    Verifica se um host é um endereço .onion v3 válido (versão e checksum).
+
+    Args:
+        host (str): Host da URL (ex.: xxxx.onion ou sub.xxxx.onion)
+
+    Returns:
+        bool: True se o endereço for um onion v3 válido
+    """
+    host = (host or '').lower().rstrip('.')
+    if not host.endswith('.onion'):
+        return False
+
+    # Considera apenas o rótulo imediatamente antes de ".onion" (subdomínios são permitidos)
+    rotulo = host[:-len('.onion')].split('.')[-1]
+    if not _RE_ONION_V3.match(rotulo):
+        return False
+
+    try:
+        decodificado = base64.b32decode(rotulo.upper())
+    except Exception:
+        return False
+
+    chave_publica, checksum, versao = decodificado[:32], decodificado[32:34], decodificado[34:]
+    if versao != b'\x03':
+        return False
+
+    esperado = hashlib.sha3_256(b'.onion checksum' + chave_publica + versao).digest()[:2]
+    return checksum == esperado
+
+def eh_onion(url):
+    """
+    Verifica se a URL aponta para um host .onion.
+
+    Args:
+        url (str): URL
+
+    Returns:
+        bool: True se o host terminar em .onion
+    """
+    try:
+        host = urlsplit(url).hostname or ''
+    except ValueError:
+        return False
+    return host.rstrip('.').endswith('.onion')
+
+def extrair_host(url):
+    """
+    Extrai o host (minúsculo) de uma URL.
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: Host da URL ou string vazia
+    """
+    try:
+        return (urlsplit(url).hostname or '').rstrip('.')
+    except ValueError:
+        return ''
+
+def _parametro_rastreamento(nome):
+    nome = nome.lower()
+    return nome in PARAMETROS_RASTREAMENTO or nome.startswith(PREFIXOS_RASTREAMENTO)
+
+def _normalizar_caminho(caminho):
+    """
+    Remove barras duplicadas e resolve segmentos '.' e '..' do caminho.
+
+    Args:
+        caminho (str): Caminho da URL
+
+    Returns:
+        str: Caminho normalizado
+    """
+    if not caminho:
+        return '/'
+
+    caminho = _RE_BARRAS.sub('/', caminho)
+    termina_com_barra = caminho.endswith('/')
+
+    normalizado = posixpath.normpath(caminho)
+    if not normalizado.startswith('/'):
+        normalizado = '/' + normalizado
+    normalizado = _RE_BARRAS.sub('/', normalizado)
+
+    if termina_com_barra and not normalizado.endswith('/'):
+        normalizado += '/'
+
+    return normalizado
+
+def desembrulhar_redirecionamento(url):
+    """
+    Extrai o link real de URLs de redirecionamento de buscadores.
+
+    Args:
+        url (str): URL (possivelmente de redirecionamento)
+
+    Returns:
+        str: URL de destino, ou a própria URL se não houver redirecionamento
+    """
+    try:
+        partes = urlsplit(url)
+    except ValueError:
+        return url
+
+    for nome, valor in parse_qsl(partes.query, keep_blank_values=True):
+        if nome in PARAMETROS_REDIRECIONAMENTO and valor.lower().startswith(ESQUEMAS_SUPORTADOS):
+            return valor
+
+    return url
+
+def canonicalizar_url(url, base=None):
+    """
+    Converte um link na sua forma canônica, usada antes de deduplicar e de buscar.
+
+    - resolve links relativos com urljoin
+    - coloca esquema e host em minúsculas e remove portas padrão
+    - usa sempre http para hosts .onion (o transporte já é cifrado pelo Tor)
+    - remove barras duplicadas, segmentos '.'/'..' e o fragmento (#...)
+    - remove parâmetros de rastreamento e ordena os demais
+
+    Args:
+        url (str): Link (absoluto ou relativo)
+        base (str, optional): URL da página onde o link foi encontrado. Defaults to None.
+
+    Returns:
+        str: URL canônica ou None se o link não for http(s)
+    """
+    if not url:
+        return None
+
+    url = url.strip()
+    if base:
+        url = urljoin(base, url)
+
+    try:
+        partes = urlsplit(url)
+        porta = partes.port
+    except ValueError:
+        logger.debug(f"URL inválida ignorada: {url}")
+        return None
+
+    esquema = partes.scheme.lower()
+    if esquema not in ESQUEMAS_SUPORTADOS or not partes.hostname:
+        return None
+
+    host = partes.hostname.rstrip('.')
+    if host.endswith('.onion'):
+        esquema = 'http'
+        if porta == PORTAS_PADRAO['https']:
+            porta = None
+
+    netloc = f"[{host}]" if ':' in host else host
+    if porta and porta != PORTAS_PADRAO[esquema]:
+        netloc = f"{netloc}:{porta}"
+
+    parametros = [
+        (nome, valor)
+        for nome, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if not _parametro_rastreamento(nome)
+    ]
+    query = urlencode(sorted(parametros))
+
+    return urlunsplit((esquema, netloc, _normalizar_caminho(partes.path), query, ''))
+
+def link_coletavel(url):
+    """
+    Verifica se uma URL canônica pode ser buscada: hosts .onion precisam ser v3 válidos.
+
+    Args:
+        url (str): URL canônica
+
+    Returns:
+        bool: True se o link puder ser buscado
+    """
+    if not url:
+        return False
+
+    host = extrair_host(url)
+    if host.endswith('.onion'):
+        return endereco_onion_v3_valido(host)
+
+    return True
+
+def normalizar_link(link, base=None):
+    """
+    Resolve, desembrulha e canonicaliza um link encontrado em uma página.
+
+    Args:
+        link (str): Link encontrado (href)
+        base (str, optional): URL da página onde o link foi encontrado
+
+    Returns:
+        str: URL canônica ou None se o link não puder ser coletado
+    """
+    if not link:
+        return None
+
+    absoluto = urljoin(base, link.strip()) if base else link.strip()
+    canonico = canonicalizar_url(desembrulhar_redirecionamento(absoluto))
+
+    return canonico if link_coletavel(canonico) else None
+
+def normalizar_links(links, base=None):
+    """
+    Canonicaliza uma lista de links, removendo inválidos e duplicados (mantém a ordem).
+
+    Args:
+        links (list): Links encontrados na página
+        base (str, optional): URL da página onde os links foram encontrados
+
+    Returns:
+        list: Links canônicos únicos
+    """
+    vistos = set()
+    resultado = []
+
+    for link in links:
+        canonico = normalizar_link(link, base)
+
+        if not canonico or canonico in vistos:
+            continue
+
+        vistos.add(canonico)
+        resultado.append(canonico)
+
+    return resultado
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
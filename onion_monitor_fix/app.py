@@ -1,9 +1,11 @@
 import os
+import sys
 import logging
 import csv
 import datetime
 import json
 import io
+import hashlib
 from io import TextIOWrapper
 from db import (
     init_db, get_db_connection, obter_fontes, adicionar_fonte, 
@@ -13,7 +15,15 @@ from db import (
 )
 from coletor import buscar_termo, validar_vazamento_rigoroso, verificar_status_fonte, buscar_em_todas_fontes
 from busca_valida_semantica import buscar_e_validar_termo, validar_semanticamente
-from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify, stream_with_context, make_response
+
+# As buscas em segundo plano usam tarefas.py e eventos.py da raiz do projeto; a
+# raiz entra no fim do caminho, então os módulos desta árvore (db, coletor) são
+# os que eles importam
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tarefas import submeter_lote, obter_lote, iterar_resultados_lote, FilaCheiaError
+from cache_versionado import etag_versao
+from compressao import configurar_compressao, etag_corresponde
 
 # Configuração de logging
 logging.basicConfig(
@@ -30,9 +40,52 @@ logger = logging.getLogger("app")
 app = Flask(__name__)
 app.secret_key = 'onion_monitor_v2_secret_key'
 
+# ETag e compressão gzip/brotli das respostas HTML e JSON
+configurar_compressao(app)
+
 # Inicializa o banco de dados
 init_db()
 
+# Versão de cada tabela lida antes de renderizar: muda a cada inclusão, exclusão
+# ou (em fontes) verificação de status
+_CONSULTAS_VERSAO = {
+    'fontes': "SELECT COUNT(*), MAX(id), MAX(ultimo_check), TOTAL(ativo), GROUP_CONCAT(status) FROM fontes",
+    'resultados': "SELECT MIN(id), MAX(id) FROM resultados",
+    'auditoria': "SELECT MIN(id), MAX(id) FROM auditoria",
+}
+
+def _versao_tabela(tabela):
+    conn = get_db_connection()
+    try:
+        return '-'.join(str(valor or 0) for valor in conn.execute(_CONSULTAS_VERSAO[tabela]).fetchone())
+    finally:
+        conn.close()
+
+def _resposta_versionada(chave, tabela, gerar):
+    """
+    Responde com ETag derivado da versão da tabela, ou 304 sem executar as
+    consultas e o template quando o cliente já tem essa versão (If-None-Match).
+
+    Args:
+        chave (str): Identificador da resposta
+        tabela (str): Tabela de que a resposta depende (ver _CONSULTAS_VERSAO)
+        gerar (callable): Função sem argumentos que gera o corpo da resposta
+
+    Returns:
+        Response: Resposta completa ou 304
+    """
+    # O hash da versão mantém o ETag curto (GROUP_CONCAT de fontes)
+    etag = etag_versao(chave, hashlib.sha1(_versao_tabela(tabela).encode('utf-8')).hexdigest()[:16])
+
+    if etag_corresponde(request.if_none_match, etag):
+        resposta = make_response('', 304)
+    else:
+        resposta = make_response(gerar())
+
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     """Página inicial com busca e resultados."""
@@ -78,12 +131,13 @@ def resultados():
     """Página de resultados de validação semântica."""
     termo = request.args.get('termo', '')
     
-    # Obtém os resultados de validação semântica
-    resultados_semanticos = obter_resultados(termo=termo, limite=100)
-    
-    return render_template('resultados.html', 
-                          termo=termo, 
-                          resultados=resultados_semanticos)
+    # Os resultados de validação semântica só são lidos quando o cliente não tem esta versão
+    return _resposta_versionada(
+        'resultados', 'resultados',
+        lambda: render_template('resultados.html',
+                                termo=termo,
+                                resultados=obter_resultados(termo=termo, limite=100))
+    )
 
 @app.route('/analise')
 def analise():
@@ -309,10 +363,11 @@ def instrucoes_agendamento():
 @app.route('/registros')
 def registros_auditoria():
     """Página de registros de auditoria."""
-    # Obtém os registros de auditoria
-    registros = obter_registros_auditoria(limite=100)
-    
-    return render_template('registros.html', registros=registros)
+    # Os registros de auditoria só são lidos quando o cliente não tem esta versão
+    return _resposta_versionada(
+        'registros', 'auditoria',
+        lambda: render_template('registros.html', registros=obter_registros_auditoria(limite=100))
+    )
 
 @app.route('/relatorio-auditoria')
 def relatorio_auditoria():
@@ -332,29 +387,35 @@ def relatorio_auditoria():
 
 @app.route('/api/buscar', methods=['POST'])
 def api_buscar():
-    """API para busca de termos."""
-    data = request.get_json()
+    """
+    API para busca de termos em lote.
     
-    if not data or 'termo' not in data:
+    Aceita {"termos": [...]} ou {"termo": "..."} e responde 202 com o
+    identificador do lote; a busca roda em segundo plano e termos repetidos
+    ou já em busca são agrupados em uma única execução.
+    """
+    data = request.get_json(silent=True) or {}
+    termos = data.get('termos')
+    
+    if termos is None and data.get('termo'):
+        termos = [data['termo']]
+    
+    if not isinstance(termos, list) or not termos:
         return jsonify({
             'success': False,
-            'error': 'Parâmetro "termo" obrigatório'
+            'error': 'Parâmetro "termos" (lista) ou "termo" obrigatório'
         }), 400
     
-    termo = data['termo']
-    usar_validacao_semantica = data.get('validacao_semantica', True)
+    opcoes = {'usar_validacao_semantica': bool(data.get('validacao_semantica', True))}
     
     try:
-        # Realiza a busca
-        resultados = buscar_em_todas_fontes(termo, usar_validacao_semantica=usar_validacao_semantica)
-        
-        return jsonify({
-            'success': True,
-            'termo': termo,
-            'resultados': resultados,
-            'total': len(resultados),
-            'validados': sum(1 for r in resultados if r.get('validado', False))
-        })
+        lote = submeter_lote(termos, opcoes=opcoes)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FilaCheiaError as e:
+        resposta = jsonify({'success': False, 'error': str(e)})
+        resposta.headers['Retry-After'] = '60'
+        return resposta, 503
     except Exception as e:
         logger.error(f"Erro na API de busca: {str(e)}")
         
@@ -362,19 +423,69 @@ def api_buscar():
             'success': False,
             'error': str(e)
         }), 500
+    
+    registrar_auditoria(
+        acao="api_buscar_lote",
+        descricao=f"Lote de busca enviado pela API: {lote['lote_id']}",
+        dados=f"Termos: {len(lote['termos'])}, Agrupados: {sum(1 for t in lote['termos'] if t['coalescida'])}"
+    )
+    
+    return jsonify({
+        'success': True,
+        'lote_id': lote['lote_id'],
+        'termos': lote['termos'],
+        'status_url': url_for('api_lote', lote_id=lote['lote_id']),
+        'resultados_url': url_for('api_lote_resultados', lote_id=lote['lote_id'])
+    }), 202
+
+@app.route('/api/buscar/<lote_id>', methods=['GET'])
+def api_lote(lote_id):
+    """Estado de um lote, com as tarefas paginadas (?pagina=N&por_pagina=M)."""
+    pagina = request.args.get('pagina', 1, type=int)
+    por_pagina = min(request.args.get('por_pagina', 100, type=int), 500)
+    
+    lote = obter_lote(lote_id, pagina=pagina, por_pagina=por_pagina)
+    if not lote:
+        return jsonify({'success': False, 'error': 'Lote não encontrado'}), 404
+    
+    return jsonify(lote)
+
+@app.route('/api/buscar/<lote_id>/resultados', methods=['GET'])
+def api_lote_resultados(lote_id):
+    """
+    Resultados do lote em NDJSON (um objeto JSON por linha).
+    
+    Com ?aguardar=1 a resposta permanece aberta e envia os resultados à medida
+    que são persistidos, terminando quando todas as buscas do lote acabarem.
+    """
+    if not obter_lote(lote_id, por_pagina=0):
+        return jsonify({'success': False, 'error': 'Lote não encontrado'}), 404
+    
+    aguardar = request.args.get('aguardar', '0').lower() in ['1', 'true', 'sim']
+    
+    def gerar():
+        for item in iterar_resultados_lote(lote_id, aguardar=aguardar):
+            yield json.dumps(item, default=str) + '\n'
+    
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/fontes', methods=['GET'])
 def api_fontes():
     """API para obtenção de fontes."""
     try:
-        # Obtém as fontes
-        fontes = obter_fontes(apenas_ativas=request.args.get('apenas_ativas') == '1')
+        def gerar():
+            fontes = obter_fontes(apenas_ativas=request.args.get('apenas_ativas') == '1')
+            return jsonify({
+                'success': True,
+                'fontes': fontes,
+                'total': len(fontes)
+            })
         
-        return jsonify({
-            'success': True,
-            'fontes': fontes,
-            'total': len(fontes)
-        })
+        return _resposta_versionada('fontes', 'fontes', gerar)
     except Exception as e:
         logger.error(f"Erro na API de fontes: {str(e)}")
         
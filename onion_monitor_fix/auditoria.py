@@ -1,6 +1,7 @@
 import logging
 import datetime
 import os
+from arquivo_rotativo import obter_arquivo
 
 # Configuração de logging para auditoria
 logging.basicConfig(
@@ -66,20 +67,17 @@ class AuditoriaManager:
     
     def _registrar_em_arquivo(self, tipo_evento, log_entry):
         """
-        Registra o evento em um arquivo de log específico para o tipo.
+        Registra o evento como uma linha JSON no arquivo do tipo (logs/{tipo_evento}.jsonl).
+        
+        O arquivo fica aberto entre os eventos, com escrita em buffer e fsync
+        periódico, e é rotacionado e comprimido por tamanho ou dia (ver arquivo_rotativo).
         
         Args:
             tipo_evento (str): Tipo do evento
             log_entry (dict): Dados do evento
         """
-        log_file = os.path.join(self.log_dir, f"{tipo_evento}.log")
-        
         try:
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"{log_entry['timestamp']} - {log_entry['usuario']} - {log_entry['descricao']}")
-                if log_entry['dados']:
-                    f.write(f" - Dados: {log_entry['dados']}")
-                f.write("\n")
+            obter_arquivo(os.path.join(self.log_dir, f"{tipo_evento}.jsonl")).escrever(log_entry)
         except Exception as e:
             logger.error(f"Erro ao registrar em arquivo de log: {str(e)}")
     
@@ -109,6 +107,38 @@ class AuditoriaManager:
         except Exception as e:
             logger.error(f"Erro ao registrar em banco de dados: {str(e)}")
     
+    def _consulta_eventos(self, colunas, tipo_evento=None, data_inicio=None, data_fim=None):
+        """
+        Monta a consulta de eventos com os filtros, em ordem decrescente de data.
+        
+        Args:
+            colunas (str): Colunas selecionadas
+            tipo_evento (str, optional): Filtrar por tipo de evento
+            data_inicio (str, optional): Data de início (formato YYYY-MM-DD)
+            data_fim (str, optional): Data de fim (formato YYYY-MM-DD)
+            
+        Returns:
+            tuple: (consulta SQL, parâmetros)
+        """
+        query = f'SELECT {colunas} FROM auditoria WHERE 1=1'
+        params = []
+        
+        if tipo_evento:
+            query += ' AND acao = ?'
+            params.append(tipo_evento)
+        
+        if data_inicio:
+            query += ' AND DATE(data_registro) >= DATE(?)'
+            params.append(data_inicio)
+        
+        if data_fim:
+            query += ' AND DATE(data_registro) <= DATE(?)'
+            params.append(data_fim)
+        
+        query += ' ORDER BY data_registro DESC'
+        
+        return query, params
+    
     def obter_eventos(self, tipo_evento=None, data_inicio=None, data_fim=None, limite=1000):
         """
         Obtém eventos de auditoria do banco de dados com filtros.
@@ -129,22 +159,8 @@ class AuditoriaManager:
         try:
             cursor = self.db_connection.cursor()
             
-            query = 'SELECT * FROM auditoria WHERE 1=1'
-            params = []
-            
-            if tipo_evento:
-                query += ' AND acao = ?'
-                params.append(tipo_evento)
-            
-            if data_inicio:
-                query += ' AND DATE(data_registro) >= DATE(?)'
-                params.append(data_inicio)
-            
-            if data_fim:
-                query += ' AND DATE(data_registro) <= DATE(?)'
-                params.append(data_fim)
-            
-            query += ' ORDER BY data_registro DESC LIMIT ?'
+            query, params = self._consulta_eventos('*', tipo_evento, data_inicio, data_fim)
+            query += ' LIMIT ?'
             params.append(limite)
             
             cursor.execute(query, params)
@@ -159,6 +175,9 @@ class AuditoriaManager:
         """
         Exporta eventos de auditoria para um arquivo CSV.
         
+        Os eventos são lidos do cursor em lotes e gravados à medida que chegam,
+        sem limite de quantidade e sem carregar o período inteiro em memória.
+        
         Args:
             arquivo_saida (str): Caminho do arquivo de saída
             tipo_evento (str, optional): Filtrar por tipo de evento
@@ -168,21 +187,36 @@ class AuditoriaManager:
         Returns:
             bool: True se a exportação foi bem-sucedida, False caso contrário
         """
-        eventos = self.obter_eventos(tipo_evento, data_inicio, data_fim, limite=10000)
-        
-        if not eventos:
-            logger.warning("Nenhum evento para exportar")
+        if not self.db_connection:
+            logger.error("Sem conexão com o banco de dados para exportar eventos")
             return False
         
         try:
             import csv
             
+            colunas = ['id', 'acao', 'descricao', 'dados', 'data_registro']
+            query, params = self._consulta_eventos(', '.join(colunas), tipo_evento, data_inicio, data_fim)
+            cursor = self.db_connection.cursor()
+            cursor.arraysize = 10000
+            cursor.execute(query, params)
+            
+            exportados = 0
             with open(arquivo_saida, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=['id', 'acao', 'descricao', 'dados', 'data_registro'])
-                writer.writeheader()
-                writer.writerows(eventos)
+                writer = csv.writer(f)
+                writer.writerow(colunas)
+                
+                while True:
+                    eventos = cursor.fetchmany()
+                    if not eventos:
+                        break
+                    writer.writerows(tuple(evento) for evento in eventos)
+                    exportados += len(eventos)
+            
+            if not exportados:
+                logger.warning("Nenhum evento para exportar")
+                return False
             
-            logger.info(f"Exportados {len(eventos)} eventos para {arquivo_saida}")
+            logger.info(f"Exportados {exportados} eventos para {arquivo_saida}")
             return True
         except Exception as e:
             logger.error(f"Erro ao exportar eventos: {str(e)}")
@@ -1,9 +1,13 @@
 import requests
 import logging
 import re
+import os
+import html
+import codecs
 from bs4 import BeautifulSoup
 import datetime
 from db import registrar_coleta, registrar_auditoria
+from normalizacao_url import canonicalizar_url
 
 # Configuração de logging
 logging.basicConfig(
@@ -16,6 +20,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger("busca_semantica")
 
+# Limite de bytes lidos por página (dumps de vazamentos podem ter centenas de MB)
+MAX_BYTES_PAGINA = int(os.environ.get('ONION_MAX_BYTES_PAGINA', 10 * 1024 * 1024))
+
+# Tamanho dos blocos lidos da rede
+TAMANHO_CHUNK = 64 * 1024
+
+# Quantidade de caracteres de contexto antes e depois do termo
+JANELA_CONTEXTO = 100
+
+# Tamanho máximo de trecho HTML incompleto (tag ou bloco <script>) mantido entre blocos
+MAX_HTML_PENDENTE = 256 * 1024
+
+_RE_BLOCOS_INVISIVEIS = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_RE_BLOCO_INVISIVEL_ABERTO = re.compile(r'<(script|style)\b', re.IGNORECASE)
+_RE_TAGS = re.compile(r'<[^>]*>')
+_RE_ESPACOS = re.compile(r'\s+')
+
 def termo_presente_em_contexto(html, termo):
     """
     Verifica se um termo está presente no contexto HTML e extrai o trecho relevante.
@@ -36,6 +57,246 @@ def termo_presente_em_contexto(html, termo):
         logger.error(f"Erro ao analisar HTML: {str(e)}")
         return None
 
+def _texto_visivel(fragmento_html):
+    """
+    Converte um fragmento HTML em texto visível, sem tags e com espaços normalizados.
+    
+    Args:
+        fragmento_html (str): Trecho de HTML (pode ser parcial)
+        
+    Returns:
+        str: Texto visível do fragmento
+    """
+    texto = _RE_BLOCOS_INVISIVEIS.sub(' ', fragmento_html)
+    texto = _RE_TAGS.sub(' ', texto)
+    texto = html.unescape(texto)
+    return _RE_ESPACOS.sub(' ', texto)
+
+def _ponto_de_corte_html(fragmento_html):
+    """
+    Encontra a posição a partir da qual o HTML ainda está incompleto
+    (tag sem '>' ou bloco <script>/<style> sem fechamento).
+    
+    Args:
+        fragmento_html (str): Trecho de HTML acumulado
+        
+    Returns:
+        int: Índice do início do trecho incompleto (len(fragmento_html) se completo)
+    """
+    corte = len(fragmento_html)
+    
+    # Tag aberta no fim do bloco
+    ultimo_abre = fragmento_html.rfind('<')
+    if ultimo_abre != -1 and fragmento_html.find('>', ultimo_abre) == -1:
+        corte = ultimo_abre
+    
+    # Bloco <script>/<style> ainda sem fechamento
+    for abertura in _RE_BLOCO_INVISIVEL_ABERTO.finditer(fragmento_html, 0, corte):
+        fechamento = re.compile(rf'</{abertura.group(1)}\s*>', re.IGNORECASE)
+        if not fechamento.search(fragmento_html, abertura.end()):
+            corte = min(corte, abertura.start())
+            break
+    
+    # Entidade HTML cortada (ex.: "&amp" sem ';')
+    ultimo_e = fragmento_html.rfind('&', max(0, corte - 10), corte)
+    if ultimo_e != -1 and ';' not in fragmento_html[ultimo_e:corte]:
+        corte = ultimo_e
+    
+    # Evita acumular indefinidamente um trecho que nunca se fecha
+    if len(fragmento_html) - corte > MAX_HTML_PENDENTE:
+        corte = len(fragmento_html)
+    
+    return corte
+
+def _criar_decodificador(response):
+    """
+    Cria um decodificador incremental para o corpo da resposta.
+    
+    Args:
+        response (requests.Response): Resposta HTTP aberta em modo stream
+        
+    Returns:
+        codecs.IncrementalDecoder: Decodificador incremental
+    """
+    encoding = 'utf-8'
+    if 'charset' in response.headers.get('Content-Type', '').lower() and response.encoding:
+        encoding = response.encoding
+    
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+def ler_corpo_limitado(response, max_bytes=MAX_BYTES_PAGINA):
+    """
+    Lê o corpo de uma resposta aberta com stream=True, até o limite de bytes.
+    
+    Args:
+        response (requests.Response): Resposta HTTP aberta em modo stream
+        max_bytes (int, optional): Limite de bytes a ler. Defaults to MAX_BYTES_PAGINA.
+        
+    Returns:
+        str: Corpo decodificado (truncado no limite, se necessário)
+    """
+    decodificador = _criar_decodificador(response)
+    partes = []
+    bytes_lidos = 0
+    
+    try:
+        for chunk in response.iter_content(chunk_size=TAMANHO_CHUNK):
+            if not chunk:
+                continue
+            
+            restante = max_bytes - bytes_lidos
+            if len(chunk) > restante:
+                chunk = chunk[:restante]
+            
+            bytes_lidos += len(chunk)
+            partes.append(decodificador.decode(chunk))
+            
+            if bytes_lidos >= max_bytes:
+                logger.warning(f"Corpo de {response.url} truncado em {max_bytes} bytes")
+                break
+        
+        partes.append(decodificador.decode(b'', final=True))
+    finally:
+        response.close()
+    
+    return ''.join(partes)
+
+def _eh_caractere_palavra(caractere):
+    # Equivalente a \w das expressões regulares (str)
+    return caractere.isalnum() or caractere == '_'
+
+def _manter_final(texto, tamanho):
+    """
+    Mantém os últimos caracteres do texto para a sobreposição entre blocos,
+    sem começar no meio de uma palavra: um fragmento no início da janela
+    casaria com \\b como se fosse uma palavra inteira.
+    
+    Args:
+        texto (str): Texto visível acumulado
+        tamanho (int): Caracteres a manter
+        
+    Returns:
+        str: Final do texto, iniciado num limite de palavra
+    """
+    inicio = len(texto) - tamanho
+    if inicio <= 0:
+        return texto
+    
+    if not (_eh_caractere_palavra(texto[inicio - 1]) and _eh_caractere_palavra(texto[inicio])):
+        return texto[inicio:]
+    
+    # Recua até o início da palavra cortada (no máximo mais uma janela)
+    recuo = inicio
+    limite = max(0, inicio - tamanho)
+    while recuo > limite and _eh_caractere_palavra(texto[recuo - 1]):
+        recuo -= 1
+    if recuo == 0 or not _eh_caractere_palavra(texto[recuo - 1]):
+        return texto[recuo:]
+    
+    # Palavra mais longa que a janela: descarta o fragmento
+    while inicio < len(texto) and _eh_caractere_palavra(texto[inicio]):
+        inicio += 1
+    return texto[inicio:]
+
+def buscar_termo_em_stream(url, termo, proxies=None, timeout=25, max_bytes=MAX_BYTES_PAGINA,
+                           headers=None, limites_palavra=True):
+    """
+    Baixa uma página em blocos e procura o termo incrementalmente, encerrando
+    a leitura assim que o termo e seu contexto forem encontrados.
+    
+    A busca é feita sobre o texto visível de cada bloco, mantendo uma janela de
+    sobreposição com o final do bloco anterior para não perder ocorrências
+    divididas entre blocos.
+    
+    Args:
+        url (str): URL da página
+        termo (str): Termo a ser buscado
+        proxies (dict, optional): Proxies para a requisição
+        timeout (int, optional): Timeout da requisição em segundos
+        max_bytes (int, optional): Limite de bytes a ler. Defaults to MAX_BYTES_PAGINA.
+        headers (dict, optional): Cabeçalhos HTTP adicionais
+        limites_palavra (bool, optional): Se o termo deve casar como palavra inteira
+        
+    Returns:
+        dict: {'status', 'contexto', 'bytes_lidos', 'truncado'}
+    """
+    termo_regex = re.escape(termo)
+    if limites_palavra:
+        termo_regex = rf'\b{termo_regex}\b'
+    padrao = re.compile(termo_regex, re.IGNORECASE)
+    
+    # Caracteres do texto anterior mantidos para casar termos divididos entre blocos
+    sobreposicao = len(termo) + JANELA_CONTEXTO
+    
+    resultado = {
+        'status': None,
+        'contexto': None,
+        'bytes_lidos': 0,
+        'truncado': False
+    }
+    
+    response = requests.get(url, proxies=proxies, timeout=timeout, headers=headers, stream=True)
+    resultado['status'] = response.status_code
+    
+    if response.status_code != 200:
+        response.close()
+        return resultado
+    
+    decodificador = _criar_decodificador(response)
+    html_pendente = ''
+    texto = ''
+    ocorrencia = None
+    
+    def extrair_contexto(texto_atual, match):
+        inicio = max(0, match.start() - JANELA_CONTEXTO)
+        return texto_atual[inicio:match.end() + JANELA_CONTEXTO].strip()
+    
+    try:
+        for chunk in response.iter_content(chunk_size=TAMANHO_CHUNK):
+            if not chunk:
+                continue
+            
+            restante = max_bytes - resultado['bytes_lidos']
+            if len(chunk) > restante:
+                chunk = chunk[:restante]
+            resultado['bytes_lidos'] += len(chunk)
+            
+            html_pendente += decodificador.decode(chunk)
+            corte = _ponto_de_corte_html(html_pendente)
+            texto += _texto_visivel(html_pendente[:corte])
+            html_pendente = html_pendente[corte:]
+            
+            if ocorrencia is None:
+                ocorrencia = padrao.search(texto)
+            
+            if ocorrencia is not None:
+                # Só encerra quando já houver contexto suficiente após o termo
+                if len(texto) - ocorrencia.end() >= JANELA_CONTEXTO:
+                    resultado['contexto'] = extrair_contexto(texto, ocorrencia)
+                    return resultado
+            else:
+                texto = _manter_final(texto, sobreposicao)
+            
+            if resultado['bytes_lidos'] >= max_bytes:
+                resultado['truncado'] = True
+                logger.warning(f"Leitura de {url} interrompida no limite de {max_bytes} bytes")
+                break
+        
+        # Fim do corpo (ou limite atingido): processa o que restou
+        texto += _texto_visivel(html_pendente + decodificador.decode(b'', final=True))
+        if ocorrencia is None:
+            ocorrencia = padrao.search(texto)
+        if ocorrencia is not None:
+            resultado['contexto'] = extrair_contexto(texto, ocorrencia)
+        
+        return resultado
+    
+    finally:
+        response.close()
+
 def buscar_e_validar_termo(termo, url, fonte_id=None, usar_proxy=False):
     """
     Busca um termo em uma URL específica e valida sua presença.
@@ -49,6 +310,7 @@ def buscar_e_validar_termo(termo, url, fonte_id=None, usar_proxy=False):
     Returns:
         dict: Resultado da busca e validação
     """
+    url = canonicalizar_url(url) or url
     logger.info(f"Buscando termo '{termo}' em {url}")
     
     # Registra a ação de busca
@@ -67,12 +329,11 @@ def buscar_e_validar_termo(termo, url, fonte_id=None, usar_proxy=False):
         }
     
     try:
-        # Tenta acessar a URL com timeout
-        response = requests.get(url, proxies=proxies, timeout=25)
+        # Lê a página em blocos, encerrando assim que o termo for encontrado
+        pagina = buscar_termo_em_stream(url, termo, proxies=proxies, timeout=25)
         
-        if response.status_code == 200:
-            # Verifica se o termo está presente no contexto
-            contexto = termo_presente_em_contexto(response.text, termo)
+        if pagina['status'] == 200:
+            contexto = pagina['contexto']
             
             if contexto:
                 # Registra a coleta bem-sucedida
@@ -103,7 +364,7 @@ def buscar_e_validar_termo(termo, url, fonte_id=None, usar_proxy=False):
             else:
                 logger.info(f"Termo '{termo}' não encontrado no contexto de {url}")
         else:
-            logger.warning(f"Falha ao acessar {url}: Status {response.status_code}")
+            logger.warning(f"Falha ao acessar {url}: Status {pagina['status']}")
             
     except Exception as e:
         logger.error(f"Erro ao acessar {url}: {str(e)}")
@@ -139,6 +400,9 @@ def validar_semanticamente(termo, links, fonte_id=None, usar_proxy=False):
     """
     resultados = []
     
+    # Evita buscar duas vezes variantes do mesmo link
+    links = list(dict.fromkeys(canonicalizar_url(link) or link for link in links))
+    
     for url in links:
         resultado = buscar_e_validar_termo(termo, url, fonte_id, usar_proxy)
         resultados.append(resultado)
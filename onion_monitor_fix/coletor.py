@@ -4,10 +4,11 @@ import datetime
 import json
 import requests
 from bs4 import BeautifulSoup
-import re
 import random
 import time
 from db import get_db_connection, registrar_coleta, registrar_validacao, registrar_auditoria, obter_fontes, adicionar_fonte
+from busca_valida_semantica import ler_corpo_limitado, buscar_termo_em_stream
+from normalizacao_url import normalizar_links
 
 # Configuração de logging
 logging.basicConfig(
@@ -44,13 +45,15 @@ def verificar_tor_disponivel():
         logger.error(f"Erro ao verificar disponibilidade do Tor: {str(e)}")
         return False
 
-def buscar_termo(termo, usar_validacao_semantica=True):
+def buscar_termo(termo, usar_validacao_semantica=True, ao_progredir=None):
     """
     Busca um termo nas fontes cadastradas e registra os resultados.
     
     Args:
         termo (str): Termo a ser buscado
         usar_validacao_semantica (bool): Se deve usar validação semântica real
+        ao_progredir (callable, optional): Chamada ao fim de cada fonte com
+            (fonte, novos_resultados, fontes_concluidas, total_fontes). Defaults to None.
         
     Returns:
         list: Lista de resultados encontrados
@@ -90,7 +93,9 @@ def buscar_termo(termo, usar_validacao_semantica=True):
     resultados = []
     
     # Para cada fonte, realiza a busca
-    for fonte in fontes:
+    for indice, fonte in enumerate(fontes, start=1):
+        novos_resultados = []
+        
         try:
             logger.info(f"Buscando em {fonte['nome']} ({fonte['url']})")
             
@@ -141,6 +146,9 @@ def buscar_termo(termo, usar_validacao_semantica=True):
                 )
             except Exception as inner_e:
                 logger.error(f"Erro ao gerar resultados simulados: {str(inner_e)}")
+        
+        if ao_progredir:
+            ao_progredir(fonte, novos_resultados, indice, len(fontes))
     
     # Registra a conclusão da busca
     registrar_auditoria(
@@ -217,19 +225,18 @@ def buscar_com_validacao_semantica(termo, fonte, tor_disponivel=False):
         
         # Faz a requisição
         try:
-            response = requests.get(url_busca, proxies=proxies, timeout=15)
+            response = requests.get(url_busca, proxies=proxies, timeout=15, stream=True)
             
-            # Extrai links da página
-            soup = BeautifulSoup(response.text, 'html.parser')
-            links_encontrados = [a['href'] for a in soup.find_all('a', href=True)]
+            # Extrai links da página na forma canônica (sem duplicatas)
+            soup = BeautifulSoup(ler_corpo_limitado(response), 'html.parser')
+            links_encontrados = normalizar_links(
+                [a['href'] for a in soup.find_all('a', href=True)],
+                base=response.url or url_busca
+            )
             
             # Filtra links relevantes
             links_relevantes = []
             for link in links_encontrados:
-                # Normaliza o link
-                if link.startswith('/'):
-                    link = url_base + link if url_base.endswith('/') else url_base + link
-                
                 # Filtra por relevância
                 if '.onion' in link or termo.lower() in link.lower():
                     links_relevantes.append(link)
@@ -240,16 +247,13 @@ def buscar_com_validacao_semantica(termo, fonte, tor_disponivel=False):
             # Para cada link relevante, verifica se o termo está presente
             for link in links_relevantes:
                 try:
-                    link_response = requests.get(link, proxies=proxies, timeout=10)
-                    soup = BeautifulSoup(link_response.text, 'html.parser')
-                    texto = soup.get_text()
+                    # Lê a página em blocos, parando assim que o termo e o contexto aparecerem
+                    pagina = buscar_termo_em_stream(link, termo, proxies=proxies, timeout=10,
+                                                    limites_palavra=False)
+                    contexto = pagina['contexto']
                     
                     # Verifica se o termo está presente
-                    if termo.lower() in texto.lower():
-                        # Extrai contexto
-                        match = re.search(rf'(.{{0,100}}{re.escape(termo)}.{{0,100}})', texto, re.IGNORECASE)
-                        contexto = match.group(0) if match else f"Termo '{termo}' encontrado na página"
-                        
+                    if contexto:
                         # Registra a coleta
                         coleta_id = registrar_coleta(
                             termo_busca=termo,
@@ -343,19 +347,14 @@ def buscar_em_surface(termo, fonte, tor_disponivel=False):
     } if usar_proxy else None
 
     try:
-        response = requests.get(url_busca, proxies=proxies, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        response = requests.get(url_busca, proxies=proxies, timeout=15, stream=True)
+        soup = BeautifulSoup(ler_corpo_limitado(response), 'html.parser')
         
-        # Busca links em diferentes formatos
-        links_encontrados = []
-        
-        # Links diretos
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            # Normaliza o link
-            if href.startswith('/'):
-                href = url_base + href if url_base.endswith('/') else url_base + href
-            links_encontrados.append(href)
+        # Links diretos, na forma canônica (sem duplicatas)
+        links_encontrados = normalizar_links(
+            [a['href'] for a in soup.find_all('a', href=True)],
+            base=response.url or url_busca
+        )
         
         # Filtra links relevantes
         links_relevantes = []
@@ -632,7 +631,9 @@ def verificar_status_fonte(fonte):
 
     try:
         inicio = time.time()
-        response = requests.get(url, proxies=proxies, timeout=15)
+        # Apenas o status interessa: não baixa o corpo da página
+        response = requests.get(url, proxies=proxies, timeout=15, stream=True)
+        response.close()
         tempo_resposta = time.time() - inicio
         
         return {
@@ -128,6 +128,66 @@ def init_db():
             )
         ''')
         
+        # Tarefas de busca executadas em segundo plano e seus resultados parciais
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tarefas (
+                id TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                termo TEXT,
+                termo_normalizado TEXT,
+                chave TEXT,
+                opcoes TEXT,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                fontes_concluidas INTEGER NOT NULL DEFAULT 0,
+                total_fontes INTEGER,
+                total_resultados INTEGER NOT NULL DEFAULT 0,
+                erro TEXT,
+                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_inicio TIMESTAMP,
+                data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_fim TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tarefas_status ON tarefas (status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tarefas_chave ON tarefas (chave, status, data_fim)')
+        
+        # Single-flight: no máximo uma tarefa ativa por chave de busca (termo normalizado + opções)
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_tarefas_chave_ativa ON tarefas (chave)
+            WHERE status IN ('pendente', 'executando')
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tarefas_resultados (
+                tarefa_id TEXT NOT NULL,
+                ordem INTEGER NOT NULL,
+                dados TEXT NOT NULL,
+                PRIMARY KEY (tarefa_id, ordem),
+                FOREIGN KEY (tarefa_id) REFERENCES tarefas (id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Lotes de buscas enviados pela API (uma tarefa por termo)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS lotes (
+                id TEXT PRIMARY KEY,
+                total_termos INTEGER NOT NULL,
+                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS lotes_tarefas (
+                lote_id TEXT NOT NULL,
+                ordem INTEGER NOT NULL,
+                termo TEXT NOT NULL,
+                tarefa_id TEXT NOT NULL,
+                PRIMARY KEY (lote_id, ordem),
+                FOREIGN KEY (lote_id) REFERENCES lotes (id),
+                FOREIGN KEY (tarefa_id) REFERENCES tarefas (id)
+            ) WITHOUT ROWID
+        ''')
+        
         conn.commit()
         logger.info("Banco de dados inicializado com sucesso.")
         
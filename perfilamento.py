@@ -0,0 +1,195 @@
+import io
+import os
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import functools
+import contextlib
+import contextvars
+
+logger = logging.getLogger("perfilamento")
+
+# Registro de spans das buscas (desligue com PERFILAMENTO=0)
+PERFILAMENTO_ATIVO = os.environ.get('PERFILAMENTO', '1').lower() in ['1', 'true', 'sim', 'yes']
+
+# Captura cProfile de todas as execuções (caro; normalmente pedido por execução)
+CPROFILE_SEMPRE = os.environ.get('PERFILAMENTO_CPROFILE', '0').lower() in ['1', 'true', 'sim', 'yes']
+
+# Spans guardados por execução; os excedentes são apenas contados
+MAX_SPANS_EXECUCAO = int(os.environ.get('PERFILAMENTO_MAX_SPANS', 5000))
+
+# Funções listadas no relatório do cProfile
+LINHAS_CPROFILE = 60
+
+_execucao_atual = contextvars.ContextVar('execucao_perfilamento', default=None)
+
+class Execucao:
+    """
+    Execução perfilada: spans aninhados das etapas de uma busca.
+    """
+
+    def __init__(self, nome, detalhes=None):
+        self.id = uuid.uuid4().hex
+        self.nome = nome
+        self.detalhes = detalhes
+        self.status = 'executando'
+        self.inicio = time.perf_counter()
+        self.duracao_ms = None
+        self.spans = []
+        self.pilha = []
+        self.descartados = 0
+        self.perfil = None
+
+    def _agora_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+@contextlib.contextmanager
+def execucao(nome, detalhes=None, perfilar=False):
+    """
+    Registra uma execução com os spans abertos durante ela.
+
+    Se já houver uma execução ativa no contexto (ex.: busca chamada dentro de
+    outra instrumentada), o bloco vira apenas um span dela.
+
+    Args:
+        nome (str): Nome da execução (ex.: 'buscar_termo')
+        detalhes (str, optional): Descrição (ex.: termo buscado)
+        perfilar (bool, optional): Captura também um cProfile da execução
+
+    Yields:
+        Execucao: Execução em andamento (None se o perfilamento estiver desligado)
+    """
+    if _execucao_atual.get() is not None:
+        with span(nome, detalhes=detalhes):
+            yield _execucao_atual.get()
+        return
+
+    if not PERFILAMENTO_ATIVO and not perfilar:
+        yield None
+        return
+
+    atual = Execucao(nome, detalhes)
+    token = _execucao_atual.set(atual)
+
+    perfilador = None
+    if perfilar or CPROFILE_SEMPRE:
+        perfilador = cProfile.Profile()
+        try:
+            perfilador.enable()
+        except ValueError as e:
+            # Outro perfilador já ativo neste processo
+            logger.warning(f"cProfile indisponível para a execução {atual.id}: {str(e)}")
+            perfilador = None
+
+    try:
+        yield atual
+        atual.status = 'concluida'
+    except Exception:
+        atual.status = 'erro'
+        raise
+    finally:
+        if perfilador:
+            perfilador.disable()
+            saida = io.StringIO()
+            pstats.Stats(perfilador, stream=saida).sort_stats('cumulative').print_stats(LINHAS_CPROFILE)
+            atual.perfil = saida.getvalue()
+
+        _execucao_atual.reset(token)
+        atual.duracao_ms = atual._agora_ms()
+
+        # Importado aqui: o db também usa este módulo para instrumentar suas funções
+        from db import registrar_execucao_perfilada
+        registrar_execucao_perfilada(atual)
+
+@contextlib.contextmanager
+def span(nome, **atributos):
+    """
+    Mede uma etapa dentro da execução atual. Sem execução ativa, não faz nada.
+
+    Args:
+        nome (str): Nome da etapa (ex.: 'fetch', 'parse')
+        **atributos: Atributos do span (ex.: fonte='Ahmia')
+    """
+    atual = _execucao_atual.get()
+    if atual is None:
+        yield
+        return
+
+    if len(atual.spans) >= MAX_SPANS_EXECUCAO:
+        atual.descartados += 1
+        yield
+        return
+
+    registro = {
+        'ordem': len(atual.spans),
+        'pai': atual.pilha[-1]['ordem'] if atual.pilha else None,
+        'nome': nome,
+        'inicio_ms': atual._agora_ms(),
+        'duracao_ms': None,
+        'atributos': json.dumps(atributos, default=str) if atributos else None
+    }
+    atual.spans.append(registro)
+    atual.pilha.append(registro)
+
+    try:
+        yield
+    finally:
+        atual.pilha.pop()
+        registro['duracao_ms'] = atual._agora_ms() - registro['inicio_ms']
+
+def instrumentar(nome=None, atributos=None):
+    """
+    Decorador que registra cada chamada da função como um span.
+
+    Args:
+        nome (str, optional): Nome do span. Defaults to None (nome da função).
+        atributos (callable, optional): Recebe os argumentos da chamada e devolve
+            os atributos do span (ex.: lambda termo, fonte: {'fonte': fonte['nome']})
+    """
+    def decorador(funcao):
+        nome_span = nome or funcao.__name__
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            if _execucao_atual.get() is None:
+                return funcao(*args, **kwargs)
+            with span(nome_span, **(atributos(*args, **kwargs) if atributos else {})):
+                return funcao(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+def resumir_spans(spans):
+    """
+    Agrega os spans de uma execução por nome da etapa.
+
+    O tempo próprio desconta o tempo dos spans filhos, mostrando onde o tempo
+    foi gasto de fato (ex.: 'buscar_em_surface' sem o 'fetch' e o 'parse').
+
+    Args:
+        spans (list): Spans da execução (dicionários com ordem, pai, nome e duracao_ms)
+
+    Returns:
+        list: [{'nome', 'chamadas', 'total_ms', 'proprio_ms'}] ordenado por tempo próprio
+    """
+    filhos_ms = {}
+    for registro in spans:
+        if registro['pai'] is not None and registro['duracao_ms'] is not None:
+            filhos_ms[registro['pai']] = filhos_ms.get(registro['pai'], 0) + registro['duracao_ms']
+
+    resumo = {}
+    for registro in spans:
+        duracao = registro['duracao_ms'] or 0
+        item = resumo.setdefault(registro['nome'], {'nome': registro['nome'], 'chamadas': 0, 'total_ms': 0, 'proprio_ms': 0})
+        item['chamadas'] += 1
+        item['total_ms'] += duracao
+        item['proprio_ms'] += max(duracao - filhos_ms.get(registro['ordem'], 0), 0)
+
+    return sorted(resumo.values(), key=lambda item: item['proprio_ms'], reverse=True)
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
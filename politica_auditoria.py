@@ -0,0 +1,292 @@
+import os
+import atexit
+import random
+import logging
+import datetime
+import threading
+from metricas import FILA_AUDITORIA, AUDITORIA_DESCARTADA
+
+logger = logging.getLogger("politica_auditoria")
+
+# Modos de registro de um evento de auditoria
+MODO_SINCRONO = 'sincrono'        # grava na hora, na thread que chamou
+MODO_ASSINCRONO = 'assincrono'    # enfileira e grava em lote numa thread de fundo
+MODO_CONTADOR = 'contador'        # apenas incrementa o contador por minuto da ação
+MODO_DESLIGADO = 'desligado'      # descarta o evento
+
+MODOS = (MODO_SINCRONO, MODO_ASSINCRONO, MODO_CONTADOR, MODO_DESLIGADO)
+
+# Categoria de cada ação; ações não listadas caem em 'padrao'
+CATEGORIAS_ACAO = {
+    'visualizar_analise': 'visualizacao',
+    'visualizar_relatorio': 'visualizacao',
+    'visualizar_registros': 'visualizacao',
+    'visualizar_ferramentas': 'visualizacao',
+    'visualizar_agendamento': 'visualizacao',
+    'visualizar_cadastro': 'visualizacao',
+    'visualizacao_relatorio': 'visualizacao',
+    'debug_analise': 'visualizacao',
+    'consultar_coletas': 'consulta',
+    'registrar_coleta': 'coleta',
+    'coleta_duplicada': 'coleta',
+    'registrar_validacao': 'coleta',
+}
+
+# Política padrão: visualizações e consultas viram contadores, eventos da coleta
+# saem do caminho crítico e as demais ações continuam gravadas na hora
+POLITICA_PADRAO = 'visualizacao=contador,consulta=contador,coleta=assincrono,padrao=sincrono'
+
+# Intervalo (s) e tamanho máximo do lote da gravação em segundo plano
+INTERVALO_GRAVACAO = float(os.environ.get('AUDITORIA_INTERVALO_GRAVACAO', 5))
+TAMANHO_LOTE = int(os.environ.get('AUDITORIA_TAMANHO_LOTE', 500))
+
+# Máximo de registros (e de contadores) pendentes; enquanto o banco recusar as
+# gravações, os mais antigos são descartados acima deste limite
+MAX_PENDENTES = int(os.environ.get('AUDITORIA_MAX_PENDENTES', 50000))
+
+def carregar_politica(especificacao=None):
+    """
+    Interpreta a política de auditoria.
+
+    O formato é 'categoria=modo[:taxa]' separado por vírgulas, por exemplo
+    'visualizacao=contador,coleta=assincrono:0.25,padrao=sincrono'. A taxa é a
+    fração dos eventos da categoria que são mantidos (amostragem).
+
+    Args:
+        especificacao (str, optional): Política a interpretar. Defaults to None
+            (variável de ambiente AUDITORIA_POLITICA ou a política padrão).
+
+    Returns:
+        dict: {categoria: (modo, taxa)}
+    """
+    politica = {}
+    especificacao = especificacao or os.environ.get('AUDITORIA_POLITICA') or POLITICA_PADRAO
+
+    for item in (POLITICA_PADRAO + ',' + especificacao).split(','):
+        if '=' not in item:
+            continue
+        categoria, regra = (parte.strip() for parte in item.split('=', 1))
+        modo, _, taxa = regra.partition(':')
+        modo = modo.strip().lower()
+
+        if modo not in MODOS:
+            logger.warning(f"Modo de auditoria desconhecido para '{categoria}': {modo}")
+            continue
+
+        try:
+            taxa = min(max(float(taxa), 0.0), 1.0) if taxa else 1.0
+        except ValueError:
+            logger.warning(f"Taxa de amostragem inválida para '{categoria}': {taxa}")
+            taxa = 1.0
+
+        politica[categoria] = (modo, taxa)
+
+    return politica
+
+_politica = carregar_politica()
+
+def classificar(acao):
+    """
+    Obtém a categoria de uma ação de auditoria.
+
+    Args:
+        acao (str): Tipo de ação
+
+    Returns:
+        str: Categoria da ação
+    """
+    categoria = CATEGORIAS_ACAO.get(acao)
+    if categoria:
+        return categoria
+    if acao.startswith('visualizar_'):
+        return 'visualizacao'
+    return 'padrao'
+
+def decidir_modo(acao):
+    """
+    Decide como um evento deve ser registrado, aplicando a amostragem da categoria.
+
+    Args:
+        acao (str): Tipo de ação
+
+    Returns:
+        str: Um dos MODOS (MODO_DESLIGADO quando o evento é descartado)
+    """
+    categoria = classificar(acao)
+    modo, taxa = _politica.get(categoria) or _politica['padrao']
+
+    if taxa < 1.0 and random.random() >= taxa:
+        return MODO_DESLIGADO
+
+    return modo
+
+def definir_politica(especificacao):
+    """
+    Substitui a política em uso (ex.: em scripts de manutenção).
+
+    Args:
+        especificacao (str): Política no formato de carregar_politica()
+    """
+    global _politica
+    _politica = carregar_politica(especificacao)
+
+class BufferAuditoria:
+    """
+    Acumula eventos e contadores de auditoria e os grava em lote numa thread de fundo.
+    """
+
+    def __init__(self, gravar, intervalo=INTERVALO_GRAVACAO, tamanho_lote=TAMANHO_LOTE, max_pendentes=MAX_PENDENTES):
+        """
+        Inicializa o buffer.
+
+        Args:
+            gravar (callable): Função gravar(registros, contadores) que persiste um lote;
+                registros é uma lista de tuplas (acao, descricao, dados, data_hora) e
+                contadores um dicionário {(acao, minuto): total}
+            intervalo (float, optional): Intervalo máximo (s) entre gravações
+            tamanho_lote (int, optional): Quantidade de registros que antecipa a gravação
+            max_pendentes (int, optional): Máximo de registros e de contadores pendentes
+        """
+        self.gravar = gravar
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self.max_pendentes = max_pendentes
+        self.descartados = 0
+        self.registros = []
+        self.contadores = {}
+        self._lock = threading.Lock()
+        self._gravacao = threading.Lock()
+        self._sinal = threading.Event()
+        self._thread = None
+
+    def _iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, name='auditoria-buffer', daemon=True)
+            self._thread.start()
+
+    def _limitar(self):
+        # Chamado com o lock: descarta os registros e os contadores (minutos) mais antigos acima do limite
+        descartados = 0
+
+        excesso = len(self.registros) - self.max_pendentes
+        if excesso > 0:
+            del self.registros[:excesso]
+            descartados += excesso
+
+        excesso = len(self.contadores) - self.max_pendentes
+        if excesso > 0:
+            for chave in sorted(self.contadores, key=lambda chave: chave[1])[:excesso]:
+                del self.contadores[chave]
+            descartados += excesso
+
+        if descartados:
+            if not self.descartados:
+                logger.warning(f"Buffer de auditoria cheio ({self.max_pendentes} pendentes): descartando os eventos mais antigos")
+            self.descartados += descartados
+            AUDITORIA_DESCARTADA.inc(descartados)
+
+    def adicionar(self, acao, descricao, dados=None):
+        """
+        Enfileira um registro completo de auditoria.
+
+        Args:
+            acao (str): Tipo de ação realizada
+            descricao (str): Descrição da ação
+            dados (str, optional): Dados adicionais. Defaults to None.
+        """
+        with self._lock:
+            self.registros.append((acao, descricao, dados, _agora()))
+            if len(self.registros) > self.max_pendentes:
+                self._limitar()
+            cheio = len(self.registros) >= self.tamanho_lote
+            FILA_AUDITORIA.set(len(self.registros) + len(self.contadores))
+            self._iniciar()
+        if cheio:
+            self._sinal.set()
+
+    def contar(self, acao):
+        """
+        Incrementa o contador da ação no minuto atual.
+
+        Args:
+            acao (str): Tipo de ação realizada
+        """
+        chave = (acao, _agora()[:16] + ':00')
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + 1
+            if len(self.contadores) > self.max_pendentes:
+                self._limitar()
+            FILA_AUDITORIA.set(len(self.registros) + len(self.contadores))
+            self._iniciar()
+
+    def descarregar(self):
+        """
+        Grava imediatamente tudo o que estiver pendente.
+
+        Returns:
+            int: Quantidade de registros e contadores gravados
+        """
+        with self._gravacao:
+            with self._lock:
+                registros, self.registros = self.registros, []
+                contadores, self.contadores = self.contadores, {}
+                FILA_AUDITORIA.set(0)
+
+            if not registros and not contadores:
+                return 0
+
+            try:
+                self.gravar(registros, contadores)
+            except Exception as e:
+                logger.error(f"Erro ao gravar lote de auditoria: {str(e)}")
+                # Devolve o lote para a próxima tentativa
+                with self._lock:
+                    self.registros[:0] = registros
+                    for chave, total in contadores.items():
+                        self.contadores[chave] = self.contadores.get(chave, 0) + total
+                    self._limitar()
+                    FILA_AUDITORIA.set(len(self.registros) + len(self.contadores))
+                return 0
+
+            with self._lock:
+                descartados, self.descartados = self.descartados, 0
+            if descartados:
+                logger.warning(f"Gravação da auditoria retomada; {descartados} eventos/contadores descartados com o buffer cheio")
+
+            return len(registros) + len(contadores)
+
+    def _executar(self):
+        while True:
+            self._sinal.wait(self.intervalo)
+            self._sinal.clear()
+            self.descarregar()
+
+def _agora():
+    # Mesmo fuso de CURRENT_TIMESTAMP (UTC), usado na coluna data_hora da auditoria
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def obter_buffer(gravar):
+    """
+    Obtém o buffer de auditoria do processo, criando-o na primeira chamada.
+
+    Args:
+        gravar (callable): Função de gravação usada na criação do buffer
+
+    Returns:
+        BufferAuditoria: Buffer compartilhado
+    """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = BufferAuditoria(gravar)
+            # Garante que eventos pendentes sejam gravados quando o processo terminar
+            atexit.register(_buffer.descarregar)
+        return _buffer
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
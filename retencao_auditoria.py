@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+import os
+import sys
+import gzip
+import json
+import time
+import logging
+import argparse
+import datetime
+import db
+
+logger = logging.getLogger("retencao_auditoria")
+
+# Eventos de auditoria mais antigos que isto (dias) saem da tabela auditoria
+DIAS_RETENCAO = int(os.environ.get('AUDITORIA_RETENCAO_DIAS', 90))
+
+# Diretório dos arquivos mensais (JSONL com gzip) dos eventos removidos
+DIRETORIO_ARQUIVO = os.environ.get('AUDITORIA_DIRETORIO_ARQUIVO') or os.path.join(
+    os.path.dirname(os.path.abspath(db.DB_PATH)), 'arquivo_auditoria'
+)
+
+# Eventos removidos por transação: mantém curtos os bloqueios de escrita do banco
+TAMANHO_LOTE = int(os.environ.get('AUDITORIA_LOTE_EXCLUSAO', 5000))
+
+# Pausa (s) entre dois lotes, para dar vez aos outros escritores
+PAUSA_ENTRE_LOTES = float(os.environ.get('AUDITORIA_PAUSA_LOTES', 0))
+
+# Páginas devolvidas ao sistema por passo do incremental_vacuum
+PAGINAS_VACUUM = int(os.environ.get('AUDITORIA_PAGINAS_VACUUM', 2000))
+
+# auto_vacuum = INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+def calcular_corte(dias=None, agora=None):
+    """
+    Calcula o instante de corte da retenção (início do dia, em UTC, como a
+    coluna data_hora).
+
+    Args:
+        dias (int, optional): Dias mantidos na tabela auditoria. Defaults to DIAS_RETENCAO.
+        agora (datetime.datetime, optional): Instante de referência (UTC). Defaults to None.
+
+    Returns:
+        str: Data e hora no formato 'YYYY-MM-DD HH:MM:SS'
+    """
+    dias = DIAS_RETENCAO if dias is None else dias
+    agora = agora or datetime.datetime.now(datetime.timezone.utc)
+    corte = datetime.datetime.combine(agora.date() - datetime.timedelta(days=dias), datetime.time())
+    return corte.strftime('%Y-%m-%d %H:%M:%S')
+
+def _arquivar(registros, diretorio):
+    """
+    Acrescenta os eventos aos arquivos mensais (auditoria-YYYY-MM.jsonl.gz).
+
+    Cada chamada acrescenta um novo membro gzip ao arquivo do mês, que continua
+    legível por gzip/zcat como um único fluxo.
+
+    Args:
+        registros (list): Linhas da tabela auditoria (sqlite3.Row)
+        diretorio (str): Diretório dos arquivos
+
+    Returns:
+        list: Arquivos alterados
+    """
+    por_mes = {}
+    for registro in registros:
+        por_mes.setdefault(str(registro['data_hora'])[:7], []).append(dict(registro))
+
+    os.makedirs(diretorio, exist_ok=True)
+    arquivos = []
+    for mes, linhas in sorted(por_mes.items()):
+        caminho = os.path.join(diretorio, f'auditoria-{mes}.jsonl.gz')
+        with gzip.open(caminho, 'at', encoding='utf-8') as f:
+            for linha in linhas:
+                f.write(json.dumps(linha, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        arquivos.append(caminho)
+    return arquivos
+
+def calcular_limite_id(conn, corte):
+    """
+    Calcula o primeiro id que permanece na tabela auditoria.
+
+    A retenção remove sempre um prefixo contínuo de ids (para a cadeia de
+    hashes continuar a partir da âncora): tudo antes do primeiro evento a
+    partir do corte.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco de dados
+        corte (str): Instante de corte (ver calcular_corte())
+
+    Returns:
+        int: Eventos com id menor que este são movidos
+    """
+    primeiro_mantido = conn.execute('SELECT MIN(id) FROM auditoria WHERE data_hora >= ?', (corte,)).fetchone()[0]
+    if primeiro_mantido is not None:
+        return primeiro_mantido
+    return (conn.execute('SELECT MAX(id) FROM auditoria').fetchone()[0] or 0) + 1
+
+def arquivar_lote(conn, limite_id, diretorio, tamanho_lote=None):
+    """
+    Move um lote de eventos anteriores ao corte para o arquivo.
+
+    Os eventos são gravados no arquivo mensal antes da transação que os soma
+    em auditoria_diaria e os exclui; se a transação falhar, o próximo lote
+    grava os mesmos eventos de novo (o arquivo pode ter repetições, mas nunca
+    perde eventos). As repetições são identificadas pelo campo id.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco de dados
+        limite_id (int): Eventos com id menor que este são movidos (ver calcular_limite_id())
+        diretorio (str): Diretório dos arquivos
+        tamanho_lote (int, optional): Eventos por lote. Defaults to TAMANHO_LOTE.
+
+    Returns:
+        int: Eventos movidos (0 quando não há mais o que mover)
+    """
+    registros = conn.execute(
+        'SELECT * FROM auditoria WHERE id < ? ORDER BY id LIMIT ?',
+        (limite_id, tamanho_lote or TAMANHO_LOTE)
+    ).fetchall()
+    if not registros:
+        return 0
+
+    _arquivar(registros, diretorio)
+
+    totais = {}
+    for registro in registros:
+        chave = (registro['acao'], str(registro['data_hora'])[:10])
+        totais[chave] = totais.get(chave, 0) + 1
+
+    try:
+        conn.executemany(
+            '''
+            INSERT INTO auditoria_diaria (acao, dia, total) VALUES (?, ?, ?)
+            ON CONFLICT (acao, dia) DO UPDATE SET total = total + excluded.total
+            ''',
+            [(acao, dia, total) for (acao, dia), total in totais.items()]
+        )
+        # Os ids anteriores ao lote já foram removidos: o lote é um intervalo
+        conn.execute('DELETE FROM auditoria WHERE id <= ?', (registros[-1]['id'],))
+        # A cadeia de hashes continua a partir do último evento removido
+        if registros[-1]['hash']:
+            conn.execute(
+                'INSERT OR REPLACE INTO auditoria_ancora (chave, id, hash) VALUES (1, ?, ?)',
+                (registros[-1]['id'], registros[-1]['hash'])
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return len(registros)
+
+def consolidar_contadores(conn, corte):
+    """
+    Soma em auditoria_diaria os contadores por minuto anteriores ao corte e os exclui.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco de dados
+        corte (str): Minutos anteriores a este instante são consolidados
+
+    Returns:
+        int: Linhas de contadores consolidadas
+    """
+    try:
+        conn.execute(
+            '''
+            INSERT INTO auditoria_diaria (acao, dia, total)
+            SELECT acao, DATE(minuto), SUM(total) FROM auditoria_contadores
+            WHERE minuto < ? GROUP BY acao, DATE(minuto)
+            ON CONFLICT (acao, dia) DO UPDATE SET total = total + excluded.total
+            ''',
+            (corte,)
+        )
+        removidos = conn.execute('DELETE FROM auditoria_contadores WHERE minuto < ?', (corte,)).rowcount
+        conn.commit()
+        return removidos
+    except Exception:
+        conn.rollback()
+        raise
+
+def liberar_espaco(conn, paginas=None):
+    """
+    Devolve ao sistema as páginas livres do banco com PRAGMA incremental_vacuum,
+    em passos curtos.
+
+    Só funciona em bancos com auto_vacuum = INCREMENTAL (ver converter_auto_vacuum()).
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco de dados
+        paginas (int, optional): Páginas por passo. Defaults to PAGINAS_VACUUM.
+
+    Returns:
+        int: Páginas devolvidas (None se o banco não usa auto_vacuum incremental)
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        logger.warning(
+            "O banco não usa auto_vacuum incremental; o espaço liberado fica reservado no arquivo. "
+            "Converta uma vez com: python retencao_auditoria.py --converter-auto-vacuum"
+        )
+        return None
+
+    liberadas = 0
+    livres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    while livres:
+        conn.execute(f'PRAGMA incremental_vacuum({paginas or PAGINAS_VACUUM})').fetchall()
+        restantes = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if restantes >= livres:
+            break
+        liberadas += livres - restantes
+        livres = restantes
+    return liberadas
+
+def converter_auto_vacuum():
+    """
+    Ativa auto_vacuum = INCREMENTAL num banco existente.
+
+    Executa um VACUUM completo (reescreve o arquivo e bloqueia o banco durante
+    a operação); deve ser feito uma única vez, fora do horário de coleta.
+    """
+    conn = db.get_db_connection()
+
+    try:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        logger.info(f"auto_vacuum do banco: {conn.execute('PRAGMA auto_vacuum').fetchone()[0]}")
+    finally:
+        conn.close()
+
+def executar_retencao(dias=None, diretorio=None, tamanho_lote=None):
+    """
+    Aplica a retenção da auditoria.
+
+    Os eventos anteriores ao corte são gravados nos arquivos mensais, somados
+    por ação e dia em auditoria_diaria e excluídos em lotes; os contadores por
+    minuto anteriores ao corte também são consolidados. Os relatórios continuam
+    contando esses eventos a partir de auditoria_diaria.
+
+    Args:
+        dias (int, optional): Dias mantidos na tabela auditoria. Defaults to DIAS_RETENCAO.
+        diretorio (str, optional): Diretório dos arquivos. Defaults to DIRETORIO_ARQUIVO.
+        tamanho_lote (int, optional): Eventos por lote. Defaults to TAMANHO_LOTE.
+
+    Returns:
+        dict: {'corte', 'arquivados', 'lotes', 'contadores_consolidados', 'paginas_liberadas', 'duracao_s'}
+    """
+    inicio = time.perf_counter()
+    corte = calcular_corte(dias)
+    diretorio = diretorio or DIRETORIO_ARQUIVO
+    resumo = {'corte': corte, 'arquivados': 0, 'lotes': 0, 'contadores_consolidados': 0, 'paginas_liberadas': None}
+
+    conn = db.get_db_connection()
+
+    try:
+        limite_id = calcular_limite_id(conn, corte)
+        while True:
+            movidos = arquivar_lote(conn, limite_id, diretorio, tamanho_lote)
+            if not movidos:
+                break
+            resumo['arquivados'] += movidos
+            resumo['lotes'] += 1
+            if PAUSA_ENTRE_LOTES:
+                time.sleep(PAUSA_ENTRE_LOTES)
+
+        resumo['contadores_consolidados'] = consolidar_contadores(conn, corte)
+
+        if resumo['arquivados'] or resumo['contadores_consolidados']:
+            resumo['paginas_liberadas'] = liberar_espaco(conn)
+
+        logger.info(f"Retenção da auditoria concluída: {resumo}")
+
+    except Exception as e:
+        logger.error(f"Erro na retenção da auditoria: {str(e)}")
+        raise
+
+    finally:
+        conn.close()
+
+    resumo['duracao_s'] = round(time.perf_counter() - inicio, 2)
+    return resumo
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Retenção, consolidação e arquivamento da auditoria")
+    parser.add_argument('--dias', type=int, default=DIAS_RETENCAO, help="Dias mantidos na tabela auditoria")
+    parser.add_argument('--diretorio', default=DIRETORIO_ARQUIVO, help="Diretório dos arquivos mensais")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Eventos excluídos por transação")
+    parser.add_argument('--converter-auto-vacuum', action='store_true',
+                        help="Ativa auto_vacuum incremental no banco (VACUUM completo, uma única vez)")
+    args = parser.parse_args()
+
+    if args.converter_auto_vacuum:
+        converter_auto_vacuum()
+        sys.exit(0)
+
+    print(json.dumps(executar_retencao(args.dias, args.diretorio, args.lote), indent=2, ensure_ascii=False))
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
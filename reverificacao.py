@@ -0,0 +1,141 @@
+import os
+import time
+import logging
+import requests
+from bs4 import BeautifulSoup
+from db import obter_urls_para_verificar, registrar_verificacao_url, obter_estatisticas_indice
+from busca_valida_semantica import ler_corpo_limitado, MAX_BYTES_PAGINA
+from impressao_conteudo import hash_conteudo
+from normalizacao_url import eh_onion
+from metricas import medir_requisicao
+
+logger = logging.getLogger("reverificacao")
+
+# Proxy Tor para hosts .onion
+PROXY_TOR = os.environ.get('TOR_PROXY', 'socks5h://127.0.0.1:9050')
+
+# Quantidade máxima de URLs verificadas por execução
+MAX_URLS_EXECUCAO = int(os.environ.get('REVERIFICACAO_MAX_URLS', 200))
+
+# Intervalo mínimo entre duas requisições ao mesmo host (segundos)
+ATRASO_POR_HOST = float(os.environ.get('FRONTEIRA_ATRASO_HOST', 2.0))
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+def verificar_url(registro, timeout=25):
+    """
+    Busca novamente uma URL do índice usando requisição condicional.
+
+    Quando o servidor responde 304 (ETag/Last-Modified) a página não é baixada;
+    caso contrário o conteúdo é lido com limite de bytes e comparado pelo hash
+    do texto visível.
+
+    Args:
+        registro (dict): Linha do índice (url, etag, last_modified, hash_conteudo)
+        timeout (int, optional): Timeout da requisição em segundos
+
+    Returns:
+        dict: {'url', 'status', 'alterado', 'texto'}
+    """
+    url = registro['url']
+    proxies = {'http': PROXY_TOR, 'https': PROXY_TOR} if eh_onion(url) else None
+
+    headers = dict(HEADERS)
+    if registro.get('etag'):
+        headers['If-None-Match'] = registro['etag']
+    if registro.get('last_modified'):
+        headers['If-Modified-Since'] = registro['last_modified']
+
+    try:
+        with medir_requisicao('reverificacao') as medicao:
+            response = requests.get(url, headers=headers, proxies=proxies, timeout=timeout, stream=True)
+            medicao['status'] = response.status_code
+            html = ler_corpo_limitado(response, MAX_BYTES_PAGINA) if response.status_code == 200 else None
+
+        if response.status_code == 304:
+            response.close()
+            registrar_verificacao_url(url, 'inalterado', hash_conteudo=registro.get('hash_conteudo'))
+            return {'url': url, 'status': 'inalterado', 'alterado': False, 'texto': None}
+
+        if response.status_code != 200:
+            response.close()
+            registrar_verificacao_url(url, f"http_{response.status_code}")
+            return {'url': url, 'status': f"http_{response.status_code}", 'alterado': False, 'texto': None}
+
+        texto = BeautifulSoup(html, 'html.parser').get_text(separator=' ')
+
+        resultado = registrar_verificacao_url(
+            url,
+            'alterado',
+            hash_conteudo=hash_conteudo(texto),
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+        alterado = bool(resultado and resultado['alterado'])
+
+        return {
+            'url': url,
+            'status': 'alterado' if alterado else 'inalterado',
+            'alterado': alterado,
+            'texto': texto if alterado else None
+        }
+
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Falha ao verificar {url}: {str(e)}")
+        registrar_verificacao_url(url, 'erro')
+        return {'url': url, 'status': 'erro', 'alterado': False, 'texto': None}
+
+def executar_reverificacao(limite=MAX_URLS_EXECUCAO, apenas_onion=False):
+    """
+    Verifica as URLs do índice com verificação vencida.
+
+    Apenas as URLs vencidas são buscadas; o intervalo de cada URL cresce enquanto
+    ela não muda, então páginas estáveis são consultadas cada vez menos.
+
+    Args:
+        limite (int, optional): Quantidade máxima de URLs verificadas
+        apenas_onion (bool, optional): Considera apenas hosts .onion
+
+    Returns:
+        dict: Resumo da execução com a lista de URLs alteradas
+    """
+    pendentes = obter_urls_para_verificar(limite=limite, apenas_onion=apenas_onion)
+    logger.info(f"Reverificação iniciada: {len(pendentes)} URLs vencidas")
+
+    resumo = {'verificadas': 0, 'alteradas': [], 'inalteradas': 0, 'erros': 0}
+    ultimo_acesso = {}
+
+    for registro in pendentes:
+        espera = ultimo_acesso.get(registro['host'], 0) + ATRASO_POR_HOST - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        ultimo_acesso[registro['host']] = time.monotonic()
+
+        resultado = verificar_url(registro)
+        resumo['verificadas'] += 1
+
+        if resultado['alterado']:
+            resumo['alteradas'].append(resultado)
+        elif resultado['status'] == 'inalterado':
+            resumo['inalteradas'] += 1
+        else:
+            resumo['erros'] += 1
+
+    logger.info(
+        f"Reverificação concluída: {resumo['verificadas']} verificadas, "
+        f"{len(resumo['alteradas'])} alteradas, {resumo['inalteradas']} inalteradas, {resumo['erros']} erros"
+    )
+
+    return resumo
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    executar_reverificacao()
+    print(obter_estatisticas_indice())
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Saída de eventos (outbox) das coletas validadas.
+
+registrar_validacao() grava um evento 'coleta_validada' na tabela
+saida_eventos na mesma transação em que a coleta passa a validado = 1; os
+sistemas externos leem os eventos a partir do último id que confirmaram
+(cada consumidor tem o seu, em saida_consumidores), pela API
+/api/saida/<consumidor> ou pelo despachante de webhook deste módulo.
+
+A entrega é "pelo menos uma vez": um lote só é confirmado depois da resposta
+2xx do receptor; se a confirmação se perder, o lote é reenviado e o
+receptor descarta as repetições pelo id do evento.
+
+Uso:
+    python saida_eventos.py despachar --consumidor soar --url https://soar.exemplo/webhook
+    python saida_eventos.py despachar --consumidor soar --url http://127.0.0.1:8900/ --uma-vez
+    python saida_eventos.py limpar --dias 30
+"""
+import os
+import re
+import sys
+import hmac
+import json
+import random
+import signal
+import hashlib
+import logging
+import argparse
+import threading
+import requests
+import db
+from escritor_db import escrita
+
+logger = logging.getLogger("saida_eventos")
+
+# Webhook padrão do despachante e segredo da assinatura HMAC (cabeçalho X-Assinatura)
+WEBHOOK_URL = os.environ.get('SAIDA_WEBHOOK_URL')
+WEBHOOK_SEGREDO = os.environ.get('SAIDA_WEBHOOK_SEGREDO')
+
+# Eventos por requisição ao webhook (e máximo por leitura da API)
+TAMANHO_LOTE = int(os.environ.get('SAIDA_LOTE', 100))
+
+# Intervalo (s) entre consultas quando não há eventos pendentes
+INTERVALO_CONSULTA = float(os.environ.get('SAIDA_INTERVALO', 5))
+
+# Espera máxima (s) entre tentativas de entrega; a espera dobra a cada falha seguida
+ESPERA_MAXIMA = float(os.environ.get('SAIDA_ESPERA_MAXIMA', 300))
+
+# Tempo limite (s) de cada requisição ao webhook
+TIMEOUT_WEBHOOK = float(os.environ.get('SAIDA_TIMEOUT', 10))
+
+# Eventos mais antigos que isto (dias) são removidos, confirmados ou não
+DIAS_RETENCAO = int(os.environ.get('SAIDA_RETENCAO_DIAS', 30))
+
+NOME_CONSUMIDOR = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+def validar_consumidor(consumidor):
+    """
+    Valida o nome de um consumidor (letras, números, '_', '.' e '-', até 64 caracteres).
+
+    Raises:
+        ValueError: Se o nome for inválido
+    """
+    if not consumidor or not NOME_CONSUMIDOR.match(consumidor):
+        raise ValueError(f"Nome de consumidor inválido: {consumidor}")
+
+def obter_eventos(consumidor, limite=None):
+    """
+    Obtém os eventos ainda não confirmados por um consumidor.
+
+    A leitura não grava nada: um consumidor ainda sem confirmações lê a partir
+    do evento mais antigo ainda guardado e só passa a existir em
+    saida_consumidores na primeira confirmação (confirmar_eventos).
+
+    Args:
+        consumidor (str): Nome do consumidor
+        limite (int, optional): Máximo de eventos. Defaults to TAMANHO_LOTE.
+
+    Returns:
+        dict: {'consumidor', 'confirmado_ate', 'eventos'}; cada evento tem
+        {'id', 'tipo', 'coleta_id', 'data_criacao', 'dados'}
+    """
+    validar_consumidor(consumidor)
+    conn = db.get_db_connection()
+
+    try:
+        linha = conn.execute(
+            'SELECT ultimo_id FROM saida_consumidores WHERE nome = ?', (consumidor,)
+        ).fetchone()
+        confirmado_ate = linha[0] if linha else 0
+        linhas = conn.execute(
+            'SELECT id, tipo, coleta_id, data_criacao, dados FROM saida_eventos WHERE id > ? ORDER BY id LIMIT ?',
+            (confirmado_ate, limite or TAMANHO_LOTE)
+        ).fetchall()
+
+        eventos = []
+        for linha in linhas:
+            evento = dict(linha)
+            evento['dados'] = json.loads(evento['dados'])
+            eventos.append(evento)
+
+        return {'consumidor': consumidor, 'confirmado_ate': confirmado_ate, 'eventos': eventos}
+
+    finally:
+        conn.close()
+
+@escrita
+def confirmar_eventos(consumidor, ate_id):
+    """
+    Confirma o recebimento dos eventos de um consumidor até um id (inclusive).
+
+    A confirmação nunca volta atrás nem passa do último evento gravado.
+
+    Args:
+        consumidor (str): Nome do consumidor
+        ate_id (int): Id do último evento processado
+
+    Returns:
+        int: Último id confirmado do consumidor
+    """
+    validar_consumidor(consumidor)
+    conn = db.get_db_connection()
+
+    try:
+        conn.execute(
+            '''
+            INSERT INTO saida_consumidores (nome, ultimo_id, data_confirmacao)
+            VALUES (?, MIN(?, (SELECT COALESCE(MAX(id), 0) FROM saida_eventos)), CURRENT_TIMESTAMP)
+            ON CONFLICT (nome) DO UPDATE SET
+                ultimo_id = MAX(ultimo_id, excluded.ultimo_id),
+                data_confirmacao = excluded.data_confirmacao
+            ''',
+            (consumidor, int(ate_id))
+        )
+        conn.commit()
+        return conn.execute('SELECT ultimo_id FROM saida_consumidores WHERE nome = ?', (consumidor,)).fetchone()[0]
+
+    finally:
+        conn.close()
+
+@escrita
+def limpar_eventos(dias=None):
+    """
+    Remove os eventos mais antigos que a retenção.
+
+    Args:
+        dias (int, optional): Dias mantidos. Defaults to DIAS_RETENCAO.
+
+    Returns:
+        int: Eventos removidos
+    """
+    conn = db.get_db_connection()
+
+    try:
+        removidos = conn.execute(
+            "DELETE FROM saida_eventos WHERE data_criacao < DATETIME('now', ?)",
+            (f'-{DIAS_RETENCAO if dias is None else dias} days',)
+        ).rowcount
+        conn.commit()
+        return removidos
+
+    finally:
+        conn.close()
+
+def assinar(corpo, segredo):
+    """
+    Calcula a assinatura HMAC-SHA256 do corpo enviado ao webhook.
+
+    Args:
+        corpo (bytes): Corpo da requisição
+        segredo (str): Segredo compartilhado com o receptor
+
+    Returns:
+        str: 'sha256=<hex>' (cabeçalho X-Assinatura)
+    """
+    return 'sha256=' + hmac.new(segredo.encode('utf-8'), corpo, hashlib.sha256).hexdigest()
+
+def despachar_lote(consumidor, url, segredo=None, tamanho_lote=None, sessao=None):
+    """
+    Envia ao webhook um lote dos eventos pendentes do consumidor e, com
+    resposta 2xx, confirma o lote.
+
+    Args:
+        consumidor (str): Nome do consumidor
+        url (str): URL do webhook
+        segredo (str, optional): Segredo da assinatura HMAC. Defaults to None.
+        tamanho_lote (int, optional): Eventos por requisição. Defaults to TAMANHO_LOTE.
+        sessao (requests.Session, optional): Sessão HTTP reaproveitada. Defaults to None.
+
+    Returns:
+        int: Eventos entregues (0 se não havia pendentes)
+
+    Raises:
+        requests.RequestException: Se a entrega falhar (o lote continua pendente)
+    """
+    pendentes = obter_eventos(consumidor, tamanho_lote)
+    eventos = pendentes['eventos']
+    if not eventos:
+        return 0
+
+    corpo = json.dumps({'consumidor': consumidor, 'eventos': eventos}, ensure_ascii=False, default=str).encode('utf-8')
+    cabecalhos = {'Content-Type': 'application/json', 'X-Consumidor': consumidor}
+    if segredo:
+        cabecalhos['X-Assinatura'] = assinar(corpo, segredo)
+
+    resposta = (sessao or requests).post(url, data=corpo, headers=cabecalhos, timeout=TIMEOUT_WEBHOOK)
+    resposta.raise_for_status()
+
+    confirmar_eventos(consumidor, eventos[-1]['id'])
+    return len(eventos)
+
+def executar_despachante(consumidor, url, segredo=None, tamanho_lote=None, intervalo=None, uma_vez=False, parar=None):
+    """
+    Entrega continuamente os eventos do consumidor ao webhook.
+
+    Lotes cheios são enviados em seguida; sem eventos pendentes, espera o
+    intervalo de consulta. Cada falha seguida dobra a espera (com variação
+    aleatória) até ESPERA_MAXIMA, e o mesmo lote é reenviado.
+
+    Args:
+        consumidor (str): Nome do consumidor
+        url (str): URL do webhook
+        segredo (str, optional): Segredo da assinatura HMAC. Defaults to None.
+        tamanho_lote (int, optional): Eventos por requisição. Defaults to TAMANHO_LOTE.
+        intervalo (float, optional): Espera sem eventos pendentes (s). Defaults to INTERVALO_CONSULTA.
+        uma_vez (bool, optional): Termina quando não houver mais pendentes ou na primeira falha (ex.: cron). Defaults to False.
+        parar (threading.Event, optional): Sinal de parada. Defaults to None.
+
+    Returns:
+        dict: {'entregues', 'lotes', 'falhas'}
+    """
+    tamanho_lote = tamanho_lote or TAMANHO_LOTE
+    intervalo = INTERVALO_CONSULTA if intervalo is None else intervalo
+    parar = parar or threading.Event()
+    resumo = {'entregues': 0, 'lotes': 0, 'falhas': 0}
+    falhas_seguidas = 0
+
+    logger.info(f"Despachante do consumidor '{consumidor}' enviando para {url}")
+
+    with requests.Session() as sessao:
+        while not parar.is_set():
+            try:
+                entregues = despachar_lote(consumidor, url, segredo, tamanho_lote, sessao)
+                falhas_seguidas = 0
+            except Exception as e:
+                falhas_seguidas += 1
+                resumo['falhas'] += 1
+                espera = min(ESPERA_MAXIMA, intervalo * 2 ** (falhas_seguidas - 1)) * (0.5 + random.random())
+                if uma_vez:
+                    # A próxima execução (ex.: cron) tenta de novo a partir do mesmo lote
+                    logger.error(f"Erro ao entregar eventos a {url}: {str(e)}")
+                    break
+                logger.error(f"Erro ao entregar eventos a {url} (falha {falhas_seguidas}): {str(e)}; nova tentativa em {espera:.1f}s")
+                parar.wait(espera)
+                continue
+
+            if entregues:
+                resumo['entregues'] += entregues
+                resumo['lotes'] += 1
+                logger.info(f"Entregues {entregues} eventos ao consumidor '{consumidor}'")
+
+            if entregues < tamanho_lote:
+                if uma_vez:
+                    break
+                parar.wait(intervalo)
+
+    return resumo
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Saída de eventos das coletas validadas")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    despachar = comandos.add_parser('despachar', help="Entrega os eventos a um webhook")
+    despachar.add_argument('--consumidor', required=True, help="Nome do consumidor (guarda a posição confirmada)")
+    despachar.add_argument('--url', default=WEBHOOK_URL, help="URL do webhook")
+    despachar.add_argument('--segredo', default=WEBHOOK_SEGREDO, help="Segredo da assinatura HMAC")
+    despachar.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Eventos por requisição")
+    despachar.add_argument('--intervalo', type=float, default=INTERVALO_CONSULTA, help="Espera sem eventos pendentes (s)")
+    despachar.add_argument('--uma-vez', action='store_true', help="Termina quando não houver mais eventos pendentes")
+
+    limpar = comandos.add_parser('limpar', help="Remove os eventos mais antigos que a retenção")
+    limpar.add_argument('--dias', type=int, default=DIAS_RETENCAO)
+
+    args = parser.parse_args()
+
+    if args.comando == 'limpar':
+        print(json.dumps({'removidos': limpar_eventos(args.dias)}))
+        sys.exit(0)
+
+    if not args.url:
+        parser.error("informe --url ou SAIDA_WEBHOOK_URL")
+
+    # SIGTERM/SIGINT terminam o lote em andamento antes de sair
+    sinal_parada = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: sinal_parada.set())
+    signal.signal(signal.SIGINT, lambda *_: sinal_parada.set())
+
+    resumo = executar_despachante(
+        args.consumidor, args.url, args.segredo, args.lote, args.intervalo, args.uma_vez, sinal_parada
+    )
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,814 @@
+import os
+import json
+import sqlite3
+import uuid
+import logging
+import datetime
+import threading
+import time
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from db import get_db_connection, registrar_auditoria
+from escritor_db import escrita
+from coletor import buscar_termo
+from eventos import canal_eventos, publicar as publicar_evento
+from metricas import DURACAO_BUSCA
+
+logger = logging.getLogger("tarefas")
+
+# Quantidade de buscas executadas em paralelo por processo, por fila
+# (buscas interativas não esperam atrás de lotes enviados por integrações)
+MAX_TRABALHADORES = int(os.environ.get('TAREFAS_MAX_TRABALHADORES', 2))
+MAX_TRABALHADORES_LOTE = int(os.environ.get('TAREFAS_MAX_TRABALHADORES_LOTE', 1))
+
+# Quantidade máxima de buscas aguardando ou em execução neste processo, por fila
+MAX_TAREFAS_PENDENTES = int(os.environ.get('TAREFAS_MAX_PENDENTES', 10))
+MAX_TAREFAS_PENDENTES_LOTE = int(os.environ.get('TAREFAS_MAX_PENDENTES_LOTE', 2000))
+
+# Quantidade máxima de termos em um lote
+MAX_TERMOS_LOTE = int(os.environ.get('TAREFAS_MAX_TERMOS_LOTE', 500))
+
+# Janela (segundos) em que uma busca concluída responde a novas buscas idênticas
+# sem consultar as fontes novamente (0 desativa o cache)
+TEMPO_CACHE_RESULTADOS = int(os.environ.get('TAREFAS_CACHE_SEGUNDOS', 300))
+
+# Tarefas sem progresso por mais tempo que isso (segundos) são consideradas interrompidas
+TEMPO_MAXIMO_SEM_PROGRESSO = int(os.environ.get('TAREFAS_TEMPO_MAXIMO', 3600))
+
+# Espera máxima (segundos) de buscar_coalescido por uma busca, inclusive a executada por outro processo
+TEMPO_MAXIMO_ESPERA = int(os.environ.get('TAREFAS_ESPERA_MAXIMA', 2 * TEMPO_MAXIMO_SEM_PROGRESSO))
+
+STATUS_ATIVOS = ('pendente', 'executando')
+
+FILA_INTERATIVA = 'interativa'
+FILA_LOTE = 'lote'
+
+_CONFIGURACAO_FILAS = {
+    FILA_INTERATIVA: (MAX_TRABALHADORES, MAX_TAREFAS_PENDENTES),
+    FILA_LOTE: (MAX_TRABALHADORES_LOTE, MAX_TAREFAS_PENDENTES_LOTE),
+}
+
+class FilaCheiaError(Exception):
+    """Erro lançado quando o limite de tarefas pendentes foi atingido."""
+    pass
+
+_executores = {}
+_lock = threading.Lock()
+_lock_criacao = threading.Lock()
+_pendentes = {fila: 0 for fila in _CONFIGURACAO_FILAS}
+
+def normalizar_termo(termo):
+    """
+    Normaliza um termo para identificar buscas equivalentes
+    (espaços colapsados e letras minúsculas).
+
+    Args:
+        termo (str): Termo buscado
+
+    Returns:
+        str: Termo normalizado
+    """
+    return ' '.join((termo or '').split()).lower()
+
+def chave_busca(termo, opcoes=None):
+    """
+    Gera a chave que identifica buscas equivalentes (termo normalizado e opções).
+
+    Args:
+        termo (str): Termo buscado
+        opcoes (dict, optional): Opções repassadas ao coletor. Defaults to None.
+
+    Returns:
+        str: Chave da busca
+    """
+    return f"{normalizar_termo(termo)}|{json.dumps(opcoes or {}, sort_keys=True)}"
+
+def _obter_executor(fila):
+    """
+    Obtém o pool de trabalhadores de uma fila (criado sob demanda).
+
+    Args:
+        fila (str): FILA_INTERATIVA ou FILA_LOTE
+
+    Returns:
+        ThreadPoolExecutor: Pool de trabalhadores
+    """
+    with _lock:
+        if fila not in _executores:
+            _executores[fila] = ThreadPoolExecutor(
+                max_workers=_CONFIGURACAO_FILAS[fila][0],
+                thread_name_prefix=f'tarefa-{fila}'
+            )
+        return _executores[fila]
+
+@escrita
+def _atualizar_tarefa(tarefa_id, **campos):
+    """
+    Atualiza os campos de uma tarefa.
+
+    Args:
+        tarefa_id (str): ID da tarefa
+        **campos: Campos a atualizar
+    """
+    atribuicoes = ', '.join(f"{campo} = ?" for campo in campos)
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            f"UPDATE tarefas SET {atribuicoes}, data_atualizacao = CURRENT_TIMESTAMP WHERE id = ?",
+            list(campos.values()) + [tarefa_id]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+@escrita
+def _registrar_progresso(tarefa_id, novos_resultados, fontes_concluidas, total_fontes):
+    """
+    Persiste os resultados parciais de uma fonte e o progresso da tarefa.
+
+    Args:
+        tarefa_id (str): ID da tarefa
+        novos_resultados (list): Resultados obtidos na fonte
+        fontes_concluidas (int): Fontes já processadas
+        total_fontes (int): Total de fontes da busca
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT total_resultados FROM tarefas WHERE id = ?', (tarefa_id,))
+        ordem = cursor.fetchone()['total_resultados']
+
+        cursor.executemany(
+            'INSERT INTO tarefas_resultados (tarefa_id, ordem, dados) VALUES (?, ?, ?)',
+            [(tarefa_id, ordem + i, json.dumps(resultado, default=str)) for i, resultado in enumerate(novos_resultados)]
+        )
+        cursor.execute(
+            '''
+            UPDATE tarefas
+            SET fontes_concluidas = ?, total_fontes = ?, total_resultados = ?,
+                data_atualizacao = CURRENT_TIMESTAMP
+            WHERE id = ?
+            ''',
+            (fontes_concluidas, total_fontes, ordem + len(novos_resultados), tarefa_id)
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Erro ao registrar progresso da tarefa {tarefa_id}: {str(e)}")
+    finally:
+        conn.close()
+
+def _executar_busca(tarefa_id, termo, fila, opcoes=None):
+    """
+    Executa a busca de uma tarefa.
+
+    Args:
+        tarefa_id (str): ID da tarefa
+        termo (str): Termo buscado
+        fila (str): Fila em que a tarefa foi enfileirada (None se executada pelo chamador)
+        opcoes (dict, optional): Opções repassadas ao coletor. Defaults to None.
+    """
+    status = 'erro'
+    inicio = time.perf_counter()
+
+    try:
+        _atualizar_tarefa(tarefa_id, status='executando', data_inicio=_agora())
+        logger.info(f"Tarefa {tarefa_id} iniciada: busca por '{termo}'")
+
+        def ao_progredir(fonte, novos_resultados, fontes_concluidas, total_fontes):
+            _registrar_progresso(tarefa_id, novos_resultados, fontes_concluidas, total_fontes)
+
+        # Eventos publicados pelos coletores durante a busca vão para o canal da tarefa
+        with canal_eventos(tarefa_id):
+            resultados = buscar_termo(termo, ao_progredir=ao_progredir, **(opcoes or {}))
+        resultados_validados = sum(1 for r in resultados if r.get('validado'))
+
+        _atualizar_tarefa(tarefa_id, status='concluida', data_fim=_agora())
+        status = 'concluida'
+        logger.info(f"Tarefa {tarefa_id} concluída: {len(resultados)} resultados")
+
+        registrar_auditoria(
+            acao="concluir_busca",
+            descricao=f"Busca concluída para o termo: {termo}",
+            dados=f"Resultados: {len(resultados)}, Validados: {resultados_validados}, Tarefa: {tarefa_id}"
+        )
+
+    except Exception as e:
+        logger.error(f"Erro na tarefa {tarefa_id}: {str(e)}")
+        _atualizar_tarefa(tarefa_id, status='erro', erro=str(e), data_fim=_agora())
+
+    finally:
+        if fila:
+            _liberar_vagas(fila, 1)
+        DURACAO_BUSCA.labels(origem=fila or 'direta', status=status).observe(time.perf_counter() - inicio)
+        publicar_evento('tarefa_concluida', {'tarefa_id': tarefa_id, 'status': status}, canal=tarefa_id)
+
+def _agora():
+    # Mesmo fuso de CURRENT_TIMESTAMP (UTC), para comparar com as datas gravadas pelo SQLite
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def _processo_atual():
+    # Identifica o processo que enfileira uma tarefa (máquina:pid)
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _processo_ativo(processo):
+    """
+    Verifica se o processo que enfileirou uma tarefa pendente ainda existe.
+
+    Processos de outra máquina não podem ser verificados e são considerados
+    ativos; tarefas sem processo registrado (gravadas por versões anteriores)
+    são consideradas órfãs.
+
+    Args:
+        processo (str): Processo no formato de _processo_atual
+
+    Returns:
+        bool: True se o processo pode estar executando a fila da tarefa
+    """
+    if not processo:
+        return False
+
+    maquina, _, pid = processo.rpartition(':')
+    if maquina != socket.gethostname():
+        return True
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+@escrita
+def marcar_tarefas_interrompidas():
+    """
+    Marca como interrompidas as tarefas ativas que não vão mais terminar.
+
+    Tarefas em execução expiram quando deixam de registrar progresso por mais
+    de TEMPO_MAXIMO_SEM_PROGRESSO (por exemplo, quando o processo que as
+    executava foi reiniciado). Tarefas pendentes podem esperar na fila por
+    mais tempo que isso (um lote grande na fila de lotes) e só expiram quando
+    o processo que as enfileirou não existe mais.
+
+    Returns:
+        int: Quantidade de tarefas marcadas
+    """
+    limite = f'-{TEMPO_MAXIMO_SEM_PROGRESSO} seconds'
+    conn = get_db_connection()
+    try:
+        marcadas = conn.execute(
+            '''
+            UPDATE tarefas SET status = 'interrompida', data_fim = CURRENT_TIMESTAMP
+            WHERE status = 'executando' AND data_atualizacao < datetime('now', ?)
+            ''',
+            (limite,)
+        ).rowcount
+
+        pendentes = conn.execute(
+            "SELECT id, processo FROM tarefas WHERE status = 'pendente' AND data_atualizacao < datetime('now', ?)",
+            (limite,)
+        ).fetchall()
+        orfas = [(row['id'],) for row in pendentes if not _processo_ativo(row['processo'])]
+        if orfas:
+            conn.executemany(
+                "UPDATE tarefas SET status = 'interrompida', data_fim = CURRENT_TIMESTAMP WHERE id = ? AND status = 'pendente'",
+                orfas
+            )
+
+        conn.commit()
+        return marcadas + len(orfas)
+    finally:
+        conn.close()
+
+def _reservar_vagas(fila, quantidade):
+    """
+    Reserva vagas na fila, respeitando o limite de tarefas pendentes.
+
+    Args:
+        fila (str): Fila de destino
+        quantidade (int): Quantidade de tarefas
+
+    Raises:
+        FilaCheiaError: Se não houver vagas suficientes
+    """
+    limite = _CONFIGURACAO_FILAS[fila][1]
+
+    with _lock:
+        if _pendentes[fila] + quantidade > limite:
+            raise FilaCheiaError(f"Limite de {limite} buscas pendentes na fila '{fila}' atingido")
+        _pendentes[fila] += quantidade
+
+def _liberar_vagas(fila, quantidade):
+    with _lock:
+        _pendentes[fila] -= quantidade
+
+def _buscar_tarefa_reutilizavel(cursor, chave):
+    """
+    Procura uma tarefa que possa atender a busca: pendente ou em execução, ou
+    concluída dentro da janela de cache.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor do banco de dados
+        chave (str): Chave da busca
+
+    Returns:
+        tuple: (ID da tarefa, 'em_andamento' ou 'cache') ou (None, None)
+    """
+    cursor.execute(
+        '''
+        SELECT id FROM tarefas
+        WHERE chave = ? AND status IN (?, ?)
+        LIMIT 1
+        ''',
+        (chave,) + STATUS_ATIVOS
+    )
+    row = cursor.fetchone()
+    if row:
+        return row['id'], 'em_andamento'
+
+    if TEMPO_CACHE_RESULTADOS > 0:
+        cursor.execute(
+            '''
+            SELECT id FROM tarefas
+            WHERE chave = ? AND status = 'concluida' AND data_fim >= datetime('now', ?)
+            ORDER BY data_fim DESC
+            LIMIT 1
+            ''',
+            (chave, f'-{TEMPO_CACHE_RESULTADOS} seconds')
+        )
+        row = cursor.fetchone()
+        if row:
+            return row['id'], 'cache'
+
+    return None, None
+
+@escrita
+def _inserir_tarefa(tarefa_id, termo, chave, opcoes_json, processo=None):
+    """
+    Insere uma tarefa de busca pendente.
+
+    Args:
+        tarefa_id (str): ID da tarefa
+        termo (str): Termo a buscar
+        chave (str): Chave da busca (ver chave_busca)
+        opcoes_json (str): Opções serializadas
+        processo (str, optional): Processo que enfileira a tarefa (ver _processo_atual)
+
+    Raises:
+        sqlite3.IntegrityError: Se já houver uma tarefa ativa com a mesma chave
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            '''
+            INSERT INTO tarefas (id, tipo, termo, termo_normalizado, chave, opcoes, processo)
+            VALUES (?, 'busca', ?, ?, ?, ?, ?)
+            ''',
+            (tarefa_id, termo, normalizar_termo(termo), chave, opcoes_json, processo)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _obter_ou_criar_tarefas(termos, opcoes=None):
+    """
+    Obtém, para cada termo, uma tarefa existente equivalente ou cria uma nova.
+
+    Funciona como single-flight entre processos: o índice único parcial sobre a
+    chave das tarefas ativas impede que duas buscas idênticas sejam criadas ao
+    mesmo tempo; quem perde a corrida passa a acompanhar a tarefa vencedora.
+
+    Args:
+        termos (list): Termos a buscar
+        opcoes (dict, optional): Opções repassadas ao coletor. Defaults to None.
+
+    Returns:
+        tuple: (lista de dicionários com termo, tarefa_id, coalescida e origem,
+                lista de tuplas (tarefa_id, termo) das tarefas criadas)
+    """
+    marcar_tarefas_interrompidas()
+
+    resposta = []
+    criadas = []
+    opcoes_json = json.dumps(opcoes or {}, sort_keys=True)
+
+    # O lock evita que threads deste processo disputem a mesma chave
+    with _lock_criacao:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            vistos = {}
+
+            for termo in termos:
+                chave = chave_busca(termo, opcoes)
+
+                if chave in vistos:
+                    tarefa_id, origem = vistos[chave], 'lote'
+                else:
+                    tarefa_id, origem = _buscar_tarefa_reutilizavel(cursor, chave)
+
+                if tarefa_id is None:
+                    tarefa_id = uuid.uuid4().hex
+                    try:
+                        _inserir_tarefa(tarefa_id, termo, chave, opcoes_json, _processo_atual())
+                        criadas.append((tarefa_id, termo))
+                        origem = 'nova'
+                    except sqlite3.IntegrityError:
+                        # Outro processo criou a mesma busca entre a consulta e a inserção
+                        tarefa_id, origem = _buscar_tarefa_reutilizavel(cursor, chave)
+                        if tarefa_id is None:
+                            raise
+
+                vistos[chave] = tarefa_id
+                resposta.append({
+                    'termo': termo,
+                    'tarefa_id': tarefa_id,
+                    'coalescida': origem != 'nova',
+                    'origem': origem
+                })
+        finally:
+            conn.close()
+
+    return resposta, criadas
+
+def _submeter(termos, fila, opcoes=None):
+    """
+    Cria as tarefas dos termos e envia as novas ao pool da fila.
+
+    Args:
+        termos (list): Termos a buscar
+        fila (str): Fila de destino
+        opcoes (dict, optional): Opções repassadas ao coletor. Defaults to None.
+
+    Returns:
+        list: Lista de dicionários (termo, tarefa_id, coalescida, origem)
+
+    Raises:
+        FilaCheiaError: Se o limite de tarefas pendentes foi atingido
+    """
+    _reservar_vagas(fila, len(termos))
+
+    try:
+        resposta, criadas = _obter_ou_criar_tarefas(termos, opcoes)
+    except Exception:
+        _liberar_vagas(fila, len(termos))
+        raise
+
+    # Devolve as vagas dos termos atendidos por tarefas existentes
+    _liberar_vagas(fila, len(termos) - len(criadas))
+
+    executor = _obter_executor(fila)
+    for tarefa_id, termo in criadas:
+        executor.submit(_executar_busca, tarefa_id, termo, fila, opcoes)
+        logger.info(f"Tarefa {tarefa_id} criada para o termo '{termo}' (fila {fila})")
+
+    return resposta
+
+def submeter_busca(termo, opcoes=None):
+    """
+    Cria uma tarefa de busca e a envia ao pool de trabalhadores.
+
+    Se já houver uma busca equivalente pendente, em execução ou concluída
+    dentro da janela de cache, retorna o ID dela.
+
+    Args:
+        termo (str): Termo a ser buscado
+        opcoes (dict, optional): Opções repassadas ao coletor. Defaults to None.
+
+    Returns:
+        str: ID da tarefa
+
+    Raises:
+        FilaCheiaError: Se o limite de tarefas pendentes foi atingido
+    """
+    return _submeter([termo], FILA_INTERATIVA, opcoes)[0]['tarefa_id']
+
+@escrita
+def _registrar_lote(lote_id, itens):
+    """
+    Grava um lote e a ordem dos seus termos.
+
+    Args:
+        lote_id (str): ID do lote
+        itens (list): Dicionários {'termo', 'tarefa_id', ...} na ordem do lote
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('INSERT INTO lotes (id, total_termos) VALUES (?, ?)', (lote_id, len(itens)))
+        conn.executemany(
+            'INSERT INTO lotes_tarefas (lote_id, ordem, termo, tarefa_id) VALUES (?, ?, ?, ?)',
+            [(lote_id, ordem, item['termo'], item['tarefa_id']) for ordem, item in enumerate(itens)]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def submeter_lote(termos, opcoes=None):
+    """
+    Cria um lote de buscas (uma tarefa por termo distinto) na fila de lotes.
+
+    Args:
+        termos (list): Termos a buscar
+        opcoes (dict, optional): Opções repassadas ao coletor. Defaults to None.
+
+    Returns:
+        dict: {'lote_id', 'termos': [{'termo', 'tarefa_id', 'coalescida', 'origem'}]}
+
+    Raises:
+        ValueError: Se a lista de termos estiver vazia ou exceder MAX_TERMOS_LOTE
+        FilaCheiaError: Se o limite de tarefas pendentes foi atingido
+    """
+    termos = [termo.strip() for termo in termos if isinstance(termo, str) and termo.strip()]
+
+    if not termos:
+        raise ValueError("Nenhum termo informado")
+    if len(termos) > MAX_TERMOS_LOTE:
+        raise ValueError(f"O lote excede o limite de {MAX_TERMOS_LOTE} termos")
+
+    itens = _submeter(termos, FILA_LOTE, opcoes)
+    lote_id = uuid.uuid4().hex
+    _registrar_lote(lote_id, itens)
+
+    logger.info(f"Lote {lote_id} criado com {len(itens)} termos")
+
+    return {'lote_id': lote_id, 'termos': itens}
+
+def reservar_buscas(termos, opcoes=None):
+    """
+    Reserva as buscas dos termos para execução fora dos pools deste módulo
+    (ex.: coleta paralela), mantendo o single-flight com as demais buscas.
+
+    Termos com busca equivalente pendente, em execução ou em cache ficam com a
+    tarefa existente e não devem ser buscados de novo. Os demais ganham uma
+    tarefa em execução, atualizada por quem reservou com
+    registrar_progresso_busca e encerrada com encerrar_busca.
+
+    Args:
+        termos (list): Termos a buscar
+        opcoes (dict, optional): Opções repassadas ao coletor. Defaults to None.
+
+    Returns:
+        tuple: (dicionário termo -> tarefa_id das buscas reservadas,
+                lista de dicionários (termo, tarefa_id, coalescida, origem) de todos os termos)
+    """
+    resposta, criadas = _obter_ou_criar_tarefas(termos, opcoes)
+
+    reservadas = {}
+    for tarefa_id, termo in criadas:
+        _atualizar_tarefa(tarefa_id, status='executando', data_inicio=_agora())
+        reservadas[termo] = tarefa_id
+
+    return reservadas, resposta
+
+def registrar_progresso_busca(tarefa_id, novos_resultados, fontes_concluidas, total_fontes):
+    """
+    Registra os resultados de uma fonte numa busca reservada com reservar_buscas.
+
+    Args:
+        tarefa_id (str): ID da tarefa
+        novos_resultados (list): Resultados obtidos na fonte
+        fontes_concluidas (int): Fontes já processadas
+        total_fontes (int): Total de fontes da busca
+    """
+    _registrar_progresso(tarefa_id, novos_resultados, fontes_concluidas, total_fontes)
+
+def encerrar_busca(tarefa_id, status='concluida', erro=None):
+    """
+    Encerra uma busca reservada com reservar_buscas.
+
+    Uma busca 'interrompida' é assumida pelas chamadas de buscar_coalescido
+    que a aguardavam.
+
+    Args:
+        tarefa_id (str): ID da tarefa
+        status (str, optional): 'concluida', 'erro' ou 'interrompida'. Defaults to 'concluida'.
+        erro (str, optional): Mensagem de erro. Defaults to None.
+    """
+    _atualizar_tarefa(tarefa_id, status=status, erro=erro, data_fim=_agora())
+    publicar_evento('tarefa_concluida', {'tarefa_id': tarefa_id, 'status': status}, canal=tarefa_id)
+
+def _sem_progresso(tarefa):
+    # Mesmo critério de marcar_tarefas_interrompidas (datas em UTC, no formato do SQLite)
+    limite = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=TEMPO_MAXIMO_SEM_PROGRESSO)
+    return (tarefa['data_atualizacao'] or '') < limite.strftime('%Y-%m-%d %H:%M:%S')
+
+def buscar_coalescido(termo, opcoes=None, intervalo=2.0, espera_maxima=None):
+    """
+    Executa uma busca de forma síncrona, compartilhando a execução com buscas
+    idênticas em andamento (inclusive em outros processos) ou recentes.
+
+    Usada por chamadores que precisam do resultado completo, como a busca agendada.
+    Se o processo que executava a busca compartilhada morrer, a tarefa é marcada
+    como interrompida quando fica sem progresso e a busca é assumida por esta chamada.
+
+    Args:
+        termo (str): Termo a ser buscado
+        opcoes (dict, optional): Opções repassadas ao coletor. Defaults to None.
+        intervalo (float, optional): Intervalo entre consultas enquanto aguarda outra execução
+        espera_maxima (float, optional): Espera máxima (s) pelo resultado. Defaults to TEMPO_MAXIMO_ESPERA.
+
+    Returns:
+        list: Lista de resultados encontrados
+
+    Raises:
+        RuntimeError: Se a busca compartilhada terminar com erro
+        TimeoutError: Se o resultado não ficar pronto dentro da espera máxima
+    """
+    prazo = time.monotonic() + (espera_maxima or TEMPO_MAXIMO_ESPERA)
+
+    while True:
+        resposta, criadas = _obter_ou_criar_tarefas([termo], opcoes)
+        tarefa_id = resposta[0]['tarefa_id']
+
+        if criadas:
+            # Esta chamada venceu: executa a busca na própria thread
+            _executar_busca(tarefa_id, termo, None, opcoes)
+        else:
+            logger.info(f"Busca por '{termo}' atendida pela tarefa {tarefa_id} ({resposta[0]['origem']})")
+
+        tarefa = obter_tarefa(tarefa_id, incluir_resultados=False)
+        while tarefa and not tarefa['concluida']:
+            if time.monotonic() >= prazo:
+                raise TimeoutError(f"Busca compartilhada {tarefa_id} não concluída em {espera_maxima or TEMPO_MAXIMO_ESPERA}s")
+            time.sleep(intervalo)
+            tarefa = obter_tarefa(tarefa_id, incluir_resultados=False)
+            if tarefa and not tarefa['concluida'] and _sem_progresso(tarefa):
+                # O processo que executava a busca parou: libera a chave da busca
+                marcar_tarefas_interrompidas()
+                tarefa = obter_tarefa(tarefa_id, incluir_resultados=False)
+
+        if tarefa is None:
+            raise RuntimeError(f"Busca compartilhada {tarefa_id} não existe mais")
+
+        if tarefa['status'] == 'interrompida' and not criadas:
+            logger.warning(f"Tarefa {tarefa_id} interrompida sem concluir: assumindo a busca por '{termo}'")
+            continue
+
+        if tarefa['status'] != 'concluida':
+            raise RuntimeError(f"Busca compartilhada {tarefa_id} terminou com status '{tarefa['status']}': {tarefa['erro']}")
+
+        return obter_tarefa(tarefa_id)['resultados']
+
+def obter_tarefa(tarefa_id, desde=0, incluir_resultados=True):
+    """
+    Obtém o estado de uma tarefa e os resultados a partir de uma posição.
+
+    Args:
+        tarefa_id (str): ID da tarefa
+        desde (int, optional): Posição do primeiro resultado retornado. Defaults to 0.
+        incluir_resultados (bool, optional): Se deve carregar os resultados. Defaults to True.
+
+    Returns:
+        dict: Estado da tarefa com a lista 'resultados' ou None se não existir
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM tarefas WHERE id = ?', (tarefa_id,))
+        tarefa = cursor.fetchone()
+
+        if not tarefa:
+            return None
+
+        tarefa = dict(tarefa)
+        tarefa['concluida'] = tarefa['status'] not in STATUS_ATIVOS
+        tarefa['resultados'] = []
+
+        if incluir_resultados:
+            cursor.execute(
+                'SELECT dados FROM tarefas_resultados WHERE tarefa_id = ? AND ordem >= ? ORDER BY ordem',
+                (tarefa_id, desde)
+            )
+            tarefa['resultados'] = [json.loads(row['dados']) for row in cursor.fetchall()]
+
+        return tarefa
+    finally:
+        conn.close()
+
+def listar_tarefas(limite=20):
+    """
+    Lista as tarefas mais recentes.
+
+    Args:
+        limite (int, optional): Quantidade máxima de tarefas. Defaults to 20.
+
+    Returns:
+        list: Lista de dicionários com as tarefas
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('SELECT * FROM tarefas ORDER BY data_criacao DESC LIMIT ?', (limite,))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def obter_lote(lote_id, pagina=1, por_pagina=100):
+    """
+    Obtém o estado de um lote e de uma página das suas tarefas.
+
+    Args:
+        lote_id (str): ID do lote
+        pagina (int, optional): Página das tarefas (a partir de 1). Defaults to 1.
+        por_pagina (int, optional): Tarefas por página. Defaults to 100.
+
+    Returns:
+        dict: Estado do lote ou None se não existir
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM lotes WHERE id = ?', (lote_id,))
+        lote = cursor.fetchone()
+
+        if not lote:
+            return None
+
+        lote = dict(lote)
+
+        cursor.execute(
+            '''
+            SELECT t.status, COUNT(*) AS quantidade, SUM(t.total_resultados) AS resultados
+            FROM lotes_tarefas lt
+            JOIN tarefas t ON t.id = lt.tarefa_id
+            WHERE lt.lote_id = ?
+            GROUP BY t.status
+            ''',
+            (lote_id,)
+        )
+        por_status = {row['status']: row['quantidade'] for row in cursor.fetchall()}
+        lote['por_status'] = por_status
+        lote['concluido'] = not any(por_status.get(status) for status in STATUS_ATIVOS)
+
+        cursor.execute(
+            '''
+            SELECT lt.ordem, lt.termo, t.id AS tarefa_id, t.status, t.fontes_concluidas,
+                   t.total_fontes, t.total_resultados, t.erro
+            FROM lotes_tarefas lt
+            JOIN tarefas t ON t.id = lt.tarefa_id
+            WHERE lt.lote_id = ?
+            ORDER BY lt.ordem
+            LIMIT ? OFFSET ?
+            ''',
+            (lote_id, por_pagina, (max(pagina, 1) - 1) * por_pagina)
+        )
+        lote['pagina'] = max(pagina, 1)
+        lote['por_pagina'] = por_pagina
+        lote['tarefas'] = [dict(row) for row in cursor.fetchall()]
+
+        return lote
+    finally:
+        conn.close()
+
+def iterar_resultados_lote(lote_id, aguardar=False, intervalo=1.0):
+    """
+    Percorre os resultados persistidos das tarefas de um lote.
+
+    Args:
+        lote_id (str): ID do lote
+        aguardar (bool, optional): Se deve continuar até todas as tarefas terminarem. Defaults to False.
+        intervalo (float, optional): Intervalo entre consultas ao aguardar (segundos). Defaults to 1.0.
+
+    Yields:
+        dict: {'termo', 'tarefa_id', 'resultado'}
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            'SELECT termo, tarefa_id FROM lotes_tarefas WHERE lote_id = ? ORDER BY ordem',
+            (lote_id,)
+        )
+        # Tarefas agrupadas aparecem uma vez por termo original; os resultados são enviados uma vez por tarefa
+        termos_por_tarefa = {}
+        for row in cursor.fetchall():
+            termos_por_tarefa.setdefault(row['tarefa_id'], row['termo'])
+    finally:
+        conn.close()
+
+    enviados = {tarefa_id: 0 for tarefa_id in termos_por_tarefa}
+
+    while enviados:
+        for tarefa_id in list(enviados):
+            tarefa = obter_tarefa(tarefa_id, desde=enviados[tarefa_id])
+            if tarefa is None:
+                # Tarefa removida do banco: não há mais resultados a enviar
+                del enviados[tarefa_id]
+                continue
+
+            for resultado in tarefa['resultados']:
+                yield {'termo': termos_por_tarefa[tarefa_id], 'tarefa_id': tarefa_id, 'resultado': resultado}
+            enviados[tarefa_id] += len(tarefa['resultados'])
+
+            if tarefa['concluida'] or not aguardar:
+                del enviados[tarefa_id]
+
+        if enviados:
+            time.sleep(intervalo)
+
+# Desenvolvido por Luiz Vaisconcelos
+# Email: luiz.vaisconcelos@gmail.com
+# LinkedIn: https://www.linkedin.com/in/vaisconcelos/
+# GitHub: https://github.com/luizhvaisconcelos
@@ -0,0 +1,77 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import db
+import escritor_db
+import tarefas
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'onion_monitor.db'))
+    escritor_db.definir_encaminhador(None)
+    db.init_db()
+    return db
+
+def _envelhecer(tarefa_id, segundos):
+    conn = db.get_db_connection()
+    conn.execute(
+        "UPDATE tarefas SET data_criacao = datetime('now', ?), data_atualizacao = datetime('now', ?) WHERE id = ?",
+        (f'-{segundos} seconds', f'-{segundos} seconds', tarefa_id)
+    )
+    conn.commit()
+    conn.close()
+
+def _aguardar_status(tarefa_id, status, limite=10):
+    prazo = time.monotonic() + limite
+    while time.monotonic() < prazo:
+        if tarefas.obter_tarefa(tarefa_id, incluir_resultados=False)['status'] == status:
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"Tarefa {tarefa_id} não chegou a '{status}'")
+
+def test_tarefa_pendente_na_fila_de_lotes_nao_expira(banco, monkeypatch):
+    liberar = threading.Event()
+
+    def buscar_termo(termo, ao_progredir=None, **opcoes):
+        if termo == 'primeiro':
+            liberar.wait(10)
+        resultados = [{'titulo': termo}]
+        ao_progredir('fonte', resultados, 1, 1)
+        return resultados
+
+    monkeypatch.setattr(tarefas, 'buscar_termo', buscar_termo)
+
+    lote = tarefas.submeter_lote(['primeiro', 'segundo'])
+    primeira, segunda = (item['tarefa_id'] for item in lote['termos'])
+    _aguardar_status(primeira, 'executando')
+
+    # A segunda tarefa espera na fila (um trabalhador de lotes) por mais que o tempo máximo sem progresso
+    _envelhecer(segunda, tarefas.TEMPO_MAXIMO_SEM_PROGRESSO + 60)
+    tarefas.marcar_tarefas_interrompidas()
+
+    assert tarefas.obter_tarefa(segunda, incluir_resultados=False)['status'] == 'pendente'
+    assert not tarefas.obter_lote(lote['lote_id'])['concluido']
+
+    # A chave continua ocupada: a mesma busca é coalescida, e não executada de novo
+    repetida = tarefas.submeter_lote(['segundo'])['termos'][0]
+    assert repetida['tarefa_id'] == segunda
+    assert repetida['origem'] == 'em_andamento'
+
+    liberar.set()
+    termos = [item['resultado']['titulo'] for item in tarefas.iterar_resultados_lote(lote['lote_id'], aguardar=True, intervalo=0.05)]
+    assert sorted(termos) == ['primeiro', 'segundo']
+    assert tarefas.obter_tarefa(segunda, incluir_resultados=False)['status'] == 'concluida'
+
+def test_tarefa_pendente_de_processo_encerrado_expira(banco):
+    processo = subprocess.Popen([sys.executable, '-c', 'pass'])
+    processo.wait()
+
+    tarefas._inserir_tarefa('orfa', 'termo', tarefas.chave_busca('termo'), '{}', f"{tarefas.socket.gethostname()}:{processo.pid}")
+    _envelhecer('orfa', tarefas.TEMPO_MAXIMO_SEM_PROGRESSO + 60)
+
+    assert tarefas.marcar_tarefas_interrompidas() == 1
+    assert tarefas.obter_tarefa('orfa', incluir_resultados=False)['status'] == 'interrompida'